@@ -38,7 +38,16 @@ DATABASE_CONFIG = {
 POOL_CONFIG = {
     'min_connections': int(os.getenv('MIN_CONNECTIONS_POOL', '2')),
     'max_connections': int(os.getenv('MAX_CONNECTIONS_POOL', '10')),
-    'timeout': int(os.getenv('CONNECTION_TIMEOUT', '10'))
+    'timeout': int(os.getenv('CONNECTION_TIMEOUT', '10')),
+    # Consultas simultâneas de uma página (as demais sessões disputam o restante do pool)
+    'page_workers': int(os.getenv('POOL_PAGE_WORKERS', '3')),
+    # Conexões ociosas acima do mínimo são fechadas após este tempo
+    'idle_seconds': float(os.getenv('POOL_IDLE_SECONDS', '300')),
+    # Tempo máximo de cada consulta dos dashboards (0: sem limite)
+    'statement_timeout_ms': int(os.getenv('POOL_STATEMENT_TIMEOUT_MS', '30000')),
+    # Resultados com ao menos estas linhas estimadas são lidos via COPY (0: desativado)
+    'copy_min_rows': int(os.getenv('POOL_COPY_MIN_ROWS', '50000')),
+    'copy_block_mb': float(os.getenv('POOL_COPY_BLOCK_MB', '8'))
 }
 
 # Schemas específicos
@@ -48,17 +57,90 @@ SCHEMAS = {
     'cte': os.getenv('CTE_SCHEMA', 'cte')
 }
 
-# Configurações de cache
+# Configurações de cache (consultas dos dashboards: Streamlit/utils/cache_consultas.py)
 CACHE_CONFIG = {
     'ttl_seconds': int(os.getenv('CACHE_TTL_SECONDS', '3600')),
-    'max_size': 1000
+    'max_size': int(os.getenv('CACHE_MAX_SIZE', '1000')),
+    'max_memory_mb': float(os.getenv('CACHE_MAX_MEMORY_MB', '256')),
+    # Intervalo mínimo entre leituras da geração dos dados (migrations/create_geracao_dados.sql)
+    'generation_poll_seconds': float(os.getenv('CACHE_GENERATION_POLL_SECONDS', '1')),
+    # Cache em disco compartilhado pelos processos do host (vazio: desativado)
+    'shared_dir': os.getenv('CACHE_SHARED_DIR', ''),
+    'shared_max_mb': float(os.getenv('CACHE_SHARED_MAX_MB', '1024')),
+    # Acertos no disco só regravam o último acesso (ordem de remoção) após este intervalo
+    'shared_access_interval_seconds': float(os.getenv('CACHE_SHARED_ACCESS_INTERVAL_SECONDS', '60'))
 }
 
 # Configurações de processamento
 PROCESSING_CONFIG = {
     'batch_size': int(os.getenv('BATCH_SIZE', '50')),
     'max_workers': int(os.getenv('MAX_WORKERS', '4')),
-    'network_timeout': int(os.getenv('NETWORK_TIMEOUT', '30'))
+    'network_timeout': int(os.getenv('NETWORK_TIMEOUT', '30')),
+    # 'individual' (um documento por transação) ou 'lote' (cte.f_ingest_cte_batch)
+    'ingest_mode': os.getenv('INGEST_MODE', 'individual'),
+    'ingest_batch_size': int(os.getenv('INGEST_BATCH_SIZE', '500')),
+    # Manifesto de ingestão (staging.ingestao_manifesto) para execuções retomáveis
+    'use_manifest': os.getenv('USE_MANIFEST', 'true').lower() == 'true',
+    'manifest_lease_minutes': int(os.getenv('MANIFEST_LEASE_MINUTES', '30')),
+    # Raiz de ingestão: o manifesto guarda o caminho relativo a ela (vazia: diretório varrido)
+    'ingest_root': os.getenv('INGEST_ROOT', ''),
+    # Workers distribuídos (python main.py --worker): heartbeat dos shards
+    'worker_lease_seconds': int(os.getenv('WORKER_LEASE_SECONDS', '60')),
+    # Descoberta de arquivos (padrões glob separados por vírgula)
+    'discovery_recursive': os.getenv('DISCOVERY_RECURSIVE', 'false').lower() == 'true',
+    'discovery_include': os.getenv('DISCOVERY_INCLUDE', '*.xml').split(','),
+    'discovery_exclude': [p for p in os.getenv('DISCOVERY_EXCLUDE', '').split(',') if p],
+    # Sucessos/erros recentes mantidos pelo StatsManager
+    'stats_max_recent': int(os.getenv('STATS_MAX_RECENT', '1000')),
+    # Backfill: documentos (faixa de id_cte) por UPDATE
+    'backfill_chunk_size': int(os.getenv('BACKFILL_CHUNK_SIZE', '10000'))
+}
+
+# Configurações do modo daemon (python main.py --watch DIR)
+WATCH_CONFIG = {
+    'max_batch': int(os.getenv('WATCH_MAX_BATCH', '200')),
+    'max_age_seconds': float(os.getenv('WATCH_MAX_AGE_SECONDS', '2')),
+    'poll_interval_seconds': float(os.getenv('WATCH_POLL_INTERVAL_SECONDS', '0.5')),
+    'stable_seconds': float(os.getenv('WATCH_STABLE_SECONDS', '1')),
+    'metrics_file': os.getenv('WATCH_METRICS_FILE', '')
+}
+
+# Configurações de distância (haversine sobre coordenadas IBGE)
+DISTANCE_CONFIG = {
+    # 'frete' mantém frete ÷ custo/km; 'haversine' (opcional) usa as coordenadas de ibge.municipio
+    'mileage_source': os.getenv('MILEAGE_SOURCE', 'frete'),
+    'cache_dir': os.getenv('DISTANCE_CACHE_DIR', os.path.join('temp', 'distancias')),
+    'circuity_default': float(os.getenv('DISTANCE_CIRCUITY_DEFAULT', '1.0')),
+    'circuity_file': os.getenv('DISTANCE_CIRCUITY_FILE', ''),
+    # Rotas mantidas em memória na frente de cte.rota_distancia
+    'route_cache_size': int(os.getenv('ROUTE_CACHE_SIZE', '4096'))
+}
+
+# Views materializadas de analytics (migrations/create_mv_refresh.sql)
+VIEWS_CONFIG = {
+    # Atualiza as views afetadas ao fim de cada processamento do ETL
+    'refresh_after_batch': os.getenv('VIEWS_REFRESH_AFTER_BATCH', 'true').lower() == 'true',
+    'refresh_workers': int(os.getenv('VIEWS_REFRESH_WORKERS', '4')),
+    # Modo daemon: intervalo mínimo entre atualizações (não a cada micro-lote)
+    'refresh_min_interval_seconds': float(os.getenv('VIEWS_REFRESH_MIN_INTERVAL_SECONDS', '300'))
+}
+
+# Tabelas de referência IBGE em memória compartilhada (uma cópia por host)
+REFERENCE_CONFIG = {
+    'shared_memory': os.getenv('SHARED_REFERENCES', 'true').lower() == 'true',
+    # Vazio = prefixo derivado de host/porta/banco
+    'prefix': os.getenv('SHARED_REFERENCES_PREFIX', ''),
+    'check_interval_seconds': float(os.getenv('SHARED_REFERENCES_CHECK_SECONDS', '1.0'))
+}
+
+# Particionamento mensal de cte.documento/cte.carga (migrations/create_particionamento.sql)
+PARTITION_CONFIG = {
+    # Meses à frente do atual com partição criada no início de cada processamento
+    'future_months': int(os.getenv('PARTITION_FUTURE_MONTHS', '3')),
+    # Linhas por transação na cópia para as tabelas particionadas
+    'migration_batch_size': int(os.getenv('PARTITION_MIGRATION_BATCH', '20000')),
+    'migration_pause_seconds': float(os.getenv('PARTITION_MIGRATION_PAUSE', '0')),
+    'archive_dir': os.getenv('PARTITION_ARCHIVE_DIR', os.path.join('temp', 'arquivo'))
 }
 
 # Configurações de log
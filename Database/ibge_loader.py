@@ -3,12 +3,16 @@
 """
 IBGE Loader for PostgreSQL (UF & Município)
 -------------------------------------------
-- Fetches official data from IBGE's public API.
-- Upserts into the schema created by schema_cte_ibge_postgres.sql.
-- Safe to re-run (idempotent).
+- Loads UFs and municipalities (with coordinates) from a versioned, gzip
+  compressed snapshot shipped in dados/ibge (works offline).
+- COPYs the snapshot into temporary staging tables and upserts only the rows
+  that are new or changed (safe and cheap to re-run).
+- Optionally refreshes the snapshot from IBGE's public API and the
+  coordinates dataset on GitHub (--refresh), then loads it.
 
 Requirements:
-    pip install requests psycopg2-binary
+    pip install psycopg2-binary
+    pip install requests          # only for --refresh
 
 Environment variables for DB connection (default in parentheses):
     PGHOST (localhost)
@@ -17,24 +21,41 @@ Environment variables for DB connection (default in parentheses):
     PGUSER (postgres)
     PGPASSWORD (postgres)
 
+A snapshot flagged "seed" in its manifest (a partial list, e.g. the one
+shipped before the full snapshot is generated) is refused unless --refresh
+replaces it or --allow-seed is given.
+
 Usage:
-    python ibge_loader.py
+    python ibge_loader.py                 # offline, from the snapshot
+    python ibge_loader.py --refresh       # fetch online, write a new snapshot, load it
+    python ibge_loader.py --allow-seed    # load a seed snapshot (development/tests)
 """
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
 import os
 import sys
 import time
-import csv
-import io
-from typing import List, Dict, Any
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
 
-import requests
 import psycopg2
-from psycopg2.extras import execute_values
 
 IBGE_ESTADOS_URL = "https://servicodados.ibge.gov.br/api/v1/localidades/estados?orderBy=id"
 IBGE_MUNICIPIOS_URL = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios?orderBy=id"
 MUNICIPIOS_COORDENADAS_URL = "https://raw.githubusercontent.com/kelvins/Municipios-Brasileiros/main/csv/municipios.csv"
 
+SNAPSHOT_DIR = Path(__file__).parent / "dados" / "ibge"
+SNAPSHOT_MANIFEST = "snapshot.json"
+UF_FILE = "uf.csv.gz"
+MUNICIPIO_FILE = "municipio.csv.gz"
+UF_COLUMNS = ("id_uf", "sigla", "nome", "regiao")
+MUNICIPIO_COLUMNS = ("id_municipio", "nome", "id_uf", "latitude", "longitude")
+
 def getenv(name: str, default: str) -> str:
     v = os.getenv(name, default)
     return v
@@ -52,11 +73,12 @@ def get_conn():
     return conn
 
 def fetch_json(url: str) -> Any:
+    import requests
     resp = requests.get(url, timeout=60)
     resp.raise_for_status()
     return resp.json()
 
-def load_ufs(conn, estados: List[Dict[str, Any]]) -> int:
+def build_uf_rows(estados: List[Dict[str, Any]]) -> List[Tuple]:
     rows = []
     for e in estados:
         id_uf = int(e["id"])
@@ -64,18 +86,7 @@ def load_ufs(conn, estados: List[Dict[str, Any]]) -> int:
         nome = e["nome"]
         regiao_nome = e.get("regiao", {}).get("nome")
         rows.append((id_uf, sigla, nome, regiao_nome))
-
-    sql = """
-        INSERT INTO ibge.uf (id_uf, sigla, nome, regiao)
-        VALUES %s
-        ON CONFLICT (id_uf) DO UPDATE
-           SET sigla = EXCLUDED.sigla,
-               nome = EXCLUDED.nome,
-               regiao = EXCLUDED.regiao;
-    """
-    with conn.cursor() as cur:
-        execute_values(cur, sql, rows, page_size=100)
-    return len(rows)
+    return sorted(rows)
 
 # Robust extractor for UF id from the IBGE municipios payload (handles API variations)
 def _extract_uf_id_from_municipio(m: Dict[str, Any]):
@@ -105,7 +116,7 @@ def _extract_uf_id_from_municipio(m: Dict[str, Any]):
     # Not found
     return None
 
-def load_municipios(conn, municipios: List[Dict[str, Any]], coordenadas: Dict[int, tuple]) -> int:
+def build_municipio_rows(municipios: List[Dict[str, Any]], coordenadas: Dict[int, tuple]) -> List[Tuple]:
     rows = []
     for m in municipios:
         id_mun = int(m["id"])
@@ -119,24 +130,8 @@ def load_municipios(conn, municipios: List[Dict[str, Any]], coordenadas: Dict[in
         
         # Buscar coordenadas do dicionário
         lat, lon = coordenadas.get(id_mun, (None, None))
-        rows.append((id_mun, nome, id_uf, nome, lat, lon))
-
-    sql = """
-        INSERT INTO ibge.municipio (id_municipio, nome, id_uf, nome_normalizado, latitude, longitude)
-        VALUES %s
-        ON CONFLICT (id_municipio) DO UPDATE
-           SET nome = EXCLUDED.nome,
-               id_uf = EXCLUDED.id_uf,
-               nome_normalizado = EXCLUDED.nome_normalizado,
-               latitude = EXCLUDED.latitude,
-               longitude = EXCLUDED.longitude;
-    """
-    # Notar que para definir nome_normalizado chamamos a função no lado SQL.
-    # O execute_values permite usar um template customizado para cada linha.
-    template = "(%s, %s, %s, ibge.f_normaliza_texto(%s), %s, %s)"
-    with conn.cursor() as cur:
-        execute_values(cur, sql, rows, template=template, page_size=500)
-    return len(rows)
+        rows.append((id_mun, nome, id_uf, lat, lon))
+    return sorted(rows)
 
 def ensure_prereqs(conn):
     # Garante extensão unaccent (usada na ibge.f_normaliza_texto) e schemas básicos (caso alguém rode isolado).
@@ -162,14 +157,16 @@ def fetch_coordenadas() -> Dict[int, tuple]:
     Busca coordenadas geográficas dos municípios brasileiros.
     Retorna um dicionário {codigo_ibge: (latitude, longitude)}
     """
+    import requests
     print("Fetching coordenadas from GitHub dataset ...")
     try:
         resp = requests.get(MUNICIPIOS_COORDENADAS_URL, timeout=60)
         resp.raise_for_status()
         
         coordenadas = {}
-        csv_reader = csv.DictReader(io.StringIO(resp.text))
         
+        csv_reader = csv.DictReader(io.StringIO(resp.text))
+
         for row in csv_reader:
             try:
                 codigo_ibge = int(row['codigo_ibge'])
@@ -187,9 +184,217 @@ def fetch_coordenadas() -> Dict[int, tuple]:
         print("Continuing without coordinates...")
         return {}
 
-def main():
+# ---------------------------------------------------------------------------
+# Snapshot (offline reference data)
+# ---------------------------------------------------------------------------
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+def _write_csv_gz(path: Path, columns: Tuple[str, ...], rows: List[Tuple]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows(rows)
+    # mtime=0: same data -> same bytes -> same sha256 (clean diffs in git)
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0) as gz:
+            gz.write(buffer.getvalue().encode("utf-8"))
+
+def write_snapshot(uf_rows: List[Tuple], municipio_rows: List[Tuple],
+                   snapshot_dir: Path = SNAPSHOT_DIR, description: str = "",
+                   seed: bool = False) -> Dict[str, Any]:
+    """
+    Writes uf.csv.gz, municipio.csv.gz and the snapshot.json manifest
+    (version, row counts and sha256 of each file). seed=True flags a partial
+    snapshot that load_snapshot refuses by default.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    _write_csv_gz(snapshot_dir / UF_FILE, UF_COLUMNS, sorted(uf_rows))
+    _write_csv_gz(snapshot_dir / MUNICIPIO_FILE, MUNICIPIO_COLUMNS, sorted(municipio_rows))
+
+    now = datetime.now(timezone.utc)
+    manifest = {
+        "version": now.strftime("%Y.%m.%d"),
+        "created_at": now.isoformat(timespec="seconds"),
+        "description": description,
+        "seed": seed,
+        "sources": [IBGE_ESTADOS_URL, IBGE_MUNICIPIOS_URL, MUNICIPIOS_COORDENADAS_URL],
+        "files": {
+            UF_FILE: {"rows": len(uf_rows), "sha256": _sha256(snapshot_dir / UF_FILE)},
+            MUNICIPIO_FILE: {"rows": len(municipio_rows), "sha256": _sha256(snapshot_dir / MUNICIPIO_FILE)},
+        },
+    }
+    (snapshot_dir / SNAPSHOT_MANIFEST).write_text(
+        json.dumps(manifest, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+    )
+    return manifest
+
+def read_manifest(snapshot_dir: Path = SNAPSHOT_DIR) -> Dict[str, Any]:
+    """Reads the manifest and checks the sha256 of every snapshot file."""
+    snapshot_dir = Path(snapshot_dir)
+    manifest = json.loads((snapshot_dir / SNAPSHOT_MANIFEST).read_text(encoding="utf-8"))
+    for name, info in manifest["files"].items():
+        if _sha256(snapshot_dir / name) != info["sha256"]:
+            raise ValueError(f"Snapshot file {name} does not match the manifest (sha256)")
+    return manifest
+
+def check_seed(manifest: Dict[str, Any], allow_seed: bool = False) -> None:
+    """Raises ValueError for a seed snapshot unless allow_seed is set."""
+    if manifest.get("seed") and not allow_seed:
+        raise ValueError(
+            f"Snapshot {manifest['version']} is a seed "
+            f"({manifest['files'][MUNICIPIO_FILE]['rows']} municipalities): "
+            "run with --refresh to fetch the full IBGE list or --allow-seed to load it anyway"
+        )
+
+def refresh_snapshot(snapshot_dir: Path = SNAPSHOT_DIR) -> Dict[str, Any]:
+    """Fetches the online sources and writes a new snapshot."""
+    print("Fetching UFs from IBGE ...")
+    estados = fetch_json(IBGE_ESTADOS_URL)
+    print(f"Fetched {len(estados)} UFs")
+
+    print("Fetching Municípios from IBGE ... (this can take a few seconds)")
+    municipios = fetch_json(IBGE_MUNICIPIOS_URL)
+    print(f"Fetched {len(municipios)} Municípios")
+
+    # Buscar coordenadas geográficas
+    coordenadas = fetch_coordenadas()
+
+    return write_snapshot(
+        build_uf_rows(estados), build_municipio_rows(municipios, coordenadas), snapshot_dir,
+        description="Full IBGE snapshot (all UFs and municipalities)",
+    )
+
+def load_snapshot(conn, snapshot_dir: Path = SNAPSHOT_DIR, allow_seed: bool = False) -> Dict[str, int]:
+    """
+    COPYs the snapshot into temporary staging tables and upserts only new or
+    changed rows into ibge.uf / ibge.municipio. Rows missing from the
+    snapshot are kept (they may be referenced by documents).
+    The caller commits.
+
+    Raises:
+        ValueError: the snapshot is a seed and allow_seed is False
+
+    Returns:
+        Snapshot row counts and the number of rows actually written
+    """
+    snapshot_dir = Path(snapshot_dir)
+    manifest = read_manifest(snapshot_dir)
+    check_seed(manifest, allow_seed)
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE tmp_ibge_uf (
+                id_uf smallint, sigla char(2), nome text, regiao text
+            ) ON COMMIT DROP;
+            CREATE TEMP TABLE tmp_ibge_municipio (
+                id_municipio integer, nome text, id_uf smallint,
+                latitude numeric(9,6), longitude numeric(9,6)
+            ) ON COMMIT DROP;
+        """)
+        for table, name, columns in (("tmp_ibge_uf", UF_FILE, UF_COLUMNS),
+                                     ("tmp_ibge_municipio", MUNICIPIO_FILE, MUNICIPIO_COLUMNS)):
+            with gzip.open(snapshot_dir / name, "rt", encoding="utf-8") as f:
+                cur.copy_expert(
+                    f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)", f
+                )
+
+        cur.execute("""
+            INSERT INTO ibge.uf AS u (id_uf, sigla, nome, regiao)
+            SELECT s.id_uf, s.sigla, s.nome, s.regiao
+            FROM tmp_ibge_uf s
+            LEFT JOIN ibge.uf t ON t.id_uf = s.id_uf
+            WHERE t.id_uf IS NULL
+               OR (t.sigla, t.nome, t.regiao) IS DISTINCT FROM (s.sigla, s.nome, s.regiao)
+            ON CONFLICT (id_uf) DO UPDATE
+               SET sigla = EXCLUDED.sigla,
+                   nome = EXCLUDED.nome,
+                   regiao = EXCLUDED.regiao;
+        """)
+        ufs_written = cur.rowcount
+
+        # ibge.f_normaliza_texto runs only for the rows being written
+        cur.execute("""
+            INSERT INTO ibge.municipio AS m
+                (id_municipio, nome, id_uf, nome_normalizado, latitude, longitude)
+            SELECT s.id_municipio, s.nome, s.id_uf, ibge.f_normaliza_texto(s.nome),
+                   s.latitude, s.longitude
+            FROM tmp_ibge_municipio s
+            LEFT JOIN ibge.municipio t ON t.id_municipio = s.id_municipio
+            WHERE t.id_municipio IS NULL
+               OR (t.nome, t.id_uf, t.latitude, t.longitude)
+                  IS DISTINCT FROM (s.nome, s.id_uf, s.latitude, s.longitude)
+            ON CONFLICT (id_municipio) DO UPDATE
+               SET nome = EXCLUDED.nome,
+                   id_uf = EXCLUDED.id_uf,
+                   nome_normalizado = EXCLUDED.nome_normalizado,
+                   latitude = EXCLUDED.latitude,
+                   longitude = EXCLUDED.longitude;
+        """)
+        municipios_written = cur.rowcount
+
+    return {
+        "version": manifest["version"],
+        "ufs": manifest["files"][UF_FILE]["rows"],
+        "municipios": manifest["files"][MUNICIPIO_FILE]["rows"],
+        "ufs_written": ufs_written,
+        "municipios_written": municipios_written,
+    }
+
+def republish_shared_references(conn, prefix: str = None):
+    """
+    Swap in the freshly loaded tables for processes attached to the host's
+    shared-memory copy (ReferenciaCompartilhadaManager). Does nothing when no
+    copy was published for this database yet. Returns the new version or None.
+    """
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from Database.managers.referencia_compartilhada_manager import ReferenciaCompartilhadaManager
+
+    if prefix is None:
+        prefix = ReferenciaCompartilhadaManager.prefixo_banco({
+            "host": getenv("PGHOST", "localhost"),
+            "port": getenv("PGPORT", "5432"),
+            "database": getenv("PGDATABASE", "postgres"),
+        })
+    manager = ReferenciaCompartilhadaManager(prefixo=prefix)
+    if manager.atual() is None:
+        return None
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT id_municipio, id_uf, nome, latitude, longitude FROM ibge.municipio;")
+        municipios = cur.fetchall()
+        cur.execute("SELECT id_uf, sigla FROM ibge.uf;")
+        ufs = cur.fetchall()
+    return manager.publicar(manager.montar_tabelas(municipios, ufs))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load IBGE UFs and municipalities")
+    parser.add_argument("--refresh", action="store_true",
+                        help="fetch IBGE/GitHub online and write a new snapshot before loading")
+    parser.add_argument("--allow-seed", action="store_true",
+                        help="load the snapshot even if its manifest flags it as a partial seed")
+    parser.add_argument("--snapshot-dir", default=str(SNAPSHOT_DIR),
+                        help="snapshot directory (default: dados/ibge)")
+    parser.add_argument("--shared-prefix", default=None,
+                        help="shared-memory prefix to republish (default: derived from PGHOST/PGPORT/PGDATABASE)")
+    args = parser.parse_args(argv)
+
     t0 = time.time()
     print("== IBGE Loader ==")
+
+    if args.refresh:
+        manifest = refresh_snapshot(Path(args.snapshot_dir))
+        print(f"Snapshot {manifest['version']} written to {args.snapshot_dir}")
+    else:
+        # Fail before connecting when the shipped snapshot is only a seed
+        try:
+            check_seed(read_manifest(Path(args.snapshot_dir)), args.allow_seed)
+        except ValueError as e:
+            print("Error:", e)
+            sys.exit(1)
+
     try:
         conn = get_conn()
     except Exception as e:
@@ -199,24 +404,11 @@ def main():
     try:
         ensure_prereqs(conn)
 
-        print("Fetching UFs from IBGE ...")
-        estados = fetch_json(IBGE_ESTADOS_URL)
-        print(f"Fetched {len(estados)} UFs")
-
-        print("Upserting UFs ...")
-        n_ufs = load_ufs(conn, estados)
-        print(f"Upserted UFs: {n_ufs}")
-
-        print("Fetching Municípios from IBGE ... (this can take a few seconds)")
-        municipios = fetch_json(IBGE_MUNICIPIOS_URL)
-        print(f"Fetched {len(municipios)} Municípios")
-
-        # Buscar coordenadas geográficas
-        coordenadas = fetch_coordenadas()
-
-        print("Upserting Municípios with coordinates ...")
-        n_mun = load_municipios(conn, municipios, coordenadas)
-        print(f"Upserted Municípios: {n_mun}")
+        print(f"Loading snapshot from {args.snapshot_dir} ...")
+        result = load_snapshot(conn, Path(args.snapshot_dir), allow_seed=args.allow_seed)
+        print(f"Snapshot {result['version']}: {result['ufs']} UFs, {result['municipios']} Municípios")
+        print(f"Written (new or changed) -> UF: {result['ufs_written']}, "
+              f"Município: {result['municipios_written']}")
 
         # Quick sanity checks
         with conn.cursor() as cur:
@@ -226,6 +418,10 @@ def main():
             m_count = cur.fetchone()[0]
         conn.commit()
 
+        version = republish_shared_references(conn, args.shared_prefix)
+        if version:
+            print(f"Shared-memory reference tables republished (version {version})")
+
         dt = time.time() - t0
         print(f"Done in {dt:.1f}s. Totals -> UF: {u_count}, Município: {m_count}")
     except Exception as e:
@@ -8,6 +8,8 @@ Entry Point - Classe Main simplificada
 import os
 import sys
 import time
+import argparse
+from datetime import date
 from pathlib import Path
 
 # Adicionar diretórios ao path
@@ -17,12 +19,25 @@ sys.path.insert(0, parent_dir)
 
 # Imports locais
 try:
-    from Config.database_config import DATABASE_CONFIG, validate_config
+    from Config.database_config import (
+        DATABASE_CONFIG, PROCESSING_CONFIG, WATCH_CONFIG, DISTANCE_CONFIG, REFERENCE_CONFIG,
+        VIEWS_CONFIG, PARTITION_CONFIG, validate_config
+    )
     from Database.managers.database_manager import CTEDatabaseManager
     from Database.managers.file_manager import FileManager
+    from Database.managers.manifest_manager import ManifestManager
+    from Database.managers.particao_manager import ParticaoManager
+    from Database.managers.geracao_dados_manager import GeracaoDadosManager
+    from Database.managers.referencia_compartilhada_manager import ReferenciaCompartilhadaManager
+    from Database.managers.rota_distancia_manager import RotaDistanciaManager
+    from Database.managers.shard_manager import ShardManager
     from Database.managers.stats_manager import StatsManager
+    from Database.services.backfill_service import BackfillService
+    from Database.services.distancia_service import DistanciaService
     from Database.services.etl_service import ETLService
     from Database.services.quilometragem_service import QuilometragemService
+    from Database.services.watch_service import WatchService
+    from Database.views.orquestrador_views import OrquestradorViews
 except ImportError as e:
     print(f"❌ Erro de importação: {e}")
     sys.exit(1)
@@ -34,11 +49,28 @@ class CTEMainApplication:
     Orquestra todos os componentes seguindo arquitetura limpa
     """
     
-    def __init__(self):
-        """Inicializa a aplicação com todos os managers necessários."""
+    def __init__(self, retry_falhas: bool = False, worker: bool = False,
+                 diretorio: Path = None, custo_por_km: float = None):
+        """
+        Inicializa a aplicação com todos os managers necessários.
+        
+        Args:
+            retry_falhas: Se True, processa apenas arquivos com erro no manifesto
+            worker: Se True, coordena o trabalho com outros workers via shards
+            diretorio: Diretório de entrada (dispensa o seletor de diretório)
+            custo_por_km: Custo por km (dispensa a pergunta interativa)
+        """
+        self.retry_falhas = retry_falhas
+        self.worker = worker
+        self.diretorio = Path(diretorio) if diretorio else None
+        self.custo_por_km = custo_por_km
         self.db_manager = None
+        self.manifest_manager = None
+        self.shard_manager = None
+        self.rota_manager = None
+        self.referencias = None
         self.file_manager = FileManager()
-        self.stats_manager = StatsManager()
+        self.stats_manager = StatsManager(PROCESSING_CONFIG['stats_max_recent'])
         self.etl_service = None
         self.quilometragem_service = QuilometragemService()
         
@@ -72,7 +104,23 @@ class CTEMainApplication:
         # 2. Inicializar managers
         try:
             self.db_manager = CTEDatabaseManager(DATABASE_CONFIG)
-            self.etl_service = ETLService(self.db_manager, self.stats_manager)
+            self.manifest_manager = self._inicializar_manifesto()
+            if self.worker:
+                if not self.manifest_manager:
+                    print("❌ O modo worker requer o manifesto de ingestão")
+                    return False
+                self.shard_manager = ShardManager(
+                    self.db_manager, PROCESSING_CONFIG['worker_lease_seconds']
+                )
+                print(f"🧩 Worker de ingestão: {self.shard_manager.id_worker}")
+            self.referencias = self._inicializar_referencias()
+            self.etl_service = ETLService(
+                self.db_manager, self.stats_manager, self.manifest_manager,
+                self._inicializar_distancias(), self.referencias,
+                self._inicializar_views() if VIEWS_CONFIG['refresh_after_batch'] else None,
+                self._inicializar_particoes(),
+                GeracaoDadosManager(self.db_manager)
+            )
             print("✅ Componentes inicializados com sucesso")
             return True
             
@@ -80,32 +128,173 @@ class CTEMainApplication:
             print(f"❌ Erro na inicialização: {e}")
             return False
     
-    def selecionar_e_validar_arquivos(self) -> tuple[Path, int]:
+    def _inicializar_manifesto(self):
+        """
+        Cria o manager do manifesto de ingestão se habilitado e disponível.
+        
+        Returns:
+            ManifestManager ou None se o manifesto não será usado
+        """
+        if not PROCESSING_CONFIG['use_manifest']:
+            return None
+        
+        manifest_manager = ManifestManager(
+            self.db_manager, PROCESSING_CONFIG['manifest_lease_minutes'],
+            PROCESSING_CONFIG['ingest_root'] or None
+        )
+        if not manifest_manager.disponivel():
+            print("⚠️ Manifesto de ingestão indisponível "
+                  "(aplique migrations/create_ingestao_manifesto.sql)")
+            return None
+        
+        print(f"📒 Manifesto de ingestão ativo (execução {manifest_manager.id_execucao[:8]})")
+        return manifest_manager
+    
+    def _inicializar_views(self):
+        """
+        Cria o orquestrador das views materializadas se a migration existe.
+        
+        Returns:
+            OrquestradorViews ou None (views comuns ou migration ausente)
+        """
+        orquestrador = OrquestradorViews(self.db_manager, VIEWS_CONFIG['refresh_workers'])
+        if not orquestrador.disponivel():
+            print("⚠️ Views materializadas indisponíveis (aplique migrations/create_mv_refresh.sql)")
+            return None
+        
+        print("🔄 Views materializadas atualizadas ao fim de cada processamento")
+        return orquestrador
+    
+    def _inicializar_particoes(self):
+        """
+        Cria o manager de partições se cte.documento é (ou está sendo) particionada.
+        
+        Returns:
+            ParticaoManager ou None (tabelas não particionadas)
+        """
+        particoes = ParticaoManager(self.db_manager, PARTITION_CONFIG['future_months'])
+        if not particoes.disponivel():
+            return None
+        
+        print("🗓️ Partições mensais de documentos criadas durante a carga")
+        return particoes
+    
+    def _inicializar_referencias(self):
+        """
+        Anexa-se às tabelas IBGE em memória compartilhada do host.
+        
+        O primeiro processo publica as tabelas; os workers seguintes apenas
+        se anexam a elas.
+        
+        Returns:
+            ReferenciaCompartilhadaManager ou None se desabilitado/indisponível
+        """
+        if not REFERENCE_CONFIG['shared_memory']:
+            return None
+        
+        referencias = ReferenciaCompartilhadaManager(
+            self.db_manager,
+            REFERENCE_CONFIG['prefix'] or ReferenciaCompartilhadaManager.prefixo_banco(DATABASE_CONFIG),
+            REFERENCE_CONFIG['check_interval_seconds']
+        )
+        tabelas = referencias.obter()
+        if tabelas is None or not tabelas.total_municipios:
+            print("⚠️ Tabelas de referência em memória compartilhada indisponíveis")
+            return None
+        
+        print(f"🗂️  Referências IBGE compartilhadas (versão {tabelas.versao}, "
+              f"{tabelas.total_municipios} municípios)")
+        return referencias
+    
+    def _inicializar_distancias(self):
+        """
+        Cria o serviço de distâncias se habilitado e se há coordenadas no IBGE.
+        
+        Com a tabela cte.rota_distancia disponível, as distâncias passam pelo
+        RotaDistanciaManager (LRU + tabela) antes de serem calculadas.
+        
+        Returns:
+            RotaDistanciaManager, DistanciaService ou None (quilometragem por
+            frete ÷ custo/km)
+        """
+        if DISTANCE_CONFIG['mileage_source'] != 'haversine':
+            return None
+        
+        try:
+            distancia_service = DistanciaService(
+                self.db_manager,
+                diretorio_cache=DISTANCE_CONFIG['cache_dir'],
+                fator_circuidade_padrao=DISTANCE_CONFIG['circuity_default'],
+                referencias=self.referencias
+            )
+            if DISTANCE_CONFIG['circuity_file']:
+                distancia_service.carregar_fatores_circuidade(DISTANCE_CONFIG['circuity_file'])
+            total = distancia_service.total_municipios
+        except Exception as e:
+            print(f"⚠️ Serviço de distâncias indisponível: {e}")
+            return None
+        
+        if not total:
+            print("⚠️ Municípios sem coordenadas (execute ibge_loader.py); "
+                  "quilometragem será estimada pelo frete")
+            return None
+        
+        print(f"📏 Quilometragem por distância entre municípios ({total} com coordenadas)")
+        
+        rota_manager = RotaDistanciaManager(
+            self.db_manager, distancia_service, DISTANCE_CONFIG['route_cache_size']
+        )
+        if not rota_manager.disponivel():
+            print("⚠️ Tabela de rotas indisponível (aplique migrations/create_rota_distancia.sql)")
+            return distancia_service
+        
+        self.rota_manager = rota_manager
+        return rota_manager
+    
+    def selecionar_e_validar_arquivos(self) -> tuple[Path, bool]:
         """
         Seleciona diretório e valida arquivos XML.
         
+        Só verifica se há ao menos um XML; o total é contado pelo
+        StatsManager durante o processamento em streaming.
+        
         Returns:
-            tuple: (diretorio_path, total_arquivos)
+            tuple: (diretorio_path, possui_arquivos)
         """
         print("\n📋 2. Selecionando diretório...")
-        diretorio = self.file_manager.selecionar_diretorio()
+        diretorio = self.diretorio or self.file_manager.selecionar_diretorio()
         
         if not diretorio:
             print("❌ Nenhum diretório selecionado!")
-            return None, 0
+            return None, False
         
-        # Descobrir arquivos XML
-        xml_files = self.file_manager.descobrir_arquivos_xml(diretorio)
-        total_arquivos = len(xml_files)
+        # Sonda de vazio: para no primeiro XML em vez de percorrer o diretório
+        primeiro = next(iter(self._descobrir_arquivos(diretorio)), None)
         
         print(f"\n✅ Diretório selecionado: {diretorio.name}")
-        print(f"📊 Total de arquivos XML: {total_arquivos}")
         
-        if total_arquivos == 0:
+        if primeiro is None:
             print("❌ Nenhum arquivo XML encontrado no diretório!")
-            return None, 0
+            return None, False
             
-        return diretorio, total_arquivos
+        return diretorio, True
+    
+    def _descobrir_arquivos(self, diretorio: Path):
+        """
+        Descobre os XMLs do diretório em streaming, com os filtros configurados.
+        
+        Args:
+            diretorio: Path do diretório com arquivos XML
+        
+        Returns:
+            Iterador de arquivos XML
+        """
+        return self.file_manager.iterar_arquivos_xml(
+            diretorio,
+            recursivo=PROCESSING_CONFIG['discovery_recursive'],
+            incluir=PROCESSING_CONFIG['discovery_include'],
+            excluir=PROCESSING_CONFIG['discovery_exclude']
+        )
     
     def configurar_parametros(self) -> float:
         """
@@ -115,6 +304,9 @@ class CTEMainApplication:
             float: Custo por quilômetro configurado
         """
         print("\n📋 3. Configurando cálculo de quilometragem...")
+        if self.custo_por_km:
+            print(f"💰 Custo por km: R$ {self.custo_por_km:.2f}")
+            return self.custo_por_km
         return self.quilometragem_service.configurar_custo_por_km()
     
     def processar_arquivos(self, diretorio: Path, custo_por_km: float) -> bool:
@@ -130,16 +322,49 @@ class CTEMainApplication:
         """
         print("\n📋 4. Processando arquivos...")
         
+        if self.manifest_manager:
+            raiz = self.manifest_manager.definir_raiz([diretorio])
+            print(f"📒 Raiz do manifesto: {raiz}")
+        
         # Descobrir arquivos
-        xml_files = self.file_manager.descobrir_arquivos_xml(diretorio)
+        if self.retry_falhas:
+            if not self.manifest_manager:
+                print("❌ --retry-failed requer o manifesto de ingestão")
+                return False
+            xml_files = self.manifest_manager.listar_falhas(diretorio)
+            print(f"🔁 Reprocessando {len(xml_files)} arquivos com falha registrada no manifesto")
+            if not xml_files:
+                print("❌ Nenhum arquivo XML encontrado!")
+                return False
+        elif self.shard_manager:
+            # Workers precisam da mesma ordem para dividir e roubar trabalho
+            xml_files = sorted(self._descobrir_arquivos(diretorio))
+        else:
+            # Streaming: o processamento começa enquanto a descoberta continua
+            xml_files = self._descobrir_arquivos(diretorio)
         
-        if not xml_files:
-            print("❌ Nenhum arquivo XML encontrado!")
-            return False
+        # Em modo worker, os shards próprios vêm primeiro e o restante
+        # só é processado se ainda estiver livre no manifesto
+        if self.shard_manager:
+            shards = self.shard_manager.rebalancear()
+            self.shard_manager.iniciar_heartbeat()
+            xml_files = self.shard_manager.ordenar_por_afinidade(xml_files)
+            print(f"🧩 Shards deste worker: {len(shards)}/{self.shard_manager.total_shards}")
         
         # Processar com ETL Service
         inicio_tempo = time.time()
-        sucesso = self.etl_service.processar_lote_arquivos(xml_files, custo_por_km)
+        try:
+            if PROCESSING_CONFIG['ingest_mode'] == 'lote':
+                sucesso = self.etl_service.processar_arquivos_em_lotes(
+                    xml_files, custo_por_km, PROCESSING_CONFIG['ingest_batch_size']
+                )
+            else:
+                sucesso = self.etl_service.processar_lote_arquivos(
+                    xml_files, custo_por_km, PROCESSING_CONFIG['ingest_batch_size']
+                )
+        finally:
+            if self.shard_manager:
+                self.shard_manager.encerrar()
         tempo_total = time.time() - inicio_tempo
         
         # Gerar relatório final
@@ -160,8 +385,8 @@ class CTEMainApplication:
                 return False
             
             # 2. Selecionar e validar arquivos
-            diretorio, total_arquivos = self.selecionar_e_validar_arquivos()
-            if not diretorio or total_arquivos == 0:
+            diretorio, possui_arquivos = self.selecionar_e_validar_arquivos()
+            if not diretorio or not possui_arquivos:
                 return False
             
             # 3. Configurar parâmetros
@@ -189,12 +414,334 @@ class CTEMainApplication:
             print(f"\n❌ Erro inesperado: {e}")
             print("🔧 Verifique a configuração e tente novamente")
             return False
-
+    
+    def executar_daemon(self, diretorios: list, custo_por_km: float) -> bool:
+        """
+        Executa a ingestão contínua dos diretórios monitorados (sem interface).
+        
+        Args:
+            diretorios: Diretórios a monitorar
+            custo_por_km: Valor por quilômetro para cálculos
+        
+        Returns:
+            bool: True se o monitoramento encerrou normalmente
+        """
+        if not self.inicializar_sistema():
+            return False
+        
+        diretorios = [Path(d) for d in diretorios]
+        inexistentes = [d for d in diretorios if not d.is_dir()]
+        if inexistentes:
+            for diretorio in inexistentes:
+                print(f"❌ Diretório não encontrado: {diretorio}")
+            return False
+        
+        if self.manifest_manager:
+            raiz = self.manifest_manager.definir_raiz(diretorios)
+            print(f"📒 Raiz do manifesto: {raiz}")
+        
+        watch_service = WatchService(
+            self.etl_service,
+            diretorios,
+            custo_por_km,
+            modo_ingestao=PROCESSING_CONFIG['ingest_mode'],
+            lote_maximo=WATCH_CONFIG['max_batch'],
+            idade_maxima=WATCH_CONFIG['max_age_seconds'],
+            intervalo_varredura=WATCH_CONFIG['poll_interval_seconds'],
+            estabilidade=WATCH_CONFIG['stable_seconds'],
+            arquivo_metricas=WATCH_CONFIG['metrics_file'] or None,
+            shard_manager=self.shard_manager,
+            intervalo_views=VIEWS_CONFIG['refresh_min_interval_seconds']
+        )
+        try:
+            return watch_service.executar()
+        finally:
+            if self.shard_manager:
+                self.shard_manager.encerrar()
+    
+    def executar_backfill(self, workers: int) -> bool:
+        """
+        Atualiza a quilometragem dos documentos já carregados pelas rotas.
+        
+        Grava as rotas que ainda não estão em cte.rota_distancia e atualiza
+        cte.documento em faixas de id_cte, em paralelo, sem reler os XMLs.
+        
+        Args:
+            workers: Conexões usadas em paralelo
+        
+        Returns:
+            bool: True se todas as faixas foram atualizadas
+        """
+        if not self.inicializar_sistema():
+            return False
+        
+        if not self.rota_manager:
+            print("❌ O backfill requer MILEAGE_SOURCE=haversine, coordenadas no IBGE "
+                  "e a tabela cte.rota_distancia")
+            return False
+        
+        print("\n🗺️  Calculando rotas ainda sem distância...")
+        gravadas = self.rota_manager.preencher_rotas_faltantes()
+        print(f"✅ {gravadas} rotas gravadas")
+        
+        backfill_service = BackfillService(
+            self.db_manager, workers, PROCESSING_CONFIG['backfill_chunk_size']
+        )
+        sucesso = self._resumir_backfill(backfill_service.backfill_quilometragem())
+        self._atualizar_views_materializadas()
+        return sucesso
+    
+    def executar_recalculo(self, custo_por_km: float, workers: int, data_inicio=None,
+                           data_fim=None, placa: str = None, progresso=None) -> bool:
+        """
+        Recalcula a quilometragem (frete ÷ custo/km) dos documentos já carregados.
+        
+        Documentos cuja rota tem distância em cte.rota_distancia são
+        preservados quando a quilometragem vem das coordenadas IBGE.
+        
+        Args:
+            custo_por_km: Novo custo por quilômetro
+            workers: Conexões usadas em paralelo
+            data_inicio: Data de emissão inicial (inclusiva), opcional
+            data_fim: Data de emissão final (inclusiva), opcional
+            placa: Placa do veículo, opcional
+            progresso: Função chamada com (faixas concluídas, total, documentos)
+        
+        Returns:
+            bool: True se todas as faixas foram atualizadas
+        """
+        if not self.inicializar_sistema():
+            return False
+        
+        backfill_service = BackfillService(
+            self.db_manager, workers, PROCESSING_CONFIG['backfill_chunk_size']
+        )
+        try:
+            resultado = backfill_service.recalcular_custo_por_km(
+                custo_por_km, data_inicio, data_fim, placa,
+                preservar_rotas=DISTANCE_CONFIG['mileage_source'] == 'haversine',
+                progresso=progresso
+            )
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        
+        sucesso = self._resumir_backfill(resultado)
+        self._atualizar_views_materializadas()
+        return sucesso
+    
+    def executar_atualizacao_views(self, forcar: bool = False) -> bool:
+        """
+        Atualiza as views materializadas com origens alteradas.
+        
+        Args:
+            forcar: Atualiza todas, mesmo sem alterações
+        
+        Returns:
+            bool: True se todas as views pendentes foram atualizadas
+        """
+        try:
+            self.db_manager = CTEDatabaseManager(DATABASE_CONFIG)
+        except Exception as e:
+            print(f"❌ Erro na inicialização: {e}")
+            return False
+        
+        orquestrador = OrquestradorViews(self.db_manager, VIEWS_CONFIG['refresh_workers'])
+        if not orquestrador.disponivel():
+            print("❌ Views materializadas indisponíveis (aplique migrations/create_mv_refresh.sql)")
+            return False
+        
+        resultado = orquestrador.atualizar(forcar=forcar, esperar=True)
+        if resultado['atualizadas']:
+            GeracaoDadosManager(self.db_manager).incrementar()
+        for status in orquestrador.status():
+            defasagem = status['defasagem'] or '-'
+            print(f"   {status['nome_view']}: {status['duracao_ms'] or 0:.0f} ms, defasagem {defasagem}")
+        return not resultado['falhas']
+    
+    def executar_particionamento(self, acao: str) -> bool:
+        """
+        Migra os documentos para as tabelas particionadas ou lista as partições.
+        
+        Args:
+            acao: 'migrar' (cópia em lotes, retomável), 'trocar' (troca das
+                tabelas após a cópia) ou 'listar'
+        
+        Returns:
+            bool: True se a ação foi concluída
+        """
+        try:
+            self.db_manager = CTEDatabaseManager(DATABASE_CONFIG)
+        except Exception as e:
+            print(f"❌ Erro na inicialização: {e}")
+            return False
+        
+        particoes = ParticaoManager(self.db_manager, PARTITION_CONFIG['future_months'])
+        if not particoes.disponivel():
+            print("❌ Particionamento indisponível (aplique migrations/create_particionamento.sql)")
+            return False
+        
+        try:
+            if acao == 'migrar':
+                particoes.migrar(
+                    PARTITION_CONFIG['migration_batch_size'],
+                    PARTITION_CONFIG['migration_pause_seconds'],
+                    progresso=lambda tabela, linhas, ultimo_id: print(
+                        f"   {tabela}: {linhas} linhas (até id {ultimo_id})"
+                    )
+                )
+                print("✅ Cópia concluída - execute --particionar trocar")
+            elif acao == 'trocar':
+                for objeto, descricao in particoes.trocar():
+                    print(f"   {objeto}: {descricao}")
+                print("✅ cte.documento e cte.carga particionadas "
+                      "(tabelas antigas em cte.documento_legado e cte.carga_legada)")
+            else:
+                for particao in particoes.listar():
+                    print(f"   {particao['particao']}: {particao['linhas_estimadas']} linhas, "
+                          f"{particao['tamanho_bytes'] / 1024 / 1024:.1f} MB")
+        except Exception as e:
+            print(f"❌ {e}")
+            return False
+        
+        if acao != 'listar':
+            self._atualizar_views_apos_manutencao()
+        return True
+    
+    def executar_arquivamento(self, mes: str, destino: str = None) -> bool:
+        """
+        Arquiva um mês: exporta documentos, cargas e partes e remove a partição.
+        
+        Args:
+            mes: Mês no formato AAAA-MM
+            destino: Diretório do arquivo (padrão: PARTITION_CONFIG['archive_dir'])
+        
+        Returns:
+            bool: True se o mês foi arquivado
+        """
+        try:
+            self.db_manager = CTEDatabaseManager(DATABASE_CONFIG)
+            ano, numero_mes = (int(parte) for parte in mes.split('-'))
+            particoes = ParticaoManager(self.db_manager)
+            particoes.arquivar(date(ano, numero_mes, 1), Path(destino or PARTITION_CONFIG['archive_dir']))
+        except Exception as e:
+            print(f"❌ Erro ao arquivar {mes}: {e}")
+            return False
+        
+        self._atualizar_views_apos_manutencao()
+        return True
+    
+    def _atualizar_views_apos_manutencao(self) -> None:
+        """Atualiza as views e a geração dos dados após uma manutenção fora do ETL."""
+        orquestrador = OrquestradorViews(self.db_manager, VIEWS_CONFIG['refresh_workers'])
+        if orquestrador.disponivel():
+            orquestrador.atualizar(esperar=True)
+        GeracaoDadosManager(self.db_manager).incrementar()
+    
+    def _atualizar_views_materializadas(self) -> None:
+        """Atualiza as views e a geração dos dados após um job que alterou cte.documento."""
+        if self.etl_service and self.etl_service.orquestrador_views:
+            self.etl_service.orquestrador_views.atualizar(esperar=True)
+        if self.etl_service and self.etl_service.geracao:
+            self.etl_service.geracao.incrementar()
+    
+    def _resumir_backfill(self, resultado: dict) -> bool:
+        """Imprime o resumo de um job em blocos e indica se terminou sem erros."""
+        print(f"✅ {resultado['documentos_atualizados']} documentos atualizados "
+              f"em {resultado['segundos']:.1f}s")
+        if resultado['faixas_erro']:
+            retomada = f" (job #{resultado['id_job']} será retomado)" if resultado['id_job'] else ""
+            print(f"⚠️ {resultado['faixas_erro']} faixas com erro - execute novamente{retomada}")
+        return resultado['faixas_erro'] == 0
 
 def main():
     """Entry point da aplicação."""
-    app = CTEMainApplication()
-    success = app.executar()
+    parser = argparse.ArgumentParser(description="Alimentação do banco de dados CT-e")
+    parser.add_argument(
+        '--retry-failed', action='store_true',
+        help="Reprocessa apenas os arquivos com erro registrado no manifesto de ingestão"
+    )
+    parser.add_argument(
+        '--watch', nargs='+', metavar='DIR',
+        help="Modo daemon: monitora os diretórios e processa novos XMLs continuamente"
+    )
+    parser.add_argument(
+        '--custo-km', type=float, default=None,
+        help="Custo por km (dispensa a pergunta interativa; padrão no daemon: R$ 2,50)"
+    )
+    parser.add_argument(
+        '--diretorio', metavar='DIR',
+        help="Diretório com os XMLs (dispensa o seletor de diretório)"
+    )
+    parser.add_argument(
+        '--worker', action='store_true',
+        help="Divide os arquivos com outros workers (mesmo banco) por shards"
+    )
+    parser.add_argument(
+        '--backfill-quilometragem', action='store_true',
+        help="Atualiza a quilometragem dos documentos existentes pela distância das rotas"
+    )
+    parser.add_argument(
+        '--recalcular-custo-km', type=float, metavar='CUSTO',
+        help="Recalcula a quilometragem dos documentos existentes com um novo custo por km"
+    )
+    parser.add_argument(
+        '--data-inicio', metavar='AAAA-MM-DD',
+        help="Recálculo: data de emissão inicial (inclusiva)"
+    )
+    parser.add_argument(
+        '--data-fim', metavar='AAAA-MM-DD',
+        help="Recálculo: data de emissão final (inclusiva)"
+    )
+    parser.add_argument(
+        '--placa',
+        help="Recálculo: apenas documentos do veículo"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=PROCESSING_CONFIG['max_workers'],
+        help="Conexões paralelas usadas pelo backfill e pelo recálculo"
+    )
+    parser.add_argument(
+        '--atualizar-views', nargs='?', const='pendentes', choices=['pendentes', 'todas'],
+        help="Atualiza as views materializadas com origens alteradas (ou todas)"
+    )
+    parser.add_argument(
+        '--particionar', choices=['migrar', 'trocar', 'listar'],
+        help="Particionamento mensal: copia os documentos em lotes, troca as tabelas ou lista as partições"
+    )
+    parser.add_argument(
+        '--arquivar-mes', metavar='AAAA-MM',
+        help="Exporta o mês para CSV compactado e remove a partição do banco"
+    )
+    parser.add_argument(
+        '--destino', metavar='DIR',
+        help="Arquivamento: diretório do arquivo (padrão: PARTITION_ARCHIVE_DIR)"
+    )
+    args = parser.parse_args()
+    
+    app = CTEMainApplication(
+        retry_falhas=args.retry_failed,
+        worker=args.worker,
+        diretorio=args.diretorio,
+        custo_por_km=args.custo_km
+    )
+    if args.particionar:
+        success = app.executar_particionamento(args.particionar)
+    elif args.arquivar_mes:
+        success = app.executar_arquivamento(args.arquivar_mes, args.destino)
+    elif args.atualizar_views:
+        success = app.executar_atualizacao_views(forcar=args.atualizar_views == 'todas')
+    elif args.backfill_quilometragem:
+        success = app.executar_backfill(args.workers)
+    elif args.recalcular_custo_km is not None:
+        success = app.executar_recalculo(
+            args.recalcular_custo_km, args.workers, args.data_inicio, args.data_fim, args.placa
+        )
+    elif args.watch:
+        custo_por_km = args.custo_km or app.quilometragem_service.custo_padrao_por_km
+        success = app.executar_daemon(args.watch, custo_por_km)
+    else:
+        success = app.executar()
     sys.exit(0 if success else 1)
 
 
@@ -6,9 +6,25 @@ Managers Package - Gerenciadores do sistema SACT
 from .database_manager import CTEDatabaseManager
 from .file_manager import FileManager  
 from .stats_manager import StatsManager
+from .manifest_manager import ManifestManager
+from .shard_manager import ShardManager
+from .rota_distancia_manager import RotaDistanciaManager
+from .sketch_quantil_manager import SketchQuantilManager
+from .referencia_compartilhada_manager import ReferenciaCompartilhadaManager
+from .agregado_mensal_manager import AgregadoMensalManager
+from .particao_manager import ParticaoManager
+from .geracao_dados_manager import GeracaoDadosManager
 
 __all__ = [
     'CTEDatabaseManager',
     'FileManager', 
-    'StatsManager'
+    'StatsManager',
+    'ManifestManager',
+    'ShardManager',
+    'RotaDistanciaManager',
+    'SketchQuantilManager',
+    'ReferenciaCompartilhadaManager',
+    'AgregadoMensalManager',
+    'ParticaoManager',
+    'GeracaoDadosManager'
 ]
\ No newline at end of file
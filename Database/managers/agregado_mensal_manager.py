@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Agregado Mensal Manager - Manutenção de analytics.agg_mensal e agg_cliente_mensal
+"""
+
+from typing import Dict
+
+
+class AgregadoMensalManager:
+    """
+    Manager das tabelas de agregados mensais lidas pelas views de analytics.
+    
+    Os agregados são mantidos pelos triggers de cte.documento e
+    cte.documento_parte (migrations/create_agg_mensal.sql), então cargas e
+    atualizações já são refletidas sem passo extra. Este manager só cuida da
+    manutenção: reconstrução completa e conferência contra cte.documento.
+    """
+    
+    TABELA = 'analytics.agg_mensal'
+    TABELAS = ('analytics.agg_mensal', 'analytics.agg_cliente_mensal')
+    
+    def __init__(self, db_manager):
+        """
+        Inicializa o manager de agregados.
+        
+        Args:
+            db_manager: Manager de banco de dados
+        """
+        self.db_manager = db_manager
+    
+    def disponivel(self) -> bool:
+        """
+        Verifica se as tabelas de agregados existem no banco.
+        
+        Returns:
+            True se a migration create_agg_mensal.sql foi aplicada
+        """
+        try:
+            resultado = self.db_manager.execute_query(
+                "SELECT to_regclass(%s) IS NOT NULL", (self.TABELA,), fetch_one=True
+            )
+            return bool(resultado and resultado[0])
+        except Exception as e:
+            print(f"⚠️ Erro ao verificar agregados mensais: {e}")
+            return False
+    
+    # ========== MANUTENÇÃO ==========
+    
+    def reconstruir(self) -> int:
+        """
+        Reconstrói os agregados a partir de cte.documento.
+        
+        Necessário após alterar a UF de municípios (não coberto pelos triggers).
+        
+        Returns:
+            Número de grupos gravados
+        """
+        with self.db_manager.get_cursor() as (cursor, conn):
+            cursor.execute("SELECT analytics.f_agg_reconstruir()")
+            return int(cursor.fetchone()[0])
+    
+    def conferir(self) -> Dict[str, int]:
+        """
+        Compara os agregados mantidos pelos triggers com uma reconstrução.
+        
+        A reconstrução é feita numa transação desfeita ao final; os
+        agregados não são alterados, mas as escritas neles (ETL) aguardam
+        a conferência terminar.
+        
+        Returns:
+            Dicionário tabela -> número de grupos divergentes
+        """
+        divergencias = {}
+        with self.db_manager.get_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    # Trava antes da cópia: a cópia e a reconstrução veem os mesmos documentos
+                    cursor.execute(f"LOCK TABLE {', '.join(self.TABELAS)} IN EXCLUSIVE MODE")
+                    for tabela in self.TABELAS:
+                        temporaria = 'atual_' + tabela.split('.', 1)[1]
+                        cursor.execute(
+                            f"CREATE TEMP TABLE {temporaria} ON COMMIT DROP AS SELECT * FROM {tabela}"
+                        )
+                    cursor.execute("SELECT analytics.f_agg_reconstruir()")
+                    
+                    for tabela in self.TABELAS:
+                        temporaria = 'atual_' + tabela.split('.', 1)[1]
+                        cursor.execute(f"""
+                            SELECT count(*) FROM (
+                                (SELECT * FROM {temporaria} EXCEPT SELECT * FROM {tabela})
+                                UNION ALL
+                                (SELECT * FROM {tabela} EXCEPT SELECT * FROM {temporaria})
+                            ) diferencas
+                        """)
+                        divergencias[tabela] = int(cursor.fetchone()[0])
+            finally:
+                conn.rollback()
+        
+        if any(divergencias.values()):
+            print(f"⚠️ Agregados divergentes de cte.documento: {divergencias}")
+        return divergencias
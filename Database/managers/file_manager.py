@@ -5,9 +5,10 @@ File Manager - Gerenciamento de arquivos e interface de usuário
 
 import os
 import tkinter as tk
+from fnmatch import fnmatchcase
 from tkinter import filedialog, messagebox
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional, Sequence
 
 
 class FileManager:
@@ -77,12 +78,8 @@ class FileManager:
             print(f"❌ Caminho não é um diretório: {diretorio}")
             return []
         
-        # Buscar arquivos XML
-        xml_files = list(diretorio.glob("*.xml"))
-        xml_files.extend(diretorio.glob("*.XML"))  # Case insensitive
-        
-        # Remover duplicatas e ordenar
-        xml_files = sorted(set(xml_files))
+        # Buscar arquivos XML (extensão sem diferenciar maiúsculas) e ordenar
+        xml_files = sorted(self.iterar_arquivos_xml(diretorio))
         
         print(f"📊 Arquivos XML encontrados: {len(xml_files)}")
         
@@ -92,6 +89,65 @@ class FileManager:
         
         return xml_files
     
+    def iterar_arquivos_xml(self, diretorio: Path, recursivo: bool = False,
+                            incluir: Sequence[str] = ('*.xml',),
+                            excluir: Sequence[str] = ()) -> Iterator[Path]:
+        """
+        Percorre o diretório com os.scandir e entrega os arquivos à medida
+        que são encontrados, sem montar nem ordenar a lista completa.
+        
+        Os padrões são comparados sem diferenciar maiúsculas. Os de inclusão
+        valem para o nome do arquivo; os de exclusão valem para o nome ou
+        para o caminho relativo ao diretório (ex.: 'cancelados', '*/tmp/*').
+        
+        Args:
+            diretorio: Path do diretório para buscar
+            recursivo: Se True, percorre também os subdiretórios
+            incluir: Padrões glob dos arquivos aceitos
+            excluir: Padrões glob de arquivos ou subdiretórios ignorados
+        
+        Yields:
+            Path de cada arquivo XML encontrado
+        """
+        incluir = [padrao.lower() for padrao in incluir if padrao]
+        excluir = [padrao.lower() for padrao in excluir if padrao]
+        base = str(diretorio)
+        pendentes = [base]
+        
+        while pendentes:
+            atual = pendentes.pop()
+            subdiretorios = []
+            
+            try:
+                entradas = os.scandir(atual)
+            except OSError as e:
+                print(f"⚠️ Erro ao ler diretório {atual}: {e}")
+                continue
+            
+            with entradas:
+                for entrada in entradas:
+                    nome = entrada.name.lower()
+                    if excluir:
+                        relativo = entrada.path[len(base) + 1:].replace(os.sep, '/').lower()
+                        if any(fnmatchcase(nome, p) or fnmatchcase(relativo, p) for p in excluir):
+                            continue
+                    
+                    try:
+                        if entrada.is_dir(follow_symlinks=False):
+                            if recursivo:
+                                subdiretorios.append(entrada.path)
+                            continue
+                        if not entrada.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    
+                    if any(fnmatchcase(nome, p) for p in incluir):
+                        yield Path(entrada.path)
+            
+            # Subdiretórios são lidos depois de fechar o atual (um descritor por vez)
+            pendentes.extend(reversed(subdiretorios))
+    
     def validar_arquivo_xml(self, arquivo: Path) -> bool:
         """
         Valida se arquivo XML está acessível.
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Geração Dados Manager - Contador de geração dos dados analíticos
+"""
+
+from typing import Optional
+
+
+class GeracaoDadosManager:
+    """
+    Manager do contador de geração dos dados (migrations/create_geracao_dados.sql).
+    
+    O ETL incrementa a geração depois de cada lote confirmado e o
+    orquestrador depois de atualizar as views materializadas; o cache de
+    consultas do Streamlit descarta resultados lidos em gerações anteriores.
+    O incremento precisa acontecer depois do commit: antes dele o cache
+    poderia guardar, já com a geração nova, um resultado sem os dados.
+    """
+    
+    FUNCAO = 'analytics.f_geracao_dados()'
+    
+    def __init__(self, db_manager):
+        """
+        Inicializa o manager de geração.
+        
+        Args:
+            db_manager: Manager de banco de dados
+        """
+        self.db_manager = db_manager
+        self._disponivel = None
+    
+    def disponivel(self) -> bool:
+        """
+        Verifica se o contador existe no banco (resultado guardado).
+        
+        Returns:
+            True se a migration create_geracao_dados.sql foi aplicada
+        """
+        if self._disponivel is None:
+            try:
+                resultado = self.db_manager.execute_query(
+                    "SELECT to_regprocedure(%s) IS NOT NULL", (self.FUNCAO,), fetch_one=True
+                )
+                self._disponivel = bool(resultado and resultado[0])
+            except Exception as e:
+                print(f"⚠️ Erro ao verificar geração dos dados: {e}")
+                return False
+        return self._disponivel
+    
+    def atual(self) -> Optional[int]:
+        """
+        Geração atual dos dados.
+        
+        Returns:
+            Geração (0 antes do primeiro incremento) ou None sem a migration
+        """
+        if not self.disponivel():
+            return None
+        resultado = self.db_manager.execute_query(
+            "SELECT analytics.f_geracao_dados()", fetch_one=True
+        )
+        return int(resultado[0])
+    
+    def incrementar(self) -> Optional[int]:
+        """
+        Incrementa a geração; chamar depois do commit da carga.
+        
+        Falhas só são registradas: sem o incremento os dashboards ficam
+        com o resultado anterior até o TTL do cache expirar.
+        
+        Returns:
+            Nova geração ou None (migration ausente ou erro)
+        """
+        if not self.disponivel():
+            return None
+        try:
+            resultado = self.db_manager.execute_query(
+                "SELECT analytics.f_geracao_dados_incrementar()", fetch_one=True
+            )
+            return int(resultado[0])
+        except Exception as e:
+            print(f"⚠️ Erro ao incrementar geração dos dados: {e}")
+            return None
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Manifest Manager - Controle de progresso retomável da ingestão
+"""
+
+import hashlib
+import os
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+
+class ManifestManager:
+    """
+    Manager do manifesto de ingestão (staging.ingestao_manifesto).
+    
+    Cada arquivo é reivindicado antes de ser processado e tem o resultado
+    gravado em bloco ao final de cada lote. Uma nova execução pula arquivos
+    concluídos (mesmo tamanho e mtime) e execuções concorrentes não
+    reivindicam arquivos que já estão em processamento por outra.
+    
+    Os arquivos são identificados pelo caminho relativo à raiz de ingestão
+    (INGEST_ROOT ou, sem ela, o diretório varrido), de modo que hosts que
+    montam o diretório em pontos diferentes reivindicam o mesmo registro.
+    Arquivos fora da raiz usam o caminho absoluto: o nome isolado não
+    distingue arquivos homônimos em subdiretórios.
+    """
+    
+    TABELA = 'staging.ingestao_manifesto'
+    
+    def __init__(self, db_manager, lease_minutos: int = 30, raiz: Optional[Path] = None):
+        """
+        Inicializa o manager do manifesto.
+        
+        Args:
+            db_manager: Manager de banco de dados
+            lease_minutos: Tempo após o qual uma reivindicação 'processando'
+                de outra execução é considerada abandonada
+            raiz: Raiz de ingestão (ponto de montagem local do diretório
+                compartilhado); None adota o diretório varrido (definir_raiz)
+        """
+        self.db_manager = db_manager
+        self.lease_minutos = int(lease_minutos)
+        self.raiz = Path(raiz).resolve() if raiz else None
+        self.id_execucao = uuid.uuid4().hex
+        self.iniciado_em = datetime.now(timezone.utc)
+        self._resultados_pendentes = []
+    
+    def disponivel(self) -> bool:
+        """
+        Verifica se a tabela do manifesto existe no banco.
+        
+        Returns:
+            True se a migration create_ingestao_manifesto.sql foi aplicada
+        """
+        try:
+            resultado = self.db_manager.execute_query(
+                "SELECT to_regclass(%s) IS NOT NULL", (self.TABELA,), fetch_one=True
+            )
+            return bool(resultado and resultado[0])
+        except Exception as e:
+            print(f"⚠️ Erro ao verificar manifesto de ingestão: {e}")
+            return False
+    
+    def definir_raiz(self, diretorios: List[Path]) -> Path:
+        """
+        Adota o diretório varrido como raiz quando nenhuma foi configurada.
+        
+        Args:
+            diretorios: Diretórios de entrada (com vários, o ancestral comum)
+        
+        Returns:
+            Raiz em uso
+        """
+        if self.raiz is None:
+            self.raiz = Path(os.path.commonpath([Path(d).resolve() for d in diretorios]))
+        return self.raiz
+    
+    def identificar(self, arquivo: Path) -> str:
+        """
+        Obtém a identidade do arquivo no manifesto, independente do ponto de montagem.
+        
+        Args:
+            arquivo: Path do arquivo
+        
+        Returns:
+            Caminho relativo à raiz (com '/') ou o caminho absoluto se não
+            houver raiz ou o arquivo estiver fora dela
+        """
+        arquivo = Path(arquivo).resolve()
+        if self.raiz:
+            try:
+                return arquivo.relative_to(self.raiz).as_posix()
+            except ValueError:
+                pass
+        return arquivo.as_posix()
+    
+    def assinatura_arquivo(self, arquivo: Path) -> Tuple[str, int, datetime]:
+        """
+        Obtém identidade, tamanho e mtime de um arquivo.
+        
+        Args:
+            arquivo: Path do arquivo
+        
+        Returns:
+            Tupla (caminho no manifesto, tamanho, mtime em UTC)
+        """
+        info = arquivo.stat()
+        mtime = datetime.fromtimestamp(info.st_mtime, tz=timezone.utc)
+        return self.identificar(arquivo), info.st_size, mtime
+    
+    @staticmethod
+    def calcular_sha256(arquivo: Path, tamanho_bloco: int = 1 << 16) -> Optional[str]:
+        """
+        Calcula o SHA-256 do arquivo lendo em blocos.
+        
+        Args:
+            arquivo: Path do arquivo
+            tamanho_bloco: Tamanho de cada leitura em bytes
+        
+        Returns:
+            Hash hexadecimal ou None se o arquivo não puder ser lido
+        """
+        try:
+            sha = hashlib.sha256()
+            with open(arquivo, 'rb') as f:
+                for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+                    sha.update(bloco)
+            return sha.hexdigest()
+        except OSError:
+            return None
+    
+    def reivindicar(self, arquivos: List[Path]) -> List[Path]:
+        """
+        Reivindica arquivos para esta execução em um único comando.
+        
+        Um arquivo é reivindicado se ainda não consta no manifesto, se não
+        foi concluído ou se mudou (tamanho/mtime) desde a conclusão, desde
+        que não esteja em processamento por outra execução dentro do lease.
+        Erros só são reivindicados se ocorreram antes do início desta
+        execução, para que workers concorrentes não repitam a mesma falha.
+        
+        Args:
+            arquivos: Arquivos candidatos
+        
+        Returns:
+            Arquivos reivindicados, na ordem recebida
+        """
+        if not arquivos:
+            return []
+        
+        por_caminho = {}
+        linhas = []
+        for arquivo in arquivos:
+            try:
+                caminho, tamanho, mtime = self.assinatura_arquivo(arquivo)
+            except OSError:
+                continue
+            if caminho in por_caminho:
+                continue
+            por_caminho[caminho] = arquivo
+            linhas.append((caminho, tamanho, mtime, self.id_execucao))
+        
+        if not linhas:
+            return []
+        
+        # Ordenar pelo caminho mantém a mesma ordem de bloqueio entre execuções
+        linhas.sort(key=lambda linha: linha[0])
+        
+        query = f"""
+            INSERT INTO {self.TABELA} AS m
+                (caminho, tamanho, mtime, id_execucao, status, tentativas)
+            VALUES %s
+            ON CONFLICT (caminho) DO UPDATE SET
+                tamanho = EXCLUDED.tamanho,
+                mtime = EXCLUDED.mtime,
+                id_execucao = EXCLUDED.id_execucao,
+                status = 'processando',
+                tentativas = m.tentativas + 1
+            WHERE (m.status <> 'concluido'
+                   OR m.tamanho IS DISTINCT FROM EXCLUDED.tamanho
+                   OR m.mtime IS DISTINCT FROM EXCLUDED.mtime)
+              AND (m.status <> 'processando'
+                   OR m.id_execucao = EXCLUDED.id_execucao
+                   OR m.updated_at < now() - make_interval(mins => {self.lease_minutos}))
+              AND (m.status <> 'erro'
+                   OR m.updated_at < {{iniciado_em}}
+                   OR m.tamanho IS DISTINCT FROM EXCLUDED.tamanho
+                   OR m.mtime IS DISTINCT FROM EXCLUDED.mtime)
+            RETURNING caminho
+        """
+        
+        with self.db_manager.get_cursor() as (cursor, conn):
+            iniciado_em = cursor.mogrify("%s::timestamptz", (self.iniciado_em,)).decode()
+            query = query.format(iniciado_em=iniciado_em)
+            reivindicados = execute_values(
+                cursor, query, linhas,
+                template="(%s, %s, %s, %s, 'processando', 1)",
+                page_size=len(linhas), fetch=True
+            )
+        
+        caminhos = {linha[0] for linha in reivindicados}
+        return [arquivo for caminho, arquivo in por_caminho.items() if caminho in caminhos]
+    
+    def listar_falhas(self, diretorio: Path) -> List[Path]:
+        """
+        Lista arquivos do diretório cuja última tentativa terminou em erro.
+        
+        Os registros sob o diretório, inclusive em subdiretórios, são
+        localizados a partir da raiz (ou pelo caminho absoluto, se o
+        diretório estiver fora dela).
+        
+        Args:
+            diretorio: Diretório base da busca
+        
+        Returns:
+            Arquivos com status 'erro' que ainda existem em disco
+        """
+        prefixo = self.identificar(diretorio)
+        prefixo = '' if prefixo == '.' else prefixo.rstrip('/') + '/'
+        prefixo_like = prefixo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        
+        linhas = self.db_manager.execute_query(
+            f"SELECT caminho FROM {self.TABELA} WHERE status = 'erro' "
+            "AND caminho LIKE %s ORDER BY caminho",
+            (prefixo_like + '%',)
+        )
+        
+        arquivos = [self._localizar(linha[0]) for linha in linhas]
+        return [arquivo for arquivo in arquivos if arquivo.exists()]
+    
+    def _localizar(self, caminho: str) -> Path:
+        """
+        Converte a identidade registrada no manifesto em arquivo deste host.
+        
+        Args:
+            caminho: Caminho relativo à raiz ou absoluto
+        
+        Returns:
+            Path do arquivo
+        """
+        caminho = Path(caminho)
+        if caminho.is_absolute() or self.raiz is None:
+            return caminho
+        return self.raiz / caminho
+    
+    def registrar(self, arquivo: Path, sucesso: bool, chave: str = None,
+                  classe_erro: str = None, mensagem: str = None) -> None:
+        """
+        Acumula o resultado de um arquivo para gravação no próximo descarregar().
+        
+        Args:
+            arquivo: Path do arquivo processado
+            sucesso: True se o documento foi carregado
+            chave: Chave do CT-e, quando conhecida
+            classe_erro: Etapa ou tipo da exceção que causou a falha
+            mensagem: Descrição do erro
+        """
+        self._resultados_pendentes.append((
+            self.identificar(arquivo),
+            'concluido' if sucesso else 'erro',
+            self.calcular_sha256(arquivo),
+            chave or None,
+            None if sucesso else classe_erro,
+            None if sucesso else mensagem,
+            self.id_execucao
+        ))
+    
+    def descarregar(self) -> int:
+        """
+        Grava em bloco os resultados acumulados desde a última chamada.
+        
+        Returns:
+            Número de registros atualizados no manifesto
+        """
+        if not self._resultados_pendentes:
+            return 0
+        
+        resultados, self._resultados_pendentes = self._resultados_pendentes, []
+        
+        query = f"""
+            UPDATE {self.TABELA} AS m SET
+                status = v.status,
+                sha256 = COALESCE(v.sha256, m.sha256),
+                chave = COALESCE(v.chave, m.chave),
+                classe_erro = v.classe_erro,
+                mensagem_erro = v.mensagem_erro
+            FROM (VALUES %s) AS v (caminho, status, sha256, chave, classe_erro,
+                                   mensagem_erro, id_execucao)
+            WHERE m.caminho = v.caminho
+              AND m.id_execucao = v.id_execucao
+        """
+        
+        try:
+            with self.db_manager.get_cursor() as (cursor, conn):
+                execute_values(cursor, query, resultados, page_size=len(resultados))
+                return cursor.rowcount
+        except Exception as e:
+            print(f"⚠️ Erro ao gravar manifesto de ingestão: {e}")
+            return 0
+    
+    def liberar_reivindicacoes(self) -> int:
+        """
+        Devolve para 'pendente' os arquivos desta execução ainda em processamento.
+        
+        Usado ao interromper uma execução para que a próxima não precise
+        aguardar o lease expirar.
+        
+        Returns:
+            Número de arquivos liberados
+        """
+        return self.db_manager.execute_update(
+            f"UPDATE {self.TABELA} SET status = 'pendente' "
+            "WHERE id_execucao = %s AND status = 'processando'",
+            (self.id_execucao,)
+        )
+    
+    def contar_por_status(self) -> Dict[str, int]:
+        """
+        Conta os arquivos do manifesto por status.
+        
+        Returns:
+            Dicionário {status: quantidade}
+        """
+        linhas = self.db_manager.execute_query(
+            f"SELECT status, count(*) FROM {self.TABELA} GROUP BY status"
+        )
+        return {status: total for status, total in linhas}
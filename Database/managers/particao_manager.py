@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+Partição Manager - Particionamento mensal de cte.documento e cte.carga
+"""
+
+import gzip
+import json
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from zoneinfo import ZoneInfo
+
+
+class ParticaoManager:
+    """
+    Manager das partições mensais de cte.documento e cte.carga
+    (migrations/create_particionamento.sql).
+    
+    - Garante as partições dos meses de cada lote do ETL e dos próximos
+      meses antes da carga (CREATE TABLE ... PARTITION OF trava a tabela
+      pai, então é feito fora da transação do lote e só para meses novos);
+    - Migra os dados das tabelas não particionadas em lotes curtos e faz a
+      troca das tabelas;
+    - Arquiva meses antigos: exporta as linhas em CSV compactado e remove
+      a partição.
+    """
+    
+    TABELA_PROGRESSO = 'cte.particionamento_progresso'
+    TRAVA_TROCA = '30s'
+    
+    _COPIA = {
+        'cte.documento': """
+            INSERT INTO cte.documento_particionado (
+                id_cte, chave, numero, serie, data_emissao, cfop, valor_frete, versao_schema,
+                id_municipio_origem, id_municipio_destino, id_veiculo, created_at, updated_at,
+                quilometragem
+            )
+            SELECT d.id_cte, d.chave, d.numero, d.serie,
+                   cte.f_data_particao(d.data_emissao, d.chave, d.created_at),
+                   d.cfop, d.valor_frete, d.versao_schema, d.id_municipio_origem,
+                   d.id_municipio_destino, d.id_veiculo, d.created_at, d.updated_at,
+                   d.quilometragem
+            FROM cte.documento d
+            WHERE d.id_cte > %(inicio)s AND d.id_cte <= %(fim)s
+            FOR SHARE
+            ON CONFLICT DO NOTHING
+        """,
+        'cte.carga': """
+            INSERT INTO cte.carga_particionada (
+                id_cte, valor, peso, quantidade, produto_predominante, unidade_medida, data_emissao
+            )
+            SELECT c.id_cte, c.valor, c.peso, c.quantidade, c.produto_predominante,
+                   c.unidade_medida, d.data_emissao
+            FROM cte.carga c
+            JOIN cte.documento_particionado d ON d.id_cte = c.id_cte
+            WHERE c.id_cte > %(inicio)s AND c.id_cte <= %(fim)s
+            FOR SHARE OF c
+            ON CONFLICT DO NOTHING
+        """
+    }
+    
+    def __init__(self, db_manager, meses_futuros: int = 3):
+        """
+        Inicializa o manager de partições.
+        
+        Args:
+            db_manager: Manager de banco de dados
+            meses_futuros: Meses à frente do atual com partição garantida
+        """
+        self.db_manager = db_manager
+        self.meses_futuros = max(0, meses_futuros)
+        self._meses_garantidos: Set[date] = set()
+        self._fuso = None
+    
+    def disponivel(self) -> bool:
+        """
+        Verifica se há tabelas particionadas (migração em andamento ou concluída).
+        
+        Returns:
+            True se a migration create_particionamento.sql foi aplicada
+        """
+        try:
+            resultado = self.db_manager.execute_query(
+                "SELECT to_regprocedure('cte.f_particao_tabelas()') IS NOT NULL", fetch_one=True
+            )
+            if not (resultado and resultado[0]):
+                return False
+            resultado = self.db_manager.execute_query(
+                "SELECT documento IS NOT NULL FROM cte.f_particao_tabelas()", fetch_one=True
+            )
+            return bool(resultado and resultado[0])
+        except Exception as e:
+            print(f"⚠️ Erro ao verificar particionamento: {e}")
+            return False
+    
+    def particionado(self) -> bool:
+        """
+        Verifica se cte.documento já é a tabela particionada (troca concluída).
+        
+        Returns:
+            True se cte.documento é particionada
+        """
+        resultado = self.db_manager.execute_query(
+            "SELECT relkind = 'p' FROM pg_class WHERE oid = 'cte.documento'::regclass",
+            fetch_one=True
+        )
+        return bool(resultado and resultado[0])
+    
+    # ========== MESES ==========
+    
+    @staticmethod
+    def mes_da_chave(chave: Optional[str]) -> Optional[date]:
+        """
+        Mês de emissão contido na chave de acesso (posições 3-6, AAMM).
+        
+        Mesma regra de cte.f_data_emissao_chave.
+        
+        Args:
+            chave: Chave de acesso do CT-e (44 dígitos)
+        
+        Returns:
+            Primeiro dia do mês ou None se a chave for inválida
+        """
+        if not chave or len(chave) != 44 or not chave.isdigit():
+            return None
+        mes = int(chave[4:6])
+        if not 1 <= mes <= 12:
+            return None
+        return date(2000 + int(chave[2:4]), mes, 1)
+    
+    def mes_particao(self, data_emissao: Any, chave: Optional[str] = None) -> Optional[date]:
+        """
+        Mês da partição em que o documento será gravado.
+        
+        Datas com fuso são convertidas para o fuso do banco, que define os
+        limites das partições.
+        
+        Args:
+            data_emissao: Data de emissão (ISO 8601 ou datetime), opcional
+            chave: Chave de acesso, usada quando não há data
+        
+        Returns:
+            Primeiro dia do mês ou None se não for possível determinar
+        """
+        if isinstance(data_emissao, str) and data_emissao:
+            try:
+                data_emissao = datetime.fromisoformat(data_emissao)
+            except ValueError:
+                data_emissao = None
+        
+        if isinstance(data_emissao, datetime):
+            if data_emissao.tzinfo is not None and self.fuso() is not None:
+                data_emissao = data_emissao.astimezone(self.fuso())
+            return date(data_emissao.year, data_emissao.month, 1)
+        if isinstance(data_emissao, date):
+            return date(data_emissao.year, data_emissao.month, 1)
+        return self.mes_da_chave(chave)
+    
+    def fuso(self) -> Optional[ZoneInfo]:
+        """Fuso horário do banco (TimeZone), consultado uma vez."""
+        if self._fuso is None:
+            resultado = self.db_manager.execute_query(
+                "SELECT current_setting('TimeZone')", fetch_one=True
+            )
+            try:
+                self._fuso = ZoneInfo(resultado[0])
+            except Exception:
+                self._fuso = False
+        return self._fuso or None
+    
+    @staticmethod
+    def _somar_meses(mes: date, meses: int) -> date:
+        """Primeiro dia do mês deslocado em `meses`."""
+        indice = mes.year * 12 + mes.month - 1 + meses
+        return date(indice // 12, indice % 12 + 1, 1)
+    
+    # ========== GARANTIA DE PARTIÇÕES ==========
+    
+    def garantir_meses(self, meses: Iterable[Optional[date]]) -> int:
+        """
+        Cria as partições dos meses que ainda não existem.
+        
+        Meses já garantidos por este processo não consultam o banco.
+        
+        Args:
+            meses: Meses (qualquer dia do mês); None é ignorado
+        
+        Returns:
+            Número de partições criadas
+        """
+        novos = {date(mes.year, mes.month, 1) for mes in meses if mes} - self._meses_garantidos
+        if not novos:
+            return 0
+        
+        criadas = 0
+        # Uma transação curta por mês, fora das transações de carga
+        with self.db_manager.get_connection() as conn:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                for mes in sorted(novos):
+                    cursor.execute("SELECT cte.f_garantir_particao(%s)", (mes,))
+                    criadas += cursor.fetchone()[0]
+                    self._meses_garantidos.add(mes)
+        
+        if criadas:
+            print(f"🗓️ {criadas} partições criadas ({', '.join(f'{m:%Y-%m}' for m in sorted(novos))})")
+        return criadas
+    
+    def garantir_futuras(self, referencia: Optional[date] = None) -> int:
+        """
+        Garante as partições do mês atual e dos próximos `meses_futuros`.
+        
+        Args:
+            referencia: Mês inicial (padrão: mês atual)
+        
+        Returns:
+            Número de partições criadas
+        """
+        inicio = referencia or date.today()
+        inicio = date(inicio.year, inicio.month, 1)
+        return self.garantir_meses(
+            self._somar_meses(inicio, meses) for meses in range(self.meses_futuros + 1)
+        )
+    
+    def garantir_documentos(self, documentos: Iterable[Dict[str, Any]]) -> int:
+        """
+        Garante as partições dos meses de emissão de documentos a carregar.
+        
+        Args:
+            documentos: Dicionários com 'data_emissao' e 'chave' (payload
+                de ingestão ou dados do documento)
+        
+        Returns:
+            Número de partições criadas
+        """
+        return self.garantir_meses(
+            self.mes_particao(doc.get('data_emissao'), doc.get('chave')) for doc in documentos
+        )
+    
+    # ========== MIGRAÇÃO ==========
+    
+    def migrar(self, tamanho_lote: int = 20000, pausa: float = 0.0,
+               progresso: Optional[Callable[[str, int, int], None]] = None) -> Dict[str, int]:
+        """
+        Copia documentos e cargas das tabelas atuais para as particionadas.
+        
+        Cada lote (faixa de id_cte) é copiado em sua própria transação e o
+        progresso fica em cte.particionamento_progresso, então a migração
+        pode ser interrompida e retomada. Alterações feitas durante a cópia
+        são replicadas pelos triggers da migration.
+        
+        Args:
+            tamanho_lote: Linhas por transação
+            pausa: Segundos de espera entre lotes (alivia a carga no banco)
+            progresso: Callback (tabela, linhas_copiadas, ultimo_id)
+        
+        Returns:
+            Dicionário tabela -> linhas copiadas nesta execução
+        
+        Raises:
+            ValueError: Se não houver migração em andamento
+        """
+        resultado = self.db_manager.execute_query(
+            "SELECT to_regclass('cte.documento_particionado') IS NOT NULL", fetch_one=True
+        )
+        if not (resultado and resultado[0]):
+            raise ValueError("Nada a migrar: aplique migrations/create_particionamento.sql "
+                             "(ou a troca já foi feita)")
+        
+        tamanho_lote = max(1, tamanho_lote)
+        copiadas = {}
+        # Documentos antes das cargas (a carga usa a data do documento copiado)
+        for tabela in ('cte.documento', 'cte.carga'):
+            copiadas[tabela] = self._copiar_tabela(tabela, tamanho_lote, pausa, progresso)
+            print(f"📦 {tabela}: {copiadas[tabela]} linhas copiadas")
+        return copiadas
+    
+    def _copiar_tabela(self, tabela: str, tamanho_lote: int, pausa: float,
+                       progresso: Optional[Callable[[str, int, int], None]]) -> int:
+        """Copia uma tabela em faixas de id_cte a partir do último id registrado."""
+        with self.db_manager.get_cursor() as (cursor, conn):
+            cursor.execute(f"""
+                INSERT INTO {self.TABELA_PROGRESSO} (tabela) VALUES (%s)
+                ON CONFLICT (tabela) DO NOTHING
+            """, (tabela,))
+            cursor.execute(f"SELECT ultimo_id FROM {self.TABELA_PROGRESSO} WHERE tabela = %s",
+                           (tabela,))
+            ultimo_id = cursor.fetchone()[0]
+        
+        total = 0
+        while True:
+            with self.db_manager.get_cursor() as (cursor, conn):
+                # Fim da faixa pelo N-ésimo id: lacunas na sequência não geram lotes vazios
+                cursor.execute(f"""
+                    SELECT max(id_cte) FROM (
+                        SELECT id_cte FROM {tabela}
+                        WHERE id_cte > %s ORDER BY id_cte LIMIT %s
+                    ) faixa
+                """, (ultimo_id, tamanho_lote))
+                fim = cursor.fetchone()[0]
+                if fim is None:
+                    break
+                
+                if tabela == 'cte.documento':
+                    cursor.execute("""
+                        SELECT DISTINCT date_trunc('month',
+                               cte.f_data_particao(data_emissao, chave, created_at))::date
+                        FROM cte.documento
+                        WHERE id_cte > %s AND id_cte <= %s
+                    """, (ultimo_id, fim))
+                    meses = [linha[0] for linha in cursor.fetchall()]
+                    conn.commit()
+                    self.garantir_meses(meses)
+                
+                cursor.execute(self._COPIA[tabela], {'inicio': ultimo_id, 'fim': fim})
+                linhas = cursor.rowcount
+                cursor.execute(f"""
+                    UPDATE {self.TABELA_PROGRESSO}
+                    SET ultimo_id = %s, linhas = linhas + %s, atualizado_em = now()
+                    WHERE tabela = %s
+                """, (fim, linhas, tabela))
+            
+            ultimo_id = fim
+            total += linhas
+            if progresso:
+                progresso(tabela, total, ultimo_id)
+            if pausa:
+                time.sleep(pausa)
+        return total
+    
+    def trocar(self, trava: Optional[str] = None) -> List[tuple]:
+        """
+        Troca cte.documento e cte.carga pelas tabelas particionadas.
+        
+        Executada numa única transação curta (cte.f_particionamento_trocar):
+        confere a cópia, move triggers e sequência e recria as views
+        dependentes. As tabelas antigas ficam como cte.documento_legado e
+        cte.carga_legada até serem removidas manualmente.
+        
+        Args:
+            trava: Tempo máximo de espera pelas travas (padrão: TRAVA_TROCA);
+                a troca é abortada em vez de bloquear o ETL indefinidamente
+        
+        Returns:
+            Lista de (objeto, ação)
+        """
+        with self.db_manager.get_cursor() as (cursor, conn):
+            cursor.execute("SELECT set_config('lock_timeout', %s, true)", (trava or self.TRAVA_TROCA,))
+            cursor.execute("SELECT * FROM cte.f_particionamento_trocar()")
+            acoes = cursor.fetchall()
+            cursor.execute(f"DELETE FROM {self.TABELA_PROGRESSO}")
+        
+        with self.db_manager.get_connection() as conn:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute("ANALYZE cte.documento, cte.carga")
+        self._meses_garantidos.clear()
+        return acoes
+    
+    # ========== CONSULTA ==========
+    
+    def listar(self) -> List[Dict[str, Any]]:
+        """
+        Partições existentes.
+        
+        Returns:
+            Lista de dicionários de cte.vw_particoes (tabela, mês, limites,
+            linhas estimadas e tamanho)
+        """
+        with self.db_manager.get_cursor(dict_cursor=True) as (cursor, conn):
+            cursor.execute("SELECT * FROM cte.vw_particoes ORDER BY tabela, mes")
+            return [dict(linha) for linha in cursor.fetchall()]
+    
+    # ========== ARQUIVAMENTO ==========
+    
+    def arquivar(self, mes: date, destino: Path) -> Dict[str, Any]:
+        """
+        Exporta um mês para CSV compactado e remove a partição do banco.
+        
+        Grava em destino/cte_AAAA_MM/ os arquivos documento.csv.gz,
+        carga.csv.gz e documento_parte.csv.gz (com cabeçalho; reimportáveis
+        com COPY ... FROM ... CSV HEADER) e um manifesto.json. A exportação e
+        a remoção ocorrem na mesma transação, com as partições travadas.
+        
+        Args:
+            mes: Mês a arquivar (qualquer dia do mês)
+            destino: Diretório do arquivo
+        
+        Returns:
+            Conteúdo do manifesto (mês, linhas por tabela e arquivos)
+        
+        Raises:
+            ValueError: Se a partição do mês não existir
+        """
+        mes = date(mes.year, mes.month, 1)
+        sufixo = mes.strftime('p%Y_%m')
+        documento, carga = f"cte.documento_{sufixo}", f"cte.carga_{sufixo}"
+        
+        resultado = self.db_manager.execute_query(
+            "SELECT to_regclass(%s) IS NOT NULL, to_regclass(%s) IS NOT NULL",
+            (documento, carga), fetch_one=True
+        )
+        if not resultado[0]:
+            raise ValueError(f"Partição {documento} não existe")
+        
+        pasta = Path(destino) / f"cte_{mes:%Y_%m}"
+        pasta.mkdir(parents=True, exist_ok=True)
+        exportacoes = [
+            ('documento', f"SELECT * FROM {documento}"),
+            ('documento_parte', f"SELECT p.* FROM cte.documento_parte p "
+                                f"JOIN {documento} d ON d.id_cte = p.id_cte"),
+        ]
+        if resultado[1]:
+            exportacoes.insert(1, ('carga', f"SELECT * FROM {carga}"))
+        
+        manifesto = {'mes': mes.isoformat(), 'linhas': {}, 'arquivos': {}}
+        with self.db_manager.get_cursor() as (cursor, conn):
+            # Ninguém grava no mês entre a exportação e a remoção
+            cursor.execute(
+                f"LOCK TABLE {', '.join([documento] + ([carga] if resultado[1] else []))} "
+                f"IN ACCESS EXCLUSIVE MODE"
+            )
+            for nome, consulta in exportacoes:
+                arquivo = pasta / f"{nome}.csv.gz"
+                with gzip.open(arquivo, 'wb') as saida:
+                    cursor.copy_expert(f"COPY ({consulta}) TO STDOUT WITH (FORMAT csv, HEADER)", saida)
+                manifesto['linhas'][nome] = cursor.rowcount
+                manifesto['arquivos'][nome] = arquivo.name
+            
+            cursor.execute("SELECT cte.f_particao_remover(%s)", (mes,))
+        
+        manifesto['arquivado_em'] = datetime.now().isoformat(timespec='seconds')
+        (pasta / 'manifesto.json').write_text(json.dumps(manifesto, indent=2), encoding='utf-8')
+        self._meses_garantidos.discard(mes)
+        print(f"🗄️ {mes:%Y-%m} arquivado em {pasta} ({manifesto['linhas'].get('documento', 0)} documentos)")
+        return manifesto
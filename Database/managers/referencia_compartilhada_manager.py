@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+Referência Compartilhada Manager - Tabelas IBGE em memória compartilhada por host
+"""
+
+import bisect
+import hashlib
+import json
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+class _NomesInternados:
+    """Sequência (somente leitura) dos nomes únicos, decodificados sob demanda."""
+    
+    def __init__(self, offsets: np.ndarray, dados: np.ndarray):
+        self._offsets = offsets
+        self._dados = dados
+    
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+    
+    def __getitem__(self, i: int) -> str:
+        return bytes(self._dados[self._offsets[i]:self._offsets[i + 1]]).decode('utf-8')
+
+
+class TabelasReferencia:
+    """
+    Visão de uma versão publicada das tabelas de referência.
+    
+    Os arrays apontam diretamente para o bloco de memória compartilhada
+    (sem cópia) e são somente leitura:
+        codigos            int64   códigos IBGE em ordem crescente
+        ids_uf             int16   UF de cada município
+        latitudes          float64 graus (NaN sem coordenadas)
+        longitudes         float64 graus (NaN sem coordenadas)
+        nome_id            int32   índice do nome em nomes (internado)
+    """
+    
+    def __init__(self, versao: str, memoria, arrays: Dict[str, np.ndarray]):
+        self.versao = versao
+        self._memoria = memoria   # mantém o mapeamento vivo enquanto houver visões
+        self.codigos = arrays['codigos']
+        self.ids_uf = arrays['ids_uf']
+        self.latitudes = arrays['latitudes']
+        self.longitudes = arrays['longitudes']
+        self.nome_id = arrays['nome_id']
+        self._ordem_nome = arrays['ordem_nome']
+        self._nome_id_ordenado = arrays['nome_id_ordenado']
+        self.nomes = _NomesInternados(arrays['nomes_offsets'], arrays['nomes_dados'])
+        self.siglas_uf = {
+            sigla.decode('ascii'): int(id_uf)
+            for sigla, id_uf in zip(arrays['ufs_sigla'], arrays['ufs_id'])
+        }
+    
+    @property
+    def total_municipios(self) -> int:
+        """Quantidade de municípios publicados."""
+        return len(self.codigos)
+    
+    def indices(self, codigos) -> np.ndarray:
+        """
+        Converte códigos IBGE em índices das tabelas.
+        
+        Returns:
+            Índices (-1 para códigos ausentes)
+        """
+        codigos = np.asarray(codigos, dtype=np.int64)
+        if len(self.codigos) == 0:
+            return np.full(codigos.shape, -1, dtype=np.int64)
+        posicoes = np.clip(np.searchsorted(self.codigos, codigos), 0, len(self.codigos) - 1)
+        return np.where(self.codigos[posicoes] == codigos, posicoes, -1)
+    
+    def nome_municipio(self, codigo: int) -> Optional[str]:
+        """Nome (em maiúsculas) de um município ou None se ausente."""
+        indice = int(self.indices([codigo])[0])
+        return self.nomes[int(self.nome_id[indice])] if indice >= 0 else None
+    
+    def codigo_municipio(self, nome: str, sigla_uf: str) -> Optional[int]:
+        """
+        Código IBGE pelo nome exato (sem diferenciar maiúsculas) e UF.
+        
+        Equivale à busca exata do ETL em ibge.municipio (UPPER(nome) e sigla).
+        
+        Returns:
+            Código IBGE ou None se não encontrado
+        """
+        id_uf = self.siglas_uf.get((sigla_uf or '').strip().upper())
+        nome = (nome or '').strip().upper()
+        if id_uf is None or not nome:
+            return None
+        
+        posicao = bisect.bisect_left(self.nomes, nome)
+        if posicao >= len(self.nomes) or self.nomes[posicao] != nome:
+            return None
+        
+        inicio = int(np.searchsorted(self._nome_id_ordenado, posicao, side='left'))
+        fim = int(np.searchsorted(self._nome_id_ordenado, posicao, side='right'))
+        for indice in self._ordem_nome[inicio:fim]:
+            if self.ids_uf[indice] == id_uf:
+                return int(self.codigos[indice])
+        return None
+
+
+class ReferenciaCompartilhadaManager:
+    """
+    Manager das tabelas de referência IBGE publicadas em memória compartilhada.
+    
+    O primeiro processo do host carrega ibge.municipio/ibge.uf e publica os
+    arrays em um bloco multiprocessing.shared_memory cujo nome inclui a versão
+    (hash do conteúdo). Um segundo bloco pequeno ("ponteiro") guarda o nome da
+    versão atual, protegido por um contador de sequência. Os demais processos
+    (workers) apenas se anexam ao bloco, sem cópia.
+    
+    Uma nova publicação (ex.: após ibge_loader.py) cria o novo bloco por
+    inteiro e só então troca o ponteiro; atual() passa a retornar a nova
+    versão e quem ainda usa a anterior continua com o mapeamento válido.
+    """
+    
+    MAGICO = b'SACTREF1'
+    TAMANHO_CABECALHO = 4096
+    TAMANHO_PONTEIRO = 72
+    ALINHAMENTO = 64
+    
+    def __init__(self, db_manager=None, prefixo: str = 'sact_ref',
+                 intervalo_verificacao: float = 1.0):
+        """
+        Inicializa o manager de referências compartilhadas.
+        
+        Args:
+            db_manager: Manager de banco (fonte das tabelas ao publicar)
+            prefixo: Prefixo dos nomes dos blocos no host (ex.: prefixo_banco())
+            intervalo_verificacao: Segundos entre leituras do ponteiro em atual()
+        """
+        self.db_manager = db_manager
+        self.prefixo = prefixo
+        self.intervalo_verificacao = intervalo_verificacao
+        self._tabelas = None
+        self._verificado_em = 0.0
+    
+    @staticmethod
+    def prefixo_banco(config: Dict) -> str:
+        """
+        Prefixo dos blocos para um banco (bancos diferentes no mesmo host não
+        compartilham tabelas).
+        
+        Args:
+            config: Configuração de conexão (host, port, database)
+        """
+        origem = f"{config.get('host')}:{config.get('port')}/{config.get('database')}"
+        return 'sact_' + hashlib.sha1(origem.encode('utf-8')).hexdigest()[:8]
+    
+    # ========== MEMÓRIA COMPARTILHADA ==========
+    
+    @staticmethod
+    def _abrir_memoria(nome: str, criar: bool = False, tamanho: int = 0):
+        """
+        Abre um bloco sem registrá-lo no resource_tracker.
+        
+        Os blocos devem sobreviver ao processo que os criou; quem remove é
+        publicar() (versão substituída) ou remover().
+        """
+        try:
+            return shared_memory.SharedMemory(name=nome, create=criar, size=tamanho, track=False)
+        except TypeError:
+            # Python < 3.13: sem o parâmetro track
+            memoria = shared_memory.SharedMemory(name=nome, create=criar, size=tamanho)
+            resource_tracker.unregister(memoria._name, 'shared_memory')
+            memoria._sem_registro = True
+            return memoria
+    
+    @property
+    def nome_ponteiro(self) -> str:
+        """Nome do bloco que aponta para a versão atual."""
+        return f"{self.prefixo}_atual"
+    
+    def _ler_ponteiro(self) -> Optional[str]:
+        """Nome do bloco da versão atual (None se nada foi publicado)."""
+        try:
+            ponteiro = self._abrir_memoria(self.nome_ponteiro)
+        except FileNotFoundError:
+            return None
+        
+        try:
+            for _ in range(1000):
+                sequencia = struct.unpack_from('<Q', ponteiro.buf, 0)[0]
+                nome = bytes(ponteiro.buf[8:self.TAMANHO_PONTEIRO]).rstrip(b'\0').decode('ascii')
+                if sequencia % 2 == 0 and struct.unpack_from('<Q', ponteiro.buf, 0)[0] == sequencia:
+                    return nome or None
+                time.sleep(0.001)
+            return None
+        finally:
+            ponteiro.close()
+    
+    def _gravar_ponteiro(self, nome: str) -> Optional[str]:
+        """Troca a versão atual; retorna o nome anterior."""
+        try:
+            ponteiro = self._abrir_memoria(self.nome_ponteiro, criar=True, tamanho=self.TAMANHO_PONTEIRO)
+        except FileExistsError:
+            ponteiro = self._abrir_memoria(self.nome_ponteiro)
+        
+        try:
+            anterior = bytes(ponteiro.buf[8:self.TAMANHO_PONTEIRO]).rstrip(b'\0').decode('ascii') or None
+            sequencia = struct.unpack_from('<Q', ponteiro.buf, 0)[0]
+            # Sequência ímpar durante a escrita: leitores repetem a leitura
+            struct.pack_into('<Q', ponteiro.buf, 0, sequencia | 1)
+            ponteiro.buf[8:self.TAMANHO_PONTEIRO] = nome.encode('ascii').ljust(self.TAMANHO_PONTEIRO - 8, b'\0')
+            struct.pack_into('<Q', ponteiro.buf, 0, (sequencia | 1) + 1)
+            return anterior
+        finally:
+            ponteiro.close()
+    
+    # ========== PUBLICAÇÃO ==========
+    
+    def carregar_tabelas(self) -> Dict[str, np.ndarray]:
+        """
+        Lê ibge.municipio e ibge.uf e monta os arrays a publicar.
+        
+        Returns:
+            Dicionário nome -> array
+        """
+        municipios = self.db_manager.execute_query("""
+            SELECT m.id_municipio, m.id_uf, m.nome, m.latitude, m.longitude
+            FROM ibge.municipio m
+            ORDER BY m.id_municipio
+        """)
+        ufs = self.db_manager.execute_query("SELECT id_uf, sigla FROM ibge.uf ORDER BY id_uf")
+        return self.montar_tabelas(municipios, ufs)
+    
+    @staticmethod
+    def montar_tabelas(municipios: Iterable[Tuple], ufs: Iterable[Tuple]) -> Dict[str, np.ndarray]:
+        """
+        Monta os arrays a partir de linhas (id, id_uf, nome, lat, lon) e (id_uf, sigla).
+        
+        Returns:
+            Dicionário nome -> array (nomes internados em ordem crescente)
+        """
+        municipios = sorted(municipios, key=lambda linha: int(linha[0]))
+        ufs = sorted(ufs, key=lambda linha: int(linha[0]))
+        
+        nomes_unicos = sorted({str(linha[2]).strip().upper() for linha in municipios})
+        posicao_nome = {nome: i for i, nome in enumerate(nomes_unicos)}
+        nomes_codificados = [nome.encode('utf-8') for nome in nomes_unicos]
+        offsets = np.zeros(len(nomes_codificados) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(nome) for nome in nomes_codificados])
+        
+        nome_id = np.array(
+            [posicao_nome[str(linha[2]).strip().upper()] for linha in municipios], dtype=np.int32
+        )
+        ids_uf = np.array([int(linha[1]) for linha in municipios], dtype=np.int16)
+        ordem_nome = np.lexsort((ids_uf, nome_id)).astype(np.int32)
+        
+        return {
+            'codigos': np.array([int(linha[0]) for linha in municipios], dtype=np.int64),
+            'ids_uf': ids_uf,
+            'latitudes': np.array([np.nan if linha[3] is None else float(linha[3]) for linha in municipios],
+                                  dtype=np.float64),
+            'longitudes': np.array([np.nan if linha[4] is None else float(linha[4]) for linha in municipios],
+                                   dtype=np.float64),
+            'nome_id': nome_id,
+            'ordem_nome': ordem_nome,
+            'nome_id_ordenado': nome_id[ordem_nome],
+            'nomes_offsets': offsets,
+            'nomes_dados': np.frombuffer(b''.join(nomes_codificados), dtype=np.uint8),
+            'ufs_id': np.array([int(linha[0]) for linha in ufs], dtype=np.int16),
+            'ufs_sigla': np.array([str(linha[1]).strip().encode('ascii') for linha in ufs], dtype='S2'),
+        }
+    
+    @staticmethod
+    def versao_tabelas(tabelas: Dict[str, np.ndarray]) -> str:
+        """Versão (hash do conteúdo) das tabelas."""
+        assinatura = hashlib.sha1()
+        for nome in sorted(tabelas):
+            assinatura.update(nome.encode('ascii'))
+            assinatura.update(np.ascontiguousarray(tabelas[nome]).tobytes())
+        return assinatura.hexdigest()[:12]
+    
+    def publicar(self, tabelas: Optional[Dict[str, np.ndarray]] = None) -> str:
+        """
+        Publica as tabelas no host e as torna a versão atual.
+        
+        Args:
+            tabelas: Arrays de montar_tabelas (padrão: lidos do banco)
+        
+        Returns:
+            Versão publicada
+        """
+        if tabelas is None:
+            tabelas = self.carregar_tabelas()
+        versao = self.versao_tabelas(tabelas)
+        nome_bloco = f"{self.prefixo}_{versao}"
+        
+        # Metadados: dtype, forma e deslocamento de cada array
+        descricao, deslocamento = {}, self.TAMANHO_CABECALHO
+        for nome, array in tabelas.items():
+            descricao[nome] = {'dtype': array.dtype.str, 'forma': list(array.shape), 'inicio': deslocamento}
+            deslocamento += -(-max(array.nbytes, 1) // self.ALINHAMENTO) * self.ALINHAMENTO
+        metadados = json.dumps({'versao': versao, 'arrays': descricao}).encode('utf-8')
+        if len(metadados) > self.TAMANHO_CABECALHO - 16:
+            raise ValueError("Metadados das tabelas excedem o cabeçalho")
+        
+        try:
+            bloco = self._abrir_memoria(nome_bloco, criar=True, tamanho=deslocamento)
+        except FileExistsError:
+            # Mesma versão já publicada (ou sendo publicada) por outro processo
+            self._aguardar_pronto(nome_bloco)
+        else:
+            try:
+                for nome, array in tabelas.items():
+                    inicio = descricao[nome]['inicio']
+                    destino = np.ndarray(array.shape, dtype=array.dtype, buffer=bloco.buf, offset=inicio)
+                    destino[...] = array
+                    del destino
+                bloco.buf[16:16 + len(metadados)] = metadados
+                struct.pack_into('<I', bloco.buf, 12, len(metadados))
+                bloco.buf[0:8] = self.MAGICO
+                bloco.buf[8] = 1   # pronto: gravado por último
+            finally:
+                bloco.close()
+        
+        anterior = self._gravar_ponteiro(nome_bloco)
+        if anterior and anterior != nome_bloco:
+            self._remover_bloco(anterior)
+        self._verificado_em = 0.0
+        return versao
+    
+    def _aguardar_pronto(self, nome_bloco: str, timeout: float = 30.0) -> None:
+        """Espera outro processo terminar de gravar o bloco."""
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            bloco = self._abrir_memoria(nome_bloco)
+            try:
+                if bloco.size > 8 and bloco.buf[8] == 1:
+                    return
+            finally:
+                bloco.close()
+            time.sleep(0.01)
+        raise TimeoutError(f"Bloco {nome_bloco} não ficou pronto")
+    
+    # ========== CONSULTA ==========
+    
+    def _anexar(self, nome_bloco: str) -> Optional[TabelasReferencia]:
+        """Anexa-se a um bloco publicado (sem cópia)."""
+        try:
+            bloco = self._abrir_memoria(nome_bloco)
+        except FileNotFoundError:
+            return None
+        
+        if bytes(bloco.buf[0:8]) != self.MAGICO or bloco.buf[8] != 1:
+            bloco.close()
+            return None
+        
+        tamanho = struct.unpack_from('<I', bloco.buf, 12)[0]
+        metadados = json.loads(bytes(bloco.buf[16:16 + tamanho]).decode('utf-8'))
+        arrays = {}
+        for nome, info in metadados['arrays'].items():
+            array = np.ndarray(tuple(info['forma']), dtype=np.dtype(info['dtype']),
+                               buffer=bloco.buf, offset=info['inicio'])
+            array.flags.writeable = False
+            arrays[nome] = array
+        return TabelasReferencia(metadados['versao'], bloco, arrays)
+    
+    def atual(self, forcar: bool = False) -> Optional[TabelasReferencia]:
+        """
+        Versão atual das tabelas no host.
+        
+        O ponteiro é lido no máximo a cada intervalo_verificacao segundos;
+        se a versão mudou, anexa-se ao novo bloco.
+        
+        Args:
+            forcar: Lê o ponteiro mesmo dentro do intervalo
+        
+        Returns:
+            TabelasReferencia ou None se nada foi publicado
+        """
+        agora = time.monotonic()
+        if not forcar and self._tabelas is not None and agora - self._verificado_em < self.intervalo_verificacao:
+            return self._tabelas
+        self._verificado_em = agora
+        
+        nome_bloco = self._ler_ponteiro()
+        if nome_bloco is None:
+            return self._tabelas
+        
+        if self._tabelas is None or f"{self.prefixo}_{self._tabelas.versao}" != nome_bloco:
+            tabelas = self._anexar(nome_bloco)
+            if tabelas is not None:
+                self._tabelas = tabelas
+        return self._tabelas
+    
+    def obter(self) -> Optional[TabelasReferencia]:
+        """
+        Anexa-se às tabelas do host, publicando-as se ainda não existirem.
+        
+        Returns:
+            TabelasReferencia ou None se não foi possível publicar
+        """
+        tabelas = self.atual()
+        if tabelas is not None:
+            return tabelas
+        
+        try:
+            self.publicar()
+        except Exception as e:
+            print(f"⚠️ Erro ao publicar tabelas de referência: {e}")
+            return None
+        return self.atual(forcar=True)
+    
+    # ========== REMOÇÃO ==========
+    
+    def _remover_bloco(self, nome_bloco: str) -> None:
+        """Remove o nome do bloco; processos anexados mantêm o mapeamento."""
+        try:
+            bloco = self._abrir_memoria(nome_bloco)
+        except FileNotFoundError:
+            return
+        bloco.close()
+        if getattr(bloco, '_sem_registro', False):
+            # Python < 3.13: unlink() também remove o registro do tracker
+            resource_tracker.register(bloco._name, 'shared_memory')
+        bloco.unlink()
+    
+    def remover(self) -> None:
+        """Remove a versão atual e o ponteiro do host."""
+        nome_bloco = self._ler_ponteiro()
+        if nome_bloco:
+            self._remover_bloco(nome_bloco)
+        self._remover_bloco(self.nome_ponteiro)
+        self._tabelas = None
+        self._verificado_em = 0.0
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Rota Distância Manager - Distâncias por rota persistidas em cte.rota_distancia
+"""
+
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+
+class RotaDistanciaManager:
+    """
+    Manager das distâncias por rota (município de origem -> destino).
+    
+    A consulta passa por três níveis: um LRU em memória, a tabela
+    cte.rota_distancia e, para rotas ainda não vistas, o DistanciaService.
+    Rotas calculadas são gravadas na tabela (sem sobrescrever valores de
+    outra fonte) para que documentos e relatórios futuros não as recalculem.
+    
+    Expõe calcular_lote() com a mesma assinatura do DistanciaService, então
+    pode ser usado pelo ETLService no lugar dele.
+    """
+    
+    TABELA = 'cte.rota_distancia'
+    
+    def __init__(self, db_manager, distancia_service=None, tamanho_cache: int = 4096):
+        """
+        Inicializa o manager de rotas.
+        
+        Args:
+            db_manager: Manager de banco de dados
+            distancia_service: Serviço que calcula rotas ainda não gravadas
+            tamanho_cache: Quantidade máxima de rotas no LRU em memória
+        """
+        self.db_manager = db_manager
+        self.distancia_service = distancia_service
+        self.tamanho_cache = max(1, tamanho_cache)
+        self._cache = OrderedDict()   # (origem, destino) -> km ou None
+        
+        self.estatisticas = {'cache': 0, 'banco': 0, 'calculadas': 0}
+    
+    def disponivel(self) -> bool:
+        """
+        Verifica se a tabela de rotas existe no banco.
+        
+        Returns:
+            True se a migration create_rota_distancia.sql foi aplicada
+        """
+        try:
+            resultado = self.db_manager.execute_query(
+                "SELECT to_regclass(%s) IS NOT NULL", (self.TABELA,), fetch_one=True
+            )
+            return bool(resultado and resultado[0])
+        except Exception as e:
+            print(f"⚠️ Erro ao verificar tabela de rotas: {e}")
+            return False
+    
+    # ========== LRU ==========
+    
+    def _obter_cache(self, rota: Tuple[int, int]):
+        """Retorna (encontrado, km) do LRU, renovando a posição da rota."""
+        if rota not in self._cache:
+            return False, None
+        self._cache.move_to_end(rota)
+        return True, self._cache[rota]
+    
+    def _guardar_cache(self, rota: Tuple[int, int], km: Optional[float]) -> None:
+        """Guarda a rota no LRU, descartando a menos usada se necessário."""
+        self._cache[rota] = km
+        self._cache.move_to_end(rota)
+        while len(self._cache) > self.tamanho_cache:
+            self._cache.popitem(last=False)
+    
+    def limpar_cache(self) -> None:
+        """Esvazia o LRU em memória."""
+        self._cache.clear()
+    
+    # ========== CONSULTA ==========
+    
+    def calcular_lote(self, origens, destinos) -> np.ndarray:
+        """
+        Obtém as distâncias de vários pares (origem, destino).
+        
+        Args:
+            origens: Códigos IBGE de origem
+            destinos: Códigos IBGE de destino
+        
+        Returns:
+            Distâncias em km (float64); NaN para rotas sem distância conhecida
+        """
+        rotas = [self._normalizar_rota(origem, destino) for origem, destino in zip(origens, destinos)]
+        resultado = np.full(len(rotas), np.nan, dtype=np.float64)
+        
+        faltantes = set()
+        for i, rota in enumerate(rotas):
+            if rota is None:
+                continue
+            encontrado, km = self._obter_cache(rota)
+            if encontrado:
+                self.estatisticas['cache'] += 1
+                if km is not None:
+                    resultado[i] = km
+            else:
+                faltantes.add(rota)
+        
+        if faltantes:
+            conhecidas = self._buscar_rotas(faltantes)
+            self.estatisticas['banco'] += len(conhecidas)
+            
+            novas = sorted(faltantes - set(conhecidas))
+            if novas:
+                calculadas = self._calcular_e_gravar(novas)
+                self.estatisticas['calculadas'] += sum(1 for km in calculadas.values() if km is not None)
+                conhecidas.update(calculadas)
+            
+            for rota in faltantes:
+                self._guardar_cache(rota, conhecidas.get(rota))
+            
+            for i, rota in enumerate(rotas):
+                if rota in faltantes and conhecidas.get(rota) is not None:
+                    resultado[i] = conhecidas[rota]
+        
+        return resultado
+    
+    def distancia_km(self, origem, destino) -> Optional[float]:
+        """
+        Distância de uma rota.
+        
+        Args:
+            origem: Código IBGE de origem
+            destino: Código IBGE de destino
+        
+        Returns:
+            Distância em km ou None se desconhecida
+        """
+        km = self.calcular_lote([origem], [destino])[0]
+        return None if np.isnan(km) else float(km)
+    
+    @staticmethod
+    def _normalizar_rota(origem, destino) -> Optional[Tuple[int, int]]:
+        """Converte o par para inteiros; None se algum código for inválido."""
+        try:
+            return int(origem), int(destino)
+        except (TypeError, ValueError):
+            return None
+    
+    def _buscar_rotas(self, rotas: Iterable[Tuple[int, int]]) -> dict:
+        """Busca as rotas na tabela em uma única consulta."""
+        rotas = list(rotas)
+        linhas = self.db_manager.execute_query(f"""
+            SELECT r.id_municipio_origem, r.id_municipio_destino, r.km
+            FROM {self.TABELA} r
+            JOIN unnest(%s::integer[], %s::integer[]) AS p (origem, destino)
+              ON r.id_municipio_origem = p.origem AND r.id_municipio_destino = p.destino
+        """, ([rota[0] for rota in rotas], [rota[1] for rota in rotas]))
+        
+        return {(origem, destino): float(km) for origem, destino, km in linhas}
+    
+    def _calcular_e_gravar(self, rotas: List[Tuple[int, int]]) -> dict:
+        """
+        Calcula rotas novas com o DistanciaService e grava as conhecidas.
+        
+        Returns:
+            Dicionário rota -> km (None para rotas sem coordenadas)
+        """
+        if not self.distancia_service:
+            return {}
+        
+        distancias = self.distancia_service.calcular_lote(
+            [rota[0] for rota in rotas], [rota[1] for rota in rotas]
+        )
+        calculadas = {
+            rota: None if np.isnan(km) else round(float(km), 1)
+            for rota, km in zip(rotas, distancias)
+        }
+        self.gravar_rotas(
+            [(rota[0], rota[1], km) for rota, km in calculadas.items() if km is not None]
+        )
+        return calculadas
+    
+    def gravar_rotas(self, rotas: List[Tuple[int, int, float]], fonte: str = 'haversine') -> int:
+        """
+        Grava rotas na tabela sem sobrescrever rotas já existentes.
+        
+        Args:
+            rotas: Tuplas (origem, destino, km)
+            fonte: Origem do valor
+        
+        Returns:
+            Número de rotas inseridas
+        """
+        if not rotas:
+            return 0
+        
+        try:
+            with self.db_manager.get_cursor() as (cursor, conn):
+                execute_values(cursor, f"""
+                    INSERT INTO {self.TABELA}
+                        (id_municipio_origem, id_municipio_destino, km, fonte)
+                    VALUES %s
+                    ON CONFLICT (id_municipio_origem, id_municipio_destino) DO NOTHING
+                """, [(origem, destino, km, fonte) for origem, destino, km in rotas],
+                    page_size=len(rotas))
+                return cursor.rowcount
+        except Exception as e:
+            print(f"⚠️ Erro ao gravar rotas: {e}")
+            return 0
+    
+    # ========== BACKFILL ==========
+    
+    def preencher_rotas_faltantes(self, tamanho_bloco: int = 5000) -> int:
+        """
+        Calcula e grava as rotas de documentos existentes ainda sem distância.
+        
+        Args:
+            tamanho_bloco: Rotas calculadas por chamada ao DistanciaService
+        
+        Returns:
+            Número de rotas gravadas
+        """
+        linhas = self.db_manager.execute_query(f"""
+            SELECT DISTINCT d.id_municipio_origem, d.id_municipio_destino
+            FROM cte.documento d
+            WHERE d.id_municipio_origem IS NOT NULL
+              AND d.id_municipio_destino IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM {self.TABELA} r
+                  WHERE r.id_municipio_origem = d.id_municipio_origem
+                    AND r.id_municipio_destino = d.id_municipio_destino
+              )
+            ORDER BY 1, 2
+        """)
+        
+        gravadas = 0
+        for inicio in range(0, len(linhas), tamanho_bloco):
+            bloco = [tuple(linha) for linha in linhas[inicio:inicio + tamanho_bloco]]
+            calculadas = self._calcular_e_gravar(bloco)
+            gravadas += sum(1 for km in calculadas.values() if km is not None)
+        return gravadas
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Shard Manager - Coordenação de workers de ingestão via PostgreSQL
+"""
+
+import os
+import math
+import uuid
+import zlib
+import socket
+import threading
+from pathlib import Path
+from typing import List, Set
+
+
+class ShardManager:
+    """
+    Manager da divisão de arquivos entre workers de ingestão.
+    
+    Cada arquivo pertence a um shard (crc32 do nome do arquivo). Os shards
+    ficam em staging.ingestao_shard e cada worker detém no máximo sua cota
+    (total de shards / workers ativos). Shards livres ou com heartbeat
+    vencido são reivindicados com FOR UPDATE SKIP LOCKED; um worker acima
+    da cota devolve o excedente para que novos workers recebam trabalho.
+    """
+    
+    TABELA_SHARD = 'staging.ingestao_shard'
+    TABELA_WORKER = 'staging.ingestao_worker'
+    
+    def __init__(self, db_manager, lease_segundos: int = 60):
+        """
+        Inicializa o manager de shards.
+        
+        Args:
+            db_manager: Manager de banco de dados
+            lease_segundos: Tempo sem heartbeat após o qual um worker e seus
+                shards são considerados parados
+        """
+        self.db_manager = db_manager
+        self.lease_segundos = int(lease_segundos)
+        self.id_worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.total_shards = 0
+        self.shards: Set[int] = set()
+        
+        self._lock = threading.Lock()
+        self._parar_heartbeat = threading.Event()
+        self._thread_heartbeat = None
+    
+    @staticmethod
+    def calcular_shard(arquivo: Path, total_shards: int) -> int:
+        """
+        Calcula o shard de um arquivo.
+        
+        O hash usa apenas o nome do arquivo (que contém a chave do CT-e),
+        para que máquinas com pontos de montagem diferentes concordem.
+        
+        Args:
+            arquivo: Path do arquivo
+            total_shards: Quantidade total de shards
+        
+        Returns:
+            Número do shard (0 a total_shards - 1)
+        """
+        return zlib.crc32(Path(arquivo).name.encode('utf-8')) % total_shards
+    
+    @staticmethod
+    def calcular_cota(total_shards: int, workers_ativos: int) -> int:
+        """
+        Calcula quantos shards cada worker pode deter.
+        
+        Args:
+            total_shards: Quantidade total de shards
+            workers_ativos: Workers com heartbeat dentro do lease
+        
+        Returns:
+            Cota de shards por worker
+        """
+        return math.ceil(total_shards / max(1, workers_ativos))
+    
+    def pertence(self, arquivo: Path) -> bool:
+        """
+        Verifica se o arquivo pertence a um shard deste worker.
+        
+        Args:
+            arquivo: Path do arquivo
+        
+        Returns:
+            True se o shard do arquivo é deste worker
+        """
+        if not self.total_shards:
+            return False
+        with self._lock:
+            return self.calcular_shard(arquivo, self.total_shards) in self.shards
+    
+    def ordenar_por_afinidade(self, arquivos: List[Path]) -> List[Path]:
+        """
+        Ordena os arquivos: primeiro os shards deste worker, depois os demais.
+        
+        Os demais arquivos ficam para o fim, em ordem inversa, e só são
+        processados se ainda estiverem livres no manifesto (roubo de
+        trabalho de workers lentos ou parados). A ordem inversa faz quem
+        rouba começar pelo fim da fila do dono, reduzindo a disputa.
+        
+        Args:
+            arquivos: Arquivos descobertos
+        
+        Returns:
+            Arquivos reordenados
+        """
+        proprios = [arquivo for arquivo in arquivos if self.pertence(arquivo)]
+        if not proprios:
+            return list(arquivos)
+        demais = [arquivo for arquivo in arquivos if not self.pertence(arquivo)]
+        return proprios + demais[::-1]
+    
+    def heartbeat(self) -> Set[int]:
+        """
+        Renova o heartbeat do worker e dos shards que ele detém.
+        
+        Returns:
+            Shards ainda detidos (um shard pode ter sido reivindicado por
+            outro worker se o heartbeat venceu)
+        """
+        with self.db_manager.get_cursor() as (cursor, conn):
+            cursor.execute(f"""
+                INSERT INTO {self.TABELA_WORKER} (id_worker, host, pid)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (id_worker) DO UPDATE SET heartbeat = now()
+            """, (self.id_worker, socket.gethostname(), os.getpid()))
+            
+            cursor.execute(f"""
+                UPDATE {self.TABELA_SHARD} SET heartbeat = now()
+                WHERE id_worker = %s
+                RETURNING shard
+            """, (self.id_worker,))
+            detidos = {linha[0] for linha in cursor.fetchall()}
+            
+            if not self.total_shards:
+                cursor.execute(f"SELECT count(*) FROM {self.TABELA_SHARD}")
+                self.total_shards = cursor.fetchone()[0]
+        
+        with self._lock:
+            self.shards = detidos
+        return detidos
+    
+    def rebalancear(self) -> Set[int]:
+        """
+        Ajusta os shards deste worker à cota atual.
+        
+        Returns:
+            Shards detidos após o rebalanceamento
+        """
+        self.heartbeat()
+        
+        with self.db_manager.get_cursor() as (cursor, conn):
+            cursor.execute(f"""
+                SELECT count(*) FROM {self.TABELA_WORKER}
+                WHERE heartbeat >= now() - make_interval(secs => %s)
+            """, (self.lease_segundos,))
+            cota = self.calcular_cota(self.total_shards, cursor.fetchone()[0])
+            
+            with self._lock:
+                detidos = sorted(self.shards)
+            
+            if len(detidos) > cota:
+                excedentes = detidos[cota:]
+                cursor.execute(f"""
+                    UPDATE {self.TABELA_SHARD}
+                    SET id_worker = NULL, heartbeat = NULL
+                    WHERE id_worker = %s AND shard = ANY(%s)
+                """, (self.id_worker, excedentes))
+                detidos = detidos[:cota]
+            
+            elif len(detidos) < cota:
+                cursor.execute(f"""
+                    WITH livres AS (
+                        SELECT shard
+                        FROM {self.TABELA_SHARD}
+                        WHERE id_worker IS NULL
+                           OR heartbeat < now() - make_interval(secs => %s)
+                        ORDER BY shard
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE {self.TABELA_SHARD} s
+                    SET id_worker = %s, heartbeat = now(), reivindicado_em = now()
+                    FROM livres
+                    WHERE s.shard = livres.shard
+                    RETURNING s.shard
+                """, (self.lease_segundos, cota - len(detidos), self.id_worker))
+                detidos += [linha[0] for linha in cursor.fetchall()]
+            
+            # Remover registros de workers parados há muito tempo
+            cursor.execute(f"""
+                DELETE FROM {self.TABELA_WORKER}
+                WHERE heartbeat < now() - make_interval(secs => %s)
+            """, (self.lease_segundos * 10,))
+        
+        with self._lock:
+            self.shards = set(detidos)
+            return set(self.shards)
+    
+    def iniciar_heartbeat(self) -> None:
+        """Inicia thread que rebalanceia e renova o heartbeat a cada terço do lease."""
+        if self._thread_heartbeat:
+            return
+        
+        def _executar():
+            intervalo = max(1.0, self.lease_segundos / 3)
+            while not self._parar_heartbeat.wait(intervalo):
+                try:
+                    self.rebalancear()
+                except Exception as e:
+                    print(f"⚠️ Erro no heartbeat do worker: {e}")
+        
+        self._thread_heartbeat = threading.Thread(target=_executar, daemon=True)
+        self._thread_heartbeat.start()
+    
+    def encerrar(self) -> None:
+        """Para o heartbeat e devolve os shards deste worker."""
+        self._parar_heartbeat.set()
+        if self._thread_heartbeat:
+            self._thread_heartbeat.join(timeout=5)
+            self._thread_heartbeat = None
+        
+        try:
+            with self.db_manager.get_cursor() as (cursor, conn):
+                cursor.execute(f"""
+                    UPDATE {self.TABELA_SHARD}
+                    SET id_worker = NULL, heartbeat = NULL
+                    WHERE id_worker = %s
+                """, (self.id_worker,))
+                cursor.execute(
+                    f"DELETE FROM {self.TABELA_WORKER} WHERE id_worker = %s",
+                    (self.id_worker,)
+                )
+        except Exception as e:
+            print(f"⚠️ Erro ao liberar shards do worker: {e}")
+        
+        with self._lock:
+            self.shards = set()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Sketch Quantil Manager - Medianas e p90 a partir de analytics.sketch_quantil
+"""
+
+import math
+from datetime import date
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+# Precisão dos sketches (deve ser a mesma de migrations/create_sketch_quantil.sql)
+ALFA_SKETCH = 0.01
+GAMA_SKETCH = (1 + ALFA_SKETCH) / (1 - ALFA_SKETCH)
+
+METRICAS_SKETCH = ('km', 'frete', 'frete_km')
+DIMENSOES_SKETCH = ('geral', 'veiculo', 'rota')
+
+
+class SketchQuantilManager:
+    """
+    Manager dos sketches de quantis mantidos no banco.
+    
+    Cada métrica (km, frete, frete_km) é guardada como contagens por bucket
+    logarítmico, por dimensão (geral, veículo ou rota) e mês. Os sketches são
+    mantidos pelos triggers de cte.documento, então qualquer carga ou
+    atualização já é refletida. Um quantil combina os buckets do filtro e
+    tem erro relativo de no máximo ALFA_SKETCH, com custo proporcional ao
+    número de buckets e não ao de documentos.
+    """
+    
+    TABELA = 'analytics.sketch_quantil'
+    
+    def __init__(self, db_manager):
+        """
+        Inicializa o manager de sketches.
+        
+        Args:
+            db_manager: Manager de banco de dados
+        """
+        self.db_manager = db_manager
+    
+    def disponivel(self) -> bool:
+        """
+        Verifica se a tabela de sketches existe no banco.
+        
+        Returns:
+            True se a migration create_sketch_quantil.sql foi aplicada
+        """
+        try:
+            resultado = self.db_manager.execute_query(
+                "SELECT to_regclass(%s) IS NOT NULL", (self.TABELA,), fetch_one=True
+            )
+            return bool(resultado and resultado[0])
+        except Exception as e:
+            print(f"⚠️ Erro ao verificar sketches de quantis: {e}")
+            return False
+    
+    # ========== BUCKETS ==========
+    
+    @staticmethod
+    def bucket(valores) -> np.ndarray:
+        """
+        Índice do bucket de cada valor positivo (mesma fórmula do SQL).
+        
+        Args:
+            valores: Valores > 0
+        
+        Returns:
+            Array int64 com ceil(ln(valor) / ln(gama))
+        """
+        valores = np.asarray(valores, dtype=np.float64)
+        return np.ceil(np.log(valores) / math.log(GAMA_SKETCH)).astype(np.int64)
+    
+    @staticmethod
+    def valor_bucket(buckets) -> np.ndarray:
+        """
+        Valor representativo de cada bucket (erro relativo <= ALFA_SKETCH).
+        
+        Args:
+            buckets: Índices de bucket
+        
+        Returns:
+            Array float64 com 2 * gama^i / (gama + 1)
+        """
+        buckets = np.asarray(buckets, dtype=np.float64)
+        return 2 * np.power(GAMA_SKETCH, buckets) / (GAMA_SKETCH + 1)
+    
+    @classmethod
+    def quantil_buckets(cls, contagens: Dict[int, int], quantil: float) -> Optional[float]:
+        """
+        Quantil de um sketch em memória (bucket -> contagem).
+        
+        Segue a mesma regra de analytics.f_sketch_quantil: primeiro bucket
+        cuja contagem acumulada alcança ceil(quantil * total).
+        
+        Args:
+            contagens: Contagem por bucket; sketches se combinam somando
+            quantil: Quantil entre 0 e 1
+        
+        Returns:
+            Valor aproximado do quantil ou None se o sketch estiver vazio
+        """
+        buckets = sorted(b for b, c in contagens.items() if c > 0)
+        if not buckets:
+            return None
+        
+        acumulado = np.cumsum([contagens[b] for b in buckets])
+        alvo = max(1, math.ceil(quantil * acumulado[-1]))
+        posicao = int(np.searchsorted(acumulado, alvo))
+        return float(cls.valor_bucket(buckets[posicao]))
+    
+    @staticmethod
+    def chave_rota(origem: int, destino: int) -> int:
+        """Chave da dimensão 'rota' (códigos IBGE de 7 dígitos)."""
+        return int(origem) * 10000000 + int(destino)
+    
+    # ========== CONSULTA ==========
+    
+    def quantis(self, metrica: str, quantis: Sequence[float] = (0.5, 0.9),
+                dimensao: str = 'geral', chave: int = 0,
+                mes_inicio: Optional[date] = None,
+                mes_fim: Optional[date] = None) -> Dict[float, Optional[float]]:
+        """
+        Quantis de uma métrica combinando os sketches do filtro.
+        
+        Args:
+            metrica: 'km', 'frete' ou 'frete_km'
+            quantis: Quantis desejados (ex.: 0.5 e 0.9)
+            dimensao: 'geral', 'veiculo' ou 'rota'
+            chave: 0 (geral), id_veiculo ou chave_rota(origem, destino)
+            mes_inicio: Primeiro mês considerado (inclusive)
+            mes_fim: Último mês considerado (inclusive)
+        
+        Returns:
+            Dicionário quantil -> valor (None sem dados)
+        """
+        if metrica not in METRICAS_SKETCH:
+            raise ValueError(f"Métrica inválida: {metrica}")
+        if dimensao not in DIMENSOES_SKETCH:
+            raise ValueError(f"Dimensão inválida: {dimensao}")
+        
+        quantis = list(quantis)
+        linhas = self.db_manager.execute_query("""
+            SELECT q, analytics.f_sketch_quantil(%s, q, %s, %s, %s, %s)
+            FROM unnest(%s::float8[]) AS q
+        """, (metrica, dimensao, chave, mes_inicio, mes_fim, quantis))
+        
+        return {float(q): (float(valor) if valor is not None else None) for q, valor in linhas}
+    
+    def mediana_p90(self, metrica: str, **filtros) -> Dict[str, Optional[float]]:
+        """
+        Mediana e p90 de uma métrica.
+        
+        Args:
+            metrica: 'km', 'frete' ou 'frete_km'
+            **filtros: dimensao, chave, mes_inicio e mes_fim de quantis()
+        
+        Returns:
+            Dicionário com 'mediana' e 'p90'
+        """
+        resultado = self.quantis(metrica, (0.5, 0.9), **filtros)
+        return {'mediana': resultado.get(0.5), 'p90': resultado.get(0.9)}
+    
+    # ========== MANUTENÇÃO ==========
+    
+    def reconstruir(self) -> int:
+        """
+        Reconstrói todos os sketches a partir de cte.documento.
+        
+        Returns:
+            Número de buckets gravados
+        """
+        with self.db_manager.get_cursor() as (cursor, conn):
+            cursor.execute("SELECT analytics.f_sketch_reconstruir()")
+            return int(cursor.fetchone()[0])
+    
+    def compactar(self) -> int:
+        """
+        Remove buckets que ficaram com contagem zero após atualizações.
+        
+        Returns:
+            Número de buckets removidos
+        """
+        with self.db_manager.get_cursor() as (cursor, conn):
+            cursor.execute("SELECT analytics.f_sketch_compactar()")
+            return int(cursor.fetchone()[0])
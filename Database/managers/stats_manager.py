@@ -4,6 +4,7 @@ Stats Manager - Gerenciamento de estatísticas e relatórios
 """
 
 import time
+from collections import Counter, deque
 from typing import Dict, Any
 from datetime import datetime
 
@@ -12,10 +13,22 @@ class StatsManager:
     """
     Manager para controle de estatísticas e geração de relatórios.
     Implementa Single Responsibility Principle para métricas.
+    
+    A memória não cresce com o número de arquivos: os totais ficam em
+    contadores e apenas os registros mais recentes são mantidos.
     """
     
-    def __init__(self):
-        """Inicializa o manager de estatísticas."""
+    MAX_TIPOS_ERRO = 50
+    MAX_EXEMPLOS_POR_TIPO = 3
+    
+    def __init__(self, max_registros: int = 1000):
+        """
+        Inicializa o manager de estatísticas.
+        
+        Args:
+            max_registros: Quantidade de sucessos e erros recentes mantidos
+        """
+        self.max_registros = max_registros
         self.estatisticas = {
             'pessoas_inseridas': 0,
             'enderecos_inseridos': 0,
@@ -25,13 +38,22 @@ class StatsManager:
             'sucessos': 0,
             'erros': 0,
             'arquivos_processados': 0,
+            'arquivos_ignorados': 0,
             'tempo_inicio': None,
             'tempo_fim': None
         }
         
-        self.detalhes_erros = []
-        self.arquivos_sucesso = []
-        self.arquivos_erro = []
+        # Totais agregados dos sucessos
+        self.totais_sucesso = {'valor_frete': 0.0, 'quilometragem': 0.0}
+        
+        # Erros agrupados por tipo (com alguns arquivos de exemplo)
+        self.erros_por_tipo = Counter()
+        self.exemplos_erro = {}
+        
+        # Buffers circulares dos registros mais recentes
+        self.detalhes_erros = deque(maxlen=max_registros)
+        self.arquivos_sucesso = deque(maxlen=max_registros)
+        self.arquivos_erro = self.detalhes_erros
     
     def iniciar_cronometro(self) -> None:
         """Inicia contagem de tempo de processamento."""
@@ -87,6 +109,12 @@ class StatsManager:
         self.incrementar('sucessos')
         self.incrementar('arquivos_processados')
         
+        for campo in self.totais_sucesso:
+            try:
+                self.totais_sucesso[campo] += float((detalhes or {}).get(campo) or 0)
+            except (TypeError, ValueError):
+                pass
+        
         self.arquivos_sucesso.append({
             'arquivo': arquivo,
             'timestamp': datetime.now(),
@@ -113,7 +141,15 @@ class StatsManager:
         }
         
         self.detalhes_erros.append(erro_info)
-        self.arquivos_erro.append(erro_info)
+        
+        # Limitar tipos distintos (mensagens com detalhes variáveis)
+        tipo = erro
+        if tipo not in self.erros_por_tipo and len(self.erros_por_tipo) >= self.MAX_TIPOS_ERRO:
+            tipo = 'Outros erros'
+        self.erros_por_tipo[tipo] += 1
+        exemplos = self.exemplos_erro.setdefault(tipo, [])
+        if len(exemplos) < self.MAX_EXEMPLOS_POR_TIPO:
+            exemplos.append(arquivo)
     
     def get_taxa_sucesso(self) -> float:
         """
@@ -151,6 +187,15 @@ class StatsManager:
             atual: Arquivo atual sendo processado
             total: Total de arquivos
         """
+        if not total:
+            # Descoberta em streaming: total desconhecido
+            if atual % 100 == 0:
+                print(f"📊 Progresso: {atual} arquivos - "
+                      f"Sucessos: {self.estatisticas['sucessos']} - "
+                      f"Erros: {self.estatisticas['erros']} - "
+                      f"Throughput: {self.get_throughput():.1f} arquivos/min")
+            return
+        
         if atual % 10 == 0 or atual == total:  # A cada 10 arquivos ou no final
             tempo_decorrido = self.get_tempo_decorrido()
             progresso = (atual / total) * 100
@@ -211,6 +256,8 @@ class StatsManager:
         print(f"   • ❌ Erros: {self.estatisticas['erros']}")
         print(f"   • 📈 Taxa de sucesso: {taxa_sucesso:.1f}%")
         print(f"   • ⚡ Throughput: {throughput:.1f} arquivos/min")
+        if self.estatisticas['arquivos_ignorados']:
+            print(f"   • ⏭️  Ignorados (manifesto): {self.estatisticas['arquivos_ignorados']}")
         
         # Métricas de banco de dados
         print(f"\n🗄️  ESTATÍSTICAS DO BANCO:")
@@ -254,28 +301,20 @@ class StatsManager:
     
     def _imprimir_detalhes_erros(self) -> None:
         """Imprime detalhes dos erros encontrados."""
-        print(f"\n❌ DETALHES DOS ERROS ({len(self.detalhes_erros)} erros):")
+        print(f"\n❌ DETALHES DOS ERROS ({self.estatisticas['erros']} erros):")
         print("-" * 60)
         
-        # Agrupar erros por tipo
-        tipos_erro = {}
-        for erro_info in self.detalhes_erros:
-            tipo = erro_info['erro']
-            if tipo not in tipos_erro:
-                tipos_erro[tipo] = []
-            tipos_erro[tipo].append(erro_info['arquivo'])
-        
         # Mostrar apenas os tipos mais comuns
-        for i, (tipo, arquivos) in enumerate(tipos_erro.items(), 1):
-            print(f"{i}. {tipo} ({len(arquivos)} ocorrências)")
+        for i, (tipo, ocorrencias) in enumerate(self.erros_por_tipo.most_common(), 1):
+            print(f"{i}. {tipo} ({ocorrencias} ocorrências)")
             
             # Mostrar apenas alguns exemplos
-            exemplos = arquivos[:3]
+            exemplos = self.exemplos_erro.get(tipo, [])
             for arquivo in exemplos:
                 print(f"   📄 {arquivo}")
             
-            if len(arquivos) > 3:
-                print(f"   ... e mais {len(arquivos) - 3} arquivos")
+            if ocorrencias > len(exemplos):
+                print(f"   ... e mais {ocorrencias - len(exemplos)} arquivos")
             
             if i >= 5:  # Limitar a 5 tipos de erro
                 break
@@ -303,16 +342,25 @@ class StatsManager:
                 f.write(f"- Taxa de sucesso: {self.get_taxa_sucesso():.1f}%\n")
                 f.write(f"- Throughput: {self.get_throughput():.1f} arquivos/min\n\n")
                 
-                # Lista de sucessos
+                # Erros agrupados por tipo (totais completos)
+                if self.erros_por_tipo:
+                    f.write(f"## Erros por Tipo\n")
+                    for tipo, ocorrencias in self.erros_por_tipo.most_common():
+                        f.write(f"- {tipo}: {ocorrencias}\n")
+                    f.write("\n")
+                
+                # Lista de sucessos (apenas os mais recentes)
                 if self.arquivos_sucesso:
-                    f.write(f"## Arquivos Processados com Sucesso ({len(self.arquivos_sucesso)})\n")
+                    f.write(f"## Últimos Arquivos Processados com Sucesso "
+                            f"({len(self.arquivos_sucesso)} de {self.estatisticas['sucessos']})\n")
                     for item in self.arquivos_sucesso:
                         f.write(f"- {item['arquivo']}\n")
                     f.write("\n")
                 
-                # Lista de erros
+                # Lista de erros (apenas os mais recentes)
                 if self.arquivos_erro:
-                    f.write(f"## Arquivos com Erro ({len(self.arquivos_erro)})\n")
+                    f.write(f"## Últimos Arquivos com Erro "
+                            f"({len(self.arquivos_erro)} de {self.estatisticas['erros']})\n")
                     for item in self.arquivos_erro:
                         f.write(f"- {item['arquivo']}: {item['erro']}\n")
             
@@ -325,4 +373,4 @@ class StatsManager:
     
     def reset(self) -> None:
         """Reseta todas as estatísticas."""
-        self.__init__()
\ No newline at end of file
+        self.__init__(self.max_registros)
\ No newline at end of file
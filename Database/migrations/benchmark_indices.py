@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de Índices das Views de Analytics
+===========================================
+Executa EXPLAIN (ANALYZE, BUFFERS) sobre a consulta de cada analytics.vw_*
+antes e depois de aplicar uma migration de índices (padrão:
+create_indices_analytics.sql) e compara tempo, buffers e índices usados.
+
+Tudo roda em uma única transação desfeita ao final: a migration, os
+documentos sintéticos da escala e o ANALYZE não ficam no banco.
+
+Uso:
+    python migrations/benchmark_indices.py                  # dados atuais
+    python migrations/benchmark_indices.py --escala 10      # 10x os documentos
+    python migrations/benchmark_indices.py --remover --saida relatorio.md
+
+Autor: Sistema SACT
+Data: 2025-11-28
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import psycopg2
+
+# Adicionar paths
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root.parent))
+
+from Config.database_config import DATABASE_CONFIG
+
+MIGRATION_PADRAO = Path(__file__).resolve().parent / 'create_indices_analytics.sql'
+
+
+# ========== DADOS ==========
+
+def ampliar_documentos(cursor, escala: int) -> int:
+    """
+    Multiplica os documentos existentes (com participantes e carga).
+    
+    Cada cópia k recebe id_cte acima do maior existente (sem consumir a
+    sequência) e chave 'BENCH<k>-<chave>'; os triggers (agregados,
+    sketches) rodam normalmente.
+    
+    Args:
+        cursor: Cursor da transação do benchmark
+        escala: Total desejado em múltiplos do volume atual (1 = sem cópias)
+    
+    Returns:
+        Número de documentos inseridos
+    """
+    if escala <= 1:
+        return 0
+    
+    cursor.execute("""
+        CREATE TEMP TABLE bench_copia ON COMMIT DROP AS
+        SELECT (SELECT max(id_cte) FROM cte.documento) + row_number() OVER () AS id_novo,
+               d.id_cte AS id_original,
+               k
+        FROM cte.documento d
+        CROSS JOIN generate_series(1, %s) AS k
+    """, (escala - 1,))
+    cursor.execute("""
+        INSERT INTO cte.documento
+            (id_cte, chave, numero, serie, data_emissao, cfop, valor_frete, versao_schema,
+             id_municipio_origem, id_municipio_destino, id_veiculo, quilometragem)
+        SELECT c.id_novo, 'BENCH' || c.k || '-' || COALESCE(d.chave, d.id_cte::text),
+               d.numero, d.serie, d.data_emissao, d.cfop, d.valor_frete, d.versao_schema,
+               d.id_municipio_origem, d.id_municipio_destino, d.id_veiculo, d.quilometragem
+        FROM bench_copia c
+        JOIN cte.documento d ON d.id_cte = c.id_original
+        ORDER BY d.data_emissao, c.k
+    """)
+    inseridos = cursor.rowcount
+    cursor.execute("""
+        INSERT INTO cte.documento_parte (id_cte, tipo, id_pessoa)
+        SELECT c.id_novo, p.tipo, p.id_pessoa
+        FROM bench_copia c
+        JOIN cte.documento_parte p ON p.id_cte = c.id_original
+    """)
+    cursor.execute("""
+        INSERT INTO cte.carga
+            (id_cte, valor, peso, quantidade, produto_predominante, unidade_medida)
+        SELECT c.id_novo, g.valor, g.peso, g.quantidade, g.produto_predominante, g.unidade_medida
+        FROM bench_copia c
+        JOIN cte.carga g ON g.id_cte = c.id_original
+    """)
+    return inseridos
+
+
+def indices_da_migration(sql: str) -> List[str]:
+    """
+    Índices criados por CREATE INDEX IF NOT EXISTS na migration.
+    
+    Args:
+        sql: Texto da migration
+    
+    Returns:
+        Nomes qualificados (schema.indice)
+    """
+    return [
+        f"{schema}.{indice}"
+        for indice, schema in re.findall(
+            r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+ON\s+(\w+)\.", sql, re.IGNORECASE
+        )
+    ]
+
+
+# ========== MEDIÇÃO ==========
+
+def consultas_views(cursor) -> Dict[str, str]:
+    """
+    Consulta de cada analytics.vw_* (exceto as de controle vw_mv_*).
+    
+    Views materializadas são medidas pela consulta que as define (o que o
+    REFRESH executa); views comuns por SELECT * sobre a view.
+    
+    Returns:
+        Dicionário nome da view -> SQL
+    """
+    cursor.execute("""
+        SELECT n.nspname || '.' || c.relname, c.relkind, pg_get_viewdef(c.oid)
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'analytics'
+          AND c.relkind IN ('v', 'm')
+          AND c.relname LIKE 'vw\\_%%'
+          AND c.relname NOT LIKE 'vw\\_mv\\_%%'
+        ORDER BY 1
+    """)
+    consultas = {}
+    for nome, tipo, definicao in cursor.fetchall():
+        consultas[nome] = definicao.strip().rstrip(';') if tipo == 'm' else f"SELECT * FROM {nome}"
+    return consultas
+
+
+def explicar(cursor, sql: str, repeticoes: int) -> Dict:
+    """
+    EXPLAIN (ANALYZE, BUFFERS) da consulta, ficando com a execução mais rápida.
+    
+    Args:
+        cursor: Cursor da transação do benchmark
+        sql: Consulta
+        repeticoes: Execuções (a primeira aquece o cache)
+    
+    Returns:
+        Dicionário com tempo_ms, buffers_lidos, buffers_cache, indices e plano
+    """
+    melhor = None
+    for _ in range(max(1, repeticoes)):
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")
+        plano = '\n'.join(linha[0] for linha in cursor.fetchall())
+        tempo = re.search(r"Execution Time: ([\d.]+) ms", plano)
+        tempo_ms = float(tempo.group(1)) if tempo else float('nan')
+        if melhor is None or tempo_ms < melhor['tempo_ms']:
+            melhor = {'tempo_ms': tempo_ms, 'plano': plano}
+    
+    # Buffers do nó raiz (acumulam os dos nós filhos)
+    buffers = re.search(r"Buffers: shared(?: hit=(\d+))?(?: read=(\d+))?", melhor['plano'])
+    melhor['buffers_cache'] = int(buffers.group(1) or 0) if buffers else 0
+    melhor['buffers_lidos'] = int(buffers.group(2) or 0) if buffers else 0
+    melhor['indices'] = sorted(set(re.findall(r"(?:Index|Index Only) Scan (?:Backward )?using (\w+)", melhor['plano'])
+                                   + re.findall(r"Bitmap Index Scan on (\w+)", melhor['plano'])))
+    return melhor
+
+
+def medir(cursor, consultas: Dict[str, str], repeticoes: int, rotulo: str) -> Dict[str, Dict]:
+    """Mede todas as views e imprime o progresso."""
+    resultados = {}
+    print(f"\n⏱️ Medindo {len(consultas)} views ({rotulo})...")
+    for nome, sql in consultas.items():
+        try:
+            cursor.execute("SAVEPOINT bench_view")
+            resultados[nome] = explicar(cursor, sql, repeticoes)
+            cursor.execute("RELEASE SAVEPOINT bench_view")
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT bench_view")
+            resultados[nome] = {'erro': str(e).strip().splitlines()[0]}
+            print(f"   ⚠️ {nome}: {resultados[nome]['erro']}")
+    return resultados
+
+
+# ========== RELATÓRIO ==========
+
+def imprimir_resumo(antes: Dict[str, Dict], depois: Dict[str, Dict]) -> None:
+    """Tabela com tempo, buffers e índices usados por view."""
+    print("\n" + "=" * 110)
+    print(f"{'VIEW':<40} {'ANTES (ms)':>11} {'DEPOIS (ms)':>12} {'VARIAÇÃO':>9} {'BUFFERS':>17}  ÍNDICES (DEPOIS)")
+    print("=" * 110)
+    total_antes = total_depois = 0.0
+    for nome in antes:
+        a, d = antes[nome], depois.get(nome, {})
+        if 'erro' in a or 'erro' in d:
+            print(f"{nome:<40} {'erro':>11}")
+            continue
+        total_antes += a['tempo_ms']
+        total_depois += d['tempo_ms']
+        variacao = (d['tempo_ms'] / a['tempo_ms'] - 1) * 100 if a['tempo_ms'] else 0.0
+        buffers = (f"{a['buffers_cache'] + a['buffers_lidos']}→"
+                   f"{d['buffers_cache'] + d['buffers_lidos']}")
+        print(f"{nome:<40} {a['tempo_ms']:>11.1f} {d['tempo_ms']:>12.1f} {variacao:>8.0f}% "
+              f"{buffers:>17}  {', '.join(d['indices']) or '-'}")
+    print("-" * 110)
+    print(f"{'TOTAL':<40} {total_antes:>11.1f} {total_depois:>12.1f}")
+
+
+def gravar_relatorio(caminho: Path, parametros: Dict, antes: Dict[str, Dict],
+                     depois: Dict[str, Dict]) -> None:
+    """Relatório em Markdown com os planos completos antes e depois."""
+    linhas = [
+        "# Benchmark de índices das views de analytics",
+        "",
+        f"- Migration: `{parametros['migration']}`",
+        f"- Documentos: {parametros['documentos']} (escala {parametros['escala']})",
+        f"- Repetições por consulta: {parametros['repeticoes']} (melhor tempo)",
+        "",
+        "| View | Antes (ms) | Depois (ms) | Índices usados depois |",
+        "|---|---:|---:|---|",
+    ]
+    for nome in antes:
+        a, d = antes[nome], depois.get(nome, {})
+        if 'erro' in a or 'erro' in d:
+            linhas.append(f"| {nome} | erro | erro | {a.get('erro') or d.get('erro')} |")
+        else:
+            linhas.append(f"| {nome} | {a['tempo_ms']:.1f} | {d['tempo_ms']:.1f} | "
+                          f"{', '.join(d['indices']) or '-'} |")
+    
+    for nome in antes:
+        linhas += ["", f"## {nome}"]
+        for rotulo, resultado in (('Antes', antes[nome]), ('Depois', depois.get(nome, {}))):
+            linhas += ["", f"### {rotulo}", "", "```", resultado.get('plano') or resultado.get('erro', ''), "```"]
+    
+    caminho.write_text('\n'.join(linhas) + '\n', encoding='utf-8')
+    print(f"\n📝 Relatório com os planos: {caminho}")
+
+
+# ========== EXECUÇÃO ==========
+
+def executar(migration: Path, escala: int = 1, repeticoes: int = 3, remover: bool = False,
+             timeout_segundos: Optional[int] = None, saida: Optional[Path] = None) -> Dict[str, Dict]:
+    """
+    Mede as views antes e depois da migration, desfazendo tudo ao final.
+    
+    Args:
+        migration: Arquivo SQL de índices
+        escala: Multiplicador do volume de documentos
+        repeticoes: Execuções por consulta (fica a mais rápida)
+        remover: Remove os índices da migration antes da primeira medição
+            (para medir um banco em que ela já foi aplicada)
+        timeout_segundos: statement_timeout por consulta
+        saida: Arquivo Markdown para o relatório com os planos
+    
+    Returns:
+        Dicionário com 'antes' e 'depois' (view -> medição)
+    """
+    sql_migration = migration.read_text(encoding='utf-8')
+    
+    conn = psycopg2.connect(**DATABASE_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            if timeout_segundos:
+                cursor.execute("SET LOCAL statement_timeout = %s", (timeout_segundos * 1000,))
+            
+            inicio = time.time()
+            inseridos = ampliar_documentos(cursor, escala)
+            if inseridos:
+                print(f"📈 {inseridos} documentos sintéticos inseridos em {time.time() - inicio:.1f}s")
+            
+            if remover:
+                for indice in indices_da_migration(sql_migration):
+                    cursor.execute(f"DROP INDEX IF EXISTS {indice}")
+                print("🗑️ Índices da migration removidos para a medição inicial")
+            
+            cursor.execute("ANALYZE cte.documento; ANALYZE cte.documento_parte; ANALYZE cte.carga")
+            cursor.execute("SELECT count(*) FROM cte.documento")
+            documentos = cursor.fetchone()[0]
+            
+            consultas = consultas_views(cursor)
+            antes = medir(cursor, consultas, repeticoes, 'antes')
+            
+            print(f"\n🔧 Aplicando {migration.name} (dentro da transação)...")
+            cursor.execute(sql_migration)
+            depois = medir(cursor, consultas, repeticoes, 'depois')
+    finally:
+        conn.rollback()
+        conn.close()
+    
+    imprimir_resumo(antes, depois)
+    if saida:
+        gravar_relatorio(saida, {
+            'migration': migration.name, 'documentos': documentos,
+            'escala': escala, 'repeticoes': repeticoes,
+        }, antes, depois)
+    return {'antes': antes, 'depois': depois}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='EXPLAIN (ANALYZE, BUFFERS) das views de analytics antes e depois de uma migration de índices'
+    )
+    parser.add_argument('--migration', type=Path, default=MIGRATION_PADRAO,
+                        help='Migration de índices (padrão: create_indices_analytics.sql)')
+    parser.add_argument('--escala', type=int, default=1,
+                        help='Multiplica os documentos existentes (padrão: 1 = dados atuais)')
+    parser.add_argument('--repeticoes', type=int, default=3,
+                        help='Execuções por consulta; vale a mais rápida (padrão: 3)')
+    parser.add_argument('--remover', action='store_true',
+                        help='Remove os índices da migration antes de medir (banco já migrado)')
+    parser.add_argument('--timeout', type=int, default=None,
+                        help='statement_timeout em segundos por consulta')
+    parser.add_argument('--saida', type=Path, default=None,
+                        help='Relatório Markdown com os planos completos')
+    args = parser.parse_args()
+    
+    if args.escala < 1:
+        parser.error('--escala deve ser >= 1')
+    
+    print("=" * 80)
+    print("🧪 BENCHMARK DE ÍNDICES - VIEWS DE ANALYTICS")
+    print("=" * 80)
+    executar(args.migration, args.escala, args.repeticoes, args.remover, args.timeout, args.saida)
+
+
+if __name__ == '__main__':
+    main()
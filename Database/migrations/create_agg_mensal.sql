@@ -0,0 +1,475 @@
+-- ============================================================================
+-- AGREGADOS MENSAIS MANTIDOS INCREMENTALMENTE (ROLLUPS)
+-- ============================================================================
+-- Data: 2025-11-28
+-- Autor: Sistema SACT
+-- Descrição: Tabelas de agregados por mês de emissão que as views de
+--            analytics leem no lugar de cte.documento inteiro:
+--
+--            analytics.agg_mensal          (ano, mes, id_veiculo, uf_origem, uf_destino)
+--            analytics.agg_cliente_mensal  (id_pessoa, tipo, ano, mes)
+--
+--            Chaves ausentes viram 0 (ano/mes 0 = documento sem data,
+--            id_veiculo 0 = sem veículo, UF 0 = sem município).
+--            Contagens e somas são somáveis entre grupos; médias saem de
+--            soma / contagem nas views. Mínimos/máximos só são recalculados
+--            a partir de cte.documento para os grupos que perderam linhas
+--            (mudança só de quilometragem é aplicada como delta puro).
+--
+--            Triggers de comando (transition tables) em cte.documento e
+--            cte.documento_parte aplicam os deltas de cada INSERT/UPDATE/DELETE
+--            (ETL individual, ETL em lote, backfill e recálculo), então o
+--            REFRESH das views custa proporcional aos agregados, não aos
+--            documentos. Mudança de UF de um município exige
+--            SELECT analytics.f_agg_reconstruir().
+--
+--            Aplicar DEPOIS de create_mv_refresh.sql e ANTES de views/*.sql.
+-- ============================================================================
+
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+CREATE TABLE IF NOT EXISTS analytics.agg_mensal (
+    ano            integer  NOT NULL,
+    mes            integer  NOT NULL,
+    id_veiculo     bigint   NOT NULL,
+    uf_origem      smallint NOT NULL,
+    uf_destino     smallint NOT NULL,
+    docs           bigint   NOT NULL,
+    docs_frete     bigint   NOT NULL,  -- documentos com valor_frete
+    frete          numeric  NOT NULL,
+    frete_min      numeric(18,2),
+    frete_max      numeric(18,2),
+    km             bigint   NOT NULL,
+    docs_km        bigint   NOT NULL,  -- documentos com quilometragem > 0
+    frete_km       numeric  NOT NULL,  -- frete dos documentos com quilometragem > 0
+    docs_taxa      bigint   NOT NULL,  -- documentos com quilometragem > 0 e frete > 0
+    soma_taxa      numeric  NOT NULL,  -- soma de frete / km desses documentos
+    frete_taxa     numeric  NOT NULL,
+    km_taxa        bigint   NOT NULL,
+    data_min       timestamptz,
+    data_max       timestamptz,
+    PRIMARY KEY (ano, mes, id_veiculo, uf_origem, uf_destino)
+);
+
+CREATE TABLE IF NOT EXISTS analytics.agg_cliente_mensal (
+    id_pessoa      bigint   NOT NULL,
+    tipo           text     NOT NULL,
+    ano            integer  NOT NULL,
+    mes            integer  NOT NULL,
+    docs           bigint   NOT NULL,
+    docs_frete     bigint   NOT NULL,
+    frete          numeric  NOT NULL,
+    frete_min      numeric(18,2),
+    frete_max      numeric(18,2),
+    km             bigint   NOT NULL,
+    data_min       timestamptz,
+    data_max       timestamptz,
+    PRIMARY KEY (id_pessoa, tipo, ano, mes)
+);
+
+-- Grupos esvaziados (docs = 0) são removidos logo após cada delta
+CREATE INDEX IF NOT EXISTS idx_agg_mensal_vazio
+    ON analytics.agg_mensal (ano) WHERE docs <= 0;
+CREATE INDEX IF NOT EXISTS idx_agg_cliente_mensal_vazio
+    ON analytics.agg_cliente_mensal (ano) WHERE docs <= 0;
+
+COMMENT ON TABLE analytics.agg_mensal IS
+'Agregados de cte.documento por mês de emissão, veículo e UFs de origem/destino.
+Mantida por triggers em cte.documento; base de vw_ctes_por_mes, vw_receita_mensal
+e dos dashboards.';
+
+COMMENT ON TABLE analytics.agg_cliente_mensal IS
+'Agregados de cte.documento por participante (id_pessoa, tipo) e mês de emissão.
+Mantida por triggers em cte.documento e cte.documento_parte; base de
+vw_faturamento_* e vw_ranking_clientes.';
+
+
+-- ============================================================================
+-- SQL dos deltas: p_origem retorna sinal (+1/-1) e as colunas de cte.documento
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_agg_mensal_sql(p_origem text)
+RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT format($sql$
+        INSERT INTO analytics.agg_mensal AS a
+            (ano, mes, id_veiculo, uf_origem, uf_destino,
+             docs, docs_frete, frete, frete_min, frete_max,
+             km, docs_km, frete_km, docs_taxa, soma_taxa, frete_taxa, km_taxa,
+             data_min, data_max)
+        SELECT COALESCE(EXTRACT(YEAR FROM x.data_emissao)::integer, 0),
+               COALESCE(EXTRACT(MONTH FROM x.data_emissao)::integer, 0),
+               COALESCE(x.id_veiculo, 0),
+               COALESCE(mo.id_uf, 0),
+               COALESCE(md.id_uf, 0),
+               sum(x.sinal),
+               sum(CASE WHEN x.valor_frete IS NOT NULL THEN x.sinal ELSE 0 END),
+               sum(x.sinal * COALESCE(x.valor_frete, 0)),
+               min(x.valor_frete) FILTER (WHERE x.sinal > 0),
+               max(x.valor_frete) FILTER (WHERE x.sinal > 0),
+               sum(x.sinal * x.quilometragem),
+               sum(CASE WHEN x.quilometragem > 0 THEN x.sinal ELSE 0 END),
+               sum(CASE WHEN x.quilometragem > 0 THEN x.sinal * COALESCE(x.valor_frete, 0) ELSE 0 END),
+               sum(CASE WHEN x.quilometragem > 0 AND x.valor_frete > 0 THEN x.sinal ELSE 0 END),
+               sum(CASE WHEN x.quilometragem > 0 AND x.valor_frete > 0
+                        THEN x.sinal * (x.valor_frete / x.quilometragem) ELSE 0 END),
+               sum(CASE WHEN x.quilometragem > 0 AND x.valor_frete > 0 THEN x.sinal * x.valor_frete ELSE 0 END),
+               sum(CASE WHEN x.quilometragem > 0 AND x.valor_frete > 0 THEN x.sinal * x.quilometragem ELSE 0 END),
+               min(x.data_emissao) FILTER (WHERE x.sinal > 0),
+               max(x.data_emissao) FILTER (WHERE x.sinal > 0)
+        FROM (%s) x
+        LEFT JOIN ibge.municipio mo ON mo.id_municipio = x.id_municipio_origem
+        LEFT JOIN ibge.municipio md ON md.id_municipio = x.id_municipio_destino
+        GROUP BY 1, 2, 3, 4, 5
+        -- Ordem fixa de bloqueio entre transações concorrentes (evita deadlock)
+        ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (ano, mes, id_veiculo, uf_origem, uf_destino)
+        DO UPDATE SET docs       = a.docs + EXCLUDED.docs,
+                      docs_frete = a.docs_frete + EXCLUDED.docs_frete,
+                      frete      = a.frete + EXCLUDED.frete,
+                      frete_min  = LEAST(a.frete_min, EXCLUDED.frete_min),
+                      frete_max  = GREATEST(a.frete_max, EXCLUDED.frete_max),
+                      km         = a.km + EXCLUDED.km,
+                      docs_km    = a.docs_km + EXCLUDED.docs_km,
+                      frete_km   = a.frete_km + EXCLUDED.frete_km,
+                      docs_taxa  = a.docs_taxa + EXCLUDED.docs_taxa,
+                      soma_taxa  = a.soma_taxa + EXCLUDED.soma_taxa,
+                      frete_taxa = a.frete_taxa + EXCLUDED.frete_taxa,
+                      km_taxa    = a.km_taxa + EXCLUDED.km_taxa,
+                      data_min   = LEAST(a.data_min, EXCLUDED.data_min),
+                      data_max   = GREATEST(a.data_max, EXCLUDED.data_max)
+    $sql$, p_origem)
+$$;
+
+-- p_origem retorna sinal, id_pessoa, tipo, data_emissao, valor_frete e quilometragem
+CREATE OR REPLACE FUNCTION analytics.f_agg_cliente_sql(p_origem text)
+RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT format($sql$
+        INSERT INTO analytics.agg_cliente_mensal AS a
+            (id_pessoa, tipo, ano, mes, docs, docs_frete, frete,
+             frete_min, frete_max, km, data_min, data_max)
+        SELECT x.id_pessoa,
+               x.tipo,
+               COALESCE(EXTRACT(YEAR FROM x.data_emissao)::integer, 0),
+               COALESCE(EXTRACT(MONTH FROM x.data_emissao)::integer, 0),
+               sum(x.sinal),
+               sum(CASE WHEN x.valor_frete IS NOT NULL THEN x.sinal ELSE 0 END),
+               sum(x.sinal * COALESCE(x.valor_frete, 0)),
+               min(x.valor_frete) FILTER (WHERE x.sinal > 0),
+               max(x.valor_frete) FILTER (WHERE x.sinal > 0),
+               sum(x.sinal * x.quilometragem),
+               min(x.data_emissao) FILTER (WHERE x.sinal > 0),
+               max(x.data_emissao) FILTER (WHERE x.sinal > 0)
+        FROM (%s) x
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (id_pessoa, tipo, ano, mes)
+        DO UPDATE SET docs       = a.docs + EXCLUDED.docs,
+                      docs_frete = a.docs_frete + EXCLUDED.docs_frete,
+                      frete      = a.frete + EXCLUDED.frete,
+                      frete_min  = LEAST(a.frete_min, EXCLUDED.frete_min),
+                      frete_max  = GREATEST(a.frete_max, EXCLUDED.frete_max),
+                      km         = a.km + EXCLUDED.km,
+                      data_min   = LEAST(a.data_min, EXCLUDED.data_min),
+                      data_max   = GREATEST(a.data_max, EXCLUDED.data_max)
+    $sql$, p_origem)
+$$;
+
+
+-- ============================================================================
+-- SQL do recálculo de mínimos/máximos dos grupos que perderam linhas
+-- (p_alterados retorna as linhas antigas; lê só o mês de cada grupo)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_agg_mensal_extremos_sql(p_alterados text)
+RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT format($sql$
+        WITH grupos AS (
+            SELECT DISTINCT
+                   COALESCE(EXTRACT(YEAR FROM x.data_emissao)::integer, 0) AS ano,
+                   COALESCE(EXTRACT(MONTH FROM x.data_emissao)::integer, 0) AS mes,
+                   COALESCE(x.id_veiculo, 0) AS id_veiculo,
+                   COALESCE(mo.id_uf, 0) AS uf_origem,
+                   COALESCE(md.id_uf, 0) AS uf_destino,
+                   date_trunc('month', x.data_emissao) AS inicio
+            FROM (%s) x
+            LEFT JOIN ibge.municipio mo ON mo.id_municipio = x.id_municipio_origem
+            LEFT JOIN ibge.municipio md ON md.id_municipio = x.id_municipio_destino
+        )
+        UPDATE analytics.agg_mensal a
+        SET frete_min = r.frete_min,
+            frete_max = r.frete_max,
+            data_min  = r.data_min,
+            data_max  = r.data_max
+        FROM grupos g
+        CROSS JOIN LATERAL (
+            SELECT min(d.valor_frete) AS frete_min, max(d.valor_frete) AS frete_max,
+                   min(d.data_emissao) AS data_min, max(d.data_emissao) AS data_max
+            FROM cte.documento d
+            LEFT JOIN ibge.municipio mo ON mo.id_municipio = d.id_municipio_origem
+            LEFT JOIN ibge.municipio md ON md.id_municipio = d.id_municipio_destino
+            WHERE (g.inicio IS NULL AND d.data_emissao IS NULL
+                   OR d.data_emissao >= g.inicio AND d.data_emissao < g.inicio + interval '1 month')
+              AND COALESCE(d.id_veiculo, 0) = g.id_veiculo
+              AND COALESCE(mo.id_uf, 0) = g.uf_origem
+              AND COALESCE(md.id_uf, 0) = g.uf_destino
+        ) r
+        WHERE (a.ano, a.mes, a.id_veiculo, a.uf_origem, a.uf_destino)
+            = (g.ano, g.mes, g.id_veiculo, g.uf_origem, g.uf_destino)
+    $sql$, p_alterados)
+$$;
+
+-- p_alterados retorna id_pessoa, tipo e data_emissao das linhas antigas
+CREATE OR REPLACE FUNCTION analytics.f_agg_cliente_extremos_sql(p_alterados text)
+RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT format($sql$
+        WITH grupos AS (
+            SELECT DISTINCT x.id_pessoa, x.tipo,
+                   COALESCE(EXTRACT(YEAR FROM x.data_emissao)::integer, 0) AS ano,
+                   COALESCE(EXTRACT(MONTH FROM x.data_emissao)::integer, 0) AS mes,
+                   date_trunc('month', x.data_emissao) AS inicio
+            FROM (%s) x
+        )
+        UPDATE analytics.agg_cliente_mensal a
+        SET frete_min = r.frete_min,
+            frete_max = r.frete_max,
+            data_min  = r.data_min,
+            data_max  = r.data_max
+        FROM grupos g
+        CROSS JOIN LATERAL (
+            SELECT min(d.valor_frete) AS frete_min, max(d.valor_frete) AS frete_max,
+                   min(d.data_emissao) AS data_min, max(d.data_emissao) AS data_max
+            FROM cte.documento_parte p
+            JOIN cte.documento d ON d.id_cte = p.id_cte
+            WHERE p.id_pessoa = g.id_pessoa
+              AND p.tipo = g.tipo
+              AND (g.inicio IS NULL AND d.data_emissao IS NULL
+                   OR d.data_emissao >= g.inicio AND d.data_emissao < g.inicio + interval '1 month')
+        ) r
+        WHERE (a.id_pessoa, a.tipo, a.ano, a.mes) = (g.id_pessoa, g.tipo, g.ano, g.mes)
+    $sql$, p_alterados)
+$$;
+
+
+-- ============================================================================
+-- Trigger em cte.documento: deltas em agg_mensal (e em agg_cliente_mensal
+-- quando data, frete ou km de documentos com participantes mudam)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_trg_agg_documento()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_mudou    text := '(n.data_emissao, n.valor_frete, n.quilometragem, n.id_veiculo,
+                         n.id_municipio_origem, n.id_municipio_destino)
+                        IS DISTINCT FROM
+                        (a.data_emissao, a.valor_frete, a.quilometragem, a.id_veiculo,
+                         a.id_municipio_origem, a.id_municipio_destino)';
+    -- Mínimos/máximos só mudam com frete, data ou chave do grupo: uma
+    -- mudança só de quilometragem (backfill, recálculo) é delta puro
+    v_mudou_extremos text := '(n.data_emissao, n.valor_frete, n.id_veiculo,
+                               n.id_municipio_origem, n.id_municipio_destino)
+                              IS DISTINCT FROM
+                              (a.data_emissao, a.valor_frete, a.id_veiculo,
+                               a.id_municipio_origem, a.id_municipio_destino)';
+    v_antigos  text;
+    v_extremos text;
+    v_origem   text;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        -- Participantes são inseridos depois do documento (trigger em documento_parte)
+        EXECUTE analytics.f_agg_mensal_sql('SELECT 1 AS sinal, * FROM novos');
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        -- Participantes saem em cascata (trigger em documento_parte)
+        v_antigos := 'SELECT * FROM antigos';
+        v_extremos := v_antigos;
+        v_origem := 'SELECT -1 AS sinal, * FROM antigos';
+    ELSE
+        -- Só documentos em que alguma coluna agregada mudou
+        v_antigos := format('SELECT a.* FROM antigos a JOIN novos n USING (id_cte) WHERE %s', v_mudou);
+        v_extremos := format('SELECT a.* FROM antigos a JOIN novos n USING (id_cte) WHERE %s',
+                             v_mudou_extremos);
+        v_origem := format(
+            'SELECT 1 AS sinal, n.* FROM novos n JOIN antigos a USING (id_cte) WHERE %s
+             UNION ALL
+             SELECT -1, * FROM (%s) antigos_alterados',
+            v_mudou, v_antigos
+        );
+    END IF;
+
+    EXECUTE analytics.f_agg_mensal_sql(v_origem);
+    DELETE FROM analytics.agg_mensal WHERE docs <= 0;
+    EXECUTE analytics.f_agg_mensal_extremos_sql(v_extremos);
+
+    IF TG_OP = 'UPDATE' THEN
+        EXECUTE analytics.f_agg_cliente_sql(format(
+            'SELECT x.sinal, p.id_pessoa, p.tipo, x.data_emissao, x.valor_frete, x.quilometragem
+             FROM (%s) x
+             JOIN cte.documento_parte p ON p.id_cte = x.id_cte',
+            v_origem
+        ));
+        DELETE FROM analytics.agg_cliente_mensal WHERE docs <= 0;
+        EXECUTE analytics.f_agg_cliente_extremos_sql(format(
+            'SELECT p.id_pessoa, p.tipo, x.data_emissao
+             FROM (%s) x
+             JOIN cte.documento_parte p ON p.id_cte = x.id_cte',
+            v_extremos
+        ));
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+
+-- ============================================================================
+-- Trigger em cte.documento_parte: deltas em agg_cliente_mensal
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_trg_agg_documento_parte()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_antigos  text;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        EXECUTE analytics.f_agg_cliente_sql(
+            'SELECT 1 AS sinal, p.id_pessoa, p.tipo, d.data_emissao, d.valor_frete, d.quilometragem
+             FROM novos p
+             JOIN cte.documento d ON d.id_cte = p.id_cte'
+        );
+
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Troca de participante (ON CONFLICT ... DO UPDATE SET id_pessoa)
+        v_antigos := 'SELECT a.* FROM antigos a JOIN novos n USING (id_cte, tipo)
+                      WHERE a.id_pessoa <> n.id_pessoa';
+        EXECUTE analytics.f_agg_cliente_sql(format(
+            'SELECT x.sinal, x.id_pessoa, x.tipo, d.data_emissao, d.valor_frete, d.quilometragem
+             FROM (SELECT 1 AS sinal, n.* FROM novos n JOIN antigos a USING (id_cte, tipo)
+                   WHERE a.id_pessoa <> n.id_pessoa
+                   UNION ALL
+                   SELECT -1, * FROM (%s) antigos_alterados) x
+             JOIN cte.documento d ON d.id_cte = x.id_cte',
+            v_antigos
+        ));
+        DELETE FROM analytics.agg_cliente_mensal WHERE docs <= 0;
+        EXECUTE analytics.f_agg_cliente_extremos_sql(format(
+            'SELECT x.id_pessoa, x.tipo, d.data_emissao
+             FROM (%s) x
+             JOIN cte.documento d ON d.id_cte = x.id_cte',
+            v_antigos
+        ));
+
+    ELSE
+        -- Na exclusão em cascata o documento já não existe para calcular o
+        -- delta: recalcula os participantes afetados (exclusões são raras)
+        DELETE FROM analytics.agg_cliente_mensal a
+        USING (SELECT DISTINCT id_pessoa, tipo FROM antigos) x
+        WHERE a.id_pessoa = x.id_pessoa AND a.tipo = x.tipo;
+
+        EXECUTE analytics.f_agg_cliente_sql(
+            'SELECT 1 AS sinal, p.id_pessoa, p.tipo, d.data_emissao, d.valor_frete, d.quilometragem
+             FROM cte.documento_parte p
+             JOIN cte.documento d ON d.id_cte = p.id_cte
+             WHERE (p.id_pessoa, p.tipo) IN (SELECT id_pessoa, tipo FROM antigos)'
+        );
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+-- Transition tables exigem um trigger por evento
+DROP TRIGGER IF EXISTS tgr_agg_documento_insert ON cte.documento;
+CREATE TRIGGER tgr_agg_documento_insert
+    AFTER INSERT ON cte.documento
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_agg_documento();
+
+DROP TRIGGER IF EXISTS tgr_agg_documento_update ON cte.documento;
+CREATE TRIGGER tgr_agg_documento_update
+    AFTER UPDATE ON cte.documento
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_agg_documento();
+
+DROP TRIGGER IF EXISTS tgr_agg_documento_delete ON cte.documento;
+CREATE TRIGGER tgr_agg_documento_delete
+    AFTER DELETE ON cte.documento
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_agg_documento();
+
+DROP TRIGGER IF EXISTS tgr_agg_documento_parte_insert ON cte.documento_parte;
+CREATE TRIGGER tgr_agg_documento_parte_insert
+    AFTER INSERT ON cte.documento_parte
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_agg_documento_parte();
+
+DROP TRIGGER IF EXISTS tgr_agg_documento_parte_update ON cte.documento_parte;
+CREATE TRIGGER tgr_agg_documento_parte_update
+    AFTER UPDATE ON cte.documento_parte
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_agg_documento_parte();
+
+DROP TRIGGER IF EXISTS tgr_agg_documento_parte_delete ON cte.documento_parte;
+CREATE TRIGGER tgr_agg_documento_parte_delete
+    AFTER DELETE ON cte.documento_parte
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_agg_documento_parte();
+
+-- As views materializadas passam a depender dos agregados: o orquestrador
+-- precisa saber quando eles mudam (ver create_mv_refresh.sql)
+DO $$
+DECLARE
+    v_tabela text;
+BEGIN
+    IF to_regprocedure('analytics.f_trg_mv_fonte_alterada()') IS NULL THEN
+        RETURN;
+    END IF;
+    FOREACH v_tabela IN ARRAY ARRAY['analytics.agg_mensal', 'analytics.agg_cliente_mensal'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS tgr_mv_fonte_alterada ON %s', v_tabela);
+        EXECUTE format(
+            'CREATE TRIGGER tgr_mv_fonte_alterada
+                 AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s
+                 FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_mv_fonte_alterada()',
+            v_tabela
+        );
+    END LOOP;
+END;
+$$;
+
+
+-- ============================================================================
+-- Manutenção: reconstrução completa a partir de cte.documento
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_agg_reconstruir()
+RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_linhas   bigint;
+    v_cliente  bigint;
+BEGIN
+    LOCK TABLE analytics.agg_mensal, analytics.agg_cliente_mensal IN EXCLUSIVE MODE;
+    TRUNCATE analytics.agg_mensal, analytics.agg_cliente_mensal;
+
+    EXECUTE analytics.f_agg_mensal_sql('SELECT 1 AS sinal, * FROM cte.documento');
+    GET DIAGNOSTICS v_linhas = ROW_COUNT;
+
+    EXECUTE analytics.f_agg_cliente_sql(
+        'SELECT 1 AS sinal, p.id_pessoa, p.tipo, d.data_emissao, d.valor_frete, d.quilometragem
+         FROM cte.documento_parte p
+         JOIN cte.documento d ON d.id_cte = p.id_cte'
+    );
+    GET DIAGNOSTICS v_cliente = ROW_COUNT;
+
+    RETURN v_linhas + v_cliente;
+END;
+$$;
+
+COMMENT ON FUNCTION analytics.f_agg_reconstruir() IS
+'Recalcula analytics.agg_mensal e analytics.agg_cliente_mensal a partir de
+cte.documento (carga inicial ou após alterar municípios/UFs). Retorna as linhas geradas.';
+
+-- Carga inicial a partir dos documentos existentes
+SELECT analytics.f_agg_reconstruir();
@@ -0,0 +1,91 @@
+-- ============================================================================
+-- COLUNAS GERADAS PARA MÉTRICAS DERIVADAS
+-- ============================================================================
+-- Data: 2025-11-29
+-- Autor: Sistema SACT
+-- Descrição: Colunas armazenadas (GENERATED ... STORED) com expressões que as
+--            views recalculavam linha a linha:
+--
+--            cte.documento.taxa_km            valor_frete / NULLIF(quilometragem, 0)
+--            cte.documento.ano_mes            'AAAA-MM' da emissão
+--            core.veiculo.ano_fabricacao_int  ano_fabricacao::integer
+--
+--            Colunas geradas só aceitam expressões IMMUTABLE: TO_CHAR e
+--            EXTRACT sobre timestamptz dependem do fuso da sessão. ano_mes é
+--            calculado no fuso do servidor no momento da migration (o mesmo
+--            dos limites das partições mensais); se o TimeZone do banco
+--            mudar, remover a coluna e aplicar esta migration novamente.
+--
+--            Índices de apoio permitem index-only scan em vw_taxa_frete_km e
+--            vw_distribuicao_viagens. Durante a migração para as tabelas
+--            particionadas (create_particionamento.sql) as colunas e índices
+--            também são criados em cte.documento_particionado.
+--
+--            Adicionar as colunas reescreve cte.documento (uma vez).
+--            Aplicar ANTES de views/vw_frota_utilizacao.sql e
+--            views/vw_operacao_transporte.sql.
+-- ============================================================================
+
+DO $$
+DECLARE
+    v_ano_mes  text := format(
+        $expr$(EXTRACT(YEAR FROM data_emissao AT TIME ZONE %1$L)::integer)::text || '-'
+              || lpad((EXTRACT(MONTH FROM data_emissao AT TIME ZONE %1$L)::integer)::text, 2, '0')$expr$,
+        current_setting('TimeZone')
+    );
+    v_tabela   text;
+    v_sufixo   text;
+BEGIN
+    FOREACH v_tabela IN ARRAY ARRAY['cte.documento', 'cte.documento_particionado'] LOOP
+        CONTINUE WHEN to_regclass(v_tabela) IS NULL;
+        -- Sufixo _part removido na troca das tabelas
+        v_sufixo := CASE WHEN v_tabela = 'cte.documento' THEN '' ELSE '_part' END;
+
+        -- Uma única reescrita da tabela para as duas colunas
+        EXECUTE format(
+            'ALTER TABLE %s
+                 ADD COLUMN IF NOT EXISTS taxa_km numeric
+                     GENERATED ALWAYS AS (valor_frete / NULLIF(quilometragem, 0)) STORED,
+                 ADD COLUMN IF NOT EXISTS ano_mes text
+                     GENERATED ALWAYS AS (%s) STORED',
+            v_tabela, v_ano_mes
+        );
+
+        -- vw_taxa_frete_km: média, extremos e faixas de distância só do índice
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS %I ON %s (quilometragem, taxa_km)
+                 WHERE quilometragem > 0 AND taxa_km > 0',
+            'idx_documento_taxa_km' || v_sufixo, v_tabela
+        );
+
+        -- vw_distribuicao_viagens: viagens e km por veículo e mês
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS %I ON %s (id_veiculo, ano_mes) INCLUDE (quilometragem)
+                 WHERE quilometragem > 0',
+            'idx_documento_veiculo_ano_mes' || v_sufixo, v_tabela
+        );
+    END LOOP;
+END;
+$$;
+
+-- ano_fabricacao só aceita 4 dígitos (ck_veiculo_ano_fabricacao): o cast não falha
+ALTER TABLE core.veiculo
+    ADD COLUMN IF NOT EXISTS ano_fabricacao_int integer
+        GENERATED ALWAYS AS (ano_fabricacao::integer) STORED;
+
+-- vw_idade_frota: contagem e idade média por modelo só do índice
+CREATE INDEX IF NOT EXISTS idx_veiculo_modelo_ano
+    ON core.veiculo (modelo, ano_fabricacao_int, placa)
+    WHERE ano_fabricacao_int IS NOT NULL;
+
+COMMENT ON COLUMN cte.documento.taxa_km IS
+'Frete por quilômetro (valor_frete / quilometragem; NULL sem quilometragem). Coluna gerada.';
+
+COMMENT ON COLUMN cte.documento.ano_mes IS
+'Mês de emissão (AAAA-MM) no fuso do servidor na criação da coluna. Coluna gerada.';
+
+COMMENT ON COLUMN core.veiculo.ano_fabricacao_int IS
+'Ano de fabricação como inteiro. Coluna gerada.';
+
+ANALYZE cte.documento;
+ANALYZE core.veiculo;
@@ -0,0 +1,430 @@
+-- ============================================================================
+-- FUNÇÃO f_ingest_cte_batch - INGESTÃO DE CT-e EM LOTE (SET-BASED)
+-- ============================================================================
+-- Data: 2025-11-20
+-- Autor: Sistema SACT
+-- Descrição: Variante em lote de cte.f_ingest_cte_json. Recebe um array JSON
+--            com centenas de documentos (mesmo formato do payload individual,
+--            com o campo opcional "quilometragem") e faz o upsert de pessoas,
+--            endereços, veículos, documentos, cargas e documento_parte com
+--            instruções set-based, em uma única chamada.
+-- ============================================================================
+
+-- ============================================================================
+-- Conversão tolerante de timestamp (equivalente ao bloco EXCEPTION da
+-- função individual, mas utilizável dentro de um SELECT)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION cte.f_try_timestamptz(_valor text)
+RETURNS timestamptz
+LANGUAGE plpgsql
+STABLE
+AS $function$
+BEGIN
+  RETURN NULLIF(_valor, '')::timestamptz;
+EXCEPTION WHEN others THEN
+  RETURN NULL;
+END $function$;
+
+-- ============================================================================
+-- Mês de emissão contido na chave de acesso (posições 3-6, AAMM); usado
+-- quando o XML não traz dhEmi, pois cte.documento é particionada pela data
+-- (migrations/create_particionamento.sql)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION cte.f_data_emissao_chave(_chave text)
+RETURNS timestamptz
+LANGUAGE sql
+STABLE
+AS $function$
+  SELECT CASE
+           WHEN _chave ~ '^[0-9]{44}$' AND substr(_chave, 5, 2) BETWEEN '01' AND '12'
+           THEN make_date(2000 + substr(_chave, 3, 2)::integer,
+                          substr(_chave, 5, 2)::integer, 1)::timestamptz
+         END
+$function$;
+
+-- Chave de partição de cte.carga; nula em cargas gravadas antes desta versão
+ALTER TABLE cte.carga ADD COLUMN IF NOT EXISTS data_emissao timestamptz;
+
+-- ============================================================================
+-- Chaves únicas de deduplicação de endereços e de pessoas sem documento
+-- (mesmas regras de core.f_upsert_endereco e core.f_upsert_pessoa). Servem
+-- de alvo ao ON CONFLICT do lote, que assim não corre com outro worker, e
+-- de índice à resolução dos ids só para as chaves do lote.
+-- Duplicatas anteriores são consolidadas no menor id antes da criação
+-- ============================================================================
+DROP TABLE IF EXISTS pg_temp._endereco_duplicado;
+CREATE TEMP TABLE _endereco_duplicado AS
+SELECT e.id_endereco,
+       min(e.id_endereco) OVER (PARTITION BY COALESCE(e.logradouro, ''), COALESCE(e.numero, ''),
+                                             COALESCE(e.cep, ''), COALESCE(e.id_municipio, -1)) AS id_manter
+  FROM core.endereco e;
+DELETE FROM _endereco_duplicado WHERE id_endereco = id_manter;
+
+INSERT INTO core.pessoa_endereco (id_pessoa, id_endereco, tipo)
+SELECT pe.id_pessoa, d.id_manter, pe.tipo
+  FROM core.pessoa_endereco pe
+  JOIN _endereco_duplicado d ON d.id_endereco = pe.id_endereco
+ON CONFLICT (id_pessoa, id_endereco) DO NOTHING;
+
+DELETE FROM core.endereco e USING _endereco_duplicado d WHERE e.id_endereco = d.id_endereco;
+DROP TABLE _endereco_duplicado;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_endereco_dedup
+    ON core.endereco ((COALESCE(logradouro, '')), (COALESCE(numero, '')),
+                      (COALESCE(cep, '')), (COALESCE(id_municipio, -1)));
+
+DROP TABLE IF EXISTS pg_temp._pessoa_duplicada;
+CREATE TEMP TABLE _pessoa_duplicada AS
+SELECT p.id_pessoa, min(p.id_pessoa) OVER (PARTITION BY p.nome) AS id_manter
+  FROM core.pessoa p
+ WHERE p.cpf_cnpj IS NULL AND p.nome IS NOT NULL;
+DELETE FROM _pessoa_duplicada WHERE id_pessoa = id_manter;
+
+UPDATE cte.documento_parte dp
+   SET id_pessoa = d.id_manter
+  FROM _pessoa_duplicada d
+ WHERE dp.id_pessoa = d.id_pessoa;
+
+INSERT INTO core.pessoa_endereco (id_pessoa, id_endereco, tipo)
+SELECT d.id_manter, pe.id_endereco, pe.tipo
+  FROM core.pessoa_endereco pe
+  JOIN _pessoa_duplicada d ON d.id_pessoa = pe.id_pessoa
+ON CONFLICT (id_pessoa, id_endereco) DO NOTHING;
+
+DELETE FROM core.pessoa p USING _pessoa_duplicada d WHERE p.id_pessoa = d.id_pessoa;
+DROP TABLE _pessoa_duplicada;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_pessoa_nome_sem_documento
+    ON core.pessoa (nome) WHERE cpf_cnpj IS NULL;
+
+
+CREATE OR REPLACE FUNCTION cte.f_ingest_cte_batch(_payload jsonb)
+RETURNS TABLE (ordem integer, chave text, id_cte bigint, inserido boolean)
+LANGUAGE plpgsql
+AS $function$
+#variable_conflict use_column
+BEGIN
+  IF _payload IS NULL OR jsonb_typeof(_payload) <> 'array' THEN
+    RAISE EXCEPTION 'f_ingest_cte_batch espera um array JSON de documentos';
+  END IF;
+
+  -- ==========================================================================
+  -- 1. Documentos do lote
+  -- ==========================================================================
+  DROP TABLE IF EXISTS pg_temp._lote_cte;
+  CREATE TEMP TABLE _lote_cte ON COMMIT DROP AS
+  SELECT
+    e.ordem::integer                                   AS ordem,
+    e.doc->>'chave'                                    AS chave,
+    NULLIF(e.doc->>'numero', '')                       AS numero,
+    NULLIF(e.doc->>'serie', '')                        AS serie,
+    NULLIF(e.doc->>'cfop', '')                         AS cfop,
+    NULLIF(e.doc->>'valor_frete', '')::NUMERIC         AS valor_frete,
+    ROUND(NULLIF(e.doc->>'quilometragem', '')::NUMERIC)::INTEGER AS quilometragem,
+    COALESCE(cte.f_try_timestamptz(e.doc->>'data_emissao'),
+             cte.f_data_emissao_chave(e.doc->>'chave')) AS data_emissao,
+    NULLIF(e.doc->>'versao_schema', '')                AS versao_schema,
+    NULLIF(e.doc->>'origem_cidade', '')                AS origem_cidade,
+    NULLIF(upper(trim(e.doc->>'origem_uf')), '')       AS origem_uf,
+    NULLIF(e.doc->>'destino_cidade', '')               AS destino_cidade,
+    NULLIF(upper(trim(e.doc->>'destino_uf')), '')      AS destino_uf,
+    NULLIF(regexp_replace(upper(trim(e.doc->>'placa')), '[^A-Z0-9]', '', 'g'), '') AS placa,
+    e.doc->'carga'                                     AS carga,
+    NULL::INTEGER                                      AS id_municipio_origem,
+    NULL::INTEGER                                      AS id_municipio_destino,
+    NULL::BIGINT                                       AS id_veiculo,
+    NULL::BIGINT                                       AS id_cte,
+    NULL::BOOLEAN                                      AS inserido
+  FROM jsonb_array_elements(_payload) WITH ORDINALITY AS e(doc, ordem)
+  WHERE NULLIF(e.doc->>'chave', '') IS NOT NULL;
+
+  -- ==========================================================================
+  -- 2. Partes (remetente, destinatário, expedidor, recebedor) achatadas
+  -- ==========================================================================
+  DROP TABLE IF EXISTS pg_temp._lote_parte;
+  CREATE TEMP TABLE _lote_parte ON COMMIT DROP AS
+  SELECT
+    l.ordem,
+    t.tipo,
+    NULLIF(p.parte->>'nome', '')                                              AS nome,
+    NULLIF(regexp_replace(p.parte->>'documento', '[^0-9]', '', 'g'), '')      AS cpf_cnpj,
+    NULLIF(trim(p.parte->>'inscricao_estadual'), '')                          AS inscricao_estadual,
+    (p.parte->'endereco') IS NOT NULL
+      AND jsonb_typeof(p.parte->'endereco') = 'object'                        AS tem_endereco,
+    NULLIF(p.parte #>> '{endereco,xlgr}', '')                                 AS logradouro,
+    NULLIF(p.parte #>> '{endereco,nro}', '')                                  AS numero,
+    NULLIF(p.parte #>> '{endereco,xbairro}', '')                              AS bairro,
+    NULLIF(p.parte #>> '{endereco,cep}', '')                                  AS cep,
+    NULLIF(p.parte #>> '{endereco,xmun}', '')                                 AS cidade,
+    NULLIF(upper(trim(p.parte #>> '{endereco,uf}')), '')                      AS uf,
+    NULL::INTEGER                                                             AS id_municipio,
+    NULL::SMALLINT                                                            AS id_uf,
+    NULL::BIGINT                                                              AS id_pessoa,
+    NULL::BIGINT                                                              AS id_endereco
+  FROM jsonb_array_elements(_payload) WITH ORDINALITY AS e(doc, ordem)
+  JOIN _lote_cte l ON l.ordem = e.ordem
+  CROSS JOIN (VALUES ('remetente'), ('destinatario'), ('expedidor'), ('recebedor')) AS t(tipo)
+  CROSS JOIN LATERAL (SELECT e.doc->t.tipo AS parte) p
+  WHERE jsonb_typeof(p.parte) = 'object'
+    AND (NULLIF(p.parte->>'nome', '') IS NOT NULL
+         OR NULLIF(regexp_replace(p.parte->>'documento', '[^0-9]', '', 'g'), '') IS NOT NULL);
+
+  -- ==========================================================================
+  -- 3. Municípios: resolvidos uma única vez por par (cidade, UF) distinto
+  -- ==========================================================================
+  DROP TABLE IF EXISTS pg_temp._lote_municipio;
+  CREATE TEMP TABLE _lote_municipio ON COMMIT DROP AS
+  SELECT s.cidade, s.uf, ibge.f_resolve_municipio(s.cidade, s.uf) AS id_municipio
+  FROM (
+    SELECT origem_cidade, origem_uf FROM _lote_cte
+    UNION
+    SELECT destino_cidade, destino_uf FROM _lote_cte
+    UNION
+    SELECT cidade, uf FROM _lote_parte WHERE tem_endereco
+  ) AS s(cidade, uf)
+  WHERE s.cidade IS NOT NULL AND s.uf IS NOT NULL;
+
+  UPDATE _lote_cte l
+     SET id_municipio_origem = m.id_municipio
+    FROM _lote_municipio m
+   WHERE m.cidade = l.origem_cidade AND m.uf = l.origem_uf;
+
+  UPDATE _lote_cte l
+     SET id_municipio_destino = m.id_municipio
+    FROM _lote_municipio m
+   WHERE m.cidade = l.destino_cidade AND m.uf = l.destino_uf;
+
+  UPDATE _lote_parte p
+     SET id_municipio = m.id_municipio
+    FROM _lote_municipio m
+   WHERE p.tem_endereco AND m.cidade = p.cidade AND m.uf = p.uf;
+
+  UPDATE _lote_parte p
+     SET id_uf = u.id_uf
+    FROM ibge.uf u
+   WHERE p.tem_endereco AND u.sigla = p.uf;
+
+  -- ==========================================================================
+  -- 4. Veículos (placa normalizada, índice uq_veiculo_placa_norm)
+  -- ==========================================================================
+  INSERT INTO core.veiculo (placa, id_uf_licenciamento)
+  SELECT DISTINCT ON (l.placa) l.placa, u.id_uf
+    FROM _lote_cte l
+    LEFT JOIN ibge.uf u ON u.sigla = l.origem_uf
+   WHERE l.placa IS NOT NULL
+   ORDER BY l.placa, l.ordem DESC
+  ON CONFLICT ((regexp_replace(upper(placa), '[^A-Z0-9]'::text, ''::text, 'g'::text))) DO UPDATE
+     SET id_uf_licenciamento = COALESCE(EXCLUDED.id_uf_licenciamento, core.veiculo.id_uf_licenciamento);
+
+  UPDATE _lote_cte l
+     SET id_veiculo = v.id_veiculo
+    FROM core.veiculo v
+   WHERE l.placa IS NOT NULL
+     AND regexp_replace(upper(v.placa), '[^A-Z0-9]', '', 'g') = l.placa;
+
+  -- ==========================================================================
+  -- 5. Pessoas
+  -- ==========================================================================
+  -- Com documento: upsert pelo UNIQUE (cpf_cnpj)
+  INSERT INTO core.pessoa (nome, cpf_cnpj, inscricao_estadual)
+  SELECT DISTINCT ON (p.cpf_cnpj) p.nome, p.cpf_cnpj, p.inscricao_estadual
+    FROM _lote_parte p
+   WHERE p.cpf_cnpj IS NOT NULL
+   ORDER BY p.cpf_cnpj, (p.inscricao_estadual IS NULL), p.ordem DESC
+  ON CONFLICT (cpf_cnpj) DO UPDATE
+     SET nome = COALESCE(EXCLUDED.nome, core.pessoa.nome),
+         inscricao_estadual = COALESCE(NULLIF(trim(core.pessoa.inscricao_estadual), ''),
+                                       EXCLUDED.inscricao_estadual);
+
+  -- Sem documento: deduplicação por nome (mesma regra de core.f_upsert_pessoa,
+  -- índice uq_pessoa_nome_sem_documento)
+  INSERT INTO core.pessoa (nome)
+  SELECT DISTINCT p.nome
+    FROM _lote_parte p
+   WHERE p.cpf_cnpj IS NULL
+  ON CONFLICT (nome) WHERE cpf_cnpj IS NULL DO NOTHING;
+
+  UPDATE _lote_parte p
+     SET id_pessoa = x.id_pessoa
+    FROM core.pessoa x
+   WHERE p.cpf_cnpj IS NOT NULL AND x.cpf_cnpj = p.cpf_cnpj;
+
+  UPDATE _lote_parte p
+     SET id_pessoa = x.id_pessoa
+    FROM core.pessoa x
+   WHERE p.cpf_cnpj IS NULL AND x.cpf_cnpj IS NULL AND x.nome = p.nome;
+
+  -- ==========================================================================
+  -- 6. Endereços (deduplicação por logradouro, número, CEP e município,
+  --    índice uq_endereco_dedup)
+  -- ==========================================================================
+  INSERT INTO core.endereco (logradouro, numero, bairro, cep, id_municipio, id_uf)
+  SELECT DISTINCT ON (COALESCE(p.logradouro, ''), COALESCE(p.numero, ''),
+                      COALESCE(p.cep, ''), COALESCE(p.id_municipio, -1))
+         p.logradouro, p.numero, p.bairro, p.cep, p.id_municipio, p.id_uf
+    FROM _lote_parte p
+   WHERE p.tem_endereco
+     AND p.id_pessoa IS NOT NULL
+   ORDER BY COALESCE(p.logradouro, ''), COALESCE(p.numero, ''),
+            COALESCE(p.cep, ''), COALESCE(p.id_municipio, -1), p.ordem DESC
+  ON CONFLICT ((COALESCE(logradouro, '')), (COALESCE(numero, '')),
+               (COALESCE(cep, '')), (COALESCE(id_municipio, -1))) DO NOTHING;
+
+  UPDATE _lote_parte p
+     SET id_endereco = e.id_endereco
+    FROM core.endereco e
+   WHERE p.tem_endereco
+     AND COALESCE(e.logradouro, '') = COALESCE(p.logradouro, '')
+     AND COALESCE(e.numero, '') = COALESCE(p.numero, '')
+     AND COALESCE(e.cep, '') = COALESCE(p.cep, '')
+     AND COALESCE(e.id_municipio, -1) = COALESCE(p.id_municipio, -1);
+
+  INSERT INTO core.pessoa_endereco (id_pessoa, id_endereco, tipo)
+  SELECT DISTINCT p.id_pessoa, p.id_endereco, 'principal'
+    FROM _lote_parte p
+   WHERE p.id_pessoa IS NOT NULL AND p.id_endereco IS NOT NULL
+  ON CONFLICT (id_pessoa, id_endereco) DO NOTHING;
+
+  -- ==========================================================================
+  -- 7. Documentos (por chave; a última ocorrência no lote prevalece).
+  --    A chave é resolvida antes da escrita, como em f_ingest_cte_json: com a
+  --    tabela particionada o UNIQUE é (chave, data_emissao), e um ON CONFLICT
+  --    sozinho inseriria de novo a chave que chega com outra data de emissão
+  -- ==========================================================================
+  UPDATE _lote_cte l
+     SET id_cte = d.id_cte
+    FROM (SELECT DISTINCT ON (d.chave) d.chave, d.id_cte
+            FROM cte.documento d
+           WHERE d.chave IN (SELECT x.chave FROM _lote_cte x)
+           ORDER BY d.chave, d.id_cte) d
+   WHERE d.chave = l.chave;
+
+  UPDATE _lote_cte l SET inserido = (l.id_cte IS NULL);
+
+  -- Já gravados: atualização no lugar (nova data_emissao move a linha de partição)
+  WITH atualizados AS (
+    UPDATE cte.documento d
+       SET numero = COALESCE(l.numero, d.numero),
+           serie  = COALESCE(l.serie, d.serie),
+           data_emissao = COALESCE(l.data_emissao, d.data_emissao),
+           cfop   = COALESCE(l.cfop, d.cfop),
+           valor_frete = COALESCE(l.valor_frete, d.valor_frete),
+           quilometragem = CASE WHEN l.quilometragem > 0
+                                THEN l.quilometragem
+                                ELSE d.quilometragem END,
+           versao_schema = COALESCE(l.versao_schema, d.versao_schema),
+           id_municipio_origem = COALESCE(l.id_municipio_origem, d.id_municipio_origem),
+           id_municipio_destino = COALESCE(l.id_municipio_destino, d.id_municipio_destino),
+           id_veiculo = COALESCE(l.id_veiculo, d.id_veiculo)
+      FROM (SELECT DISTINCT ON (x.chave) x.*
+              FROM _lote_cte x
+             WHERE x.id_cte IS NOT NULL
+             ORDER BY x.chave, x.ordem DESC) l
+     WHERE d.id_cte = l.id_cte
+    RETURNING d.id_cte, d.data_emissao
+  )
+  UPDATE _lote_cte l
+     SET data_emissao = a.data_emissao
+    FROM atualizados a
+   WHERE a.id_cte = l.id_cte;
+
+  -- Novos: sem dhEmi nem chave de 44 dígitos, o mês corrente
+  -- (mesma regra de cte.f_data_particao). O ON CONFLICT cobre outro lote
+  -- que grave a mesma chave e data ao mesmo tempo
+  WITH upsert AS (
+    INSERT INTO cte.documento (chave, numero, serie, data_emissao, cfop, valor_frete,
+                               quilometragem, versao_schema, id_municipio_origem,
+                               id_municipio_destino, id_veiculo)
+    SELECT DISTINCT ON (l.chave)
+           l.chave, l.numero, l.serie,
+           COALESCE(l.data_emissao, date_trunc('month', now())),
+           l.cfop, l.valor_frete,
+           COALESCE(l.quilometragem, 0), l.versao_schema, l.id_municipio_origem,
+           l.id_municipio_destino, l.id_veiculo
+      FROM _lote_cte l
+     WHERE l.id_cte IS NULL
+     ORDER BY l.chave, l.ordem DESC
+    ON CONFLICT ON CONSTRAINT documento_chave_key DO UPDATE
+       SET numero = COALESCE(EXCLUDED.numero, cte.documento.numero),
+           serie  = COALESCE(EXCLUDED.serie, cte.documento.serie),
+           cfop   = COALESCE(EXCLUDED.cfop, cte.documento.cfop),
+           valor_frete = COALESCE(EXCLUDED.valor_frete, cte.documento.valor_frete),
+           quilometragem = CASE WHEN EXCLUDED.quilometragem > 0
+                                THEN EXCLUDED.quilometragem
+                                ELSE cte.documento.quilometragem END,
+           versao_schema = COALESCE(EXCLUDED.versao_schema, cte.documento.versao_schema),
+           id_municipio_origem = COALESCE(EXCLUDED.id_municipio_origem, cte.documento.id_municipio_origem),
+           id_municipio_destino = COALESCE(EXCLUDED.id_municipio_destino, cte.documento.id_municipio_destino),
+           id_veiculo = COALESCE(EXCLUDED.id_veiculo, cte.documento.id_veiculo)
+    RETURNING cte.documento.id_cte, cte.documento.chave, cte.documento.data_emissao
+  )
+  UPDATE _lote_cte l
+     SET id_cte = u.id_cte,
+         data_emissao = u.data_emissao
+    FROM upsert u
+   WHERE u.chave = l.chave;
+
+  -- ==========================================================================
+  -- 8. Cargas (com a data de emissão do documento, chave de partição)
+  -- ==========================================================================
+  INSERT INTO cte.carga (id_cte, data_emissao, valor, peso, quantidade,
+                         produto_predominante, unidade_medida)
+  SELECT DISTINCT ON (l.id_cte)
+         l.id_cte,
+         l.data_emissao,
+         NULLIF(l.carga->>'valor', '')::NUMERIC,
+         NULLIF(l.carga->>'peso', '')::NUMERIC,
+         NULLIF(l.carga->>'quantidade', '')::NUMERIC,
+         NULLIF(l.carga->>'produto_predominante', ''),
+         NULLIF(l.carga->>'unidade_medida', '')
+    FROM _lote_cte l
+   WHERE l.id_cte IS NOT NULL
+     AND jsonb_typeof(l.carga) = 'object'
+   ORDER BY l.id_cte, l.ordem DESC
+  ON CONFLICT ON CONSTRAINT carga_pkey DO UPDATE SET
+      valor = EXCLUDED.valor,
+      peso = EXCLUDED.peso,
+      quantidade = EXCLUDED.quantidade,
+      produto_predominante = EXCLUDED.produto_predominante,
+      unidade_medida = EXCLUDED.unidade_medida;
+
+  -- ==========================================================================
+  -- 9. Vínculos documento-parte
+  -- ==========================================================================
+  INSERT INTO cte.documento_parte (id_cte, tipo, id_pessoa)
+  SELECT DISTINCT ON (l.id_cte, p.tipo) l.id_cte, p.tipo, p.id_pessoa
+    FROM _lote_parte p
+    JOIN _lote_cte l ON l.ordem = p.ordem
+   WHERE l.id_cte IS NOT NULL AND p.id_pessoa IS NOT NULL
+   ORDER BY l.id_cte, p.tipo, p.ordem DESC
+  ON CONFLICT (id_cte, tipo) DO UPDATE SET id_pessoa = EXCLUDED.id_pessoa;
+
+  RETURN QUERY
+  SELECT l.ordem, l.chave, l.id_cte, l.inserido
+    FROM _lote_cte l
+   ORDER BY l.ordem;
+END $function$;
+
+-- ============================================================================
+-- COMENTÁRIOS
+-- ============================================================================
+COMMENT ON FUNCTION cte.f_try_timestamptz(text) IS
+'Converte texto em timestamptz retornando NULL em caso de formato inválido.';
+
+COMMENT ON FUNCTION cte.f_data_emissao_chave(text) IS
+'Primeiro dia do mês de emissão (AAMM da chave de acesso); NULL se a chave não tiver 44 dígitos.';
+
+COMMENT ON FUNCTION cte.f_ingest_cte_batch(jsonb) IS
+'Insere ou atualiza um lote de CT-e a partir de um array JSON (mesmo formato de
+cte.f_ingest_cte_json, mais o campo opcional "quilometragem"), com instruções
+set-based para:
+- Veículos, pessoas e endereços
+- Documentos (resolvidos por chave e atualizados no lugar) e cargas
+- Vínculos pessoa-endereco e documento-parte
+
+Documentos novos sem data de emissão recebem o mês da chave de acesso ou, com
+chave fora do padrão, o mês corrente; os já gravados mantêm a data atual.
+
+Retorna uma linha por elemento do array com a posição (ordem, 1-based), a chave,
+o id_cte gravado e se o documento foi inserido (true) ou atualizado (false).
+Elementos sem chave são ignorados.';
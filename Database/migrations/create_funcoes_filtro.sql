@@ -0,0 +1,626 @@
+-- ============================================================================
+-- FUNÇÕES DE ANALYTICS COM FILTROS (PERÍODO, UF, VEÍCULO, CLIENTE)
+-- ============================================================================
+-- Data: 2025-11-30
+-- Autor: Sistema SACT
+-- Descrição: Versões parametrizadas das views dos dashboards. Cada função
+--            retorna as mesmas colunas da view correspondente, calculadas
+--            só sobre os documentos que passam nos filtros:
+--
+--            p_data_inicio / p_data_fim  período de emissão (datas inclusivas)
+--            p_uf                        sigla da UF de origem OU de destino
+--            p_placa                     placa do veículo (com ou sem hífen)
+--            p_cliente                   CPF/CNPJ do remetente ou destinatário
+--
+--            Filtro NULL = sem restrição. Sem nenhum filtro os dashboards
+--            continuam lendo as views materializadas.
+--
+--            Todas são LANGUAGE sql STABLE e não STRICT: o PostgreSQL expande
+--            a função dentro da consulta e os parâmetros viram constantes.
+--            Os filtros NULL somem do plano e o período vira um intervalo
+--            sobre data_emissao, que descarta as partições mensais fora dele
+--            (migrations/create_particionamento.sql); placa e cliente usam os
+--            índices de core.veiculo e cte.documento_parte.
+--
+--            Aplicar DEPOIS de views/*.sql (mesmas colunas das views).
+--
+--            Ex.: SELECT * FROM analytics.f_receita_mensal('2025-01-01', '2025-06-30', 'SP', NULL, NULL);
+-- ============================================================================
+
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+
+-- ============================================================================
+-- Documentos filtrados (base de todas as funções)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_documentos_filtrados(
+    p_data_inicio date DEFAULT NULL,
+    p_data_fim    date DEFAULT NULL,
+    p_uf          text DEFAULT NULL,
+    p_placa       text DEFAULT NULL,
+    p_cliente     text DEFAULT NULL
+)
+RETURNS SETOF cte.documento
+LANGUAGE sql STABLE AS $$
+    SELECT d.*
+    FROM cte.documento d
+    -- Intervalo sobre a chave de partição (mesma regra de BackfillService.montar_filtro)
+    WHERE (p_data_inicio IS NULL OR d.data_emissao >= p_data_inicio)
+      AND (p_data_fim IS NULL OR d.data_emissao < p_data_fim + 1)
+      AND (p_uf IS NULL
+           OR d.id_municipio_origem IN (SELECT m.id_municipio FROM ibge.municipio m
+                                        JOIN ibge.uf u ON u.id_uf = m.id_uf
+                                        WHERE u.sigla = upper(p_uf))
+           OR d.id_municipio_destino IN (SELECT m.id_municipio FROM ibge.municipio m
+                                         JOIN ibge.uf u ON u.id_uf = m.id_uf
+                                         WHERE u.sigla = upper(p_uf)))
+      -- Placa normalizada como em uq_veiculo_placa_norm (usa o índice)
+      AND (p_placa IS NULL
+           OR d.id_veiculo IN (SELECT v.id_veiculo FROM core.veiculo v
+                               WHERE regexp_replace(upper(v.placa), '[^A-Z0-9]', '', 'g')
+                                   = regexp_replace(upper(p_placa), '[^A-Z0-9]', '', 'g')))
+      AND (p_cliente IS NULL
+           OR d.id_cte IN (SELECT dp.id_cte FROM cte.documento_parte dp
+                           JOIN core.pessoa p ON p.id_pessoa = dp.id_pessoa
+                           WHERE p.cpf_cnpj = regexp_replace(p_cliente, '[^0-9]', '', 'g')
+                             AND dp.tipo IN ('remetente', 'destinatario')))
+$$;
+
+COMMENT ON FUNCTION analytics.f_documentos_filtrados(date, date, text, text, text) IS
+'Documentos de cte.documento no período de emissão, UF (origem ou destino), placa e cliente informados; filtros NULL não restringem.';
+
+
+-- ============================================================================
+-- Rentabilidade e Custos (views/vw_rentabilidade_custos.sql)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_receita_mensal(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    ano integer, mes integer, ano_mes text, mes_nome text, total_ctes bigint,
+    receita_total numeric(15,2), receita_media numeric(10,2), receita_minima numeric(10,2),
+    receita_maxima numeric(10,2), km_total numeric(15,2), km_medio numeric(10,2),
+    receita_por_km numeric, receita_mes_anterior numeric
+)
+LANGUAGE sql STABLE AS $$
+    WITH receita_base AS (
+        SELECT
+            EXTRACT(YEAR FROM d.data_emissao)::integer as ano,
+            EXTRACT(MONTH FROM d.data_emissao)::integer as mes,
+            COUNT(*)::BIGINT as total_ctes,
+            SUM(d.valor_frete)::NUMERIC(15,2) as receita_total,
+            AVG(d.valor_frete)::NUMERIC(10,2) as receita_media,
+            MIN(d.valor_frete)::NUMERIC(10,2) as receita_minima,
+            MAX(d.valor_frete)::NUMERIC(10,2) as receita_maxima,
+            SUM(d.quilometragem)::NUMERIC(15,2) as km_total,
+            AVG(d.quilometragem)::NUMERIC(10,2) as km_medio,
+            CASE
+                WHEN SUM(d.quilometragem) > 0
+                THEN ROUND((SUM(d.valor_frete) / SUM(d.quilometragem))::NUMERIC, 2)
+                ELSE 0
+            END as receita_por_km
+        FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+        GROUP BY 1, 2
+    )
+    SELECT
+        r.ano,
+        r.mes,
+        TO_CHAR(make_date(r.ano, r.mes, 1), 'YYYY-MM'),
+        TO_CHAR(make_date(r.ano, r.mes, 1), 'TMMonth/YYYY'),
+        r.total_ctes, r.receita_total, r.receita_media, r.receita_minima, r.receita_maxima,
+        r.km_total, r.km_medio, r.receita_por_km,
+        LAG(r.receita_total) OVER (ORDER BY r.ano, r.mes)
+    FROM receita_base r
+    ORDER BY r.ano DESC, r.mes DESC
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_ticket_medio(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    total_viagens bigint, receita_total numeric(15,2), ticket_medio numeric(10,2),
+    ticket_mediano numeric(10,2), ticket_minimo numeric(10,2), ticket_maximo numeric(10,2),
+    desvio_padrao numeric(10,2), ate_100 bigint, de_101_a_500 bigint, de_501_a_1000 bigint,
+    de_1001_a_3000 bigint, acima_3000 bigint, ticket_medio_ate_100km numeric(10,2),
+    ticket_medio_101_300km numeric(10,2), ticket_medio_301_500km numeric(10,2),
+    ticket_medio_501_1000km numeric(10,2), ticket_medio_acima_1000km numeric(10,2),
+    ticket_p90 numeric(10,2)
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        COUNT(*),
+        SUM(valor_frete)::NUMERIC(15,2),
+        AVG(valor_frete)::NUMERIC(10,2),
+        -- Quantis exatos do recorte (a view usa os sketches do histórico todo)
+        (percentile_cont(0.5) WITHIN GROUP (ORDER BY valor_frete))::NUMERIC(10,2),
+        MIN(valor_frete)::NUMERIC(10,2),
+        MAX(valor_frete)::NUMERIC(10,2),
+        STDDEV(valor_frete)::NUMERIC(10,2),
+        SUM(CASE WHEN valor_frete <= 100 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN valor_frete > 100 AND valor_frete <= 500 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN valor_frete > 500 AND valor_frete <= 1000 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN valor_frete > 1000 AND valor_frete <= 3000 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN valor_frete > 3000 THEN 1 ELSE 0 END),
+        AVG(CASE WHEN quilometragem <= 100 THEN valor_frete END)::NUMERIC(10,2),
+        AVG(CASE WHEN quilometragem > 100 AND quilometragem <= 300 THEN valor_frete END)::NUMERIC(10,2),
+        AVG(CASE WHEN quilometragem > 300 AND quilometragem <= 500 THEN valor_frete END)::NUMERIC(10,2),
+        AVG(CASE WHEN quilometragem > 500 AND quilometragem <= 1000 THEN valor_frete END)::NUMERIC(10,2),
+        AVG(CASE WHEN quilometragem > 1000 THEN valor_frete END)::NUMERIC(10,2),
+        (percentile_cont(0.9) WITHIN GROUP (ORDER BY valor_frete))::NUMERIC(10,2)
+    FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente)
+    WHERE valor_frete > 0
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_margem_veiculo(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    placa text, total_viagens bigint, receita_total numeric(15,2), receita_media numeric(10,2),
+    km_total numeric(15,2), km_medio numeric(10,2), custo_estimado numeric(15,2),
+    margem_bruta numeric(15,2), margem_percentual numeric, receita_por_km numeric,
+    classificacao_rentabilidade text, primeira_viagem timestamptz, ultima_viagem timestamptz
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        m.placa, m.total_viagens, m.receita_total, m.receita_media, m.km_total, m.km_medio,
+        (m.km * 2.50)::NUMERIC(15,2),
+        (m.frete - (m.km * 2.50))::NUMERIC(15,2),
+        CASE WHEN m.frete > 0 THEN ROUND(((m.frete - (m.km * 2.50)) / m.frete * 100)::NUMERIC, 2) ELSE 0 END,
+        CASE WHEN m.km > 0 THEN ROUND((m.frete / m.km)::NUMERIC, 2) ELSE 0 END,
+        CASE
+            WHEN m.frete > 0 AND ((m.frete - (m.km * 2.50)) / m.frete * 100) >= 40 THEN '🔥 MUITO LUCRATIVO'
+            WHEN m.frete > 0 AND ((m.frete - (m.km * 2.50)) / m.frete * 100) >= 25 THEN '✅ LUCRATIVO'
+            WHEN m.frete > 0 AND ((m.frete - (m.km * 2.50)) / m.frete * 100) >= 10 THEN '⚠️ MARGEM BAIXA'
+            WHEN m.frete > 0 AND ((m.frete - (m.km * 2.50)) / m.frete * 100) >= 0 THEN '🔧 POUCO LUCRATIVO'
+            ELSE '❌ PREJUÍZO'
+        END,
+        m.primeira_viagem, m.ultima_viagem
+    FROM (
+        SELECT
+            v.placa,
+            COUNT(d.id_cte) as total_viagens,
+            SUM(d.valor_frete)::NUMERIC(15,2) as receita_total,
+            AVG(d.valor_frete)::NUMERIC(10,2) as receita_media,
+            SUM(d.quilometragem)::NUMERIC(15,2) as km_total,
+            AVG(d.quilometragem)::NUMERIC(10,2) as km_medio,
+            SUM(d.valor_frete) as frete,
+            SUM(d.quilometragem) as km,
+            MIN(d.data_emissao) as primeira_viagem,
+            MAX(d.data_emissao) as ultima_viagem
+        FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+        JOIN core.veiculo v ON v.id_veiculo = d.id_veiculo
+        WHERE v.placa IS NOT NULL
+        GROUP BY v.placa
+    ) m
+    ORDER BY 8 DESC
+$$;
+
+-- p_tipo: 'remetente' ou 'destinatario' (vw_faturamento_remetente/destinatario)
+CREATE OR REPLACE FUNCTION analytics.f_faturamento_cliente(
+    p_tipo text,
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    id_pessoa bigint, cliente text, documento text, total_ctes bigint,
+    faturamento_total numeric(15,2), ticket_medio numeric(10,2), menor_frete numeric(10,2),
+    maior_frete numeric(10,2), km_total numeric(15,2), km_medio numeric(10,2),
+    primeira_transacao timestamptz, ultima_transacao timestamptz, classificacao text
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        p.id_pessoa,
+        p.nome,
+        p.cpf_cnpj,
+        COUNT(*)::BIGINT,
+        SUM(d.valor_frete)::NUMERIC(15,2),
+        AVG(d.valor_frete)::NUMERIC(10,2),
+        MIN(d.valor_frete)::NUMERIC(10,2),
+        MAX(d.valor_frete)::NUMERIC(10,2),
+        SUM(d.quilometragem)::NUMERIC(15,2),
+        AVG(d.quilometragem)::NUMERIC(10,2),
+        MIN(d.data_emissao),
+        MAX(d.data_emissao),
+        CASE
+            WHEN COUNT(*) >= 100 THEN '⭐ VIP'
+            WHEN COUNT(*) >= 50 THEN '🔥 PREMIUM'
+            WHEN COUNT(*) >= 20 THEN '✅ REGULAR'
+            WHEN COUNT(*) >= 5 THEN '⚠️ OCASIONAL'
+            ELSE '💤 ESPORÁDICO'
+        END
+    FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+    JOIN cte.documento_parte dp ON dp.id_cte = d.id_cte AND dp.tipo = p_tipo
+    JOIN core.pessoa p ON p.id_pessoa = dp.id_pessoa
+    GROUP BY p.id_pessoa, p.nome, p.cpf_cnpj
+    ORDER BY 5 DESC
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_ranking_clientes(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    id_pessoa bigint, cliente text, documento text, tipo_cliente text, total_ctes bigint,
+    faturamento_total numeric(15,2), ticket_medio numeric(10,2), participacao_percentual numeric,
+    km_total numeric(15,2), primeira_transacao timestamptz, ultima_transacao timestamptz,
+    classificacao text, ranking bigint
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        f.id_pessoa, f.cliente, f.documento, 'remetente', f.total_ctes,
+        f.faturamento_total, f.ticket_medio,
+        -- Participação no faturamento do recorte
+        ROUND((f.faturamento_total / (
+            SELECT SUM(valor_frete)
+            FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente)
+        ) * 100)::NUMERIC, 2),
+        f.km_total, f.primeira_transacao, f.ultima_transacao, f.classificacao,
+        ROW_NUMBER() OVER (ORDER BY f.faturamento_total DESC)
+    FROM analytics.f_faturamento_cliente('remetente', p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) f
+    ORDER BY f.faturamento_total DESC
+    LIMIT 20
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_dashboard_financeiro(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    receita_total numeric, ticket_medio numeric(10,2), total_ctes bigint,
+    custo_estimado_total numeric, margem_bruta_total numeric, margem_percentual numeric,
+    total_clientes_remetentes bigint, total_clientes_destinatarios bigint,
+    receita_media_mensal numeric(15,2), melhor_mes text
+)
+LANGUAGE sql STABLE AS $$
+    WITH docs AS (
+        SELECT d.id_cte, d.valor_frete, d.quilometragem
+        FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+    ),
+    totais AS (
+        SELECT
+            SUM(valor_frete) as frete,
+            COUNT(valor_frete) as docs_frete,
+            COUNT(*) as docs,
+            SUM(quilometragem) as km,
+            COUNT(*) FILTER (WHERE quilometragem > 0) as docs_km,
+            SUM(valor_frete) FILTER (WHERE quilometragem > 0) as frete_km,
+            SUM(valor_frete) FILTER (WHERE quilometragem > 0 AND valor_frete > 0) as frete_taxa,
+            SUM(quilometragem) FILTER (WHERE quilometragem > 0 AND valor_frete > 0) as km_taxa,
+            COUNT(*) FILTER (WHERE quilometragem > 0 AND valor_frete > 0) as docs_taxa
+        FROM docs
+    ),
+    mensal AS (
+        SELECT r.mes_nome, r.receita_total
+        FROM analytics.f_receita_mensal(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) r
+    )
+    SELECT
+        CASE WHEN t.docs_frete > 0 THEN t.frete::NUMERIC(15,2) END,
+        (t.frete / NULLIF(t.docs_frete, 0))::NUMERIC(10,2),
+        t.docs,
+        CASE WHEN t.docs_km > 0 THEN t.km::NUMERIC(15,2) * 2.50 END,
+        CASE WHEN t.docs_km > 0 THEN (COALESCE(t.frete_km, 0) - (t.km * 2.50))::NUMERIC(15,2) END,
+        CASE WHEN t.docs_taxa > 0
+             THEN ROUND(((t.frete_taxa - (t.km_taxa * 2.50)) / NULLIF(t.frete_taxa, 0) * 100)::NUMERIC, 2)
+        END,
+        (SELECT COUNT(DISTINCT dp.id_pessoa) FROM docs x
+         JOIN cte.documento_parte dp ON dp.id_cte = x.id_cte AND dp.tipo = 'remetente'),
+        (SELECT COUNT(DISTINCT dp.id_pessoa) FROM docs x
+         JOIN cte.documento_parte dp ON dp.id_cte = x.id_cte AND dp.tipo = 'destinatario'),
+        (SELECT AVG(m.receita_total)::NUMERIC(15,2) FROM mensal m),
+        (SELECT m.mes_nome FROM mensal m ORDER BY m.receita_total DESC NULLS LAST LIMIT 1)
+    FROM totais t
+$$;
+
+
+-- ============================================================================
+-- Operação de Transporte (views/vw_operacao_transporte.sql)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_ctes_por_mes(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    ano integer, mes integer, ano_mes text, mes_nome text, total_ctes bigint,
+    receita_total numeric(15,2), frete_medio numeric(10,2),
+    primeira_emissao timestamptz, ultima_emissao timestamptz
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        r.ano, r.mes, r.ano_mes, r.mes_nome, r.total_ctes, r.receita_total, r.receita_media,
+        e.primeira_emissao, e.ultima_emissao
+    FROM analytics.f_receita_mensal(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) r
+    JOIN (
+        SELECT EXTRACT(YEAR FROM d.data_emissao)::integer as ano,
+               EXTRACT(MONTH FROM d.data_emissao)::integer as mes,
+               MIN(d.data_emissao) as primeira_emissao,
+               MAX(d.data_emissao) as ultima_emissao
+        FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+        GROUP BY 1, 2
+    ) e ON e.ano = r.ano AND e.mes = r.mes
+    ORDER BY r.ano DESC, r.mes DESC
+$$;
+
+-- p_sentido: 'origem' ou 'destino' (vw_top_origens/vw_top_destinos)
+CREATE OR REPLACE FUNCTION analytics.f_top_municipios(
+    p_sentido text,
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    municipio text, uf character(2), municipio_completo text, total_viagens bigint,
+    receita_total numeric(15,2), frete_medio numeric(10,2), distancia_media_km numeric,
+    veiculos_distintos bigint
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        m.nome,
+        uf.sigla,
+        CONCAT(m.nome, ' - ', uf.sigla),
+        COUNT(d.id_cte),
+        SUM(d.valor_frete)::NUMERIC(15,2),
+        AVG(d.valor_frete)::NUMERIC(10,2),
+        ROUND(AVG(d.quilometragem), 2),
+        COUNT(DISTINCT d.id_veiculo)
+    FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+    JOIN ibge.municipio m
+      ON m.id_municipio = CASE p_sentido WHEN 'origem' THEN d.id_municipio_origem
+                                         ELSE d.id_municipio_destino END
+    JOIN ibge.uf uf ON m.id_uf = uf.id_uf
+    GROUP BY m.nome, uf.sigla
+    ORDER BY 4 DESC
+    LIMIT 10
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_top_origens(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    municipio text, uf character(2), origem_completa text, total_viagens bigint,
+    receita_total numeric(15,2), frete_medio numeric(10,2), distancia_media_km numeric,
+    veiculos_distintos bigint
+)
+LANGUAGE sql STABLE AS $$
+    SELECT * FROM analytics.f_top_municipios('origem', p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente)
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_top_destinos(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    municipio text, uf character(2), destino_completo text, total_viagens bigint,
+    receita_total numeric(15,2), frete_medio numeric(10,2), distancia_media_km numeric,
+    veiculos_distintos bigint
+)
+LANGUAGE sql STABLE AS $$
+    SELECT * FROM analytics.f_top_municipios('destino', p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente)
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_distancia_media(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    total_viagens_com_km bigint, distancia_media_km numeric, distancia_minima_km numeric,
+    distancia_maxima_km numeric, mediana_km numeric, desvio_padrao_km numeric,
+    ate_100km bigint, de_101_a_300km bigint, de_301_a_500km bigint, de_501_a_1000km bigint,
+    acima_1000km bigint, p90_km numeric
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        COUNT(*),
+        ROUND(AVG(quilometragem)::NUMERIC, 2),
+        ROUND(MIN(quilometragem)::NUMERIC, 2),
+        ROUND(MAX(quilometragem)::NUMERIC, 2),
+        ROUND((percentile_cont(0.5) WITHIN GROUP (ORDER BY quilometragem))::NUMERIC, 2),
+        ROUND(STDDEV(quilometragem)::NUMERIC, 2),
+        SUM(CASE WHEN quilometragem <= 100 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN quilometragem > 100 AND quilometragem <= 300 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN quilometragem > 300 AND quilometragem <= 500 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN quilometragem > 500 AND quilometragem <= 1000 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN quilometragem > 1000 THEN 1 ELSE 0 END),
+        ROUND((percentile_cont(0.9) WITHIN GROUP (ORDER BY quilometragem))::NUMERIC, 2)
+    FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente)
+    WHERE quilometragem > 0
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_viagens_por_veiculo(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    placa text, total_viagens bigint, receita_total numeric(15,2),
+    frete_medio_por_viagem numeric(10,2), km_medio_por_viagem numeric,
+    km_total_percorrido numeric(12,2), primeira_viagem timestamptz, ultima_viagem timestamptz,
+    classificacao text
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        v.placa,
+        COUNT(d.id_cte),
+        SUM(d.valor_frete)::NUMERIC(15,2),
+        AVG(d.valor_frete)::NUMERIC(10,2),
+        ROUND(AVG(d.quilometragem)::NUMERIC, 2),
+        SUM(d.quilometragem)::NUMERIC(12,2),
+        MIN(d.data_emissao),
+        MAX(d.data_emissao),
+        CASE
+            WHEN COUNT(d.id_cte) >= 100 THEN '🔥 MUITO ATIVO'
+            WHEN COUNT(d.id_cte) >= 50 THEN '✅ ATIVO'
+            WHEN COUNT(d.id_cte) >= 20 THEN '⚠️ MODERADO'
+            ELSE '💤 BAIXA ATIVIDADE'
+        END
+    FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+    JOIN core.veiculo v ON v.id_veiculo = d.id_veiculo
+    WHERE v.placa IS NOT NULL
+    GROUP BY v.placa
+    ORDER BY 2 DESC
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_produtos_predominantes(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    produto text, total_ctes bigint, quantidade_total numeric(15,2), unidade_medida text,
+    peso_total_kg numeric(15,2), peso_medio_kg numeric(10,2), receita_total numeric(15,2),
+    frete_medio numeric(10,2), receita_por_kg numeric, classificacao text
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        COALESCE(c.produto_predominante, 'NÃO INFORMADO'),
+        COUNT(DISTINCT d.id_cte),
+        SUM(c.quantidade)::NUMERIC(15,2),
+        c.unidade_medida,
+        SUM(c.peso)::NUMERIC(15,2),
+        AVG(c.peso)::NUMERIC(10,2),
+        SUM(d.valor_frete)::NUMERIC(15,2),
+        AVG(d.valor_frete)::NUMERIC(10,2),
+        CASE WHEN SUM(c.peso) > 0 THEN ROUND(SUM(d.valor_frete) / SUM(c.peso), 2) ELSE 0 END,
+        CASE
+            WHEN COUNT(DISTINCT d.id_cte) >= 100 THEN '⭐ TOP PRODUTO'
+            WHEN COUNT(DISTINCT d.id_cte) >= 50 THEN '✅ REGULAR'
+            WHEN COUNT(DISTINCT d.id_cte) >= 20 THEN '⚠️ OCASIONAL'
+            ELSE '💤 RARO'
+        END
+    FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+    -- cte.carga também é particionada por data_emissao
+    LEFT JOIN cte.carga c ON c.id_cte = d.id_cte AND c.data_emissao = d.data_emissao
+    GROUP BY c.produto_predominante, c.unidade_medida
+    ORDER BY 2 DESC
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_taxa_frete_km(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    total_viagens bigint, taxa_media_por_km numeric, taxa_minima_por_km numeric,
+    taxa_maxima_por_km numeric, taxa_mediana_por_km numeric, taxa_ate_100km numeric,
+    taxa_101_300km numeric, taxa_301_500km numeric, taxa_501_1000km numeric,
+    taxa_acima_1000km numeric, taxa_p90_por_km numeric
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        COUNT(*),
+        ROUND(AVG(taxa_km)::NUMERIC, 2),
+        ROUND(MIN(taxa_km)::NUMERIC, 2),
+        ROUND(MAX(taxa_km)::NUMERIC, 2),
+        ROUND((percentile_cont(0.5) WITHIN GROUP (ORDER BY taxa_km))::NUMERIC, 2),
+        ROUND(AVG(CASE WHEN quilometragem <= 100 THEN taxa_km END)::NUMERIC, 2),
+        ROUND(AVG(CASE WHEN quilometragem > 100 AND quilometragem <= 300 THEN taxa_km END)::NUMERIC, 2),
+        ROUND(AVG(CASE WHEN quilometragem > 300 AND quilometragem <= 500 THEN taxa_km END)::NUMERIC, 2),
+        ROUND(AVG(CASE WHEN quilometragem > 500 AND quilometragem <= 1000 THEN taxa_km END)::NUMERIC, 2),
+        ROUND(AVG(CASE WHEN quilometragem > 1000 THEN taxa_km END)::NUMERIC, 2),
+        ROUND((percentile_cont(0.9) WITHIN GROUP (ORDER BY taxa_km))::NUMERIC, 2)
+    FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente)
+    WHERE quilometragem > 0 AND taxa_km > 0
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_dashboard_operacao(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    total_ctes bigint, total_veiculos bigint, total_origens bigint, total_destinos bigint,
+    receita_total numeric, frete_medio numeric(10,2), km_medio numeric, km_total numeric,
+    taxa_media_km numeric, primeira_data timestamptz, ultima_data timestamptz,
+    produto_mais_transportado text
+)
+LANGUAGE sql STABLE AS $$
+    WITH docs AS (
+        SELECT d.*
+        FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+    )
+    SELECT
+        COUNT(*),
+        COUNT(DISTINCT id_veiculo),
+        COUNT(DISTINCT id_municipio_origem),
+        COUNT(DISTINCT id_municipio_destino),
+        CASE WHEN COUNT(valor_frete) > 0 THEN SUM(valor_frete)::NUMERIC(15,2) END,
+        AVG(valor_frete)::NUMERIC(10,2),
+        ROUND(AVG(quilometragem) FILTER (WHERE quilometragem > 0)::NUMERIC, 2),
+        (SUM(quilometragem) FILTER (WHERE quilometragem > 0))::NUMERIC(15,2),
+        ROUND(AVG(taxa_km) FILTER (WHERE quilometragem > 0 AND taxa_km > 0), 2),
+        MIN(data_emissao),
+        MAX(data_emissao),
+        (SELECT c.produto_predominante
+         FROM docs x
+         JOIN cte.carga c ON c.id_cte = x.id_cte AND c.data_emissao = x.data_emissao
+         WHERE c.produto_predominante IS NOT NULL
+         GROUP BY c.produto_predominante
+         ORDER BY COUNT(*) DESC, c.produto_predominante
+         LIMIT 1)
+    FROM docs
+$$;
+
+
+-- ============================================================================
+-- Frota e Utilização (views/vw_frota_utilizacao.sql)
+-- Viagens = documentos com veículo e quilometragem > 0 (como analytics.veiculo_uso)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_uso_veiculo(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    placa text, tipo text, ano_fabricacao integer, total_viagens bigint, km_total bigint,
+    km_medio_viagem numeric, faturamento_total numeric, receita_por_km numeric
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        v.placa,
+        v.modelo,
+        v.ano_fabricacao_int,
+        COUNT(*),
+        SUM(d.quilometragem)::BIGINT,
+        ROUND(SUM(d.quilometragem)::NUMERIC / COUNT(*), 2),
+        COALESCE(SUM(d.valor_frete), 0),
+        ROUND(COALESCE(SUM(d.valor_frete) / NULLIF(SUM(d.quilometragem), 0), 0), 2)
+    FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+    JOIN core.veiculo v ON v.id_veiculo = d.id_veiculo
+    WHERE d.quilometragem > 0
+    GROUP BY v.id_veiculo, v.placa, v.modelo, v.ano_fabricacao_int
+    ORDER BY 5 DESC
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_distribuicao_viagens(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (placa text, tipo text, mes_ano text, total_viagens bigint, km_mes bigint)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        v.placa,
+        v.modelo,
+        d.ano_mes,
+        COUNT(d.id_cte),
+        COALESCE(SUM(d.quilometragem), 0)
+    FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+    JOIN core.veiculo v ON v.id_veiculo = d.id_veiculo
+    WHERE d.quilometragem > 0
+    GROUP BY v.placa, v.modelo, d.ano_mes
+    ORDER BY v.placa, 3 DESC
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_dashboard_frota(
+    p_data_inicio date DEFAULT NULL, p_data_fim date DEFAULT NULL,
+    p_uf text DEFAULT NULL, p_placa text DEFAULT NULL, p_cliente text DEFAULT NULL
+)
+RETURNS TABLE (
+    total_veiculos bigint, total_viagens bigint, km_total_frota bigint, faturamento_total numeric
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        COUNT(DISTINCT v.placa),
+        COUNT(*),
+        COALESCE(SUM(d.quilometragem), 0)::BIGINT,
+        COALESCE(SUM(d.valor_frete), 0)::NUMERIC
+    FROM analytics.f_documentos_filtrados(p_data_inicio, p_data_fim, p_uf, p_placa, p_cliente) d
+    JOIN core.veiculo v ON v.id_veiculo = d.id_veiculo
+    WHERE d.quilometragem > 0
+$$;
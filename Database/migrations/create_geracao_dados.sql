@@ -0,0 +1,44 @@
+-- ============================================================================
+-- GERAÇÃO DOS DADOS (INVALIDAÇÃO DO CACHE DOS DASHBOARDS)
+-- ============================================================================
+-- Data: 2025-11-29
+-- Autor: Sistema SACT
+-- Descrição: Contador monotônico da "geração" dos dados analíticos. O ETL
+--            incrementa o contador depois de cada lote confirmado e o
+--            orquestrador depois de atualizar as views materializadas; o
+--            cache de consultas do Streamlit (Streamlit/utils/cache_consultas.py)
+--            descarta os resultados de gerações anteriores.
+--
+--            O contador é uma sequence: nextval não trava nem participa da
+--            transação, então cargas paralelas não disputam uma linha. Por
+--            isso o incremento é feito DEPOIS do commit (um incremento
+--            dentro da transação ficaria visível antes dos dados).
+--
+--            Ex.: SELECT analytics.f_geracao_dados();
+-- ============================================================================
+
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+CREATE SEQUENCE IF NOT EXISTS analytics.geracao_dados AS bigint;
+
+-- Geração atual (0 antes do primeiro incremento)
+CREATE OR REPLACE FUNCTION analytics.f_geracao_dados()
+RETURNS bigint
+LANGUAGE sql STABLE AS $$
+    SELECT COALESCE(pg_sequence_last_value('analytics.geracao_dados'), 0);
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_geracao_dados_incrementar()
+RETURNS bigint
+LANGUAGE sql AS $$
+    SELECT nextval('analytics.geracao_dados');
+$$;
+
+COMMENT ON SEQUENCE analytics.geracao_dados IS
+'Geração dos dados analíticos; incrementada após cada carga confirmada e atualização de views.';
+
+COMMENT ON FUNCTION analytics.f_geracao_dados() IS
+'Geração atual dos dados (0 se nunca incrementada). Lida pelo cache de consultas do Streamlit.';
+
+COMMENT ON FUNCTION analytics.f_geracao_dados_incrementar() IS
+'Incrementa a geração dos dados. Chamar fora da transação de carga, após o commit.';
@@ -0,0 +1,98 @@
+-- ============================================================================
+-- ÍNDICE ESPACIAL DOS MUNICÍPIOS (CAIXA + RAIO)
+-- ============================================================================
+-- Data: 2025-11-26
+-- Autor: Sistema SACT
+-- Descrição: Filtragem por região no banco sem varrer ibge.municipio com
+--            trigonometria. A caixa de latitude/longitude usa o índice
+--            (latitude, longitude); a distância haversine só é calculada
+--            para os municípios dentro da caixa. Espelha o
+--            IndiceEspacialService (Database/services/indice_espacial_service.py).
+--
+--            Ex.: CT-e com origem a até 150 km de Teresina
+--              SELECT d.*
+--              FROM ibge.f_municipios_no_raio_municipio(2211001, 150) r
+--              JOIN cte.documento d ON d.id_municipio_origem = r.id_municipio;
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_municipio_lat_lon
+    ON ibge.municipio USING btree (latitude, longitude);
+
+
+-- ============================================================================
+-- Municípios dentro de uma caixa de latitude/longitude (inclusive)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION ibge.f_municipios_na_caixa(
+    p_lat_min  float8,
+    p_lat_max  float8,
+    p_lon_min  float8,
+    p_lon_max  float8
+)
+RETURNS TABLE (id_municipio integer, latitude float8, longitude float8)
+LANGUAGE sql STABLE PARALLEL SAFE AS $$
+    -- Limites convertidos para numeric: comparar a coluna com float8
+    -- converteria a coluna e impediria o uso do índice
+    SELECT m.id_municipio, m.latitude::float8, m.longitude::float8
+    FROM ibge.municipio m
+    WHERE m.latitude BETWEEN p_lat_min::numeric AND p_lat_max::numeric
+      AND m.longitude BETWEEN p_lon_min::numeric AND p_lon_max::numeric
+$$;
+
+
+-- ============================================================================
+-- Municípios a até p_raio_km de um ponto (caixa + haversine)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION ibge.f_municipios_no_raio(
+    p_latitude   float8,
+    p_longitude  float8,
+    p_raio_km    float8
+)
+RETURNS TABLE (id_municipio integer, distancia_km float8)
+LANGUAGE sql STABLE PARALLEL SAFE AS $$
+    WITH caixa AS (
+        -- 111.195 km por grau de latitude (raio médio 6371.0088 km)
+        SELECT p_raio_km / 111.19508 AS delta_lat,
+               CASE WHEN cos(radians(least(abs(p_latitude) + p_raio_km / 111.19508, 90))) < 1e-6
+                    THEN 180
+                    ELSE least(180, p_raio_km / (111.19508 *
+                         cos(radians(least(abs(p_latitude) + p_raio_km / 111.19508, 90)))))
+               END AS delta_lon
+    )
+    SELECT c.id_municipio, h.km
+    FROM caixa
+    CROSS JOIN LATERAL ibge.f_municipios_na_caixa(
+        p_latitude - caixa.delta_lat, p_latitude + caixa.delta_lat,
+        p_longitude - caixa.delta_lon, p_longitude + caixa.delta_lon
+    ) c
+    CROSS JOIN LATERAL (
+        SELECT 2 * 6371.0088 * asin(sqrt(least(1,
+                   sin(radians(c.latitude - p_latitude) / 2) ^ 2 +
+                   cos(radians(p_latitude)) * cos(radians(c.latitude)) *
+                   sin(radians(c.longitude - p_longitude) / 2) ^ 2))) AS km
+    ) h
+    WHERE h.km <= p_raio_km
+    ORDER BY h.km, c.id_municipio
+$$;
+
+CREATE OR REPLACE FUNCTION ibge.f_municipios_no_raio_municipio(
+    p_id_municipio  integer,
+    p_raio_km       float8
+)
+RETURNS TABLE (id_municipio integer, distancia_km float8)
+LANGUAGE sql STABLE PARALLEL SAFE AS $$
+    SELECT r.id_municipio, r.distancia_km
+    FROM ibge.municipio m
+    CROSS JOIN LATERAL ibge.f_municipios_no_raio(m.latitude::float8, m.longitude::float8, p_raio_km) r
+    WHERE m.id_municipio = p_id_municipio
+      AND m.latitude IS NOT NULL
+      AND m.longitude IS NOT NULL
+$$;
+
+COMMENT ON FUNCTION ibge.f_municipios_na_caixa(float8, float8, float8, float8) IS
+'Municípios dentro da caixa de latitude/longitude (usa idx_municipio_lat_lon).';
+
+COMMENT ON FUNCTION ibge.f_municipios_no_raio(float8, float8, float8) IS
+'Municípios a até p_raio_km do ponto (pré-filtro por caixa indexada + haversine), ordenados pela distância.';
+
+COMMENT ON FUNCTION ibge.f_municipios_no_raio_municipio(integer, float8) IS
+'Municípios a até p_raio_km de outro município (incluindo ele mesmo).';
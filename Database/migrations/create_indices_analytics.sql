@@ -0,0 +1,73 @@
+-- ============================================================================
+-- ÍNDICES DE APOIO ÀS VIEWS DE ANALYTICS
+-- ============================================================================
+-- Data: 2025-11-28
+-- Autor: Sistema SACT
+-- Descrição: Caminhos de acesso usados pelas views de analytics (e pelo
+--            recálculo dos agregados mensais): período de emissão, veículo
+--            por período, participante por tipo, CPF/CNPJ, placa e
+--            município por UF. Índices cobertos por um índice composto
+--            novo são removidos para não pagar escrita dupla no ETL.
+--
+--            Medir antes/depois:
+--              python migrations/benchmark_indices.py --escala 10
+-- ============================================================================
+
+-- Período de emissão: o btree idx_cte_documento_data_emissao (estrutura.sql)
+-- e a poda de partições já atendem; um BRIN na mesma coluna só custaria
+-- escrita no ETL. Remove o BRIN de versões anteriores desta migration.
+DROP INDEX IF EXISTS cte.idx_documento_data_emissao_brin;
+
+-- Viagens de um veículo por período (vw_distribuicao_viagens, vw_tempo_parada,
+-- recálculo por veículo); o prefixo id_veiculo substitui idx_documento_veiculo
+CREATE INDEX IF NOT EXISTS idx_documento_veiculo_data
+    ON cte.documento USING btree (id_veiculo, data_emissao);
+DROP INDEX IF EXISTS cte.idx_documento_veiculo;
+
+-- Participante por tipo (vw_faturamento_*, vw_ranking_clientes, agregados
+-- por cliente); o prefixo id_pessoa substitui idx_cte_parte_pessoa
+CREATE INDEX IF NOT EXISTS idx_documento_parte_pessoa_tipo
+    ON cte.documento_parte USING btree (id_pessoa, tipo);
+DROP INDEX IF EXISTS cte.idx_cte_parte_pessoa;
+
+-- Município por UF e nome normalizado (busca de endereço do ETL, filtros por UF)
+CREATE INDEX IF NOT EXISTS idx_municipio_uf_nome_norm
+    ON ibge.municipio USING btree (id_uf, nome_normalizado);
+
+-- CPF/CNPJ e placa únicos (estrutura.sql já cria as constraints; aqui só
+-- para bancos em que elas não existam)
+DO $$
+DECLARE
+    v_indice text[];
+BEGIN
+    FOREACH v_indice SLICE 1 IN ARRAY ARRAY[
+        ['core.pessoa', 'cpf_cnpj', 'uq_pessoa_cpf_cnpj'],
+        ['core.veiculo', 'placa', 'uq_veiculo_placa']
+    ] LOOP
+        IF NOT EXISTS (
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = v_indice[1]::regclass
+              AND i.indisunique AND i.indnkeyatts = 1
+              AND i.indpred IS NULL AND i.indexprs IS NULL
+              AND a.attname = v_indice[2]
+        ) THEN
+            EXECUTE format('CREATE UNIQUE INDEX %I ON %s (%I)', v_indice[3], v_indice[1], v_indice[2]);
+        END IF;
+    END LOOP;
+END;
+$$;
+
+ANALYZE cte.documento;
+ANALYZE cte.documento_parte;
+ANALYZE ibge.municipio;
+
+COMMENT ON INDEX cte.idx_documento_veiculo_data IS
+'Viagens de um veículo ordenadas por emissão.';
+
+COMMENT ON INDEX cte.idx_documento_parte_pessoa_tipo IS
+'Documentos de um participante por tipo (remetente, destinatário...).';
+
+COMMENT ON INDEX ibge.idx_municipio_uf_nome_norm IS
+'Municípios de uma UF por nome normalizado.';
@@ -0,0 +1,49 @@
+-- ============================================================================
+-- MANIFESTO DE INGESTÃO - CONTROLE DE PROGRESSO RETOMÁVEL
+-- ============================================================================
+-- Data: 2025-11-21
+-- Autor: Sistema SACT
+-- Descrição: Registra cada arquivo XML visto pelo ETL (caminho, tamanho,
+--            mtime, sha256, chave, status, classe do erro e execução).
+--            Permite que uma execução interrompida seja retomada pulando os
+--            arquivos concluídos, que falhas sejam reprocessadas isoladamente
+--            (--retry-failed) e que execuções concorrentes reivindiquem
+--            arquivos sem processar o mesmo arquivo duas vezes.
+-- ============================================================================
+
+CREATE SCHEMA IF NOT EXISTS staging;
+
+CREATE TABLE IF NOT EXISTS staging.ingestao_manifesto (
+    caminho        text PRIMARY KEY,
+    tamanho        bigint,
+    mtime          timestamptz,
+    sha256         text,
+    chave          text,
+    status         text NOT NULL DEFAULT 'pendente'
+                   CHECK (status IN ('pendente', 'processando', 'concluido', 'erro')),
+    classe_erro    text,
+    mensagem_erro  text,
+    id_execucao    text,
+    tentativas     integer NOT NULL DEFAULT 0,
+    created_at     timestamptz NOT NULL DEFAULT now(),
+    updated_at     timestamptz NOT NULL DEFAULT now()
+);
+
+-- Consultas de retomada e --retry-failed filtram por status
+CREATE INDEX IF NOT EXISTS idx_ingestao_manifesto_status
+    ON staging.ingestao_manifesto USING btree (status);
+
+CREATE INDEX IF NOT EXISTS idx_ingestao_manifesto_chave
+    ON staging.ingestao_manifesto USING btree (chave);
+
+CREATE INDEX IF NOT EXISTS idx_ingestao_manifesto_execucao
+    ON staging.ingestao_manifesto USING btree (id_execucao);
+
+DROP TRIGGER IF EXISTS tgr_ingestao_manifesto_updated_at ON staging.ingestao_manifesto;
+CREATE TRIGGER tgr_ingestao_manifesto_updated_at
+    BEFORE UPDATE ON staging.ingestao_manifesto
+    FOR EACH ROW EXECUTE FUNCTION ibge.trigger_set_updated_at();
+
+COMMENT ON TABLE staging.ingestao_manifesto IS
+'Manifesto de ingestão: um registro por arquivo XML com status
+(pendente, processando, concluido, erro), checksum e execução responsável.';
@@ -0,0 +1,43 @@
+-- ============================================================================
+-- INGESTÃO DISTRIBUÍDA - SHARDS E WORKERS
+-- ============================================================================
+-- Data: 2025-11-22
+-- Autor: Sistema SACT
+-- Descrição: Coordena N workers de ingestão (em uma ou mais máquinas) sobre o
+--            mesmo conjunto de arquivos. Os arquivos são divididos em shards
+--            pelo hash do nome; cada shard é reivindicado por um worker com
+--            SELECT ... FOR UPDATE SKIP LOCKED e mantido por heartbeat.
+--            Shards sem heartbeat dentro do lease são redistribuídos.
+--            Requer create_ingestao_manifesto.sql.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS staging.ingestao_worker (
+    id_worker    text PRIMARY KEY,
+    host         text,
+    pid          integer,
+    iniciado_em  timestamptz NOT NULL DEFAULT now(),
+    heartbeat    timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS staging.ingestao_shard (
+    shard            integer PRIMARY KEY CHECK (shard >= 0),
+    id_worker        text,
+    heartbeat        timestamptz,
+    reivindicado_em  timestamptz
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingestao_shard_worker
+    ON staging.ingestao_shard USING btree (id_worker);
+
+-- 64 shards: permite redistribuir trabalho entre até 64 workers
+INSERT INTO staging.ingestao_shard (shard)
+SELECT generate_series(0, 63)
+ON CONFLICT (shard) DO NOTHING;
+
+COMMENT ON TABLE staging.ingestao_worker IS
+'Workers de ingestão ativos; heartbeat define quais contam na divisão de shards.';
+
+COMMENT ON TABLE staging.ingestao_shard IS
+'Shards de arquivos (crc32 do nome do arquivo módulo total de shards) e o
+worker que os detém. Shards com heartbeat vencido são reivindicados por
+outros workers.';
@@ -0,0 +1,238 @@
+-- ============================================================================
+-- VIEWS MATERIALIZADAS: CONTROLE DE ATUALIZAÇÃO
+-- ============================================================================
+-- Data: 2025-11-27
+-- Autor: Sistema SACT
+-- Descrição: Infraestrutura das views analíticas materializadas
+--            (views/*.sql). Triggers por comando registram quais tabelas de
+--            origem mudaram em cada transação; o orquestrador
+--            (Database/views/orquestrador_views.py) consome esse registro,
+--            marca como pendentes só as views que dependem delas e executa
+--            REFRESH MATERIALIZED VIEW CONCURRENTLY em ordem de dependência.
+--            Duração e defasagem de cada atualização ficam registradas.
+--
+--            Aplicar ANTES de views/vw_*.sql (que usam f_remover_view).
+--
+--            Ex.: situação das views
+--              SELECT * FROM analytics.vw_mv_status ORDER BY defasagem DESC NULLS LAST;
+-- ============================================================================
+
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+
+-- ============================================================================
+-- Registro de alterações nas tabelas de origem (uma linha por tabela e transação)
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS analytics.mv_fonte_alteracao (
+    tabela        text        NOT NULL,
+    id_transacao  xid8        NOT NULL,
+    alterado_em   timestamptz NOT NULL DEFAULT clock_timestamp(),
+    PRIMARY KEY (tabela, id_transacao)
+);
+
+CREATE OR REPLACE FUNCTION analytics.f_trg_mv_fonte_alterada()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Chave por transação: transações concorrentes não disputam a mesma linha
+    INSERT INTO analytics.mv_fonte_alteracao (tabela, id_transacao)
+    VALUES (TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME, pg_current_xact_id())
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+    v_tabela text;
+BEGIN
+    FOREACH v_tabela IN ARRAY ARRAY[
+        'cte.documento', 'cte.carga', 'cte.documento_parte',
+        'core.veiculo', 'core.pessoa', 'ibge.municipio', 'ibge.uf',
+        -- Agregados de create_agg_mensal.sql (se já aplicada)
+        'analytics.agg_mensal', 'analytics.agg_cliente_mensal'
+    ] LOOP
+        CONTINUE WHEN to_regclass(v_tabela) IS NULL;
+        EXECUTE format('DROP TRIGGER IF EXISTS tgr_mv_fonte_alterada ON %s', v_tabela);
+        EXECUTE format(
+            'CREATE TRIGGER tgr_mv_fonte_alterada
+                 AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s
+                 FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_mv_fonte_alterada()',
+            v_tabela
+        );
+    END LOOP;
+END;
+$$;
+
+
+-- ============================================================================
+-- Situação de cada view materializada e histórico das atualizações
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS analytics.mv_controle (
+    nome_view           text PRIMARY KEY,
+    pendente            boolean     NOT NULL DEFAULT false,
+    pendente_desde      timestamptz,
+    ultima_atualizacao  timestamptz,
+    duracao_ms          numeric(12,1)
+);
+
+CREATE TABLE IF NOT EXISTS analytics.mv_atualizacao_log (
+    id_atualizacao  bigserial PRIMARY KEY,
+    nome_view       text        NOT NULL,
+    iniciado_em     timestamptz NOT NULL,
+    duracao_ms      numeric(12,1),
+    defasagem       interval,
+    concorrente     boolean     NOT NULL,
+    sucesso         boolean     NOT NULL,
+    erro            text
+);
+
+CREATE INDEX IF NOT EXISTS idx_mv_atualizacao_log_view
+    ON analytics.mv_atualizacao_log (nome_view, iniciado_em DESC);
+
+
+-- ============================================================================
+-- Dependências das views materializadas de analytics (transitivas, através
+-- de views comuns): tabelas de origem e outras views materializadas
+-- ============================================================================
+CREATE OR REPLACE VIEW analytics.vw_mv_dependencias AS
+WITH RECURSIVE diretas AS (
+    SELECT DISTINCT r.ev_class AS dependente, d.refobjid AS dependencia
+    FROM pg_rewrite r
+    JOIN pg_depend d ON d.classid = 'pg_rewrite'::regclass
+                    AND d.objid = r.oid
+                    AND d.refclassid = 'pg_class'::regclass
+    WHERE d.refobjid <> r.ev_class
+),
+fechamento AS (
+    SELECT c.oid AS view_oid, di.dependencia
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN diretas di ON di.dependente = c.oid
+    WHERE c.relkind = 'm' AND n.nspname = 'analytics'
+    UNION
+    SELECT f.view_oid, di.dependencia
+    FROM fechamento f
+    JOIN pg_class c ON c.oid = f.dependencia AND c.relkind IN ('v', 'm')
+    JOIN diretas di ON di.dependente = f.dependencia
+)
+SELECT vn.nspname || '.' || v.relname AS nome_view,
+       dn.nspname || '.' || dc.relname AS dependencia,
+       CASE dc.relkind WHEN 'm' THEN 'view_materializada' ELSE 'tabela' END AS tipo
+FROM fechamento f
+JOIN pg_class v ON v.oid = f.view_oid
+JOIN pg_namespace vn ON vn.oid = v.relnamespace
+JOIN pg_class dc ON dc.oid = f.dependencia AND dc.relkind IN ('r', 'p', 'm')
+JOIN pg_namespace dn ON dn.oid = dc.relnamespace;
+
+CREATE OR REPLACE VIEW analytics.vw_mv_status AS
+SELECT c.nome_view,
+       c.pendente OR l.desde IS NOT NULL AS desatualizada,
+       c.ultima_atualizacao,
+       c.duracao_ms,
+       -- Tempo desde a alteração mais antiga ainda não refletida na view
+       now() - LEAST(c.pendente_desde, l.desde) AS defasagem,
+       EXISTS (
+           SELECT 1
+           FROM pg_index i
+           WHERE i.indrelid = to_regclass(c.nome_view)
+             AND i.indisunique AND i.indpred IS NULL AND i.indexprs IS NULL
+       ) AS concorrente
+FROM analytics.mv_controle c
+LEFT JOIN LATERAL (
+    SELECT min(a.alterado_em) AS desde
+    FROM analytics.mv_fonte_alteracao a
+    JOIN analytics.vw_mv_dependencias d ON d.dependencia = a.tabela
+    WHERE d.nome_view = c.nome_view
+) l ON true;
+
+
+-- ============================================================================
+-- Consome o registro de alterações e marca as views afetadas como pendentes
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_mv_marcar_pendentes()
+RETURNS SETOF text
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Views criadas (já populadas) ou removidas desde a última execução
+    INSERT INTO analytics.mv_controle (nome_view, ultima_atualizacao)
+    SELECT n.nspname || '.' || c.relname, now()
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind = 'm' AND n.nspname = 'analytics'
+    ON CONFLICT (nome_view) DO NOTHING;
+
+    DELETE FROM analytics.mv_controle c
+    WHERE to_regclass(c.nome_view) IS NULL;
+
+    -- Só remove alterações já confirmadas; as demais ficam para a próxima vez
+    WITH consumidas AS (
+        DELETE FROM analytics.mv_fonte_alteracao
+        RETURNING tabela, alterado_em
+    ),
+    afetadas AS (
+        SELECT d.nome_view, min(co.alterado_em) AS desde
+        FROM consumidas co
+        JOIN analytics.vw_mv_dependencias d ON d.dependencia = co.tabela
+        GROUP BY d.nome_view
+    )
+    UPDATE analytics.mv_controle c
+    SET pendente = true,
+        pendente_desde = LEAST(c.pendente_desde, a.desde)
+    FROM afetadas a
+    WHERE c.nome_view = a.nome_view;
+
+    RETURN QUERY
+    SELECT c.nome_view FROM analytics.mv_controle c WHERE c.pendente ORDER BY 1;
+END;
+$$;
+
+
+-- ============================================================================
+-- Remove uma view comum ou materializada (para recriar com outro tipo).
+-- Sem CASCADE: views dependentes precisam ser removidas antes, para que
+-- nenhuma desapareça sem ser recriada pelo mesmo script
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_remover_view(p_nome text)
+RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_oid      regclass := to_regclass(p_nome);
+    v_tipo     "char";
+    v_detalhe  text;
+BEGIN
+    SELECT c.relkind INTO v_tipo FROM pg_class c WHERE c.oid = v_oid;
+    IF v_tipo = 'v' THEN
+        EXECUTE format('DROP VIEW %s', v_oid);
+    ELSIF v_tipo = 'm' THEN
+        EXECUTE format('DROP MATERIALIZED VIEW %s', v_oid);
+    END IF;
+EXCEPTION WHEN dependent_objects_still_exist THEN
+    GET STACKED DIAGNOSTICS v_detalhe = PG_EXCEPTION_DETAIL;
+    RAISE EXCEPTION 'A view % tem objetos dependentes e não foi removida', v_oid
+        USING ERRCODE = 'dependent_objects_still_exist',
+              DETAIL = v_detalhe,
+              HINT = 'Remova as views dependentes antes com analytics.f_remover_view e recrie-as em seguida.';
+END;
+$$;
+
+COMMENT ON TABLE analytics.mv_fonte_alteracao IS
+'Tabelas de origem alteradas por transação (tgr_mv_fonte_alterada), ainda não consumidas pelo orquestrador.';
+
+COMMENT ON TABLE analytics.mv_controle IS
+'Situação de cada view materializada de analytics: pendente de atualização, desde quando e última atualização.';
+
+COMMENT ON TABLE analytics.mv_atualizacao_log IS
+'Histórico das atualizações das views materializadas (duração, defasagem no momento da atualização e erros).';
+
+COMMENT ON VIEW analytics.vw_mv_dependencias IS
+'Tabelas e views materializadas das quais cada view materializada de analytics depende (transitivamente).';
+
+COMMENT ON VIEW analytics.vw_mv_status IS
+'Defasagem e última atualização de cada view materializada de analytics.';
+
+COMMENT ON FUNCTION analytics.f_mv_marcar_pendentes() IS
+'Consome analytics.mv_fonte_alteracao, marca como pendentes as views afetadas e retorna todas as pendentes.';
+
+COMMENT ON FUNCTION analytics.f_remover_view(text) IS
+'Remove a view comum ou materializada informada, se existir; falha se houver objetos dependentes (sem CASCADE).';
@@ -0,0 +1,629 @@
+-- ============================================================================
+-- PARTICIONAMENTO MENSAL DE cte.documento E cte.carga
+-- ============================================================================
+-- Data: 2025-11-28
+-- Autor: Sistema SACT
+-- Descrição: Particionamento declarativo por intervalo (RANGE) de
+--            cte.documento e cte.carga pelo mês de data_emissao. Consultas
+--            com filtro de intervalo em data_emissao (>= início, < fim) leem
+--            só as partições dos meses envolvidos, e meses antigos podem ser
+--            desanexados e arquivados sem DELETE em massa.
+--
+--            Esta migration não altera os dados: cria as tabelas
+--            particionadas ao lado das atuais (cte.documento_particionado e
+--            cte.carga_particionada), as partições dos meses existentes e
+--            triggers que replicam nelas cada alteração feita nas tabelas
+--            atuais. A migração é concluída pelo ParticaoManager
+--            (main.py --particionar):
+--              1. migrar: copia os documentos e cargas existentes em lotes
+--                 por id_cte, em transações curtas (retomável);
+--              2. trocar: numa transação curta, renomeia as tabelas atuais
+--                 para *_legado/*_legada e as particionadas para
+--                 cte.documento/cte.carga, move triggers e sequência e
+--                 recria as views que dependiam das tabelas.
+--
+--            Restrições do particionamento no PostgreSQL:
+--            - PRIMARY KEY/UNIQUE precisam conter a chave de partição:
+--              (id_cte, data_emissao) e (chave, data_emissao);
+--            - data_emissao passa a ser NOT NULL: documentos sem data recebem
+--              o mês da chave de acesso (cte.f_data_emissao_chave) e, na
+--              cópia dos dados antigos, em último caso o mês de created_at;
+--            - cte.carga ganha data_emissao e referencia (id_cte, data_emissao)
+--              com ON UPDATE CASCADE;
+--            - cte.documento_parte não pode referenciar só id_cte: a
+--              integridade passa a ser feita por triggers (remoção em cascata
+--              e verificação do documento na inclusão).
+--
+--            Requer create_f_ingest_cte_batch.sql (cte.f_data_emissao_chave).
+--
+--            Ex.: partições existentes
+--              SELECT * FROM cte.vw_particoes ORDER BY tabela, mes;
+-- ============================================================================
+
+-- Chave de partição de cte.carga (também criada por create_f_ingest_cte_batch.sql)
+ALTER TABLE cte.carga ADD COLUMN IF NOT EXISTS data_emissao timestamptz;
+
+
+-- ============================================================================
+-- Data usada como chave de partição dos documentos gravados sem data
+-- ============================================================================
+CREATE OR REPLACE FUNCTION cte.f_data_particao(
+    p_data_emissao timestamptz,
+    p_chave        text,
+    p_created_at   timestamptz
+)
+RETURNS timestamptz
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(p_data_emissao,
+                    cte.f_data_emissao_chave(p_chave),
+                    date_trunc('month', p_created_at));
+$$;
+
+
+-- ============================================================================
+-- Tabelas particionadas (criadas ao lado das atuais até a troca)
+-- ============================================================================
+DO $$
+DECLARE
+    v_indice text;
+    v_coluna text;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'cte.documento'::regclass) = 'p' THEN
+        RAISE NOTICE 'cte.documento já é particionada';
+        RETURN;
+    END IF;
+
+    CREATE TABLE IF NOT EXISTS cte.documento_particionado (
+        id_cte               bigint NOT NULL DEFAULT nextval('cte.documento_id_cte_seq'::regclass),
+        chave                text,
+        numero               text,
+        serie                text,
+        data_emissao         timestamptz NOT NULL,
+        cfop                 text,
+        valor_frete          numeric(18,2),
+        versao_schema        text,
+        id_municipio_origem  integer,
+        id_municipio_destino integer,
+        id_veiculo           bigint,
+        created_at           timestamptz NOT NULL DEFAULT now(),
+        updated_at           timestamptz NOT NULL DEFAULT now(),
+        quilometragem        integer NOT NULL DEFAULT 0,
+        -- Sufixo _part removido na troca (nomes de índice são únicos no schema)
+        CONSTRAINT documento_pkey_part PRIMARY KEY (id_cte, data_emissao),
+        CONSTRAINT documento_chave_key_part UNIQUE (chave, data_emissao),
+        CONSTRAINT documento_id_municipio_origem_fkey
+            FOREIGN KEY (id_municipio_origem) REFERENCES ibge.municipio(id_municipio),
+        CONSTRAINT documento_id_municipio_destino_fkey
+            FOREIGN KEY (id_municipio_destino) REFERENCES ibge.municipio(id_municipio),
+        CONSTRAINT documento_id_veiculo_fkey
+            FOREIGN KEY (id_veiculo) REFERENCES core.veiculo(id_veiculo)
+    ) PARTITION BY RANGE (data_emissao);
+
+    CREATE TABLE IF NOT EXISTS cte.carga_particionada (
+        id_cte               bigint NOT NULL,
+        valor                numeric(18,2),
+        peso                 numeric(18,3),
+        quantidade           numeric(18,3),
+        produto_predominante text,
+        unidade_medida       text,
+        data_emissao         timestamptz NOT NULL,
+        CONSTRAINT carga_pkey_part PRIMARY KEY (id_cte, data_emissao),
+        CONSTRAINT carga_id_cte_fkey
+            FOREIGN KEY (id_cte, data_emissao) REFERENCES cte.documento_particionado (id_cte, data_emissao)
+            ON UPDATE CASCADE ON DELETE CASCADE
+    ) PARTITION BY RANGE (data_emissao);
+
+    -- Colunas geradas de cte.documento (create_colunas_geradas.sql, se já aplicada)
+    FOR v_coluna IN
+        SELECT format(
+                   'ALTER TABLE cte.documento_particionado ADD COLUMN IF NOT EXISTS %I %s
+                        GENERATED ALWAYS AS (%s) STORED',
+                   a.attname, format_type(a.atttypid, a.atttypmod), pg_get_expr(ad.adbin, ad.adrelid)
+               )
+        FROM pg_attribute a
+        JOIN pg_attrdef ad ON ad.adrelid = a.attrelid AND ad.adnum = a.attnum
+        WHERE a.attrelid = 'cte.documento'::regclass
+          AND a.attgenerated = 's'
+          AND NOT a.attisdropped
+        ORDER BY a.attnum
+    LOOP
+        EXECUTE v_coluna;
+    END LOOP;
+
+    -- Mesmos índices secundários de cte.documento (particionados)
+    FOR v_indice IN
+        SELECT regexp_replace(
+                   pg_get_indexdef(i.indexrelid),
+                   '^CREATE (UNIQUE )?INDEX (\S+) ON cte\.documento ',
+                   'CREATE \1INDEX IF NOT EXISTS \2_part ON cte.documento_particionado '
+               )
+        FROM pg_index i
+        LEFT JOIN pg_constraint c ON c.conindid = i.indexrelid
+        WHERE i.indrelid = 'cte.documento'::regclass
+          AND c.oid IS NULL
+    LOOP
+        EXECUTE v_indice;
+    END LOOP;
+END;
+$$;
+
+-- Progresso da cópia em lotes (ParticaoManager.migrar)
+CREATE TABLE IF NOT EXISTS cte.particionamento_progresso (
+    tabela         text PRIMARY KEY,
+    ultimo_id      bigint      NOT NULL DEFAULT 0,
+    linhas         bigint      NOT NULL DEFAULT 0,
+    atualizado_em  timestamptz NOT NULL DEFAULT now()
+);
+
+
+-- ============================================================================
+-- Tabelas particionadas em uso: as de destino durante a migração, as
+-- definitivas depois da troca; NULL se o particionamento não foi aplicado
+-- ============================================================================
+CREATE OR REPLACE FUNCTION cte.f_particao_tabelas(OUT documento regclass, OUT carga regclass)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    IF to_regclass('cte.documento_particionado') IS NOT NULL THEN
+        documento := 'cte.documento_particionado'::regclass;
+        carga := 'cte.carga_particionada'::regclass;
+    ELSIF (SELECT relkind FROM pg_class WHERE oid = to_regclass('cte.documento')) = 'p' THEN
+        documento := 'cte.documento'::regclass;
+        carga := 'cte.carga'::regclass;
+    END IF;
+END;
+$$;
+
+
+-- ============================================================================
+-- Criação das partições mensais (cte.documento_pAAAA_MM e cte.carga_pAAAA_MM)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION cte.f_garantir_particao(p_mes date)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_inicio   date := date_trunc('month', p_mes)::date;
+    v_fim      date := (date_trunc('month', p_mes) + interval '1 month')::date;
+    v_sufixo   text := to_char(p_mes, '"p"YYYY_MM');
+    v_tabelas  record;
+    v_pai      regclass;
+    v_nome     text;
+    v_criadas  integer := 0;
+BEGIN
+    IF to_regclass('cte.documento_' || v_sufixo) IS NOT NULL
+       AND to_regclass('cte.carga_' || v_sufixo) IS NOT NULL THEN
+        RETURN 0;
+    END IF;
+
+    SELECT * INTO v_tabelas FROM cte.f_particao_tabelas();
+    IF v_tabelas.documento IS NULL THEN
+        RAISE EXCEPTION 'cte.documento não é particionada (aplique migrations/create_particionamento.sql)';
+    END IF;
+
+    -- Processos de ETL concorrentes podem pedir o mesmo mês
+    PERFORM pg_advisory_xact_lock(hashtext('cte.f_garantir_particao'));
+
+    -- Documento antes da carga (a partição da carga referencia a do documento)
+    FOREACH v_pai IN ARRAY ARRAY[v_tabelas.documento, v_tabelas.carga] LOOP
+        v_nome := CASE WHEN v_pai = v_tabelas.documento THEN 'documento_' ELSE 'carga_' END || v_sufixo;
+        CONTINUE WHEN to_regclass('cte.' || v_nome) IS NOT NULL;
+        EXECUTE format(
+            'CREATE TABLE cte.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+            v_nome, v_pai, v_inicio::timestamptz, v_fim::timestamptz
+        );
+        v_criadas := v_criadas + 1;
+    END LOOP;
+    RETURN v_criadas;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION cte.f_garantir_particoes(p_inicio date, p_fim date)
+RETURNS integer
+LANGUAGE sql AS $$
+    SELECT COALESCE(sum(cte.f_garantir_particao(m::date)), 0)::integer
+    FROM generate_series(date_trunc('month', p_inicio), date_trunc('month', p_fim),
+                         interval '1 month') AS m;
+$$;
+
+CREATE OR REPLACE VIEW cte.vw_particoes AS
+SELECT pai.relname AS tabela,
+       to_date(substring(c.relname FROM 'p(\d{4}_\d{2})$'), 'YYYY_MM') AS mes,
+       c.oid::regclass AS particao,
+       pg_get_expr(c.relpartbound, c.oid) AS limites,
+       GREATEST(c.reltuples, 0)::bigint AS linhas_estimadas,
+       pg_total_relation_size(c.oid) AS tamanho_bytes
+FROM pg_inherits h
+JOIN pg_class c ON c.oid = h.inhrelid
+JOIN pg_class pai ON pai.oid = h.inhparent
+JOIN pg_namespace n ON n.oid = pai.relnamespace
+WHERE n.nspname = 'cte'
+  AND pai.relkind = 'p'
+  AND pai.relname IN ('documento', 'carga', 'documento_particionado', 'carga_particionada');
+
+
+-- ============================================================================
+-- Réplica das alterações nas tabelas atuais durante a migração
+-- (com a cópia em lotes travando as linhas lidas com FOR SHARE, a versão
+-- mais recente de cada linha sempre prevalece)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION cte.f_trg_particionamento_documento()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM cte.documento_particionado WHERE id_cte = OLD.id_cte;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        UPDATE cte.documento_particionado
+           SET id_cte = NEW.id_cte,
+               chave = NEW.chave,
+               numero = NEW.numero,
+               serie = NEW.serie,
+               data_emissao = cte.f_data_particao(NEW.data_emissao, NEW.chave, NEW.created_at),
+               cfop = NEW.cfop,
+               valor_frete = NEW.valor_frete,
+               versao_schema = NEW.versao_schema,
+               id_municipio_origem = NEW.id_municipio_origem,
+               id_municipio_destino = NEW.id_municipio_destino,
+               id_veiculo = NEW.id_veiculo,
+               created_at = NEW.created_at,
+               updated_at = NEW.updated_at,
+               quilometragem = NEW.quilometragem
+         WHERE id_cte = OLD.id_cte;
+        IF FOUND THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    -- Documento ainda não copiado
+    INSERT INTO cte.documento_particionado (
+        id_cte, chave, numero, serie, data_emissao, cfop, valor_frete, versao_schema,
+        id_municipio_origem, id_municipio_destino, id_veiculo, created_at, updated_at,
+        quilometragem
+    ) VALUES (
+        NEW.id_cte, NEW.chave, NEW.numero, NEW.serie,
+        cte.f_data_particao(NEW.data_emissao, NEW.chave, NEW.created_at),
+        NEW.cfop, NEW.valor_frete, NEW.versao_schema, NEW.id_municipio_origem,
+        NEW.id_municipio_destino, NEW.id_veiculo, NEW.created_at, NEW.updated_at,
+        NEW.quilometragem
+    )
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION cte.f_trg_particionamento_carga()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM cte.carga_particionada WHERE id_cte = OLD.id_cte;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        UPDATE cte.carga_particionada
+           SET valor = NEW.valor,
+               peso = NEW.peso,
+               quantidade = NEW.quantidade,
+               produto_predominante = NEW.produto_predominante,
+               unidade_medida = NEW.unidade_medida
+         WHERE id_cte = OLD.id_cte;
+        IF FOUND THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    -- Sem o documento já copiado, a carga fica para a cópia em lotes
+    INSERT INTO cte.carga_particionada (
+        id_cte, valor, peso, quantidade, produto_predominante, unidade_medida, data_emissao
+    )
+    SELECT NEW.id_cte, NEW.valor, NEW.peso, NEW.quantidade, NEW.produto_predominante,
+           NEW.unidade_medida, d.data_emissao
+    FROM cte.documento_particionado d
+    WHERE d.id_cte = NEW.id_cte
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$;
+
+DO $$
+BEGIN
+    IF to_regclass('cte.documento_particionado') IS NULL THEN
+        RETURN;
+    END IF;
+
+    DROP TRIGGER IF EXISTS tgr_particionamento_documento ON cte.documento;
+    CREATE TRIGGER tgr_particionamento_documento
+        AFTER INSERT OR UPDATE OR DELETE ON cte.documento
+        FOR EACH ROW EXECUTE FUNCTION cte.f_trg_particionamento_documento();
+
+    DROP TRIGGER IF EXISTS tgr_particionamento_carga ON cte.carga;
+    CREATE TRIGGER tgr_particionamento_carga
+        AFTER INSERT OR UPDATE OR DELETE ON cte.carga
+        FOR EACH ROW EXECUTE FUNCTION cte.f_trg_particionamento_carga();
+
+    -- Partições dos meses já presentes (e das alterações em andamento)
+    PERFORM cte.f_garantir_particao(m)
+    FROM (
+        SELECT DISTINCT date_trunc('month', cte.f_data_particao(data_emissao, chave, created_at))::date AS m
+        FROM cte.documento
+        UNION
+        SELECT date_trunc('month', now())::date
+    ) meses;
+END;
+$$;
+
+
+-- ============================================================================
+-- Integridade de cte.documento_parte depois da troca (sem FK para id_cte)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION cte.f_trg_documento_parte_remover()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM cte.documento_parte p
+    USING (SELECT DISTINCT id_cte FROM antigos) a
+    WHERE p.id_cte = a.id_cte;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION cte.f_trg_documento_parte_documento()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM cte.documento d WHERE d.id_cte = NEW.id_cte) THEN
+        RAISE EXCEPTION 'documento % não existe em cte.documento', NEW.id_cte
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+
+-- ============================================================================
+-- Troca das tabelas (chamada por ParticaoManager.trocar depois da cópia)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION cte.f_particionamento_trocar()
+RETURNS TABLE (objeto text, acao text)
+LANGUAGE plpgsql
+SET search_path = pg_catalog
+AS $$
+DECLARE
+    v_tabelas  regclass[] := ARRAY['cte.documento'::regclass, 'cte.carga'::regclass];
+    v_faltando bigint;
+    v_sem_data bigint;
+    v_item     record;
+    v_indice   text;
+BEGIN
+    IF to_regclass('cte.documento_particionado') IS NULL THEN
+        RAISE EXCEPTION 'Nada a trocar: cte.documento_particionado não existe';
+    END IF;
+
+    LOCK TABLE cte.documento, cte.carga, cte.documento_parte,
+               cte.documento_particionado, cte.carga_particionada
+        IN ACCESS EXCLUSIVE MODE;
+
+    SELECT (SELECT count(*) FROM cte.documento) - (SELECT count(*) FROM cte.documento_particionado)
+         + (SELECT count(*) FROM cte.carga) - (SELECT count(*) FROM cte.carga_particionada)
+      INTO v_faltando;
+    IF v_faltando <> 0 THEN
+        RAISE EXCEPTION 'Cópia incompleta (% linhas de diferença): execute a migração antes da troca', v_faltando;
+    END IF;
+    SELECT count(*) INTO v_sem_data FROM cte.documento WHERE data_emissao IS NULL;
+
+    -- Views que dependem (transitivamente) das tabelas, com nível de dependência
+    CREATE TEMP TABLE _dependentes ON COMMIT DROP AS
+    WITH RECURSIVE diretas AS (
+        SELECT DISTINCT r.ev_class AS dependente, d.refobjid AS dependencia
+        FROM pg_rewrite r
+        JOIN pg_depend d ON d.classid = 'pg_rewrite'::regclass
+                        AND d.objid = r.oid
+                        AND d.refclassid = 'pg_class'::regclass
+        WHERE d.refobjid <> r.ev_class
+    ),
+    arvore AS (
+        SELECT di.dependente, 1 AS nivel
+        FROM diretas di
+        WHERE di.dependencia = ANY (v_tabelas)
+        UNION ALL
+        SELECT di.dependente, a.nivel + 1
+        FROM arvore a
+        JOIN diretas di ON di.dependencia = a.dependente
+    )
+    SELECT c.oid::regclass::text AS nome,
+           c.relkind AS tipo,
+           max(a.nivel) AS nivel,
+           pg_get_viewdef(c.oid) AS definicao,
+           obj_description(c.oid, 'pg_class') AS comentario,
+           ARRAY(SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i
+                 WHERE i.indrelid = c.oid ORDER BY i.indexrelid) AS indices
+    FROM arvore a
+    JOIN pg_class c ON c.oid = a.dependente
+    GROUP BY c.oid;
+
+    -- Triggers das tabelas atuais, exceto os de réplica
+    CREATE TEMP TABLE _triggers ON COMMIT DROP AS
+    SELECT t.tgname::text AS nome, t.tgrelid::regclass::text AS tabela,
+           pg_get_triggerdef(t.oid) AS definicao
+    FROM pg_trigger t
+    WHERE t.tgrelid = ANY (v_tabelas)
+      AND NOT t.tgisinternal
+      AND t.tgname NOT IN ('tgr_particionamento_documento', 'tgr_particionamento_carga');
+
+    FOR v_item IN SELECT * FROM _dependentes ORDER BY nivel DESC, nome LOOP
+        EXECUTE format('DROP %s %s',
+                       CASE v_item.tipo WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END,
+                       v_item.nome);
+    END LOOP;
+
+    DROP TRIGGER tgr_particionamento_documento ON cte.documento;
+    DROP TRIGGER tgr_particionamento_carga ON cte.carga;
+    FOR v_item IN SELECT * FROM _triggers LOOP
+        EXECUTE format('DROP TRIGGER %I ON %s', v_item.nome, v_item.tabela);
+    END LOOP;
+
+    ALTER TABLE cte.documento_parte DROP CONSTRAINT IF EXISTS documento_parte_id_cte_fkey;
+
+    -- Nomes: atuais com sufixo _legado, particionadas com os nomes originais
+    FOR v_item IN
+        SELECT i.indexrelid::regclass AS indice, c.relname AS nome
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = ANY (v_tabelas)
+    LOOP
+        EXECUTE format('ALTER INDEX %s RENAME TO %I', v_item.indice, left(v_item.nome, 56) || '_legado');
+    END LOOP;
+    ALTER TABLE cte.documento RENAME TO documento_legado;
+    ALTER TABLE cte.carga RENAME TO carga_legada;
+
+    FOR v_item IN
+        SELECT i.indexrelid::regclass AS indice, c.relname AS nome
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid IN ('cte.documento_particionado'::regclass, 'cte.carga_particionada'::regclass)
+          AND c.relname LIKE '%\_part'
+    LOOP
+        EXECUTE format('ALTER INDEX %s RENAME TO %I', v_item.indice, left(v_item.nome, -5));
+    END LOOP;
+    ALTER TABLE cte.documento_particionado RENAME TO documento;
+    ALTER TABLE cte.carga_particionada RENAME TO carga;
+    ALTER SEQUENCE cte.documento_id_cte_seq OWNED BY cte.documento.id_cte;
+    RETURN QUERY SELECT 'cte.documento'::text, 'particionada'::text;
+
+    -- Triggers (a definição capturada já cita cte.documento/cte.carga)
+    FOR v_item IN SELECT * FROM _triggers LOOP
+        EXECUTE v_item.definicao;
+        RETURN QUERY SELECT v_item.nome, 'trigger recriado'::text;
+    END LOOP;
+
+    CREATE TRIGGER tgr_documento_parte_remover
+        AFTER DELETE ON cte.documento
+        REFERENCING OLD TABLE AS antigos
+        FOR EACH STATEMENT EXECUTE FUNCTION cte.f_trg_documento_parte_remover();
+    CREATE TRIGGER tgr_documento_parte_documento
+        BEFORE INSERT OR UPDATE OF id_cte ON cte.documento_parte
+        FOR EACH ROW EXECUTE FUNCTION cte.f_trg_documento_parte_documento();
+
+    FOR v_item IN SELECT * FROM _dependentes ORDER BY nivel, nome LOOP
+        EXECUTE format('CREATE %s %s AS %s',
+                       CASE v_item.tipo WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END,
+                       v_item.nome, rtrim(v_item.definicao, ';'));
+        FOR v_indice IN SELECT unnest(v_item.indices) LOOP
+            EXECUTE v_indice;
+        END LOOP;
+        IF v_item.comentario IS NOT NULL THEN
+            EXECUTE format('COMMENT ON %s %s IS %L',
+                           CASE v_item.tipo WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END,
+                           v_item.nome, v_item.comentario);
+        END IF;
+        RETURN QUERY SELECT v_item.nome, 'view recriada'::text;
+    END LOOP;
+
+    -- Documentos sem data ganharam um mês: agregados e sketches refeitos
+    IF v_sem_data > 0 THEN
+        IF to_regprocedure('analytics.f_agg_reconstruir()') IS NOT NULL THEN
+            PERFORM analytics.f_agg_reconstruir();
+            RETURN QUERY SELECT 'analytics.agg_mensal'::text, 'reconstruído'::text;
+        END IF;
+        IF to_regprocedure('analytics.f_sketch_reconstruir()') IS NOT NULL THEN
+            PERFORM analytics.f_sketch_reconstruir();
+            RETURN QUERY SELECT 'analytics.sketch_quantil'::text, 'reconstruído'::text;
+        END IF;
+        IF to_regprocedure('analytics.f_viagem_reconstruir()') IS NOT NULL THEN
+            PERFORM analytics.f_viagem_reconstruir();
+            RETURN QUERY SELECT 'analytics.viagem'::text, 'reconstruído'::text;
+        END IF;
+    END IF;
+END;
+$$;
+
+
+-- ============================================================================
+-- Remoção de uma partição já exportada (ParticaoManager.arquivar)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION cte.f_particao_remover(p_mes date)
+RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_sufixo     text := to_char(p_mes, '"p"YYYY_MM');
+    v_documento  regclass := to_regclass('cte.documento_' || v_sufixo);
+    v_carga      regclass := to_regclass('cte.carga_' || v_sufixo);
+    v_linhas     bigint;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'cte.documento'::regclass) <> 'p' THEN
+        RAISE EXCEPTION 'cte.documento ainda não foi trocada pela tabela particionada';
+    END IF;
+    IF v_documento IS NULL THEN
+        RAISE EXCEPTION 'Partição cte.documento_% não existe', v_sufixo;
+    END IF;
+
+    EXECUTE format('SELECT count(*) FROM %s', v_documento) INTO v_linhas;
+
+    -- Partes primeiro: os triggers de agregados recalculam os clientes afetados
+    EXECUTE format(
+        'DELETE FROM cte.documento_parte p USING %s d WHERE p.id_cte = d.id_cte', v_documento
+    );
+
+    -- A partição da carga referencia a do documento: removida antes
+    IF v_carga IS NOT NULL THEN
+        EXECUTE format('DROP TABLE %s', v_carga);
+    END IF;
+    EXECUTE format('ALTER TABLE cte.documento DETACH PARTITION %s', v_documento);
+    EXECUTE format('DROP TABLE %s', v_documento);
+
+    -- DETACH/DROP não disparam os triggers de agregados e sketches
+    IF to_regclass('analytics.agg_mensal') IS NOT NULL THEN
+        DELETE FROM analytics.agg_mensal
+        WHERE ano = extract(year FROM p_mes) AND mes = extract(month FROM p_mes);
+    END IF;
+    IF to_regclass('analytics.sketch_quantil') IS NOT NULL THEN
+        DELETE FROM analytics.sketch_quantil WHERE mes = date_trunc('month', p_mes)::date;
+    END IF;
+    IF to_regprocedure('analytics.f_viagem_remover_periodo(timestamptz,timestamptz)') IS NOT NULL THEN
+        PERFORM analytics.f_viagem_remover_periodo(
+            date_trunc('month', p_mes)::date, (date_trunc('month', p_mes) + interval '1 month')::date
+        );
+    END IF;
+    IF to_regclass('analytics.mv_fonte_alteracao') IS NOT NULL THEN
+        INSERT INTO analytics.mv_fonte_alteracao (tabela, id_transacao)
+        VALUES ('cte.documento', pg_current_xact_id()), ('cte.carga', pg_current_xact_id())
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN v_linhas;
+END;
+$$;
+
+
+-- ============================================================================
+-- COMENTÁRIOS
+-- ============================================================================
+COMMENT ON FUNCTION cte.f_data_particao(timestamptz, text, timestamptz) IS
+'Data de emissão usada como chave de partição: a informada, o mês da chave de acesso ou o mês de created_at.';
+
+COMMENT ON FUNCTION cte.f_particao_tabelas() IS
+'Tabelas particionadas de documento e carga em uso (de destino durante a migração); NULL sem particionamento.';
+
+COMMENT ON FUNCTION cte.f_garantir_particao(date) IS
+'Cria, se não existirem, as partições do mês em documento e carga. Retorna o número de partições criadas.';
+
+COMMENT ON FUNCTION cte.f_garantir_particoes(date, date) IS
+'Cria as partições de todos os meses do intervalo (inclusive). Retorna o número de partições criadas.';
+
+COMMENT ON VIEW cte.vw_particoes IS
+'Partições mensais de documento e carga, com limites, linhas estimadas e tamanho.';
+
+COMMENT ON TABLE cte.particionamento_progresso IS
+'Último id_cte copiado por tabela na migração em lotes para as tabelas particionadas.';
+
+COMMENT ON FUNCTION cte.f_particionamento_trocar() IS
+'Troca cte.documento e cte.carga pelas tabelas particionadas (após a cópia completa), movendo triggers e recriando as views dependentes.';
+
+COMMENT ON FUNCTION cte.f_particao_remover(date) IS
+'Remove a partição do mês (documentos, cargas e partes) e os agregados do mês. Retorna o número de documentos removidos.';
@@ -0,0 +1,58 @@
+-- ============================================================================
+-- JOBS DE RECÁLCULO EM BLOCOS (RETOMÁVEIS)
+-- ============================================================================
+-- Data: 2025-11-24
+-- Autor: Sistema SACT
+-- Descrição: Registra os jobs de atualização em massa de cte.documento
+--            (recálculo da quilometragem por custo/km, backfill por rota) e as
+--            faixas de id_cte já concluídas. Cada faixa é gravada na mesma
+--            transação do seu UPDATE, então um job interrompido é retomado
+--            a partir das faixas que faltam.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS staging.recalculo_job (
+    id_job                  bigserial PRIMARY KEY,
+    tipo                    text NOT NULL,
+    parametros              jsonb NOT NULL DEFAULT '{}'::jsonb,
+    tamanho_bloco           integer NOT NULL CHECK (tamanho_bloco > 0),
+    status                  text NOT NULL DEFAULT 'em_andamento'
+                            CHECK (status IN ('em_andamento', 'concluido')),
+    faixas_total            integer,
+    documentos_atualizados  bigint NOT NULL DEFAULT 0,
+    iniciado_em             timestamptz NOT NULL DEFAULT now(),
+    concluido_em            timestamptz,
+    created_at              timestamptz NOT NULL DEFAULT now(),
+    updated_at              timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS staging.recalculo_faixa (
+    id_job        bigint NOT NULL REFERENCES staging.recalculo_job (id_job) ON DELETE CASCADE,
+    id_inicial    bigint NOT NULL,
+    id_final      bigint NOT NULL,
+    documentos    integer NOT NULL DEFAULT 0,
+    concluida_em  timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (id_job, id_inicial, id_final)
+);
+
+-- Localizar o job em andamento com os mesmos parâmetros
+CREATE INDEX IF NOT EXISTS idx_recalculo_job_tipo_status
+    ON staging.recalculo_job USING btree (tipo, status);
+
+DROP TRIGGER IF EXISTS tgr_recalculo_job_updated_at ON staging.recalculo_job;
+CREATE TRIGGER tgr_recalculo_job_updated_at
+    BEFORE UPDATE ON staging.recalculo_job
+    FOR EACH ROW EXECUTE FUNCTION ibge.trigger_set_updated_at();
+
+-- Filtro por veículo e período do recálculo; mesmo índice de
+-- create_indices_analytics.sql, cujo prefixo id_veiculo dispensa um índice
+-- só de id_veiculo (removido se criado por versão anterior desta migration)
+CREATE INDEX IF NOT EXISTS idx_documento_veiculo_data
+    ON cte.documento USING btree (id_veiculo, data_emissao);
+DROP INDEX IF EXISTS cte.idx_documento_veiculo;
+
+COMMENT ON TABLE staging.recalculo_job IS
+'Jobs de atualização em massa de cte.documento. Um job em andamento com o mesmo
+tipo e parâmetros é retomado em vez de recomeçar.';
+
+COMMENT ON TABLE staging.recalculo_faixa IS
+'Faixas de id_cte concluídas por job; gravadas na mesma transação do UPDATE da faixa.';
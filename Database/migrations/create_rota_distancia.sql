@@ -0,0 +1,39 @@
+-- ============================================================================
+-- DISTÂNCIA POR ROTA (MUNICÍPIO DE ORIGEM -> MUNICÍPIO DE DESTINO)
+-- ============================================================================
+-- Data: 2025-11-23
+-- Autor: Sistema SACT
+-- Descrição: Guarda a distância de cada rota uma única vez. O ETL grava a rota
+--            na primeira vez que ela aparece (distância haversine sobre as
+--            coordenadas de ibge.municipio, com fator de circuidade) e o
+--            backfill usa a tabela para atualizar cte.documento.quilometragem
+--            em blocos, sem reler os XMLs.
+--            Rotas com fonte diferente de 'haversine' (ex.: 'manual') não são
+--            sobrescritas pelo ETL.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS cte.rota_distancia (
+    id_municipio_origem   integer NOT NULL REFERENCES ibge.municipio (id_municipio),
+    id_municipio_destino  integer NOT NULL REFERENCES ibge.municipio (id_municipio),
+    km                    numeric(10,1) NOT NULL CHECK (km >= 0),
+    fonte                 text NOT NULL DEFAULT 'haversine',
+    created_at            timestamptz NOT NULL DEFAULT now(),
+    updated_at            timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (id_municipio_origem, id_municipio_destino)
+);
+
+-- O backfill localiza documentos pela rota
+CREATE INDEX IF NOT EXISTS idx_documento_rota
+    ON cte.documento USING btree (id_municipio_origem, id_municipio_destino);
+
+DROP TRIGGER IF EXISTS tgr_rota_distancia_updated_at ON cte.rota_distancia;
+CREATE TRIGGER tgr_rota_distancia_updated_at
+    BEFORE UPDATE ON cte.rota_distancia
+    FOR EACH ROW EXECUTE FUNCTION ibge.trigger_set_updated_at();
+
+COMMENT ON TABLE cte.rota_distancia IS
+'Distância (km) por rota município de origem -> destino. Preenchida pelo ETL na
+primeira ocorrência da rota; fonte indica a origem do valor (haversine, manual).';
+
+COMMENT ON COLUMN cte.rota_distancia.km IS
+'Distância da rota em km (haversine x fator de circuidade do par de UFs quando fonte = haversine).';
@@ -0,0 +1,225 @@
+-- ============================================================================
+-- SKETCHES DE QUANTIS (MEDIANA / P90) MANTIDOS INCREMENTALMENTE
+-- ============================================================================
+-- Data: 2025-11-25
+-- Autor: Sistema SACT
+-- Descrição: Substitui PERCENTILE_CONT sobre cte.documento inteiro por sketches
+--            de buckets logarítmicos (estilo DDSketch, erro relativo de 1%).
+--            Cada valor cai no bucket ceil(ln(x) / ln(gama)); a contagem por
+--            bucket é somável (sketches de meses, veículos e rotas se combinam
+--            somando buckets) e admite remoção, então atualizações de
+--            quilometragem/frete são refletidas com exatidão.
+--
+--            Métricas: km, frete e frete_km (frete / km), sempre > 0.
+--            Dimensões: geral (chave 0), veiculo (id_veiculo) e rota
+--            (id_municipio_origem * 10000000 + id_municipio_destino), por mês
+--            de emissão ('-infinity' para documentos sem data).
+--
+--            Triggers de comando (transition tables) em cte.documento aplicam
+--            os deltas de cada INSERT/UPDATE/DELETE: ETL individual, ETL em
+--            lote, backfill e recálculo mantêm os sketches sem passo extra.
+--            Requer as views recriadas a partir de Database/views/*.sql.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS analytics.sketch_quantil (
+    metrica    text NOT NULL CHECK (metrica IN ('km', 'frete', 'frete_km')),
+    dimensao   text NOT NULL CHECK (dimensao IN ('geral', 'veiculo', 'rota')),
+    chave      bigint NOT NULL,
+    mes        date NOT NULL,
+    bucket     integer NOT NULL,
+    contagem   bigint NOT NULL,
+    PRIMARY KEY (metrica, dimensao, chave, mes, bucket)
+);
+
+COMMENT ON TABLE analytics.sketch_quantil IS
+'Sketches de quantis (buckets logarítmicos, erro relativo de 1%) por métrica,
+dimensão (geral/veiculo/rota) e mês. Mantida por triggers em cte.documento;
+consultar com analytics.f_sketch_quantil.';
+
+
+-- ============================================================================
+-- Parâmetros do sketch: alfa = 0,01 -> gama = (1 + alfa) / (1 - alfa)
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_sketch_bucket(p_valor numeric)
+RETURNS integer
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT CASE WHEN p_valor > 0
+                THEN ceil(ln(p_valor::float8) / ln(1.01 / 0.99))::integer
+           END
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_sketch_valor(p_bucket integer)
+RETURNS numeric
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    -- Ponto do bucket com erro relativo máximo alfa para qualquer valor nele
+    SELECT (2 * power(1.01 / 0.99, p_bucket) / (1.01 / 0.99 + 1))::numeric
+$$;
+
+
+-- ============================================================================
+-- Trigger: aplica o delta (+1 linhas novas, -1 linhas antigas) do comando
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_trg_sketch_documento()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_mudou  text := '(n.data_emissao, n.valor_frete, n.quilometragem, n.id_veiculo,
+                       n.id_municipio_origem, n.id_municipio_destino)
+                      IS DISTINCT FROM
+                      (a.data_emissao, a.valor_frete, a.quilometragem, a.id_veiculo,
+                       a.id_municipio_origem, a.id_municipio_destino)';
+    v_origem text;
+BEGIN
+    -- No UPDATE, só documentos em que alguma coluna dos sketches mudou:
+    -- atualizações de outras colunas (cfop, updated_at, ...) não tocam os buckets
+    v_origem := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS sinal, * FROM novos'
+        WHEN 'DELETE' THEN 'SELECT -1 AS sinal, * FROM antigos'
+        ELSE format('SELECT 1 AS sinal, n.* FROM novos n JOIN antigos a USING (id_cte) WHERE %1$s
+                     UNION ALL
+                     SELECT -1, a.* FROM antigos a JOIN novos n USING (id_cte) WHERE %1$s',
+                    v_mudou)
+    END;
+    
+    EXECUTE format($sql$
+        INSERT INTO analytics.sketch_quantil AS s
+            (metrica, dimensao, chave, mes, bucket, contagem)
+        SELECT m.metrica, dm.dimensao, dm.chave,
+               COALESCE(date_trunc('month', x.data_emissao)::date, '-infinity'::date),
+               analytics.f_sketch_bucket(m.valor),
+               sum(x.sinal)
+        FROM (%s) x
+        CROSS JOIN LATERAL (VALUES
+                 ('km', x.quilometragem::numeric),
+                 ('frete', x.valor_frete),
+                 ('frete_km', x.valor_frete / NULLIF(x.quilometragem, 0))
+             ) AS m (metrica, valor)
+        CROSS JOIN LATERAL (VALUES
+                 ('geral', 0::bigint),
+                 ('veiculo', x.id_veiculo),
+                 ('rota', x.id_municipio_origem::bigint * 10000000 + x.id_municipio_destino)
+             ) AS dm (dimensao, chave)
+        WHERE m.valor > 0
+          AND dm.chave IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+        HAVING sum(x.sinal) <> 0
+        -- Ordem fixa de bloqueio entre transações concorrentes (evita deadlock)
+        ORDER BY 1, 2, 3, 4, 5
+        ON CONFLICT (metrica, dimensao, chave, mes, bucket)
+        DO UPDATE SET contagem = s.contagem + EXCLUDED.contagem
+    $sql$, v_origem);
+    
+    RETURN NULL;
+END;
+$$;
+
+-- Transition tables exigem um trigger por evento
+DROP TRIGGER IF EXISTS tgr_sketch_documento_insert ON cte.documento;
+CREATE TRIGGER tgr_sketch_documento_insert
+    AFTER INSERT ON cte.documento
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_sketch_documento();
+
+DROP TRIGGER IF EXISTS tgr_sketch_documento_update ON cte.documento;
+CREATE TRIGGER tgr_sketch_documento_update
+    AFTER UPDATE ON cte.documento
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_sketch_documento();
+
+DROP TRIGGER IF EXISTS tgr_sketch_documento_delete ON cte.documento;
+CREATE TRIGGER tgr_sketch_documento_delete
+    AFTER DELETE ON cte.documento
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_sketch_documento();
+
+
+-- ============================================================================
+-- Consulta: quantil de uma métrica combinando os sketches do filtro
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_sketch_quantil(
+    p_metrica   text,
+    p_quantil   float8,
+    p_dimensao  text DEFAULT 'geral',
+    p_chave     bigint DEFAULT 0,
+    p_mes_ini   date DEFAULT NULL,
+    p_mes_fim   date DEFAULT NULL
+)
+RETURNS numeric
+LANGUAGE sql STABLE PARALLEL SAFE AS $$
+    WITH buckets AS (
+        SELECT bucket, sum(contagem) AS contagem
+        FROM analytics.sketch_quantil
+        WHERE metrica = p_metrica
+          AND dimensao = p_dimensao
+          AND chave = p_chave
+          AND (p_mes_ini IS NULL OR mes >= date_trunc('month', p_mes_ini)::date)
+          AND (p_mes_fim IS NULL OR mes <= p_mes_fim)
+        GROUP BY bucket
+        HAVING sum(contagem) > 0
+    ),
+    acumulado AS (
+        SELECT bucket,
+               sum(contagem) OVER (ORDER BY bucket) AS acumulado,
+               sum(contagem) OVER () AS total
+        FROM buckets
+    )
+    SELECT analytics.f_sketch_valor(bucket)
+    FROM acumulado
+    WHERE acumulado >= greatest(1, ceil(p_quantil * total))
+    ORDER BY bucket
+    LIMIT 1
+$$;
+
+COMMENT ON FUNCTION analytics.f_sketch_quantil(text, float8, text, bigint, date, date) IS
+'Quantil aproximado (erro relativo <= 1%) de km, frete ou frete_km a partir de
+analytics.sketch_quantil. Ex.: analytics.f_sketch_quantil(''km'', 0.5).';
+
+
+-- ============================================================================
+-- Manutenção: reconstrução completa e remoção de buckets zerados
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_sketch_reconstruir()
+RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_linhas bigint;
+BEGIN
+    LOCK TABLE analytics.sketch_quantil IN EXCLUSIVE MODE;
+    TRUNCATE analytics.sketch_quantil;
+
+    INSERT INTO analytics.sketch_quantil (metrica, dimensao, chave, mes, bucket, contagem)
+    SELECT m.metrica, dm.dimensao, dm.chave,
+           COALESCE(date_trunc('month', d.data_emissao)::date, '-infinity'::date),
+           analytics.f_sketch_bucket(m.valor),
+           count(*)
+    FROM cte.documento d
+    CROSS JOIN LATERAL (VALUES
+             ('km', d.quilometragem::numeric),
+             ('frete', d.valor_frete),
+             ('frete_km', d.valor_frete / NULLIF(d.quilometragem, 0))
+         ) AS m (metrica, valor)
+    CROSS JOIN LATERAL (VALUES
+             ('geral', 0::bigint),
+             ('veiculo', d.id_veiculo),
+             ('rota', d.id_municipio_origem::bigint * 10000000 + d.id_municipio_destino)
+         ) AS dm (dimensao, chave)
+    WHERE m.valor > 0
+      AND dm.chave IS NOT NULL
+    GROUP BY 1, 2, 3, 4, 5;
+
+    GET DIAGNOSTICS v_linhas = ROW_COUNT;
+    RETURN v_linhas;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_sketch_compactar()
+RETURNS bigint
+LANGUAGE sql AS $$
+    WITH removidos AS (
+        DELETE FROM analytics.sketch_quantil WHERE contagem = 0 RETURNING 1
+    )
+    SELECT count(*) FROM removidos
+$$;
+
+-- Carga inicial a partir dos documentos existentes
+SELECT analytics.f_sketch_reconstruir();
@@ -0,0 +1,411 @@
+-- ============================================================================
+-- INTERVALOS ENTRE VIAGENS E USO POR VEÍCULO MANTIDOS NA CARGA
+-- ============================================================================
+-- Data: 2025-11-29
+-- Autor: Sistema SACT
+-- Descrição: Tabelas lidas pelas views de frota no lugar do LAG/ROW_NUMBER
+--            sobre o histórico inteiro de cte.documento:
+--
+--            analytics.viagem       (uma linha por documento com veículo e
+--                                    quilometragem > 0, com
+--                                    dias_desde_viagem_anterior)
+--            analytics.veiculo_uso  (viagens, km, frete, soma dos intervalos,
+--                                    primeira e última viagem por veículo)
+--
+--            A viagem anterior é a de maior (data_emissao, id_cte) menor que
+--            a da viagem, do mesmo veículo. Triggers de comando em
+--            cte.documento aplicam cada INSERT/UPDATE/DELETE (ETL, backfill,
+--            recálculo) e corrigem só as vizinhas afetadas: a viagem
+--            seguinte a cada viagem inserida ou removida tem o intervalo
+--            recalculado por busca no índice (id_veiculo, data_emissao),
+--            então documentos que chegam fora de ordem não exigem recálculo
+--            do histórico. Os veículos envolvidos são travados em
+--            veiculo_uso durante a transação (cargas concorrentes do mesmo
+--            veículo se serializam).
+--
+--            Aplicar DEPOIS de create_mv_refresh.sql e ANTES de
+--            views/vw_frota_utilizacao.sql.
+-- ============================================================================
+
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+CREATE TABLE IF NOT EXISTS analytics.viagem (
+    id_cte                      bigint PRIMARY KEY,
+    id_veiculo                  bigint   NOT NULL,
+    data_emissao                timestamptz,
+    quilometragem               integer  NOT NULL,
+    valor_frete                 numeric(18,2),
+    dias_desde_viagem_anterior  integer  -- NULL na primeira viagem (ou sem data)
+);
+
+CREATE INDEX IF NOT EXISTS idx_viagem_veiculo_data
+    ON analytics.viagem (id_veiculo, data_emissao, id_cte);
+
+CREATE TABLE IF NOT EXISTS analytics.veiculo_uso (
+    id_veiculo       bigint PRIMARY KEY,
+    viagens          bigint  NOT NULL DEFAULT 0,
+    km_total         bigint  NOT NULL DEFAULT 0,
+    frete_total      numeric NOT NULL DEFAULT 0,
+    dias_parada      bigint  NOT NULL DEFAULT 0,  -- soma de dias_desde_viagem_anterior
+    intervalos       bigint  NOT NULL DEFAULT 0,  -- viagens com viagem anterior
+    primeira_viagem  timestamptz,
+    ultima_viagem    timestamptz
+);
+
+-- Maiores e menores rodagens (vw_veiculos_uso_extremo)
+CREATE INDEX IF NOT EXISTS idx_veiculo_uso_km
+    ON analytics.veiculo_uso (km_total);
+
+COMMENT ON TABLE analytics.viagem IS
+'Viagens (documentos com veículo e quilometragem > 0) com os dias desde a viagem
+anterior do mesmo veículo. Mantida por triggers em cte.documento.';
+
+COMMENT ON TABLE analytics.veiculo_uso IS
+'Totais por veículo (viagens, km, frete, intervalos entre viagens, primeira e
+última viagem). Mantida por triggers em cte.documento; base das views de frota.';
+
+
+-- ============================================================================
+-- SQL das remoções e inserções em analytics.viagem (com os totais do veículo).
+-- Retornam as viagens alteradas como arrays (veículos, datas, ids) para o
+-- ajuste das vizinhas em f_viagem_ajustar
+-- ============================================================================
+
+-- p_origem retorna id_cte
+CREATE OR REPLACE FUNCTION analytics.f_viagem_remover_sql(p_origem text)
+RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT format($sql$
+        WITH removidas AS (
+            DELETE FROM analytics.viagem v
+            USING (%s) x
+            WHERE v.id_cte = x.id_cte
+            RETURNING v.*
+        ),
+        totais AS (
+            UPDATE analytics.veiculo_uso u
+            SET viagens     = u.viagens - r.viagens,
+                km_total    = u.km_total - r.km,
+                frete_total = u.frete_total - r.frete,
+                dias_parada = u.dias_parada - r.dias,
+                intervalos  = u.intervalos - r.intervalos
+            FROM (SELECT id_veiculo,
+                         count(*) AS viagens,
+                         sum(quilometragem) AS km,
+                         COALESCE(sum(valor_frete), 0) AS frete,
+                         COALESCE(sum(dias_desde_viagem_anterior), 0) AS dias,
+                         count(dias_desde_viagem_anterior) AS intervalos
+                  FROM removidas
+                  GROUP BY id_veiculo) r
+            WHERE u.id_veiculo = r.id_veiculo
+        )
+        SELECT array_agg(id_veiculo), array_agg(data_emissao), array_agg(id_cte)
+        FROM removidas
+    $sql$, p_origem)
+$$;
+
+-- p_origem retorna as colunas de cte.documento
+CREATE OR REPLACE FUNCTION analytics.f_viagem_inserir_sql(p_origem text)
+RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT format($sql$
+        WITH novas AS (
+            INSERT INTO analytics.viagem (id_cte, id_veiculo, data_emissao, quilometragem, valor_frete)
+            SELECT x.id_cte, x.id_veiculo, x.data_emissao, x.quilometragem, x.valor_frete
+            FROM (%s) x
+            WHERE x.id_veiculo IS NOT NULL AND x.quilometragem > 0
+            RETURNING *
+        ),
+        totais AS (
+            UPDATE analytics.veiculo_uso u
+            SET viagens     = u.viagens + n.viagens,
+                km_total    = u.km_total + n.km,
+                frete_total = u.frete_total + n.frete
+            FROM (SELECT id_veiculo,
+                         count(*) AS viagens,
+                         sum(quilometragem) AS km,
+                         COALESCE(sum(valor_frete), 0) AS frete
+                  FROM novas
+                  GROUP BY id_veiculo) n
+            WHERE u.id_veiculo = n.id_veiculo
+        )
+        SELECT array_agg(id_veiculo), array_agg(data_emissao), array_agg(id_cte)
+        FROM novas
+    $sql$, p_origem)
+$$;
+
+
+-- ============================================================================
+-- Trava os veículos (cria a linha de totais se preciso), sempre na mesma ordem
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_viagem_travar(p_veiculos bigint[])
+RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO analytics.veiculo_uso (id_veiculo)
+    SELECT DISTINCT v FROM unnest(p_veiculos) v
+    ORDER BY 1
+    ON CONFLICT (id_veiculo) DO NOTHING;
+
+    -- Os comandos seguintes (novo snapshot) já veem as viagens de quem tinha a trava
+    PERFORM 1
+    FROM analytics.veiculo_uso
+    WHERE id_veiculo = ANY (p_veiculos)
+    ORDER BY id_veiculo
+    FOR UPDATE;
+END;
+$$;
+
+
+-- ============================================================================
+-- Correção local: recalcula o intervalo das viagens inseridas e da viagem
+-- seguinte a cada viagem inserida ou removida, e os totais dos veículos
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_viagem_ajustar(p_veiculos bigint[],
+                                                      p_datas timestamptz[],
+                                                      p_ids bigint[])
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_linhas integer;
+BEGIN
+    IF p_ids IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    WITH pontos AS (
+        SELECT * FROM unnest(p_veiculos, p_datas, p_ids) AS p(id_veiculo, data_emissao, id_cte)
+    ),
+    afetadas AS (
+        -- Inseridas (as removidas já não estão na tabela)
+        SELECT v.id_cte
+        FROM analytics.viagem v
+        JOIN pontos p ON p.id_cte = v.id_cte
+        UNION
+        -- Seguintes: a viagem anterior delas mudou
+        SELECT s.id_cte
+        FROM pontos p
+        CROSS JOIN LATERAL (
+            SELECT v.id_cte
+            FROM analytics.viagem v
+            WHERE v.id_veiculo = p.id_veiculo
+              AND (v.data_emissao, v.id_cte) > (p.data_emissao, p.id_cte)
+            ORDER BY v.data_emissao, v.id_cte
+            LIMIT 1
+        ) s
+    ),
+    calculo AS (
+        SELECT v.id_cte, v.id_veiculo,
+               v.dias_desde_viagem_anterior AS antigo,
+               EXTRACT(DAYS FROM (v.data_emissao - a.data_emissao))::integer AS novo
+        FROM afetadas f
+        JOIN analytics.viagem v ON v.id_cte = f.id_cte
+        LEFT JOIN LATERAL (
+            SELECT w.data_emissao
+            FROM analytics.viagem w
+            WHERE w.id_veiculo = v.id_veiculo
+              AND (w.data_emissao, w.id_cte) < (v.data_emissao, v.id_cte)
+            ORDER BY w.data_emissao DESC, w.id_cte DESC
+            LIMIT 1
+        ) a ON true
+    ),
+    alteradas AS (
+        UPDATE analytics.viagem v
+        SET dias_desde_viagem_anterior = c.novo
+        FROM calculo c
+        WHERE v.id_cte = c.id_cte
+          AND c.novo IS DISTINCT FROM c.antigo
+        RETURNING c.*
+    )
+    UPDATE analytics.veiculo_uso u
+    SET dias_parada = u.dias_parada + d.dias,
+        intervalos  = u.intervalos + d.intervalos
+    FROM (SELECT id_veiculo,
+                 sum(COALESCE(novo, 0) - COALESCE(antigo, 0)) AS dias,
+                 sum((novo IS NOT NULL)::integer - (antigo IS NOT NULL)::integer) AS intervalos
+          FROM alteradas
+          GROUP BY id_veiculo) d
+    WHERE u.id_veiculo = d.id_veiculo;
+    GET DIAGNOSTICS v_linhas = ROW_COUNT;
+
+    -- Primeira/última viagem por busca no índice; veículos sem viagens saem
+    UPDATE analytics.veiculo_uso u
+    SET primeira_viagem = (SELECT min(v.data_emissao) FROM analytics.viagem v
+                           WHERE v.id_veiculo = u.id_veiculo),
+        ultima_viagem   = (SELECT max(v.data_emissao) FROM analytics.viagem v
+                           WHERE v.id_veiculo = u.id_veiculo)
+    WHERE u.id_veiculo = ANY (p_veiculos);
+
+    DELETE FROM analytics.veiculo_uso
+    WHERE id_veiculo = ANY (p_veiculos) AND viagens <= 0;
+
+    RETURN v_linhas;
+END;
+$$;
+
+
+-- ============================================================================
+-- Trigger em cte.documento
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_trg_viagem_documento()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_mudou     text := '(n.id_veiculo, n.data_emissao, n.quilometragem, n.valor_frete)
+                         IS DISTINCT FROM
+                         (a.id_veiculo, a.data_emissao, a.quilometragem, a.valor_frete)';
+    v_saidas    text;
+    v_entradas  text;
+    v_veiculos  bigint[];
+    v_vei       bigint[];
+    v_datas     timestamptz[];
+    v_ids       bigint[];
+    v_vei_n     bigint[];
+    v_datas_n   timestamptz[];
+    v_ids_n     bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        v_entradas := 'SELECT * FROM novos';
+    ELSIF TG_OP = 'DELETE' THEN
+        v_saidas := 'SELECT * FROM antigos';
+    ELSE
+        -- Só documentos em que veículo, data, km ou frete mudaram
+        v_saidas := format('SELECT a.* FROM antigos a JOIN novos n USING (id_cte) WHERE %s', v_mudou);
+        v_entradas := format('SELECT n.* FROM novos n JOIN antigos a USING (id_cte) WHERE %s', v_mudou);
+    END IF;
+
+    EXECUTE format(
+        'SELECT array_agg(DISTINCT x.id_veiculo)
+         FROM (%s) x
+         WHERE x.id_veiculo IS NOT NULL AND x.quilometragem > 0',
+        concat_ws(' UNION ALL ', v_saidas, v_entradas)
+    ) INTO v_veiculos;
+
+    IF v_veiculos IS NULL THEN
+        RETURN NULL;
+    END IF;
+    PERFORM analytics.f_viagem_travar(v_veiculos);
+
+    IF v_saidas IS NOT NULL THEN
+        EXECUTE analytics.f_viagem_remover_sql(v_saidas) INTO v_vei, v_datas, v_ids;
+    END IF;
+    IF v_entradas IS NOT NULL THEN
+        EXECUTE analytics.f_viagem_inserir_sql(v_entradas) INTO v_vei_n, v_datas_n, v_ids_n;
+    END IF;
+
+    PERFORM analytics.f_viagem_ajustar(v_vei || v_vei_n, v_datas || v_datas_n, v_ids || v_ids_n);
+    RETURN NULL;
+END;
+$$;
+
+-- Transition tables exigem um trigger por evento
+DROP TRIGGER IF EXISTS tgr_viagem_documento_insert ON cte.documento;
+CREATE TRIGGER tgr_viagem_documento_insert
+    AFTER INSERT ON cte.documento
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_viagem_documento();
+
+DROP TRIGGER IF EXISTS tgr_viagem_documento_update ON cte.documento;
+CREATE TRIGGER tgr_viagem_documento_update
+    AFTER UPDATE ON cte.documento
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_viagem_documento();
+
+DROP TRIGGER IF EXISTS tgr_viagem_documento_delete ON cte.documento;
+CREATE TRIGGER tgr_viagem_documento_delete
+    AFTER DELETE ON cte.documento
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_viagem_documento();
+
+-- As views de frota passam a ler veiculo_uso (ver create_mv_refresh.sql)
+DO $$
+BEGIN
+    IF to_regprocedure('analytics.f_trg_mv_fonte_alterada()') IS NULL THEN
+        RETURN;
+    END IF;
+    DROP TRIGGER IF EXISTS tgr_mv_fonte_alterada ON analytics.veiculo_uso;
+    CREATE TRIGGER tgr_mv_fonte_alterada
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON analytics.veiculo_uso
+        FOR EACH STATEMENT EXECUTE FUNCTION analytics.f_trg_mv_fonte_alterada();
+END;
+$$;
+
+
+-- ============================================================================
+-- Manutenção: remoção de um período (arquivamento) e reconstrução completa
+-- ============================================================================
+CREATE OR REPLACE FUNCTION analytics.f_viagem_remover_periodo(p_inicio timestamptz,
+                                                              p_fim timestamptz)
+RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_origem    text := format(
+        'SELECT id_cte FROM analytics.viagem WHERE data_emissao >= %L AND data_emissao < %L',
+        p_inicio, p_fim
+    );
+    v_veiculos  bigint[];
+    v_vei       bigint[];
+    v_datas     timestamptz[];
+    v_ids       bigint[];
+BEGIN
+    SELECT array_agg(DISTINCT id_veiculo) INTO v_veiculos
+    FROM analytics.viagem
+    WHERE data_emissao >= p_inicio AND data_emissao < p_fim;
+
+    IF v_veiculos IS NULL THEN
+        RETURN 0;
+    END IF;
+    PERFORM analytics.f_viagem_travar(v_veiculos);
+
+    EXECUTE analytics.f_viagem_remover_sql(v_origem) INTO v_vei, v_datas, v_ids;
+    PERFORM analytics.f_viagem_ajustar(v_vei, v_datas, v_ids);
+    RETURN COALESCE(cardinality(v_ids), 0);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.f_viagem_reconstruir()
+RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_linhas bigint;
+BEGIN
+    LOCK TABLE analytics.viagem, analytics.veiculo_uso IN EXCLUSIVE MODE;
+    TRUNCATE analytics.viagem, analytics.veiculo_uso;
+
+    INSERT INTO analytics.viagem
+        (id_cte, id_veiculo, data_emissao, quilometragem, valor_frete, dias_desde_viagem_anterior)
+    SELECT d.id_cte, d.id_veiculo, d.data_emissao, d.quilometragem, d.valor_frete,
+           EXTRACT(DAYS FROM (d.data_emissao - LAG(d.data_emissao) OVER (
+               PARTITION BY d.id_veiculo ORDER BY d.data_emissao, d.id_cte
+           )))::integer
+    FROM cte.documento d
+    WHERE d.id_veiculo IS NOT NULL AND d.quilometragem > 0;
+    GET DIAGNOSTICS v_linhas = ROW_COUNT;
+
+    INSERT INTO analytics.veiculo_uso
+        (id_veiculo, viagens, km_total, frete_total, dias_parada, intervalos,
+         primeira_viagem, ultima_viagem)
+    SELECT id_veiculo, count(*), sum(quilometragem), COALESCE(sum(valor_frete), 0),
+           COALESCE(sum(dias_desde_viagem_anterior), 0), count(dias_desde_viagem_anterior),
+           min(data_emissao), max(data_emissao)
+    FROM analytics.viagem
+    GROUP BY id_veiculo;
+
+    RETURN v_linhas;
+END;
+$$;
+
+COMMENT ON FUNCTION analytics.f_viagem_ajustar(bigint[], timestamptz[], bigint[]) IS
+'Recalcula dias_desde_viagem_anterior das viagens informadas e das seguintes a
+elas, e os totais dos veículos. Retorna o número de veículos com intervalos alterados.';
+
+COMMENT ON FUNCTION analytics.f_viagem_remover_periodo(timestamptz, timestamptz) IS
+'Remove de analytics.viagem as viagens do período (partição arquivada), corrigindo
+as seguintes e os totais. Retorna o número de viagens removidas.';
+
+COMMENT ON FUNCTION analytics.f_viagem_reconstruir() IS
+'Recalcula analytics.viagem e analytics.veiculo_uso a partir de cte.documento.
+Retorna o número de viagens.';
+
+-- Carga inicial a partir dos documentos existentes
+SELECT analytics.f_viagem_reconstruir();
@@ -4,8 +4,13 @@
 -- Data: 2025-11-13
 -- Autor: Sistema SACT
 -- Descrição: Adiciona inserção de endereços para remetente e destinatário
+--            (sem data de emissão, usa o mês da chave: cte.f_data_emissao_chave,
+--            de create_f_ingest_cte_batch.sql)
 -- ============================================================================
 
+-- Chave de partição de cte.carga (migrations/create_particionamento.sql)
+ALTER TABLE cte.carga ADD COLUMN IF NOT EXISTS data_emissao timestamptz;
+
 CREATE OR REPLACE FUNCTION cte.f_ingest_cte_json(_payload jsonb)
 RETURNS bigint
 LANGUAGE plpgsql
@@ -41,6 +46,7 @@ BEGIN
       _data_emissao := NULL;
     END;
   END IF;
+  _data_emissao := COALESCE(_data_emissao, cte.f_data_emissao_chave(_chave));
 
   -- Resolve municípios via IBGE (por nome + UF)
   _id_mun_origem := ibge.f_resolve_municipio(_origem_cidade, _origem_uf);
@@ -71,17 +77,19 @@ BEGIN
      WHERE id_cte = _id_cte;
   END IF;
 
-  -- Carga
-  INSERT INTO cte.carga (id_cte, valor, peso, quantidade, produto_predominante, unidade_medida)
+  -- Carga (com a data de emissão gravada no documento)
+  INSERT INTO cte.carga (id_cte, data_emissao, valor, peso, quantidade,
+                         produto_predominante, unidade_medida)
   VALUES (
     _id_cte,
+    (SELECT d.data_emissao FROM cte.documento d WHERE d.id_cte = _id_cte),
     NULLIF(_payload #>> '{carga,valor}', '')::NUMERIC,
     NULLIF(_payload #>> '{carga,peso}', '')::NUMERIC,
     NULLIF(_payload #>> '{carga,quantidade}', '')::NUMERIC,
     NULLIF(_payload #>> '{carga,produto_predominante}', ''),
     NULLIF(_payload #>> '{carga,unidade_medida}', '')
   )
-  ON CONFLICT (id_cte) DO UPDATE SET
+  ON CONFLICT ON CONSTRAINT carga_pkey DO UPDATE SET
       valor = EXCLUDED.valor,
       peso = EXCLUDED.peso,
       quantidade = EXCLUDED.quantidade,
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Backfill Service - Atualizações em massa de cte.documento em blocos paralelos
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+class BackfillService:
+    """
+    Serviço de atualização em massa de documentos já carregados.
+    
+    A tabela é dividida em faixas de id_cte e cada faixa é atualizada por
+    um único UPDATE set-based em uma conexão própria. As faixas rodam em
+    paralelo e cada uma é confirmada separadamente, então transações e
+    bloqueios ficam curtos mesmo em tabelas grandes.
+    
+    Com a migration create_recalculo_jobs.sql aplicada, cada execução é um
+    job em staging.recalculo_job: as faixas concluídas são gravadas junto
+    com o UPDATE e um job interrompido é retomado pelas faixas restantes.
+    """
+    
+    TABELA_JOB = 'staging.recalculo_job'
+    TABELA_FAIXA = 'staging.recalculo_faixa'
+    
+    def __init__(self, db_manager, workers: int = 4, tamanho_bloco: int = 10000):
+        """
+        Inicializa o serviço de backfill.
+        
+        Args:
+            db_manager: Manager de banco de dados
+            workers: Conexões (faixas) atualizadas em paralelo
+            tamanho_bloco: Quantidade de id_cte por faixa
+        """
+        self.db_manager = db_manager
+        self.workers = max(1, workers)
+        self.tamanho_bloco = max(1, tamanho_bloco)
+    
+    def _tabela_existe(self, tabela: str) -> bool:
+        """Verifica se uma tabela existe no banco."""
+        try:
+            resultado = self.db_manager.execute_query(
+                "SELECT to_regclass(%s) IS NOT NULL", (tabela,), fetch_one=True
+            )
+            return bool(resultado and resultado[0])
+        except Exception as e:
+            print(f"⚠️ Erro ao verificar tabela {tabela}: {e}")
+            return False
+    
+    def faixas_id_cte(self, filtro: str = '', params_filtro: Dict[str, Any] = None,
+                      tamanho_bloco: int = None) -> List[Tuple[int, int]]:
+        """
+        Divide o intervalo de id_cte dos documentos filtrados em faixas.
+        
+        Args:
+            filtro: Condições adicionais sobre cte.documento d (``AND ...``)
+            params_filtro: Parâmetros nomeados do filtro
+            tamanho_bloco: Tamanho das faixas (padrão: self.tamanho_bloco)
+        
+        Returns:
+            Lista de tuplas (id_inicial, id_final), inclusivas
+        """
+        tamanho_bloco = tamanho_bloco or self.tamanho_bloco
+        minimo, maximo = self.db_manager.execute_query(
+            f"SELECT min(d.id_cte), max(d.id_cte) FROM cte.documento d WHERE TRUE {filtro}",
+            params_filtro or {}, fetch_one=True
+        )
+        if minimo is None:
+            return []
+        
+        return [
+            (inicio, min(inicio + tamanho_bloco - 1, maximo))
+            for inicio in range(minimo, maximo + 1, tamanho_bloco)
+        ]
+    
+    # ========== JOBS ==========
+    
+    def _iniciar_job(self, tipo: str, parametros: Dict[str, Any]) -> Tuple[int, int, Set[tuple]]:
+        """
+        Retoma o job em andamento com o mesmo tipo e parâmetros ou cria um novo.
+        
+        Returns:
+            Tupla (id_job, tamanho_bloco do job, faixas já concluídas)
+        """
+        parametros_json = json.dumps(parametros, sort_keys=True, default=str)
+        
+        with self.db_manager.get_cursor() as (cursor, conn):
+            cursor.execute(f"""
+                SELECT id_job, tamanho_bloco FROM {self.TABELA_JOB}
+                WHERE tipo = %s AND parametros = %s::jsonb AND status = 'em_andamento'
+                ORDER BY id_job DESC
+                LIMIT 1
+            """, (tipo, parametros_json))
+            existente = cursor.fetchone()
+            
+            if existente:
+                id_job, tamanho_bloco = existente
+                cursor.execute(
+                    f"SELECT id_inicial, id_final FROM {self.TABELA_FAIXA} WHERE id_job = %s",
+                    (id_job,)
+                )
+                return id_job, tamanho_bloco, {tuple(linha) for linha in cursor.fetchall()}
+            
+            cursor.execute(f"""
+                INSERT INTO {self.TABELA_JOB} (tipo, parametros, tamanho_bloco)
+                VALUES (%s, %s::jsonb, %s)
+                RETURNING id_job
+            """, (tipo, parametros_json, self.tamanho_bloco))
+            return cursor.fetchone()[0], self.tamanho_bloco, set()
+    
+    def _finalizar_job(self, id_job: int, total_faixas: int, concluido: bool) -> None:
+        """Atualiza totais do job e o marca como concluído se não houve erro."""
+        with self.db_manager.get_cursor() as (cursor, conn):
+            cursor.execute(f"""
+                UPDATE {self.TABELA_JOB} j SET
+                    faixas_total = %s,
+                    documentos_atualizados = COALESCE(
+                        (SELECT sum(f.documentos) FROM {self.TABELA_FAIXA} f WHERE f.id_job = j.id_job), 0),
+                    status = CASE WHEN %s THEN 'concluido' ELSE status END,
+                    concluido_em = CASE WHEN %s THEN now() ELSE concluido_em END
+                WHERE j.id_job = %s
+            """, (total_faixas, concluido, concluido, id_job))
+    
+    # ========== EXECUÇÃO ==========
+    
+    def _atualizar_faixa(self, query: str, faixa: Tuple[int, int], params: Dict[str, Any],
+                         id_job: Optional[int]) -> int:
+        """
+        Executa o UPDATE de uma faixa em conexão própria.
+        
+        A faixa é registrada no job na mesma transação do UPDATE.
+        
+        Returns:
+            Número de documentos alterados
+        """
+        with self.db_manager.get_cursor() as (cursor, conn):
+            cursor.execute(query, dict(params, id_inicial=faixa[0], id_final=faixa[1]))
+            atualizados = cursor.rowcount
+            
+            if id_job is not None:
+                cursor.execute(f"""
+                    INSERT INTO {self.TABELA_FAIXA} (id_job, id_inicial, id_final, documentos)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT DO NOTHING
+                """, (id_job, faixa[0], faixa[1], atualizados))
+            
+            return atualizados
+    
+    def executar_em_blocos(self, query: str, params: Dict[str, Any] = None,
+                           descricao: str = "Backfill", filtro: str = '',
+                           tipo_job: str = None, parametros_job: Dict[str, Any] = None,
+                           progresso: Callable[[int, int, int], None] = None) -> Dict[str, Any]:
+        """
+        Executa um UPDATE em todas as faixas de id_cte, em paralelo.
+        
+        Args:
+            query: UPDATE com os parâmetros nomeados %(id_inicial)s e
+                %(id_final)s e o marcador {filtro} no fim do WHERE
+            params: Parâmetros nomeados da query e do filtro
+            descricao: Rótulo usado no progresso
+            filtro: Condições adicionais sobre cte.documento d (``AND ...``)
+            tipo_job: Se informado, registra o job para poder retomá-lo
+            parametros_job: Parâmetros que identificam o job
+            progresso: Função chamada a cada faixa com (concluídas, total,
+                documentos atualizados)
+        
+        Returns:
+            Dicionário com id_job, faixas, faixas retomadas, faixas com erro,
+            documentos atualizados e tempo
+        """
+        inicio = time.time()
+        params = dict(params or {})
+        query = query.format(filtro=filtro)
+        resultado = {'id_job': None, 'faixas': 0, 'faixas_retomadas': 0, 'faixas_erro': 0,
+                     'documentos_atualizados': 0, 'segundos': 0.0}
+        
+        id_job, tamanho_bloco, concluidas_antes = None, self.tamanho_bloco, set()
+        if tipo_job and self._tabela_existe(self.TABELA_JOB):
+            id_job, tamanho_bloco, concluidas_antes = self._iniciar_job(tipo_job, parametros_job or {})
+            resultado['id_job'] = id_job
+        
+        faixas = self.faixas_id_cte(filtro, params, tamanho_bloco)
+        pendentes = [faixa for faixa in faixas if faixa not in concluidas_antes]
+        resultado['faixas'] = len(faixas)
+        resultado['faixas_retomadas'] = len(faixas) - len(pendentes)
+        
+        if not faixas:
+            print(f"ℹ️ {descricao}: nenhum documento")
+        elif resultado['faixas_retomadas']:
+            print(f"↩️ {descricao}: retomando job #{id_job} "
+                  f"({resultado['faixas_retomadas']}/{len(faixas)} faixas já concluídas)")
+        
+        if pendentes:
+            print(f"🔁 {descricao}: {len(pendentes)} faixas de até {tamanho_bloco} "
+                  f"documentos em {self.workers} conexões")
+        
+        concluidas = resultado['faixas_retomadas']
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futuros = {
+                executor.submit(self._atualizar_faixa, query, faixa, params, id_job): faixa
+                for faixa in pendentes
+            }
+            for futuro in as_completed(futuros):
+                concluidas += 1
+                try:
+                    resultado['documentos_atualizados'] += futuro.result()
+                except Exception as e:
+                    resultado['faixas_erro'] += 1
+                    faixa = futuros[futuro]
+                    print(f"   ❌ Erro na faixa {faixa[0]}-{faixa[1]}: {e}")
+                
+                if progresso:
+                    progresso(concluidas, len(faixas), resultado['documentos_atualizados'])
+                if concluidas % self.workers == 0 or concluidas == len(faixas):
+                    percentual = concluidas * 100 / len(faixas)
+                    print(f"   📊 {descricao}: {concluidas}/{len(faixas)} faixas ({percentual:.1f}%) - "
+                          f"{resultado['documentos_atualizados']} documentos atualizados")
+        
+        if id_job is not None:
+            self._finalizar_job(id_job, len(faixas), resultado['faixas_erro'] == 0)
+        
+        resultado['segundos'] = round(time.time() - inicio, 2)
+        return resultado
+    
+    # ========== JOBS DISPONÍVEIS ==========
+    
+    def backfill_quilometragem(self, progresso: Callable[[int, int, int], None] = None) -> Dict[str, Any]:
+        """
+        Atualiza cte.documento.quilometragem a partir de cte.rota_distancia.
+        
+        Só altera documentos cuja rota tem distância positiva e cuja
+        quilometragem é diferente da rota (executar de novo é seguro).
+        
+        Args:
+            progresso: Função de progresso (ver executar_em_blocos)
+        
+        Returns:
+            Resultado de executar_em_blocos
+        """
+        return self.executar_em_blocos("""
+            UPDATE cte.documento d
+            SET quilometragem = ROUND(r.km)::integer
+            FROM cte.rota_distancia r
+            WHERE d.id_cte BETWEEN %(id_inicial)s AND %(id_final)s
+              AND r.id_municipio_origem = d.id_municipio_origem
+              AND r.id_municipio_destino = d.id_municipio_destino
+              AND ROUND(r.km) > 0
+              AND d.quilometragem IS DISTINCT FROM ROUND(r.km)::integer
+              {filtro}
+        """, descricao="Backfill de quilometragem",
+            tipo_job='backfill_quilometragem', progresso=progresso)
+    
+    def recalcular_custo_por_km(self, custo_por_km: float, data_inicio=None, data_fim=None,
+                                placa: str = None, preservar_rotas: bool = True,
+                                progresso: Callable[[int, int, int], None] = None) -> Dict[str, Any]:
+        """
+        Recalcula quilometragem = valor do frete ÷ custo por km.
+        
+        Args:
+            custo_por_km: Novo custo por quilômetro
+            data_inicio: Data de emissão inicial (inclusiva), opcional
+            data_fim: Data de emissão final (inclusiva), opcional
+            placa: Placa do veículo, opcional
+            preservar_rotas: Se True, não altera documentos cuja rota tem
+                distância em cte.rota_distancia
+            progresso: Função de progresso (ver executar_em_blocos)
+        
+        Returns:
+            Resultado de executar_em_blocos
+        
+        Raises:
+            ValueError: Se o custo por km não for positivo
+        """
+        if not custo_por_km or custo_por_km <= 0:
+            raise ValueError("O custo por km deve ser maior que zero")
+        
+        filtro, params = self.montar_filtro(data_inicio, data_fim, placa)
+        params['custo_por_km'] = custo_por_km
+        if preservar_rotas and self._tabela_existe('cte.rota_distancia'):
+            filtro += """
+              AND NOT EXISTS (
+                  SELECT 1 FROM cte.rota_distancia r
+                  WHERE r.id_municipio_origem = d.id_municipio_origem
+                    AND r.id_municipio_destino = d.id_municipio_destino
+                    AND ROUND(r.km) > 0
+              )"""
+        
+        parametros_job = {
+            'custo_por_km': custo_por_km,
+            'data_inicio': str(data_inicio) if data_inicio else None,
+            'data_fim': str(data_fim) if data_fim else None,
+            'placa': params.get('placa'),
+            'preservar_rotas': preservar_rotas
+        }
+        
+        return self.executar_em_blocos("""
+            UPDATE cte.documento d
+            SET quilometragem = ROUND(GREATEST(d.valor_frete, 0) / %(custo_por_km)s)::integer
+            WHERE d.id_cte BETWEEN %(id_inicial)s AND %(id_final)s
+              AND d.valor_frete IS NOT NULL
+              AND d.quilometragem IS DISTINCT FROM
+                  ROUND(GREATEST(d.valor_frete, 0) / %(custo_por_km)s)::integer
+              {filtro}
+        """, params, descricao="Recálculo de quilometragem", filtro=filtro,
+            tipo_job='recalculo_custo_km', parametros_job=parametros_job, progresso=progresso)
+    
+    @staticmethod
+    def montar_filtro(data_inicio=None, data_fim=None, placa: str = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Monta o filtro de documentos por período de emissão e veículo.
+        
+        Args:
+            data_inicio: Data de emissão inicial (inclusiva)
+            data_fim: Data de emissão final (inclusiva)
+            placa: Placa do veículo (com ou sem hífen)
+        
+        Returns:
+            Tupla (condições ``AND ...`` sobre cte.documento d, parâmetros nomeados)
+        """
+        filtro = ''
+        params = {}
+        
+        if data_inicio:
+            filtro += " AND d.data_emissao >= %(data_inicio)s::date"
+            params['data_inicio'] = str(data_inicio)
+        if data_fim:
+            filtro += " AND d.data_emissao < %(data_fim)s::date + 1"
+            params['data_fim'] = str(data_fim)
+        if placa:
+            filtro += (" AND d.id_veiculo IN (SELECT v.id_veiculo FROM core.veiculo v "
+                       "WHERE v.placa = %(placa)s)")
+            params['placa'] = placa.upper().replace('-', '').replace(' ', '').strip()
+        
+        return filtro, params
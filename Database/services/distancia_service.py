@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Distância Service - Distâncias geodésicas entre municípios (coordenadas IBGE)
+"""
+
+import os
+import csv
+import hashlib
+import tempfile
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+
+class DistanciaService:
+    """
+    Serviço de distâncias entre municípios pela fórmula de haversine.
+    
+    As coordenadas de ibge.municipio são carregadas em vetores NumPy na
+    primeira consulta. As distâncias ficam em uma matriz float32 mapeada em
+    disco (np.memmap) calculada sob demanda, uma linha (origem) por vez:
+    depois que a linha é calculada, a consulta de um par é O(1). O arquivo
+    é compartilhado entre execuções e processos que usam as mesmas
+    coordenadas.
+    
+    O fator de circuidade (estrada / linha reta) é aplicado na consulta,
+    por par de UFs, e não altera o cache.
+    """
+    
+    RAIO_TERRA_KM = 6371.0088
+    LINHAS_POR_BLOCO = 256
+    
+    def __init__(self, db_manager=None, diretorio_cache: Optional[str] = None,
+                 fator_circuidade_padrao: float = 1.0,
+                 fatores_circuidade: Optional[Dict[Tuple[str, str], float]] = None,
+                 referencias=None):
+        """
+        Inicializa o serviço de distâncias.
+        
+        Args:
+            db_manager: Manager de banco (fonte das coordenadas)
+            diretorio_cache: Diretório do cache de distâncias em disco
+            fator_circuidade_padrao: Fator aplicado quando o par de UFs não
+                tem fator próprio (1.0 = distância em linha reta)
+            fatores_circuidade: Fatores por par de siglas {('PI', 'MA'): 1.2}
+            referencias: ReferenciaCompartilhadaManager (opcional); com ele as
+                coordenadas vêm da memória compartilhada do host e são
+                recarregadas quando uma nova versão é publicada
+        """
+        self.db_manager = db_manager
+        self.referencias = referencias
+        self._versao_referencias = None
+        self.diretorio_cache = diretorio_cache or os.path.join(
+            tempfile.gettempdir(), 'sact_distancias'
+        )
+        self.fator_circuidade_padrao = fator_circuidade_padrao
+        self._fatores_pendentes = dict(fatores_circuidade or {})
+        
+        self._codigos = None       # códigos IBGE ordenados
+        self._ufs = None           # id_uf de cada município
+        self._lat = None           # radianos
+        self._lon = None           # radianos
+        self._siglas_uf = {}       # sigla -> id_uf
+        self._circuidade = None    # matriz 100x100 indexada por id_uf
+        self._matriz = None        # np.memmap float32 (n, n)
+        self._calculadas = None    # np.memmap uint8 (n,) - linha calculada
+    
+    # ========== CARREGAMENTO ==========
+    
+    @property
+    def total_municipios(self) -> int:
+        """Quantidade de municípios com coordenadas."""
+        self._garantir_carregado()
+        return len(self._codigos)
+    
+    def definir_coordenadas(self, codigos: Iterable[int], ids_uf: Iterable[int],
+                            latitudes: Iterable[float], longitudes: Iterable[float],
+                            siglas_uf: Optional[Dict[str, int]] = None) -> int:
+        """
+        Define as coordenadas usadas pelo serviço (sem consultar o banco).
+        
+        Args:
+            codigos: Códigos IBGE dos municípios
+            ids_uf: Código IBGE da UF de cada município
+            latitudes: Latitudes em graus
+            longitudes: Longitudes em graus
+            siglas_uf: Mapa sigla -> id_uf (para os fatores de circuidade)
+        
+        Returns:
+            Quantidade de municípios com coordenadas válidas
+        """
+        codigos = np.asarray(list(codigos), dtype=np.int64)
+        ids_uf = np.asarray(list(ids_uf), dtype=np.int64)
+        latitudes = np.asarray(list(latitudes), dtype=np.float64)
+        longitudes = np.asarray(list(longitudes), dtype=np.float64)
+        
+        validos = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        ordem = np.argsort(codigos[validos], kind='stable')
+        
+        self._codigos = codigos[validos][ordem]
+        self._ufs = ids_uf[validos][ordem]
+        self._lat = np.radians(latitudes[validos][ordem])
+        self._lon = np.radians(longitudes[validos][ordem])
+        self._siglas_uf = dict(siglas_uf or {})
+        
+        self._montar_circuidade()
+        self._abrir_cache()
+        return len(self._codigos)
+    
+    def _garantir_carregado(self) -> None:
+        """Carrega as coordenadas do banco na primeira consulta."""
+        if self.referencias is not None and self._carregar_referencias():
+            return
+        
+        if self._codigos is not None:
+            return
+        
+        if self.db_manager is None:
+            raise RuntimeError("Coordenadas não definidas e nenhum banco configurado")
+        
+        linhas = self.db_manager.execute_query("""
+            SELECT m.id_municipio, m.id_uf, m.latitude, m.longitude
+            FROM ibge.municipio m
+            WHERE m.latitude IS NOT NULL AND m.longitude IS NOT NULL
+        """)
+        siglas = self.db_manager.execute_query("SELECT sigla, id_uf FROM ibge.uf")
+        
+        self.definir_coordenadas(
+            (linha[0] for linha in linhas),
+            (linha[1] for linha in linhas),
+            (float(linha[2]) for linha in linhas),
+            (float(linha[3]) for linha in linhas),
+            {sigla: id_uf for sigla, id_uf in siglas}
+        )
+    
+    def _carregar_referencias(self) -> bool:
+        """
+        Usa as tabelas publicadas em memória compartilhada, se houver.
+        
+        Returns:
+            True se as coordenadas vieram (ou continuam vindo) das referências
+        """
+        tabelas = self.referencias.atual()
+        if tabelas is None:
+            return False
+        
+        if tabelas.versao != self._versao_referencias:
+            self.definir_coordenadas(
+                tabelas.codigos, tabelas.ids_uf, tabelas.latitudes, tabelas.longitudes,
+                tabelas.siglas_uf
+            )
+            self._versao_referencias = tabelas.versao
+        return True
+    
+    def _abrir_cache(self) -> None:
+        """Abre (ou cria) o cache em disco correspondente às coordenadas atuais."""
+        n = len(self._codigos)
+        if n == 0:
+            self._matriz = np.zeros((0, 0), dtype=np.float32)
+            self._calculadas = np.zeros(0, dtype=np.uint8)
+            return
+        
+        # O nome do arquivo depende das coordenadas: mudou o IBGE, muda o cache
+        assinatura = hashlib.sha1()
+        for vetor in (self._codigos, self._lat, self._lon):
+            assinatura.update(np.ascontiguousarray(vetor).tobytes())
+        prefixo = os.path.join(self.diretorio_cache, f"distancias_{n}_{assinatura.hexdigest()[:16]}")
+        
+        os.makedirs(self.diretorio_cache, exist_ok=True)
+        arquivo_matriz = f"{prefixo}.f32"
+        arquivo_flags = f"{prefixo}.flags"
+        
+        # Outros workers podem abrir o mesmo cache ao mesmo tempo: os arquivos
+        # entram no lugar já completos e nunca são truncados depois de criados
+        flags_novas = self._criar_arquivo_esparso(arquivo_flags, n)
+        matriz_nova = self._criar_arquivo_esparso(arquivo_matriz, n * n * np.dtype(np.float32).itemsize)
+        
+        self._matriz = np.memmap(arquivo_matriz, dtype=np.float32, mode='r+', shape=(n, n))
+        self._calculadas = np.memmap(arquivo_flags, dtype=np.uint8, mode='r+', shape=(n,))
+        if matriz_nova and not flags_novas:
+            # Flags de uma matriz removida: zeradas no lugar, as linhas são recalculadas
+            self._calculadas[:] = 0
+    
+    @staticmethod
+    def _criar_arquivo_esparso(arquivo: str, tamanho: int) -> bool:
+        """
+        Cria o arquivo zerado (esparso) de forma atômica, se ainda não existe.
+        
+        O arquivo é montado com nome temporário no mesmo diretório e ligado
+        ao nome final com os.link, que falha se outro processo chegou antes.
+        
+        Args:
+            arquivo: Caminho final
+            tamanho: Tamanho em bytes
+        
+        Returns:
+            True se este processo criou o arquivo
+        """
+        if os.path.exists(arquivo):
+            return False
+        
+        descritor, temporario = tempfile.mkstemp(
+            dir=os.path.dirname(arquivo), prefix=os.path.basename(arquivo) + '.', suffix='.tmp'
+        )
+        try:
+            with os.fdopen(descritor, 'wb') as f:
+                f.truncate(tamanho)
+            os.link(temporario, arquivo)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(temporario)
+    
+    # ========== CIRCUIDADE ==========
+    
+    def definir_fator_circuidade(self, uf_origem: str, uf_destino: str, fator: float,
+                                 simetrico: bool = True) -> None:
+        """
+        Define o fator de circuidade de um par de UFs.
+        
+        Args:
+            uf_origem: Sigla da UF de origem
+            uf_destino: Sigla da UF de destino
+            fator: Razão distância rodoviária / distância em linha reta
+            simetrico: Se True, aplica também ao par inverso
+        """
+        self._fatores_pendentes[(uf_origem.upper(), uf_destino.upper())] = fator
+        if simetrico:
+            self._fatores_pendentes.setdefault((uf_destino.upper(), uf_origem.upper()), fator)
+        if self._codigos is not None:
+            self._montar_circuidade()
+    
+    def carregar_fatores_circuidade(self, arquivo_csv: str) -> int:
+        """
+        Carrega fatores de circuidade de um CSV (uf_origem,uf_destino,fator).
+        
+        Args:
+            arquivo_csv: Caminho do arquivo CSV
+        
+        Returns:
+            Quantidade de fatores carregados
+        """
+        carregados = 0
+        with open(arquivo_csv, 'r', encoding='utf-8') as f:
+            for linha in csv.DictReader(f):
+                try:
+                    self.definir_fator_circuidade(
+                        linha['uf_origem'].strip(), linha['uf_destino'].strip(),
+                        float(linha['fator'])
+                    )
+                    carregados += 1
+                except (KeyError, ValueError):
+                    continue
+        return carregados
+    
+    def _montar_circuidade(self) -> None:
+        """Monta a matriz de fatores indexada por código IBGE da UF (< 100)."""
+        self._circuidade = np.full((100, 100), self.fator_circuidade_padrao, dtype=np.float32)
+        for (uf_origem, uf_destino), fator in self._fatores_pendentes.items():
+            id_origem = self._siglas_uf.get(uf_origem)
+            id_destino = self._siglas_uf.get(uf_destino)
+            if id_origem is not None and id_destino is not None:
+                self._circuidade[id_origem, id_destino] = fator
+    
+    # ========== CÁLCULO ==========
+    
+    @classmethod
+    def haversine_km(cls, lat1, lon1, lat2, lon2) -> np.ndarray:
+        """
+        Distância de grande círculo (vetorizada), com coordenadas em radianos.
+        
+        Returns:
+            Distâncias em km (com broadcasting entre os argumentos)
+        """
+        dlat = lat2 - lat1
+        dlon = lon2 - lon1
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        return 2 * cls.RAIO_TERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    
+    def _garantir_linhas(self, indices: np.ndarray) -> None:
+        """Calcula e grava no cache as linhas (origens) ainda não calculadas."""
+        indices = np.unique(indices)
+        faltantes = indices[self._calculadas[indices] == 0]
+        
+        for inicio in range(0, len(faltantes), self.LINHAS_POR_BLOCO):
+            bloco = faltantes[inicio:inicio + self.LINHAS_POR_BLOCO]
+            self._matriz[bloco] = self.haversine_km(
+                self._lat[bloco, None], self._lon[bloco, None], self._lat[None, :], self._lon[None, :]
+            ).astype(np.float32)
+            self._calculadas[bloco] = 1
+    
+    def indices_municipios(self, codigos: Union[Iterable[int], np.ndarray]) -> np.ndarray:
+        """
+        Converte códigos IBGE em índices internos.
+        
+        Args:
+            codigos: Códigos IBGE
+        
+        Returns:
+            Índices (-1 para códigos sem coordenadas)
+        """
+        self._garantir_carregado()
+        codigos = np.asarray(codigos, dtype=np.int64)
+        if len(self._codigos) == 0:
+            return np.full(codigos.shape, -1, dtype=np.int64)
+        
+        posicoes = np.searchsorted(self._codigos, codigos)
+        posicoes = np.clip(posicoes, 0, len(self._codigos) - 1)
+        return np.where(self._codigos[posicoes] == codigos, posicoes, -1)
+    
+    def calcular_lote(self, origens, destinos, aplicar_circuidade: bool = True) -> np.ndarray:
+        """
+        Calcula as distâncias de vários pares (origem, destino) de uma vez.
+        
+        Args:
+            origens: Códigos IBGE de origem
+            destinos: Códigos IBGE de destino (mesmo tamanho de origens)
+            aplicar_circuidade: Se True, multiplica pelo fator do par de UFs
+        
+        Returns:
+            Distâncias em km (float64); NaN onde algum código não tem coordenadas
+        """
+        idx_origem = self.indices_municipios(self._converter_codigos(origens))
+        idx_destino = self.indices_municipios(self._converter_codigos(destinos))
+        
+        distancias = np.full(idx_origem.shape, np.nan, dtype=np.float64)
+        validos = (idx_origem >= 0) & (idx_destino >= 0)
+        if not validos.any():
+            return distancias
+        
+        origem_validos = idx_origem[validos]
+        destino_validos = idx_destino[validos]
+        self._garantir_linhas(origem_validos)
+        
+        km = self._matriz[origem_validos, destino_validos].astype(np.float64)
+        if aplicar_circuidade:
+            km *= self._circuidade[self._ufs[origem_validos], self._ufs[destino_validos]]
+        
+        distancias[validos] = km
+        return distancias
+    
+    def distancia_km(self, origem, destino, aplicar_circuidade: bool = True) -> Optional[float]:
+        """
+        Distância entre dois municípios.
+        
+        Args:
+            origem: Código IBGE de origem
+            destino: Código IBGE de destino
+            aplicar_circuidade: Se True, multiplica pelo fator do par de UFs
+        
+        Returns:
+            Distância em km ou None se algum código não tem coordenadas
+        """
+        km = self.calcular_lote([origem], [destino], aplicar_circuidade)[0]
+        return None if np.isnan(km) else float(km)
+    
+    @staticmethod
+    def _converter_codigos(codigos) -> np.ndarray:
+        """Converte códigos (str/int/None) para int64; inválidos viram -1."""
+        if isinstance(codigos, np.ndarray) and codigos.dtype.kind in 'iu':
+            return codigos.astype(np.int64, copy=False)
+        
+        convertidos = []
+        for codigo in codigos:
+            try:
+                convertidos.append(int(codigo))
+            except (TypeError, ValueError):
+                convertidos.append(-1)
+        return np.asarray(convertidos, dtype=np.int64)
@@ -5,8 +5,10 @@ ETL Service - Serviço principal de ETL (Extract, Transform, Load)
 
 import os
 import sys
+import json
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional
 
 # Adicionar path para cte_extractor
 current_dir = os.path.dirname(__file__)
@@ -26,16 +28,36 @@ class ETLService:
     Orquestra extração, transformação e carregamento de dados.
     """
     
-    def __init__(self, db_manager, stats_manager):
+    def __init__(self, db_manager, stats_manager, manifest_manager=None,
+                 distancia_service=None, referencias=None, orquestrador_views=None,
+                 particoes=None, geracao=None):
         """
         Inicializa o serviço ETL.
         
         Args:
             db_manager: Manager de banco de dados
             stats_manager: Manager de estatísticas
+            manifest_manager: Manager do manifesto de ingestão (opcional)
+            distancia_service: DistanciaService ou RotaDistanciaManager (opcional);
+                sem ele a quilometragem é estimada por frete ÷ custo/km
+            referencias: ReferenciaCompartilhadaManager (opcional); resolve
+                município por nome e UF sem consultar o banco
+            orquestrador_views: OrquestradorViews (opcional); atualiza as
+                views materializadas afetadas ao fim de cada processamento
+            particoes: ParticaoManager (opcional); cria as partições mensais
+                dos documentos antes de carregá-los
+            geracao: GeracaoDadosManager (opcional); incrementa a geração
+                dos dados após cada bloco confirmado (invalida o cache dos
+                dashboards)
         """
         self.db_manager = db_manager
         self.stats_manager = stats_manager
+        self.manifest_manager = manifest_manager
+        self.distancia_service = distancia_service
+        self.referencias = referencias
+        self.orquestrador_views = orquestrador_views
+        self.particoes = particoes
+        self.geracao = geracao
         self.cte_facade = CTEFacade()
         
         # Repositórios (serão criados depois)
@@ -43,27 +65,46 @@ class ETLService:
         self._veiculo_repo = None
         self._documento_repo = None
     
-    def processar_lote_arquivos(self, arquivos: List[Path], custo_por_km: float) -> bool:
+    def processar_lote_arquivos(self, arquivos: Iterable[Path], custo_por_km: float,
+                                tamanho_lote: int = 500, atualizar_views: bool = True) -> bool:
         """
         Processa um lote de arquivos XML.
         
         Args:
-            arquivos: Lista de arquivos para processar
+            arquivos: Lista ou iterador de arquivos para processar (um
+                iterador começa a ser processado sem esperar a descoberta)
             custo_por_km: Custo por quilômetro para cálculos
+            tamanho_lote: Arquivos reivindicados no manifesto por vez
+            atualizar_views: Atualiza as views materializadas ao final (o
+                modo daemon desliga e atualiza no seu próprio intervalo)
             
         Returns:
             True se processamento foi bem-sucedido
         """
-        if not arquivos:
+        total = self._contar_arquivos(arquivos)
+        if total == 0:
             print("❌ Nenhum arquivo para processar")
             return False
         
-        print(f"🚀 Iniciando processamento de {len(arquivos)} arquivos...")
+        print(f"🚀 Iniciando processamento de {total if total else 'N'} arquivos...")
         self.stats_manager.iniciar_cronometro()
+        self._garantir_particoes()
         
         try:
-            for idx, arquivo in enumerate(arquivos, 1):
-                self._processar_arquivo_individual(arquivo, custo_por_km, idx, len(arquivos))
+            idx = 0
+            for bloco in self._reivindicar_blocos(arquivos, tamanho_lote):
+                sucessos = self.stats_manager.estatisticas['sucessos']
+                for arquivo in bloco:
+                    idx += 1
+                    self._processar_arquivo_individual(arquivo, custo_por_km, idx, total)
+                self._descarregar_manifesto()
+                if self.stats_manager.estatisticas['sucessos'] > sucessos:
+                    self._incrementar_geracao()
+            
+            if total is None and idx == 0 and not self.stats_manager.estatisticas['arquivos_ignorados']:
+                print("❌ Nenhum arquivo para processar")
+                self.stats_manager.parar_cronometro()
+                return False
             
             # Finalizar processamento
             tempo_total = self.stats_manager.parar_cronometro()
@@ -83,6 +124,341 @@ class ETLService:
             print(f"❌ Erro grave no processamento: {e}")
             self.stats_manager.parar_cronometro()
             return False
+        
+        finally:
+            self._finalizar_manifesto()
+            if atualizar_views:
+                self.atualizar_views()
+    
+    def processar_arquivos_em_lotes(self, arquivos: Iterable[Path], custo_por_km: float,
+                                    tamanho_lote: int = 500, atualizar_views: bool = True) -> bool:
+        """
+        Processa arquivos XML enviando lotes para cte.f_ingest_cte_batch.
+        
+        Extração e transformação continuam por arquivo; o carregamento de
+        cada lote é feito em uma única chamada (um round trip por lote).
+        
+        Args:
+            arquivos: Lista ou iterador de arquivos para processar
+            custo_por_km: Custo por quilômetro para cálculos
+            tamanho_lote: Quantidade de documentos por chamada ao banco
+            atualizar_views: Atualiza as views materializadas ao final
+        
+        Returns:
+            True se processamento foi bem-sucedido
+        """
+        total = self._contar_arquivos(arquivos)
+        if total == 0:
+            print("❌ Nenhum arquivo para processar")
+            return False
+        
+        tamanho_lote = max(1, tamanho_lote)
+        print(f"🚀 Iniciando processamento de {total if total else 'N'} arquivos "
+              f"em lotes de {tamanho_lote}...")
+        self.stats_manager.iniciar_cronometro()
+        self._garantir_particoes()
+        
+        try:
+            idx = 0
+            for bloco in self._reivindicar_blocos(arquivos, tamanho_lote):
+                pendentes = []
+                for arquivo in bloco:
+                    payload = self._preparar_payload_arquivo(arquivo, custo_por_km)
+                    if payload:
+                        pendentes.append((arquivo, payload))
+                
+                if pendentes:
+                    self._aplicar_distancias([payload for _, payload in pendentes])
+                    self._garantir_particoes([payload for _, payload in pendentes])
+                    if self._carregar_lote(pendentes):
+                        self._incrementar_geracao()
+                self._descarregar_manifesto()
+                
+                idx += len(bloco)
+                self.stats_manager.imprimir_progresso(idx, total)
+            
+            if total:
+                self.stats_manager.imprimir_progresso(total, total)
+            elif idx == 0 and not self.stats_manager.estatisticas['arquivos_ignorados']:
+                print("❌ Nenhum arquivo para processar")
+                self.stats_manager.parar_cronometro()
+                return False
+            
+            self.stats_manager.parar_cronometro()
+            
+            taxa_sucesso = self.stats_manager.get_taxa_sucesso()
+            sucesso = taxa_sucesso >= 50.0
+            
+            if sucesso:
+                print(f"✅ Processamento em lotes concluído com sucesso!")
+            else:
+                print(f"⚠️ Processamento concluído com problemas (taxa: {taxa_sucesso:.1f}%)")
+            
+            return sucesso
+        
+        except Exception as e:
+            print(f"❌ Erro grave no processamento em lotes: {e}")
+            self.stats_manager.parar_cronometro()
+            return False
+        
+        finally:
+            self._finalizar_manifesto()
+            if atualizar_views:
+                self.atualizar_views()
+    
+    @staticmethod
+    def _contar_arquivos(arquivos: Iterable[Path]) -> Optional[int]:
+        """Retorna o total de arquivos ou None se for um iterador (streaming)."""
+        return len(arquivos) if hasattr(arquivos, '__len__') else None
+    
+    def _reivindicar_blocos(self, arquivos: Iterable[Path], tamanho_lote: int):
+        """
+        Divide os arquivos em blocos e reivindica cada bloco no manifesto.
+        
+        Sem manifesto os blocos são devolvidos inteiros. Com manifesto, os
+        arquivos concluídos ou em processamento por outra execução são
+        contados como ignorados.
+        
+        Args:
+            arquivos: Lista ou iterador de arquivos para processar
+            tamanho_lote: Quantidade de arquivos por bloco
+        
+        Yields:
+            Lista de arquivos a processar nesta execução
+        """
+        tamanho_lote = max(1, tamanho_lote)
+        iterador = iter(arquivos)
+        while True:
+            bloco = list(islice(iterador, tamanho_lote))
+            if not bloco:
+                break
+            
+            if self.manifest_manager:
+                reivindicados = self.manifest_manager.reivindicar(bloco)
+                ignorados = len(bloco) - len(reivindicados)
+                if ignorados:
+                    self.stats_manager.incrementar('arquivos_ignorados', ignorados)
+                bloco = reivindicados
+            
+            yield bloco
+    
+    def _registrar_manifesto(self, arquivo: Path, sucesso: bool, chave: str = None,
+                             classe_erro: str = None, mensagem: str = None) -> None:
+        """Acumula o resultado do arquivo no manifesto, se habilitado."""
+        if self.manifest_manager:
+            self.manifest_manager.registrar(arquivo, sucesso, chave, classe_erro, mensagem)
+    
+    def _descarregar_manifesto(self) -> None:
+        """Grava no manifesto os resultados do bloco concluído."""
+        if self.manifest_manager:
+            self.manifest_manager.descarregar()
+    
+    def _incrementar_geracao(self) -> None:
+        """Sinaliza aos dashboards que há dados novos confirmados."""
+        if self.geracao:
+            self.geracao.incrementar()
+    
+    def _garantir_particoes(self, documentos: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Cria as partições mensais ainda inexistentes antes da carga.
+        
+        Args:
+            documentos: Payloads/dados dos documentos a carregar; sem eles,
+                garante o mês atual e os seguintes
+        """
+        if not self.particoes:
+            return
+        
+        try:
+            if documentos is None:
+                self.particoes.garantir_futuras()
+            else:
+                self.particoes.garantir_documentos(documentos)
+        except Exception as e:
+            # Sem a partição, a carga do documento falha e é registrada como erro
+            print(f"⚠️ Erro ao criar partições: {e}")
+    
+    def atualizar_views(self) -> None:
+        """Atualiza as views materializadas afetadas pelo processamento."""
+        if not self.orquestrador_views:
+            return
+        
+        try:
+            if self.orquestrador_views.atualizar()['atualizadas']:
+                self._incrementar_geracao()
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar views materializadas: {e}")
+    
+    def _finalizar_manifesto(self) -> None:
+        """Grava resultados pendentes e libera reivindicações não processadas."""
+        if not self.manifest_manager:
+            return
+        
+        self.manifest_manager.descarregar()
+        liberados = self.manifest_manager.liberar_reivindicacoes()
+        if liberados:
+            print(f"⚠️ {liberados} arquivos devolvidos ao manifesto como pendentes")
+    
+    def _preparar_payload_arquivo(self, arquivo: Path,
+                                  custo_por_km: float) -> Optional[Dict[str, Any]]:
+        """
+        Executa extração e transformação de um arquivo e monta o payload de ingestão.
+        
+        Args:
+            arquivo: Path do arquivo XML
+            custo_por_km: Custo por quilômetro
+        
+        Returns:
+            Payload no formato de cte.f_ingest_cte_json ou None se falhou
+        """
+        try:
+            dados_cte = self._extrair_dados(arquivo)
+            if not dados_cte:
+                self.stats_manager.registrar_erro(arquivo.name, "Falha na extração de dados")
+                self._registrar_manifesto(arquivo, False, classe_erro='extracao',
+                                          mensagem="Falha na extração de dados")
+                return None
+            
+            dados_transformados = self._transformar_dados(dados_cte, custo_por_km)
+            if not dados_transformados:
+                self.stats_manager.registrar_erro(arquivo.name, "Falha na transformação de dados")
+                self._registrar_manifesto(arquivo, False, dados_cte.get('CT-e_chave'),
+                                          'transformacao', "Falha na transformação de dados")
+                return None
+            
+            return self._montar_payload_ingestao(dados_cte, dados_transformados)
+        
+        except Exception as e:
+            self.stats_manager.registrar_erro(arquivo.name, f"Erro inesperado: {str(e)}")
+            self._registrar_manifesto(arquivo, False, classe_erro=type(e).__name__,
+                                      mensagem=str(e))
+            return None
+    
+    def _montar_payload_ingestao(self, dados_cte: Dict[str, Any],
+                                 dados_transformados: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Monta o documento JSON aceito por cte.f_ingest_cte_json/f_ingest_cte_batch.
+        
+        Args:
+            dados_cte: Dados extraídos do CT-e
+            dados_transformados: Dados normalizados por _transformar_dados
+        
+        Returns:
+            Payload de ingestão
+        """
+        documento = dados_transformados['documento']
+        origem = dados_cte.get('Origem') or {}
+        destino = dados_cte.get('Destino') or {}
+        carga = dados_transformados.get('carga') or {}
+        
+        payload = {
+            'chave': documento.get('chave'),
+            'numero': documento.get('numero'),
+            'serie': documento.get('serie'),
+            'cfop': documento.get('cfop'),
+            'valor_frete': documento.get('valor_frete'),
+            'quilometragem': documento.get('quilometragem'),
+            'fonte_quilometragem': documento.get('fonte_quilometragem'),
+            'data_emissao': documento.get('data_emissao'),
+            'versao_schema': dados_cte.get('Versao_Schema'),
+            'origem_cidade': origem.get('cidade'),
+            'origem_uf': origem.get('uf'),
+            'origem_cod_municipio': documento.get('origem_cod_municipio'),
+            'destino_cidade': destino.get('cidade'),
+            'destino_uf': destino.get('uf'),
+            'destino_cod_municipio': documento.get('destino_cod_municipio'),
+            'placa': dados_transformados.get('veiculo', {}).get('placa'),
+            'carga': {
+                'valor': carga.get('valor_carga'),
+                'peso': carga.get('peso_liquido') or carga.get('peso_bruto'),
+                'quantidade': carga.get('quantidade'),
+                'produto_predominante': carga.get('descricao'),
+                'unidade_medida': carga.get('unidade')
+            }
+        }
+        
+        for tipo, chave_extrator in (('remetente', 'Remetente'), ('destinatario', 'Destinatario'),
+                                     ('expedidor', 'Expedidor'), ('recebedor', 'Recebedor')):
+            if dados_cte.get(chave_extrator):
+                payload[tipo] = self._montar_parte_payload(dados_cte[chave_extrator])
+        
+        return payload
+    
+    def _montar_parte_payload(self, dados_pessoa: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte pessoa do extrator para o formato de parte do payload de ingestão."""
+        pessoa = self._normalizar_dados_pessoa(dados_pessoa)
+        endereco = dados_pessoa.get('endereco') or {}
+        
+        return {
+            'nome': pessoa['nome'],
+            'documento': pessoa['cpf_cnpj'],
+            'inscricao_estadual': pessoa['inscricao_estadual'],
+            'endereco': {
+                'xlgr': pessoa['endereco']['logradouro'],
+                'nro': pessoa['endereco']['numero'],
+                'xbairro': pessoa['endereco']['bairro'],
+                'xmun': pessoa['endereco']['municipio'],
+                'uf': pessoa['endereco']['uf'],
+                'cep': pessoa['endereco']['cep']
+            } if endereco else None
+        }
+    
+    def _carregar_lote(self, pendentes: List[tuple]) -> int:
+        """
+        Carrega um lote de payloads com uma única chamada a cte.f_ingest_cte_batch.
+        
+        Args:
+            pendentes: Lista de tuplas (arquivo, payload)
+        
+        Returns:
+            Número de documentos carregados
+        """
+        payloads = [payload for _, payload in pendentes]
+        
+        try:
+            with self.db_manager.get_cursor() as (cursor, conn):
+                cursor.execute(
+                    "SELECT ordem, chave, id_cte, inserido FROM cte.f_ingest_cte_batch(%s::jsonb)",
+                    (json.dumps(payloads, default=str),)
+                )
+                resultados = {row[0]: row for row in cursor.fetchall()}
+        except Exception as e:
+            print(f"   ❌ Erro no carregamento do lote: {e}")
+            for arquivo, payload in pendentes:
+                self.stats_manager.registrar_erro(
+                    arquivo.name,
+                    f"Falha no carregamento em lote: {type(e).__name__}"
+                )
+                self._registrar_manifesto(arquivo, False, payload.get('chave'),
+                                          type(e).__name__, str(e))
+            return 0
+        
+        carregados = 0
+        for ordem, (arquivo, payload) in enumerate(pendentes, 1):
+            resultado = resultados.get(ordem)
+            if not resultado or resultado[2] is None:
+                self.stats_manager.registrar_erro(arquivo.name, "Falha no carregamento no banco")
+                self._registrar_manifesto(arquivo, False, payload.get('chave'), 'carga',
+                                          "Falha no carregamento no banco")
+                continue
+            
+            if resultado[3]:
+                self.stats_manager.incrementar('documentos_inseridos')
+            else:
+                self.stats_manager.incrementar('documentos_duplicados')
+            
+            self.stats_manager.registrar_sucesso(
+                arquivo.name,
+                {
+                    'chave_cte': resultado[1],
+                    'valor_frete': payload.get('valor_frete', 0),
+                    'quilometragem': payload.get('quilometragem', 0)
+                }
+            )
+            self._registrar_manifesto(arquivo, True, resultado[1])
+            carregados += 1
+        
+        return carregados
     
     def _processar_arquivo_individual(self, arquivo: Path, custo_por_km: float, 
                                     idx: int, total: int) -> bool:
@@ -106,6 +482,8 @@ class ETLService:
                     arquivo.name, 
                     "Falha na extração de dados"
                 )
+                self._registrar_manifesto(arquivo, False, classe_erro='extracao',
+                                          mensagem="Falha na extração de dados")
                 return False
             
             # 2. TRANSFORM - Transformar e validar dados
@@ -115,8 +493,12 @@ class ETLService:
                     arquivo.name, 
                     "Falha na transformação de dados"
                 )
+                self._registrar_manifesto(arquivo, False, dados_cte.get('CT-e_chave'),
+                                          'transformacao', "Falha na transformação de dados")
                 return False
             
+            self._aplicar_distancias([dados_transformados['documento']])
+            
             # 3. LOAD - Carregar no banco de dados
             sucesso_load = self._carregar_dados(dados_transformados)
             if not sucesso_load:
@@ -124,6 +506,8 @@ class ETLService:
                     arquivo.name, 
                     "Falha no carregamento no banco"
                 )
+                self._registrar_manifesto(arquivo, False, dados_cte.get('CT-e_chave'),
+                                          'carga', "Falha no carregamento no banco")
                 return False
             
             # Registrar sucesso
@@ -135,6 +519,7 @@ class ETLService:
                     'quilometragem': dados_transformados.get('quilometragem', 0)
                 }
             )
+            self._registrar_manifesto(arquivo, True, dados_cte.get('CT-e_chave'))
             
             # Mostrar progresso
             self.stats_manager.imprimir_progresso(idx, total)
@@ -146,6 +531,8 @@ class ETLService:
                 arquivo.name, 
                 f"Erro inesperado: {str(e)}"
             )
+            self._registrar_manifesto(arquivo, False, classe_erro=type(e).__name__,
+                                      mensagem=str(e))
             return False
     
     def _extrair_dados(self, arquivo: Path) -> Optional[Dict[str, Any]]:
@@ -194,9 +581,12 @@ class ETLService:
             
             quilometragem_service = QuilometragemService()
             
-            # Cálculo de quilometragem
+            # Cálculo de quilometragem (estimativa por frete; substituída pela
+            # distância entre municípios em _aplicar_distancias quando possível)
             valor_frete = float(dados_cte.get('Valor_frete', 0))
             quilometragem = quilometragem_service.calcular_quilometragem(valor_frete, custo_por_km)
+            origem = dados_cte.get('Origem') or {}
+            destino = dados_cte.get('Destino') or {}
             
             # Normalização de dados de pessoa
             remetente = self._normalizar_dados_pessoa(dados_cte.get('Remetente', {}))
@@ -214,7 +604,10 @@ class ETLService:
                     'data_emissao': dados_cte.get('Data_emissao', ''),
                     'cfop': dados_cte.get('CFOP', ''),
                     'valor_frete': valor_frete,
-                    'quilometragem': quilometragem
+                    'quilometragem': quilometragem,
+                    'fonte_quilometragem': 'frete',
+                    'origem_cod_municipio': origem.get('cod_municipio'),
+                    'destino_cod_municipio': destino.get('cod_municipio')
                 },
                 'remetente': remetente,
                 'destinatario': destinatario,
@@ -228,6 +621,41 @@ class ETLService:
             print(f"   ❌ Erro na transformação: {e}")
             return None
     
+    def _aplicar_distancias(self, documentos: List[Dict[str, Any]]) -> int:
+        """
+        Substitui a quilometragem estimada pela distância entre os municípios.
+        
+        Calcula todas as rotas dos documentos em uma chamada vetorizada.
+        Documentos sem coordenadas (ou com origem = destino) mantêm a
+        estimativa por frete.
+        
+        Args:
+            documentos: Dicionários com origem_cod_municipio,
+                destino_cod_municipio e quilometragem (alterados no lugar)
+        
+        Returns:
+            Número de documentos com quilometragem por distância
+        """
+        if not self.distancia_service or not documentos:
+            return 0
+        
+        try:
+            distancias = self.distancia_service.calcular_lote(
+                [documento.get('origem_cod_municipio') for documento in documentos],
+                [documento.get('destino_cod_municipio') for documento in documentos]
+            )
+        except Exception as e:
+            print(f"   ⚠️ Erro no cálculo de distâncias: {e}")
+            return 0
+        
+        aplicadas = 0
+        for documento, km in zip(documentos, distancias):
+            if km > 0:
+                documento['quilometragem'] = round(float(km), 1)
+                documento['fonte_quilometragem'] = 'haversine'
+                aplicadas += 1
+        return aplicadas
+    
     def _normalizar_dados_pessoa(self, dados_pessoa: Dict[str, Any]) -> Dict[str, Any]:
         """
         Normaliza dados de pessoa (remetente/destinatário).
@@ -346,6 +774,8 @@ class ETLService:
             # Aqui seria a integração com repositories
             # Por enquanto, simulação básica usando database_manager
             
+            self._garantir_particoes([dados['documento']])
+            
             with self.db_manager.get_connection() as conn:
                 with conn.cursor() as cursor:
                     # Inserir remetente
@@ -556,6 +986,11 @@ class ETLService:
                 if result:
                     id_municipio_destino = result[0]
             
+            # Sem data no XML, o mês da chave (cte.documento é particionada pela data)
+            data_emissao = dados_doc.get('data_emissao') or None
+            if data_emissao is None and self.particoes:
+                data_emissao = self.particoes.mes_da_chave(chave)
+            
             # Inserir novo documento COM relacionamentos
             cursor.execute("""
                 INSERT INTO cte.documento (
@@ -569,7 +1004,7 @@ class ETLService:
                 chave,
                 dados_doc.get('numero', ''),
                 dados_doc.get('serie', ''),
-                dados_doc.get('data_emissao', ''),
+                data_emissao,
                 dados_doc.get('cfop', ''),
                 dados_doc.get('valor_frete', 0),
                 dados_doc.get('quilometragem', 0),
@@ -598,6 +1033,13 @@ class ETLService:
             if not municipio or not uf:
                 return None
             
+            # Busca exata na memória compartilhada do host, se publicada
+            tabelas = self.referencias.atual() if self.referencias is not None else None
+            if tabelas is not None:
+                codigo = tabelas.codigo_municipio(municipio, uf)
+                if codigo is not None:
+                    return codigo
+            
             # Busca exata primeiro
             cursor.execute("""
                 SELECT m.id_municipio 
@@ -679,13 +1121,26 @@ class ETLService:
             unidade = dados_carga.get('unidade', 'UN').strip().upper()
             valor_carga = dados_carga.get('valor_carga', 0)
             
-            # Inserir carga mesmo sem peso, pois temos outros dados importantes
-            cursor.execute("""
+            # Com particionamento, a carga leva a data de emissão do documento
+            # (chave de partição) e o conflito é pela constraint carga_pkey
+            if self.particoes:
+                insercao = """
+                INSERT INTO cte.carga (
+                    id_cte, valor, peso, quantidade, 
+                    produto_predominante, unidade_medida, data_emissao
+                ) SELECT %s, %s, %s, %s, %s, %s, d.data_emissao
+                  FROM cte.documento d WHERE d.id_cte = %s
+                ON CONFLICT ON CONSTRAINT carga_pkey DO UPDATE SET"""
+            else:
+                insercao = """
                 INSERT INTO cte.carga (
                     id_cte, valor, peso, quantidade, 
                     produto_predominante, unidade_medida
                 ) VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id_cte) DO UPDATE SET
+                ON CONFLICT (id_cte) DO UPDATE SET"""
+            
+            # Inserir carga mesmo sem peso, pois temos outros dados importantes
+            cursor.execute(insercao + """
                     valor = EXCLUDED.valor,
                     peso = EXCLUDED.peso,
                     quantidade = EXCLUDED.quantidade,
@@ -698,7 +1153,7 @@ class ETLService:
                 quantidade,
                 descricao,
                 unidade
-            ))
+            ) + ((documento_id,) if self.particoes else ()))
             
             return True
             
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+Índice Espacial Service - Consultas por raio, vizinho mais próximo e regiões
+"""
+
+import math
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from .distancia_service import DistanciaService
+
+
+class IndiceEspacialService:
+    """
+    Índice espacial dos municípios em uma grade uniforme de latitude/longitude.
+    
+    Cada município cai em uma célula de tamanho_celula graus. Os municípios
+    ficam ordenados por célula (layout CSR: um vetor de posições e o início
+    de cada célula), então uma consulta visita apenas as células que cruzam
+    a caixa da busca e calcula haversine só para esses candidatos.
+    
+    A mesma filtragem por caixa existe no banco em ibge.f_municipios_na_caixa
+    e ibge.f_municipios_no_raio (migrations/create_indice_espacial.sql).
+    """
+    
+    KM_POR_GRAU = math.pi * DistanciaService.RAIO_TERRA_KM / 180
+    
+    def __init__(self, db_manager=None, tamanho_celula: float = 0.5):
+        """
+        Inicializa o índice espacial.
+        
+        Args:
+            db_manager: Manager de banco (fonte das coordenadas)
+            tamanho_celula: Lado da célula da grade em graus
+        """
+        if tamanho_celula <= 0:
+            raise ValueError("tamanho_celula deve ser positivo")
+        
+        self.db_manager = db_manager
+        self.tamanho_celula = float(tamanho_celula)
+        
+        self._codigos = None    # códigos IBGE ordenados por célula
+        self._lat = None        # graus, mesma ordem de _codigos
+        self._lon = None
+        self._inicio = None     # início de cada célula em _codigos (CSR)
+        self._origem = None     # (lat_min, lon_min) da grade
+        self._forma = None      # (linhas, colunas) da grade
+        self._ordenados = None  # códigos IBGE em ordem crescente
+        self._por_codigo = None # posição em _codigos de cada código de _ordenados
+    
+    # ========== CARREGAMENTO ==========
+    
+    @property
+    def total_municipios(self) -> int:
+        """Quantidade de municípios indexados."""
+        self._garantir_carregado()
+        return len(self._codigos)
+    
+    def definir_coordenadas(self, codigos: Iterable[int], latitudes: Iterable[float],
+                            longitudes: Iterable[float]) -> int:
+        """
+        Monta o índice a partir de coordenadas (sem consultar o banco).
+        
+        Args:
+            codigos: Códigos IBGE dos municípios
+            latitudes: Latitudes em graus
+            longitudes: Longitudes em graus
+        
+        Returns:
+            Quantidade de municípios com coordenadas válidas
+        """
+        codigos = np.asarray(list(codigos), dtype=np.int64)
+        latitudes = np.asarray(list(latitudes), dtype=np.float64)
+        longitudes = np.asarray(list(longitudes), dtype=np.float64)
+        
+        validos = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        codigos, latitudes, longitudes = codigos[validos], latitudes[validos], longitudes[validos]
+        
+        if len(codigos) == 0:
+            self._origem, self._forma = (0.0, 0.0), (1, 1)
+        else:
+            self._origem = (
+                math.floor(latitudes.min() / self.tamanho_celula) * self.tamanho_celula,
+                math.floor(longitudes.min() / self.tamanho_celula) * self.tamanho_celula,
+            )
+            self._forma = (
+                int((latitudes.max() - self._origem[0]) // self.tamanho_celula) + 1,
+                int((longitudes.max() - self._origem[1]) // self.tamanho_celula) + 1,
+            )
+        
+        linhas, colunas = self._celulas(latitudes, longitudes)
+        celulas = linhas * self._forma[1] + colunas
+        ordem = np.lexsort((codigos, celulas))
+        
+        self._codigos = codigos[ordem]
+        self._lat = latitudes[ordem]
+        self._lon = longitudes[ordem]
+        self._inicio = np.searchsorted(
+            celulas[ordem], np.arange(self._forma[0] * self._forma[1] + 1)
+        )
+        self._por_codigo = np.argsort(self._codigos, kind='stable')
+        self._ordenados = self._codigos[self._por_codigo]
+        return len(self._codigos)
+    
+    def _garantir_carregado(self) -> None:
+        """Carrega as coordenadas do banco na primeira consulta."""
+        if self._codigos is not None:
+            return
+        
+        if self.db_manager is None:
+            raise RuntimeError("Coordenadas não definidas e nenhum banco configurado")
+        
+        linhas = self.db_manager.execute_query("""
+            SELECT m.id_municipio, m.latitude, m.longitude
+            FROM ibge.municipio m
+            WHERE m.latitude IS NOT NULL AND m.longitude IS NOT NULL
+        """)
+        self.definir_coordenadas(
+            (linha[0] for linha in linhas),
+            (float(linha[1]) for linha in linhas),
+            (float(linha[2]) for linha in linhas)
+        )
+    
+    def _celulas(self, latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray]:
+        """Linha e coluna da grade de cada coordenada (limitadas à grade)."""
+        linhas = np.floor((np.asarray(latitudes, dtype=np.float64) - self._origem[0]) / self.tamanho_celula)
+        colunas = np.floor((np.asarray(longitudes, dtype=np.float64) - self._origem[1]) / self.tamanho_celula)
+        return (np.clip(linhas, 0, self._forma[0] - 1).astype(np.int64),
+                np.clip(colunas, 0, self._forma[1] - 1).astype(np.int64))
+    
+    def coordenadas(self, codigo: int) -> Optional[Tuple[float, float]]:
+        """
+        Coordenadas de um município indexado.
+        
+        Args:
+            codigo: Código IBGE
+        
+        Returns:
+            (latitude, longitude) em graus ou None se não indexado
+        """
+        self._garantir_carregado()
+        posicao = self._posicao(int(codigo))
+        if posicao < 0:
+            return None
+        return float(self._lat[posicao]), float(self._lon[posicao])
+    
+    def _posicao(self, codigo: int) -> int:
+        """Posição do código em _codigos (-1 se ausente)."""
+        i = int(np.searchsorted(self._ordenados, codigo))
+        if i < len(self._ordenados) and self._ordenados[i] == codigo:
+            return int(self._por_codigo[i])
+        return -1
+    
+    # ========== CONSULTAS ==========
+    
+    def _candidatos_caixa(self, lat_min: float, lat_max: float,
+                          lon_min: float, lon_max: float) -> np.ndarray:
+        """Posições dos municípios das células que cruzam a caixa."""
+        if len(self._codigos) == 0:
+            return np.zeros(0, dtype=np.int64)
+        
+        (linha_ini, linha_fim), (coluna_ini, coluna_fim) = self._celulas(
+            [lat_min, lat_max], [lon_min, lon_max]
+        )
+        fatias = []
+        for linha in range(linha_ini, linha_fim + 1):
+            base = linha * self._forma[1]
+            inicio = self._inicio[base + coluna_ini]
+            fim = self._inicio[base + coluna_fim + 1]
+            if fim > inicio:
+                fatias.append(np.arange(inicio, fim))
+        return np.concatenate(fatias) if fatias else np.zeros(0, dtype=np.int64)
+    
+    def na_caixa(self, lat_min: float, lat_max: float,
+                 lon_min: float, lon_max: float) -> np.ndarray:
+        """
+        Municípios dentro de uma caixa de latitude/longitude (inclusive).
+        
+        Returns:
+            Códigos IBGE ordenados
+        """
+        self._garantir_carregado()
+        candidatos = self._candidatos_caixa(lat_min, lat_max, lon_min, lon_max)
+        dentro = ((self._lat[candidatos] >= lat_min) & (self._lat[candidatos] <= lat_max) &
+                  (self._lon[candidatos] >= lon_min) & (self._lon[candidatos] <= lon_max))
+        return np.sort(self._codigos[candidatos[dentro]])
+    
+    def no_raio(self, latitude: float, longitude: float,
+                raio_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Municípios a até raio_km de um ponto.
+        
+        Args:
+            latitude: Latitude do centro em graus
+            longitude: Longitude do centro em graus
+            raio_km: Raio em km (distância haversine)
+        
+        Returns:
+            (códigos, distâncias em km) ordenados pela distância
+        """
+        self._garantir_carregado()
+        delta_lat = raio_km / self.KM_POR_GRAU
+        delta_lon = self._delta_longitude(latitude, raio_km)
+        
+        candidatos = self._candidatos_caixa(latitude - delta_lat, latitude + delta_lat,
+                                            longitude - delta_lon, longitude + delta_lon)
+        distancias = DistanciaService.haversine_km(
+            math.radians(latitude), math.radians(longitude),
+            np.radians(self._lat[candidatos]), np.radians(self._lon[candidatos])
+        )
+        dentro = distancias <= raio_km
+        candidatos, distancias = candidatos[dentro], distancias[dentro]
+        
+        ordem = np.lexsort((self._codigos[candidatos], distancias))
+        return self._codigos[candidatos[ordem]], distancias[ordem]
+    
+    def municipios_no_raio(self, codigo: int, raio_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Municípios a até raio_km de outro município (incluindo ele mesmo).
+        
+        Args:
+            codigo: Código IBGE do centro
+            raio_km: Raio em km
+        
+        Returns:
+            (códigos, distâncias em km); vazios se o centro não tem coordenadas
+        """
+        centro = self.coordenadas(codigo)
+        if centro is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        return self.no_raio(centro[0], centro[1], raio_km)
+    
+    def mais_proximo(self, latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Município mais próximo de cada ponto.
+        
+        A busca percorre anéis de células em volta do ponto e para quando
+        o próximo anel não pode conter nada mais perto que o melhor atual.
+        
+        Args:
+            latitudes: Latitudes em graus
+            longitudes: Longitudes em graus
+        
+        Returns:
+            (códigos, distâncias em km); -1 / NaN se o índice estiver vazio
+        """
+        self._garantir_carregado()
+        latitudes = np.atleast_1d(np.asarray(latitudes, dtype=np.float64))
+        longitudes = np.atleast_1d(np.asarray(longitudes, dtype=np.float64))
+        codigos = np.full(len(latitudes), -1, dtype=np.int64)
+        distancias = np.full(len(latitudes), np.nan, dtype=np.float64)
+        if len(self._codigos) == 0:
+            return codigos, distancias
+        
+        # Menor largura de célula em km dentro da grade (longitude encolhe com a
+        # latitude), com folga para a curvatura entre meridianos
+        lat_extrema = max(abs(self._origem[0]), abs(self._origem[0] + self._forma[0] * self.tamanho_celula))
+        km_celula = 0.95 * self.tamanho_celula * self.KM_POR_GRAU * max(
+            math.cos(math.radians(min(lat_extrema, 90.0))), 1e-6
+        )
+        anel_maximo = max(self._forma)
+        
+        linhas, colunas = self._celulas(latitudes, longitudes)
+        for i, (lat, lon, linha, coluna) in enumerate(zip(latitudes, longitudes, linhas, colunas)):
+            lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+            melhor, melhor_km = -1, math.inf
+            for anel in range(anel_maximo + 1):
+                # Tudo a partir deste anel está a pelo menos (anel - 1) células
+                if melhor >= 0 and (anel - 1) * km_celula > melhor_km:
+                    break
+                candidatos = self._anel(linha, coluna, anel)
+                if len(candidatos) == 0:
+                    continue
+                km = DistanciaService.haversine_km(
+                    lat_rad, lon_rad, np.radians(self._lat[candidatos]), np.radians(self._lon[candidatos])
+                )
+                j = int(np.argmin(km))
+                if km[j] < melhor_km:
+                    melhor, melhor_km = int(candidatos[j]), float(km[j])
+            codigos[i], distancias[i] = self._codigos[melhor], melhor_km
+        
+        return codigos, distancias
+    
+    def _anel(self, linha: int, coluna: int, anel: int) -> np.ndarray:
+        """Posições dos municípios nas células à distância (Chebyshev) anel."""
+        linhas_grade, colunas_grade = self._forma
+        fatias = []
+        for l in range(linha - anel, linha + anel + 1):
+            if l < 0 or l >= linhas_grade:
+                continue
+            if abs(l - linha) == anel:
+                faixas = [(coluna - anel, coluna + anel)]
+            else:
+                faixas = [(coluna - anel, coluna - anel), (coluna + anel, coluna + anel)]
+            for c_ini, c_fim in faixas:
+                c_ini, c_fim = max(c_ini, 0), min(c_fim, colunas_grade - 1)
+                if c_ini > c_fim:
+                    continue
+                base = l * colunas_grade
+                inicio, fim = self._inicio[base + c_ini], self._inicio[base + c_fim + 1]
+                if fim > inicio:
+                    fatias.append(np.arange(inicio, fim))
+        return np.concatenate(fatias) if fatias else np.zeros(0, dtype=np.int64)
+    
+    # ========== REGIÕES ==========
+    
+    def regioes(self, codigos, tamanho_regiao: Optional[float] = None) -> np.ndarray:
+        """
+        Região (célula de uma grade de tamanho_regiao graus) de cada município.
+        
+        Útil para agrupar origens/destinos próximos: municípios na mesma
+        célula recebem o mesmo identificador.
+        
+        Args:
+            codigos: Códigos IBGE
+            tamanho_regiao: Lado da região em graus (padrão: célula do índice)
+        
+        Returns:
+            Identificadores de região (int64); -1 para códigos sem coordenadas
+        """
+        self._garantir_carregado()
+        tamanho = float(tamanho_regiao or self.tamanho_celula)
+        
+        codigos = np.asarray(codigos, dtype=np.int64)
+        if len(self._ordenados) == 0:
+            return np.full(codigos.shape, -1, dtype=np.int64)
+        
+        i = np.clip(np.searchsorted(self._ordenados, codigos), 0, len(self._ordenados) - 1)
+        encontrados = self._ordenados[i] == codigos
+        posicoes = self._por_codigo[i]
+        
+        linhas = np.floor((self._lat[posicoes] + 90.0) / tamanho).astype(np.int64)
+        colunas = np.floor((self._lon[posicoes] + 180.0) / tamanho).astype(np.int64)
+        regioes = linhas * int(math.ceil(360.0 / tamanho)) + colunas
+        return np.where(encontrados, regioes, -1)
+    
+    def centro_regiao(self, regiao: int, tamanho_regiao: Optional[float] = None) -> Tuple[float, float]:
+        """
+        Centro geográfico de uma região retornada por regioes().
+        
+        Returns:
+            (latitude, longitude) em graus
+        """
+        tamanho = float(tamanho_regiao or self.tamanho_celula)
+        colunas = int(math.ceil(360.0 / tamanho))
+        linha, coluna = divmod(int(regiao), colunas)
+        return (linha + 0.5) * tamanho - 90.0, (coluna + 0.5) * tamanho - 180.0
+    
+    # ========== AUXILIARES ==========
+    
+    def _delta_longitude(self, latitude: float, raio_km: float) -> float:
+        """Meia largura em graus de longitude da caixa que contém o raio."""
+        lat_extrema = min(abs(latitude) + raio_km / self.KM_POR_GRAU, 90.0)
+        cosseno = math.cos(math.radians(lat_extrema))
+        if cosseno < 1e-6:
+            return 180.0
+        return min(raio_km / (self.KM_POR_GRAU * cosseno), 180.0)
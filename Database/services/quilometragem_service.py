@@ -3,7 +3,23 @@
 Quilometragem Service - Serviço para cálculos de quilometragem
 """
 
-from typing import Dict, Any
+import math
+from typing import Dict, Any, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Faixas de classificar_distancia: limites superiores (exclusivos) de cada categoria
+CATEGORIAS_DISTANCIA = (
+    "❌ INVÁLIDA", "🏘️ URBANA", "🏞️ REGIONAL", "🛣️ ESTADUAL",
+    "🗺️ INTERESTADUAL", "🌍 LONGA DISTÂNCIA"
+)
+LIMITES_DISTANCIA = np.array([50.0, 200.0, 800.0, 2000.0])
+
+# Categorias de validar_quilometragem
+CATEGORIAS_VALIDACAO = ('INVÁLIDA', 'CURTA', 'NORMAL', 'LONGA')
+
+PERCENTIS_PADRAO = (5, 25, 50, 75, 95, 99)
 
 
 class QuilometragemService:
@@ -208,4 +224,422 @@ class QuilometragemService:
         elif quilometragem < 2000:
             return "🗺️ INTERESTADUAL"
         else:
-            return "🌍 LONGA DISTÂNCIA"
\ No newline at end of file
+            return "🌍 LONGA DISTÂNCIA"
+    
+    # ========== API VETORIZADA (LOTES) ==========
+    
+    @staticmethod
+    def _como_arrays(dados, valores_frete=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Converte km/frete (arrays, listas ou DataFrame) em arrays float64.
+        
+        Args:
+            dados: Array de quilometragens ou DataFrame com as colunas
+                'quilometragem' e 'valor_frete'
+            valores_frete: Array de fretes (quando dados não é DataFrame)
+        
+        Returns:
+            Tupla (quilometragens, valores_frete); NaN vira 0
+        """
+        if hasattr(dados, 'columns'):
+            km = dados['quilometragem'].to_numpy(dtype=np.float64, na_value=0.0)
+            frete = (dados['valor_frete'].to_numpy(dtype=np.float64, na_value=0.0)
+                     if 'valor_frete' in dados.columns else np.zeros(len(km)))
+        else:
+            km = np.asarray(dados, dtype=np.float64)
+            frete = (np.asarray(valores_frete, dtype=np.float64)
+                     if valores_frete is not None else np.zeros(len(km)))
+        
+        return np.nan_to_num(km, nan=0.0), np.nan_to_num(frete, nan=0.0)
+    
+    def classificar_distancias(self, quilometragens) -> np.ndarray:
+        """
+        Versão vetorizada de classificar_distancia.
+        
+        Args:
+            quilometragens: Array de quilometragens
+        
+        Returns:
+            Códigos (int8) das categorias em CATEGORIAS_DISTANCIA
+        """
+        km = np.asarray(quilometragens, dtype=np.float64)
+        codigos = (np.searchsorted(LIMITES_DISTANCIA, km, side='right') + 1).astype(np.int8)
+        codigos[~(km > 0)] = 0
+        return codigos
+    
+    def validar_quilometragens(self, quilometragens) -> Dict[str, np.ndarray]:
+        """
+        Versão vetorizada de validar_quilometragem.
+        
+        Args:
+            quilometragens: Array de quilometragens
+        
+        Returns:
+            Dicionário com os arrays 'valida', 'categoria' (códigos em
+            CATEGORIAS_VALIDACAO), 'muito_curta' (< 10 km), 'longa'
+            (> 2000 km) e 'muito_longa' (> 5000 km)
+        """
+        km = np.asarray(quilometragens, dtype=np.float64)
+        valida = km > 0
+        
+        categoria = np.full(km.shape, 2, dtype=np.int8)
+        categoria[km < 50] = 1
+        categoria[km > 2000] = 3
+        categoria[~valida] = 0
+        
+        return {
+            'valida': valida,
+            'categoria': categoria,
+            'muito_curta': valida & (km < 10),
+            'longa': km > 2000,
+            'muito_longa': km > 5000
+        }
+    
+    @staticmethod
+    def limites_tukey(q1: float, q3: float, fator: float = 1.5) -> Tuple[float, float]:
+        """Cercas de Tukey (q1 - fator * IQR, q3 + fator * IQR)."""
+        iqr = q3 - q1
+        return q1 - fator * iqr, q3 + fator * iqr
+    
+    def marcar_outliers(self, dados, valores_frete=None,
+                        limites: Optional[Dict[str, Tuple[float, float]]] = None) -> np.ndarray:
+        """
+        Marca documentos com quilometragem ou custo por km fora das cercas de Tukey.
+        
+        Args:
+            dados: Array de quilometragens ou DataFrame (ver _como_arrays)
+            valores_frete: Array de fretes
+            limites: Cercas {'km': (min, max), 'custo_km': (min, max)}; se
+                omitidas, são calculadas sobre os próprios dados (no modo
+                em blocos use resultado['limites_outlier'])
+        
+        Returns:
+            Array booleano; documentos sem quilometragem nunca são outliers
+        """
+        km, frete = self._como_arrays(dados, valores_frete)
+        valida = km > 0
+        custo_km = np.divide(frete, km, out=np.zeros_like(frete), where=valida)
+        
+        if limites is None:
+            limites = self._limites_outlier(km[valida], custo_km[valida & (frete > 0)])
+        
+        fora_km = (km < limites['km'][0]) | (km > limites['km'][1])
+        fora_custo = (frete > 0) & ((custo_km < limites['custo_km'][0]) | (custo_km > limites['custo_km'][1]))
+        return valida & (fora_km | fora_custo)
+    
+    def _limites_outlier(self, km_validos: np.ndarray, custo_validos: np.ndarray) -> Dict[str, Tuple[float, float]]:
+        """Calcula as cercas de Tukey exatas de km e custo por km."""
+        limites = {}
+        for nome, valores in (('km', km_validos), ('custo_km', custo_validos)):
+            if len(valores):
+                q1, q3 = np.percentile(valores, [25, 75])
+                limites[nome] = self.limites_tukey(float(q1), float(q3))
+            else:
+                limites[nome] = (-math.inf, math.inf)
+        return limites
+    
+    def calcular_estatisticas_vetorizadas(self, dados, valores_frete=None,
+                                          percentis: Sequence[float] = PERCENTIS_PADRAO) -> Dict[str, Any]:
+        """
+        Estatísticas de quilometragem de um lote inteiro em operações vetorizadas.
+        
+        Retorna as mesmas chaves de calcular_estatisticas_quilometragem e
+        acrescenta percentis, histograma por categoria e outliers.
+        
+        Args:
+            dados: Array de quilometragens ou DataFrame com 'quilometragem'
+                e 'valor_frete' (ex.: resultado de pd.read_sql)
+            valores_frete: Array de fretes (quando dados não é DataFrame)
+            percentis: Percentis calculados (0-100)
+        
+        Returns:
+            Estatísticas de quilometragem
+        """
+        km, frete = self._como_arrays(dados, valores_frete)
+        if len(km) == 0:
+            return {}
+        
+        valida = km > 0
+        km_validos = km[valida]
+        if len(km_validos) == 0:
+            return {'erro': 'Nenhuma quilometragem válida encontrada'}
+        
+        fretes_validos = frete[frete > 0]
+        com_custo = valida & (frete > 0)
+        custo_km = frete[com_custo] / km[com_custo]
+        
+        estatisticas = self._estatisticas_base(
+            len(km), len(km_validos), float(km_validos.sum()), float(km_validos.min()),
+            float(km_validos.max()), len(fretes_validos), float(fretes_validos.sum())
+        )
+        
+        # Quartis entram na mesma chamada de np.percentile dos percentis pedidos
+        pedidos = sorted(set(percentis) | {25, 75})
+        limites = {}
+        for nome, valores in (('km', km_validos), ('custo_km', custo_km)):
+            calculados = self._percentis_exatos(valores, pedidos)
+            estatisticas[f'percentis_{nome}'] = {p: calculados[p] for p in percentis if p in calculados}
+            limites[nome] = (self.limites_tukey(calculados[25], calculados[75])
+                             if calculados else (-math.inf, math.inf))
+        
+        estatisticas['histograma_categorias'] = self._histograma_categorias(
+            np.bincount(self.classificar_distancias(km), minlength=len(CATEGORIAS_DISTANCIA))
+        )
+        
+        outliers = self.marcar_outliers(km, frete, limites)
+        estatisticas['limites_outlier'] = limites
+        estatisticas['total_outliers'] = int(outliers.sum())
+        estatisticas['aproximado'] = False
+        
+        return estatisticas
+    
+    def calcular_estatisticas_em_blocos(self, blocos: Iterable,
+                                        percentis: Sequence[float] = PERCENTIS_PADRAO) -> Dict[str, Any]:
+        """
+        Estatísticas de um fluxo de blocos sem carregar tudo em memória.
+        
+        Cada bloco é um DataFrame ou uma tupla (quilometragens, fretes), por
+        exemplo pd.read_sql(..., chunksize=N) ou iterar_blocos_banco().
+        Totais, mínimo, máximo e histograma por categoria são exatos;
+        percentis e cercas de outlier são aproximados (histograma
+        logarítmico, erro relativo < 0,6%). Para marcar os outliers,
+        percorra os blocos de novo com
+        marcar_outliers(bloco, limites=resultado['limites_outlier']).
+        
+        Args:
+            blocos: Iterável de blocos
+            percentis: Percentis calculados (0-100)
+        
+        Returns:
+            Estatísticas no formato de calcular_estatisticas_vetorizadas
+        """
+        parcial = EstatisticasQuilometragemParciais(self)
+        for bloco in blocos:
+            if isinstance(bloco, tuple):
+                parcial.atualizar(*bloco)
+            else:
+                parcial.atualizar(bloco)
+        return parcial.resultado(percentis)
+    
+    def iterar_blocos_banco(self, db_manager, tamanho_bloco: int = 500000,
+                            filtro: str = '', params: Dict[str, Any] = None):
+        """
+        Lê quilometragem e frete de cte.documento em blocos (cursor no servidor).
+        
+        Args:
+            db_manager: Manager de banco de dados
+            tamanho_bloco: Linhas por bloco
+            filtro: Condições adicionais sobre cte.documento d (``AND ...``)
+            params: Parâmetros nomeados do filtro
+        
+        Yields:
+            Tuplas (quilometragens, fretes) como arrays float64
+        """
+        with db_manager.get_connection() as conn:
+            with conn.cursor(name='sact_estatisticas_km') as cursor:
+                cursor.itersize = tamanho_bloco
+                cursor.execute(
+                    "SELECT d.quilometragem::float8, COALESCE(d.valor_frete, 0)::float8 "
+                    f"FROM cte.documento d WHERE TRUE {filtro}",
+                    params or {}
+                )
+                while True:
+                    linhas = cursor.fetchmany(tamanho_bloco)
+                    if not linhas:
+                        break
+                    matriz = np.asarray(linhas, dtype=np.float64)
+                    yield matriz[:, 0], matriz[:, 1]
+    
+    @staticmethod
+    def _estatisticas_base(total: int, com_km: int, soma_km: float, min_km: float,
+                           max_km: float, com_frete: int, soma_frete: float) -> Dict[str, Any]:
+        """Monta as chaves de calcular_estatisticas_quilometragem a partir dos totais."""
+        estatisticas = {
+            'total_ctes': total,
+            'ctes_com_quilometragem': com_km,
+            'quilometragem_total': soma_km,
+            'quilometragem_media': soma_km / com_km,
+            'quilometragem_min': min_km,
+            'quilometragem_max': max_km,
+            'valor_frete_total': soma_frete,
+            'valor_frete_medio': soma_frete / com_frete if com_frete else 0
+        }
+        
+        if soma_km > 0 and soma_frete > 0:
+            estatisticas['custo_medio_por_km'] = soma_frete / soma_km
+        else:
+            estatisticas['custo_medio_por_km'] = 0
+        
+        return estatisticas
+    
+    @staticmethod
+    def _percentis_exatos(valores: np.ndarray, percentis: Sequence[float]) -> Dict[float, float]:
+        """Percentis exatos (dicionário vazio se não há valores)."""
+        if len(valores) == 0:
+            return {}
+        return {p: float(v) for p, v in zip(percentis, np.percentile(valores, list(percentis)))}
+    
+    @staticmethod
+    def _histograma_categorias(contagens: np.ndarray) -> Dict[str, int]:
+        """Associa as contagens por código aos rótulos de CATEGORIAS_DISTANCIA."""
+        return {rotulo: int(total) for rotulo, total in zip(CATEGORIAS_DISTANCIA, contagens)}
+
+
+class EstatisticasQuilometragemParciais:
+    """
+    Acumulador combinável de estatísticas de quilometragem.
+    
+    Guarda totais, extremos, contagem por categoria e histogramas
+    logarítmicos de km e custo por km. Parciais de blocos, threads ou
+    processos diferentes são somados com combinar().
+    """
+    
+    LOG_MIN = -3.0          # 0,001
+    LOG_MAX = 7.0           # 10.000.000
+    BINS = 2000             # razão entre bordas ~1,16%
+    
+    def __init__(self, quilometragem_service: QuilometragemService = None):
+        """
+        Inicializa um acumulador vazio.
+        
+        Args:
+            quilometragem_service: Serviço usado na classificação (opcional)
+        """
+        self.servico = quilometragem_service or QuilometragemService()
+        self.total = 0
+        self.com_km = 0
+        self.soma_km = 0.0
+        self.min_km = math.inf
+        self.max_km = -math.inf
+        self.com_frete = 0
+        self.soma_frete = 0.0
+        self.categorias = np.zeros(len(CATEGORIAS_DISTANCIA), dtype=np.int64)
+        self.hist_km = np.zeros(self.BINS, dtype=np.int64)
+        self.hist_custo_km = np.zeros(self.BINS, dtype=np.int64)
+    
+    @classmethod
+    def _indices_bins(cls, valores: np.ndarray) -> np.ndarray:
+        """Bin logarítmico de cada valor (calculado, sem busca binária)."""
+        passo = (cls.LOG_MAX - cls.LOG_MIN) / cls.BINS
+        indices = np.floor((np.log10(valores) - cls.LOG_MIN) / passo)
+        return np.clip(indices, 0, cls.BINS - 1).astype(np.int64)
+    
+    def atualizar(self, dados, valores_frete=None) -> 'EstatisticasQuilometragemParciais':
+        """
+        Acumula um bloco.
+        
+        Args:
+            dados: Array de quilometragens ou DataFrame (ver QuilometragemService._como_arrays)
+            valores_frete: Array de fretes
+        
+        Returns:
+            O próprio acumulador
+        """
+        km, frete = self.servico._como_arrays(dados, valores_frete)
+        valida = km > 0
+        km_validos = km[valida]
+        fretes_validos = frete[frete > 0]
+        com_custo = valida & (frete > 0)
+        
+        self.total += len(km)
+        self.com_km += len(km_validos)
+        self.soma_km += float(km_validos.sum())
+        if len(km_validos):
+            self.min_km = min(self.min_km, float(km_validos.min()))
+            self.max_km = max(self.max_km, float(km_validos.max()))
+        self.com_frete += len(fretes_validos)
+        self.soma_frete += float(fretes_validos.sum())
+        
+        self.categorias += np.bincount(self.servico.classificar_distancias(km),
+                                       minlength=len(CATEGORIAS_DISTANCIA))
+        self.hist_km += np.bincount(self._indices_bins(km_validos), minlength=self.BINS)
+        self.hist_custo_km += np.bincount(
+            self._indices_bins(frete[com_custo] / km[com_custo]), minlength=self.BINS
+        )
+        return self
+    
+    def combinar(self, outro: 'EstatisticasQuilometragemParciais') -> 'EstatisticasQuilometragemParciais':
+        """
+        Soma outro acumulador a este.
+        
+        Args:
+            outro: Acumulador de outro bloco/worker
+        
+        Returns:
+            O próprio acumulador
+        """
+        self.total += outro.total
+        self.com_km += outro.com_km
+        self.soma_km += outro.soma_km
+        self.min_km = min(self.min_km, outro.min_km)
+        self.max_km = max(self.max_km, outro.max_km)
+        self.com_frete += outro.com_frete
+        self.soma_frete += outro.soma_frete
+        self.categorias += outro.categorias
+        self.hist_km += outro.hist_km
+        self.hist_custo_km += outro.hist_custo_km
+        return self
+    
+    def percentil(self, histograma: np.ndarray, percentil: float) -> Optional[float]:
+        """
+        Percentil aproximado de um histograma logarítmico.
+        
+        Args:
+            histograma: hist_km ou hist_custo_km
+            percentil: Percentil (0-100)
+        
+        Returns:
+            Valor aproximado (interpolação geométrica no bin) ou None
+        """
+        total = int(histograma.sum())
+        if total == 0:
+            return None
+        
+        alvo = percentil / 100.0 * total
+        acumulado = np.cumsum(histograma)
+        indice = int(np.searchsorted(acumulado, max(alvo, 1e-12)))
+        indice = min(indice, self.BINS - 1)
+        
+        anterior = acumulado[indice - 1] if indice else 0
+        fracao = (alvo - anterior) / histograma[indice] if histograma[indice] else 0.0
+        passo = (self.LOG_MAX - self.LOG_MIN) / self.BINS
+        return float(10 ** (self.LOG_MIN + (indice + min(max(fracao, 0.0), 1.0)) * passo))
+    
+    def resultado(self, percentis: Sequence[float] = PERCENTIS_PADRAO) -> Dict[str, Any]:
+        """
+        Estatísticas acumuladas no formato de calcular_estatisticas_vetorizadas.
+        
+        Args:
+            percentis: Percentis calculados (0-100)
+        
+        Returns:
+            Estatísticas (percentis e outliers aproximados)
+        """
+        if self.total == 0:
+            return {}
+        if self.com_km == 0:
+            return {'erro': 'Nenhuma quilometragem válida encontrada'}
+        
+        estatisticas = self.servico._estatisticas_base(
+            self.total, self.com_km, self.soma_km, self.min_km, self.max_km,
+            self.com_frete, self.soma_frete
+        )
+        estatisticas['percentis_km'] = {p: self.percentil(self.hist_km, p) for p in percentis}
+        estatisticas['percentis_custo_km'] = (
+            {p: self.percentil(self.hist_custo_km, p) for p in percentis}
+            if self.hist_custo_km.any() else {}
+        )
+        estatisticas['histograma_categorias'] = self.servico._histograma_categorias(self.categorias)
+        
+        limites = {}
+        for nome, histograma in (('km', self.hist_km), ('custo_km', self.hist_custo_km)):
+            if histograma.any():
+                limites[nome] = self.servico.limites_tukey(
+                    self.percentil(histograma, 25), self.percentil(histograma, 75)
+                )
+            else:
+                limites[nome] = (-math.inf, math.inf)
+        estatisticas['limites_outlier'] = limites
+        estatisticas['aproximado'] = True
+        
+        return estatisticas
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Watch Service - Ingestão contínua de diretórios monitorados (modo daemon)
+"""
+
+import os
+import json
+import time
+import signal
+from collections import deque
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+
+class WatchService:
+    """
+    Serviço de monitoramento contínuo de diretórios de CT-e.
+    
+    Varre os diretórios com os.scandir, acumula os arquivos novos em uma
+    fila e entrega micro-lotes ao ETLService quando a fila atinge o tamanho
+    máximo ou quando o arquivo mais antigo atinge a idade máxima.
+    """
+    
+    JANELA_THROUGHPUT = 60.0  # segundos
+    
+    def __init__(self, etl_service, diretorios: List[Path], custo_por_km: float,
+                 modo_ingestao: str = 'individual', lote_maximo: int = 200,
+                 idade_maxima: float = 2.0, intervalo_varredura: float = 0.5,
+                 estabilidade: float = 1.0, arquivo_metricas: Optional[str] = None,
+                 shard_manager=None, intervalo_views: float = 300.0):
+        """
+        Inicializa o serviço de monitoramento.
+        
+        Args:
+            etl_service: Serviço ETL que processa cada micro-lote
+            diretorios: Diretórios monitorados
+            custo_por_km: Custo por quilômetro para cálculos
+            modo_ingestao: 'individual' ou 'lote' (cte.f_ingest_cte_batch)
+            lote_maximo: Quantidade de arquivos que dispara um micro-lote
+            idade_maxima: Segundos de espera do arquivo mais antigo na fila
+            intervalo_varredura: Segundos entre varreduras dos diretórios
+            estabilidade: Idade mínima do mtime para aceitar um arquivo na
+                primeira varredura (arquivos mais novos aguardam a próxima
+                varredura sem mudança de tamanho/mtime)
+            arquivo_metricas: Caminho do JSON de métricas (opcional)
+            shard_manager: Se informado, só enfileira arquivos dos shards
+                deste worker e rebalanceia os shards periodicamente
+            intervalo_views: Segundos mínimos entre atualizações das views
+                materializadas (os micro-lotes não as atualizam um a um)
+        """
+        self.etl_service = etl_service
+        self.diretorios = [Path(d) for d in diretorios]
+        self.custo_por_km = custo_por_km
+        self.modo_ingestao = modo_ingestao
+        self.lote_maximo = max(1, lote_maximo)
+        self.idade_maxima = idade_maxima
+        self.intervalo_varredura = intervalo_varredura
+        self.estabilidade = estabilidade
+        self.arquivo_metricas = arquivo_metricas
+        self.shard_manager = shard_manager
+        self.intervalo_views = intervalo_views
+        
+        self._ativo = False
+        self._views_pendentes = False
+        self._ultima_atualizacao_views = None
+        self._ultimo_rebalanceamento = None
+        self._entregues = set()       # arquivos já enviados ao ETL
+        self._observados = {}         # arquivo -> (tamanho, mtime_ns) aguardando estabilizar
+        self._fila = deque()          # (Path, mtime, instante de enfileiramento)
+        self._janela = deque()        # (instante, quantidade) para throughput
+        
+        self.metricas_acumuladas = {
+            'arquivos_processados': 0,
+            'lotes_processados': 0,
+            'lag_ultimo_lote_max': 0.0,
+            'lag_max': 0.0,
+            'lag_soma': 0.0,
+            'ultimo_lote_em': None,
+            'iniciado_em': None
+        }
+    
+    def varrer(self) -> int:
+        """
+        Varre os diretórios e enfileira os arquivos XML novos e estáveis.
+        
+        Returns:
+            Número de arquivos enfileirados nesta varredura
+        """
+        agora = time.time()
+        presentes = set()
+        enfileirados = 0
+        self._rebalancear_shards()
+        
+        for diretorio in self.diretorios:
+            try:
+                entradas = os.scandir(diretorio)
+            except OSError as e:
+                print(f"⚠️ Erro ao varrer {diretorio}: {e}")
+                continue
+            
+            with entradas:
+                for entrada in entradas:
+                    if not entrada.name.lower().endswith('.xml'):
+                        continue
+                    
+                    caminho = entrada.path
+                    presentes.add(caminho)
+                    if caminho in self._entregues:
+                        continue
+                    if self.shard_manager and not self.shard_manager.pertence(caminho):
+                        continue
+                    
+                    try:
+                        if not entrada.is_file():
+                            continue
+                        info = entrada.stat()
+                    except OSError:
+                        continue
+                    
+                    assinatura = (info.st_size, info.st_mtime_ns)
+                    estavel = (self._observados.get(caminho) == assinatura
+                               or agora - info.st_mtime >= self.estabilidade)
+                    
+                    if estavel and info.st_size > 0:
+                        self._observados.pop(caminho, None)
+                        self._entregues.add(caminho)
+                        self._fila.append((Path(caminho), info.st_mtime, time.monotonic()))
+                        enfileirados += 1
+                    else:
+                        self._observados[caminho] = assinatura
+        
+        # Esquecer arquivos removidos/movidos mantém a memória limitada ao diretório
+        self._entregues &= presentes
+        for caminho in list(self._observados):
+            if caminho not in presentes:
+                del self._observados[caminho]
+        
+        return enfileirados
+    
+    def _rebalancear_shards(self) -> None:
+        """Rebalanceia os shards do worker a cada terço do lease."""
+        if not self.shard_manager:
+            return
+        
+        intervalo = self.shard_manager.lease_segundos / 3
+        agora = time.monotonic()
+        if self._ultimo_rebalanceamento is not None and agora - self._ultimo_rebalanceamento < intervalo:
+            return
+        
+        self._ultimo_rebalanceamento = agora
+        try:
+            self.shard_manager.rebalancear()
+        except Exception as e:
+            print(f"⚠️ Erro ao rebalancear shards: {e}")
+    
+    def deve_descarregar(self) -> bool:
+        """
+        Verifica se a fila deve ser entregue ao ETL.
+        
+        Returns:
+            True se a fila atingiu o tamanho ou a idade máxima
+        """
+        if not self._fila:
+            return False
+        if len(self._fila) >= self.lote_maximo:
+            return True
+        return time.monotonic() - self._fila[0][2] >= self.idade_maxima
+    
+    def descarregar_fila(self) -> int:
+        """
+        Entrega um micro-lote da fila ao ETL e atualiza as métricas.
+        
+        Returns:
+            Número de arquivos entregues
+        """
+        lote = []
+        while self._fila and len(lote) < self.lote_maximo:
+            lote.append(self._fila.popleft())
+        
+        if not lote:
+            return 0
+        
+        arquivos = [arquivo for arquivo, _, _ in lote]
+        if self.modo_ingestao == 'lote':
+            self.etl_service.processar_arquivos_em_lotes(arquivos, self.custo_por_km, len(arquivos),
+                                                         atualizar_views=False)
+        else:
+            self.etl_service.processar_lote_arquivos(arquivos, self.custo_por_km, len(arquivos),
+                                                     atualizar_views=False)
+        
+        self._views_pendentes = True
+        self._registrar_lote(lote)
+        return len(lote)
+    
+    def atualizar_views(self, forcar: bool = False) -> bool:
+        """
+        Atualiza as views materializadas se o intervalo mínimo já passou.
+        
+        Args:
+            forcar: Atualiza mesmo antes do intervalo (encerramento)
+        
+        Returns:
+            True se a atualização foi disparada
+        """
+        if not self._views_pendentes:
+            return False
+        
+        agora = time.monotonic()
+        if (not forcar and self._ultima_atualizacao_views is not None
+                and agora - self._ultima_atualizacao_views < self.intervalo_views):
+            return False
+        
+        self.etl_service.atualizar_views()
+        self._views_pendentes = False
+        self._ultima_atualizacao_views = time.monotonic()
+        return True
+    
+    def _registrar_lote(self, lote: List[tuple]) -> None:
+        """Atualiza lag e throughput após o commit de um micro-lote."""
+        agora = time.time()
+        lags = [max(0.0, agora - mtime) for _, mtime, _ in lote]
+        
+        metricas = self.metricas_acumuladas
+        metricas['arquivos_processados'] += len(lote)
+        metricas['lotes_processados'] += 1
+        metricas['lag_ultimo_lote_max'] = max(lags)
+        metricas['lag_max'] = max(metricas['lag_max'], max(lags))
+        metricas['lag_soma'] += sum(lags)
+        metricas['ultimo_lote_em'] = agora
+        
+        self._janela.append((time.monotonic(), len(lote)))
+        
+        print(f"📥 Micro-lote: {len(lote)} arquivos - "
+              f"lag máx: {metricas['lag_ultimo_lote_max']:.1f}s - "
+              f"throughput: {self.get_throughput():.1f} arquivos/min - "
+              f"fila: {len(self._fila)}")
+    
+    def get_throughput(self) -> float:
+        """
+        Calcula o throughput na janela recente.
+        
+        Returns:
+            Arquivos por minuto nos últimos JANELA_THROUGHPUT segundos
+        """
+        limite = time.monotonic() - self.JANELA_THROUGHPUT
+        while self._janela and self._janela[0][0] < limite:
+            self._janela.popleft()
+        
+        total = sum(quantidade for _, quantidade in self._janela)
+        return total * 60.0 / self.JANELA_THROUGHPUT
+    
+    def metricas(self) -> Dict[str, Any]:
+        """
+        Retorna as métricas atuais do daemon.
+        
+        Returns:
+            Dicionário com lag, throughput, fila e totais
+        """
+        acumuladas = self.metricas_acumuladas
+        processados = acumuladas['arquivos_processados']
+        idade_fila = time.monotonic() - self._fila[0][2] if self._fila else 0.0
+        
+        return {
+            'arquivos_processados': processados,
+            'lotes_processados': acumuladas['lotes_processados'],
+            'fila': len(self._fila),
+            'idade_fila_segundos': round(idade_fila, 3),
+            'lag_ultimo_lote_max_segundos': round(acumuladas['lag_ultimo_lote_max'], 3),
+            'lag_medio_segundos': round(acumuladas['lag_soma'] / processados, 3) if processados else 0.0,
+            'lag_max_segundos': round(acumuladas['lag_max'], 3),
+            'throughput_arquivos_min': round(self.get_throughput(), 2),
+            'ultimo_lote_em': acumuladas['ultimo_lote_em'],
+            'iniciado_em': acumuladas['iniciado_em']
+        }
+    
+    def _gravar_metricas(self) -> None:
+        """Grava as métricas no arquivo JSON configurado (escrita atômica)."""
+        if not self.arquivo_metricas:
+            return
+        
+        try:
+            temporario = f"{self.arquivo_metricas}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(self.metricas(), f, ensure_ascii=False, indent=2)
+            os.replace(temporario, self.arquivo_metricas)
+        except OSError as e:
+            print(f"⚠️ Erro ao gravar métricas: {e}")
+    
+    def parar(self, *_args) -> None:
+        """Solicita a parada do laço principal após o micro-lote atual."""
+        self._ativo = False
+    
+    def executar(self, duracao_maxima: Optional[float] = None) -> bool:
+        """
+        Executa o laço de monitoramento até parar() ou SIGINT/SIGTERM.
+        
+        Args:
+            duracao_maxima: Segundos até encerrar automaticamente (opcional)
+        
+        Returns:
+            True ao encerrar normalmente
+        """
+        print(f"👀 Monitorando {len(self.diretorios)} diretório(s) "
+              f"(lote: {self.lote_maximo}, idade máx.: {self.idade_maxima}s, "
+              f"modo: {self.modo_ingestao})")
+        for diretorio in self.diretorios:
+            print(f"   📂 {diretorio}")
+        
+        try:
+            signal.signal(signal.SIGTERM, self.parar)
+        except ValueError:
+            pass  # fora da thread principal
+        
+        self._ativo = True
+        self.metricas_acumuladas['iniciado_em'] = time.time()
+        inicio = time.monotonic()
+        self._ultima_atualizacao_views = inicio
+        
+        try:
+            while self._ativo:
+                self.varrer()
+                
+                while self.deve_descarregar():
+                    self.descarregar_fila()
+                    self._gravar_metricas()
+                self.atualizar_views()
+                
+                if duracao_maxima is not None and time.monotonic() - inicio >= duracao_maxima:
+                    break
+                
+                time.sleep(self.intervalo_varredura)
+        
+        except KeyboardInterrupt:
+            print("\n⚠️  Monitoramento interrompido pelo usuário")
+        
+        # Entregar o que restou na fila antes de sair
+        while self._fila:
+            self.descarregar_fila()
+        self._gravar_metricas()
+        self.atualizar_views(forcar=True)
+        
+        print(f"🛑 Monitoramento encerrado - {self.metricas_acumuladas['arquivos_processados']} "
+              f"arquivos em {self.metricas_acumuladas['lotes_processados']} micro-lotes")
+        return True
@@ -1,4 +1,9 @@
 # -*- coding: utf-8 -*-
 """
 Views Package - Gerenciamento de views analíticas do sistema SACT
-"""
\ No newline at end of file
+"""
+from .orquestrador_views import OrquestradorViews
+
+__all__ = [
+    'OrquestradorViews'
+]
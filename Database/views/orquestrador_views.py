@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Orquestrador de Views - Atualização das views materializadas de analytics
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+class OrquestradorViews:
+    """
+    Atualiza as views materializadas de analytics que ficaram desatualizadas.
+    
+    Os triggers de migrations/create_mv_refresh.sql registram quais tabelas
+    de origem mudaram; a cada execução só as views que dependem delas são
+    atualizadas (REFRESH ... CONCURRENTLY quando há índice único), em níveis
+    de dependência: views independentes em paralelo, cada uma em sua conexão,
+    e uma view só depois das views materializadas das quais depende.
+    
+    Apenas um orquestrador roda por vez no banco (advisory lock); quem não
+    consegue a trava deixa as alterações registradas para a próxima execução.
+    """
+    
+    TABELA_CONTROLE = 'analytics.mv_controle'
+    TRAVA = 'analytics.mv_refresh'
+    
+    def __init__(self, db_manager, workers: int = 4):
+        """
+        Inicializa o orquestrador.
+        
+        Args:
+            db_manager: Manager de banco de dados
+            workers: Views atualizadas em paralelo (uma conexão cada)
+        """
+        self.db_manager = db_manager
+        self.workers = max(1, workers)
+    
+    def disponivel(self) -> bool:
+        """
+        Verifica se a infraestrutura das views materializadas existe.
+        
+        Returns:
+            True se a migration create_mv_refresh.sql foi aplicada
+        """
+        try:
+            resultado = self.db_manager.execute_query(
+                "SELECT to_regclass(%s) IS NOT NULL", (self.TABELA_CONTROLE,), fetch_one=True
+            )
+            return bool(resultado and resultado[0])
+        except Exception as e:
+            print(f"⚠️ Erro ao verificar views materializadas: {e}")
+            return False
+    
+    # ========== DEPENDÊNCIAS ==========
+    
+    def dependencias(self) -> Dict[str, Set[str]]:
+        """
+        Views materializadas das quais cada view materializada depende.
+        
+        Returns:
+            Dicionário view -> views materializadas (transitivas)
+        """
+        linhas = self.db_manager.execute_query("""
+            SELECT nome_view, dependencia, tipo
+            FROM analytics.vw_mv_dependencias
+        """)
+        dependencias = {}
+        for nome_view, dependencia, tipo in linhas:
+            destino = dependencias.setdefault(nome_view, set())
+            if tipo == 'view_materializada':
+                destino.add(dependencia)
+        return dependencias
+    
+    @staticmethod
+    def niveis(views: Iterable[str], dependencias: Dict[str, Set[str]]) -> List[List[str]]:
+        """
+        Agrupa as views em níveis de dependência.
+        
+        Cada nível só depende de views de níveis anteriores (ou de views
+        fora da seleção), então as views de um mesmo nível podem ser
+        atualizadas em paralelo.
+        
+        Args:
+            views: Views a atualizar
+            dependencias: view -> views materializadas das quais depende
+        
+        Returns:
+            Lista de níveis, cada um com as views em ordem alfabética
+        
+        Raises:
+            ValueError: Se houver dependência circular
+        """
+        restantes = set(views)
+        niveis = []
+        while restantes:
+            nivel = sorted(
+                view for view in restantes
+                if not (dependencias.get(view, set()) & restantes) - {view}
+            )
+            if not nivel:
+                raise ValueError(f"Dependência circular entre views: {sorted(restantes)}")
+            niveis.append(nivel)
+            restantes -= set(nivel)
+        return niveis
+    
+    # ========== ATUALIZAÇÃO ==========
+    
+    def atualizar(self, forcar: bool = False, esperar: bool = False) -> Dict[str, Any]:
+        """
+        Atualiza as views materializadas pendentes.
+        
+        Args:
+            forcar: Atualiza todas as views, mesmo sem alterações nas origens
+            esperar: Aguarda a trava se outro orquestrador estiver rodando
+                (padrão: não atualiza e deixa para a próxima execução)
+        
+        Returns:
+            Dicionário com executado, atualizadas, falhas, ignoradas e
+            duracao_segundos
+        """
+        inicio = time.time()
+        resultado = {'executado': False, 'atualizadas': [], 'falhas': {}, 'ignoradas': []}
+        
+        with self.db_manager.get_connection() as conn:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                if esperar:
+                    cursor.execute("SELECT pg_advisory_lock(hashtext(%s)), true", (self.TRAVA,))
+                else:
+                    cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (self.TRAVA,))
+                if not cursor.fetchone()[-1]:
+                    print("⏭️ Views materializadas já em atualização por outro processo")
+                    resultado['duracao_segundos'] = time.time() - inicio
+                    return resultado
+                
+                try:
+                    cursor.execute("SELECT * FROM analytics.f_mv_marcar_pendentes()")
+                    pendentes = [linha[0] for linha in cursor.fetchall()]
+                    if forcar:
+                        cursor.execute(f"SELECT nome_view FROM {self.TABELA_CONTROLE}")
+                        pendentes = [linha[0] for linha in cursor.fetchall()]
+                    
+                    resultado['executado'] = True
+                    self._atualizar_niveis(pendentes, resultado)
+                finally:
+                    cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (self.TRAVA,))
+        
+        resultado['duracao_segundos'] = time.time() - inicio
+        if resultado['atualizadas'] or resultado['falhas']:
+            print(f"🔄 Views materializadas: {len(resultado['atualizadas'])} atualizadas, "
+                  f"{len(resultado['falhas'])} falhas em {resultado['duracao_segundos']:.1f}s")
+        return resultado
+    
+    def _atualizar_niveis(self, pendentes: List[str], resultado: Dict[str, Any]) -> None:
+        """Atualiza as views nível a nível; dependentes de falhas ficam pendentes."""
+        if not pendentes:
+            return
+        
+        dependencias = self.dependencias()
+        falhas = set()
+        for nivel in self.niveis(pendentes, dependencias):
+            executar = [view for view in nivel if not dependencias.get(view, set()) & falhas]
+            ignoradas = [view for view in nivel if view not in executar]
+            resultado['ignoradas'].extend(ignoradas)
+            falhas.update(ignoradas)
+            
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(executar) or 1)) as executor:
+                for view, erro in zip(executar, executor.map(self._atualizar_view, executar)):
+                    if erro is None:
+                        resultado['atualizadas'].append(view)
+                    else:
+                        resultado['falhas'][view] = erro
+                        falhas.add(view)
+    
+    def _atualizar_view(self, nome_view: str) -> Optional[str]:
+        """
+        Atualiza uma view e registra duração e defasagem.
+        
+        Returns:
+            None se atualizou ou a mensagem de erro
+        """
+        inicio = time.monotonic()
+        try:
+            with self.db_manager.get_cursor() as (cursor, conn):
+                cursor.execute("""
+                    SELECT now(), now() - pendente_desde, concorrente
+                    FROM analytics.mv_controle
+                    JOIN analytics.vw_mv_status USING (nome_view)
+                    WHERE nome_view = %s
+                """, (nome_view,))
+                iniciado_em, defasagem, concorrente = cursor.fetchone()
+                
+                cursor.execute(
+                    f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concorrente else ''}"
+                    f"{self._identificador(nome_view)}"
+                )
+                duracao_ms = (time.monotonic() - inicio) * 1000
+                
+                cursor.execute("""
+                    UPDATE analytics.mv_controle
+                    SET pendente = false,
+                        pendente_desde = NULL,
+                        ultima_atualizacao = %s,
+                        duracao_ms = %s
+                    WHERE nome_view = %s
+                """, (iniciado_em, duracao_ms, nome_view))
+                cursor.execute("""
+                    INSERT INTO analytics.mv_atualizacao_log
+                        (nome_view, iniciado_em, duracao_ms, defasagem, concorrente, sucesso)
+                    VALUES (%s, %s, %s, %s, %s, true)
+                """, (nome_view, iniciado_em, duracao_ms, defasagem, concorrente))
+            return None
+        
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar {nome_view}: {e}")
+            try:
+                self.db_manager.execute_update("""
+                    INSERT INTO analytics.mv_atualizacao_log
+                        (nome_view, iniciado_em, duracao_ms, concorrente, sucesso, erro)
+                    VALUES (%s, now(), %s, false, false, %s)
+                """, (nome_view, (time.monotonic() - inicio) * 1000, str(e)))
+            except Exception:
+                pass
+            return str(e)
+    
+    @staticmethod
+    def _identificador(nome_view: str) -> str:
+        """Nome qualificado entre aspas (schema.view)."""
+        return '.'.join('"' + parte.replace('"', '""') + '"' for parte in nome_view.split('.', 1))
+    
+    # ========== CONSULTA ==========
+    
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        Situação das views materializadas (mais defasadas primeiro).
+        
+        Returns:
+            Lista de dicionários de analytics.vw_mv_status
+        """
+        with self.db_manager.get_cursor(dict_cursor=True) as (cursor, conn):
+            cursor.execute("""
+                SELECT * FROM analytics.vw_mv_status
+                ORDER BY defasagem DESC NULLS LAST, nome_view
+            """)
+            return [dict(linha) for linha in cursor.fetchall()]
@@ -1,112 +1,130 @@
 
 -- Views de Frota e Utilização - CORRIGIDAS
+-- Materializadas (exceto idade da frota, que depende da data atual):
+-- aplicar antes migrations/create_mv_refresh.sql, migrations/create_agg_mensal.sql
+-- e migrations/create_viagem_intervalo.sql (totais por veículo em analytics.veiculo_uso);
+-- ano_mes e ano_fabricacao_int vêm de migrations/create_colunas_geradas.sql
 CREATE SCHEMA IF NOT EXISTS analytics;
 
 -- 1. Rodagem Total
-CREATE OR REPLACE VIEW analytics.vw_rodagem_total AS
+SELECT analytics.f_remover_view('analytics.vw_rodagem_total');
+CREATE MATERIALIZED VIEW analytics.vw_rodagem_total AS
 SELECT 
     v.placa,
     v.modelo AS tipo,
-    CAST(v.ano_fabricacao AS INTEGER) AS ano_fabricacao,
-    COUNT(d.id_cte) AS total_viagens,
-    COALESCE(SUM(d.quilometragem), 0) AS km_total,
-    ROUND(COALESCE(AVG(d.quilometragem), 0), 2) AS km_medio_viagem
-FROM core.veiculo v
-LEFT JOIN cte.documento d ON v.id_veiculo = d.id_veiculo
-WHERE d.quilometragem > 0
-GROUP BY v.placa, v.modelo, v.ano_fabricacao
+    v.ano_fabricacao_int AS ano_fabricacao,
+    u.viagens AS total_viagens,
+    u.km_total,
+    ROUND(u.km_total::NUMERIC / u.viagens, 2) AS km_medio_viagem
+FROM analytics.veiculo_uso u
+JOIN core.veiculo v ON v.id_veiculo = u.id_veiculo
 ORDER BY km_total DESC;
 
+CREATE UNIQUE INDEX uq_vw_rodagem_total ON analytics.vw_rodagem_total (placa, tipo, ano_fabricacao);
+
 -- 2. Distribuição de Viagens  
-CREATE OR REPLACE VIEW analytics.vw_distribuicao_viagens AS
+SELECT analytics.f_remover_view('analytics.vw_distribuicao_viagens');
+CREATE MATERIALIZED VIEW analytics.vw_distribuicao_viagens AS
 SELECT 
     v.placa,
     v.modelo AS tipo,
-    TO_CHAR(d.data_emissao, 'YYYY-MM') AS mes_ano,
+    d.ano_mes AS mes_ano,
     COUNT(d.id_cte) AS total_viagens,
     COALESCE(SUM(d.quilometragem), 0) AS km_mes
 FROM core.veiculo v
 INNER JOIN cte.documento d ON v.id_veiculo = d.id_veiculo
 WHERE d.quilometragem > 0
-GROUP BY v.placa, v.modelo, TO_CHAR(d.data_emissao, 'YYYY-MM')
+GROUP BY v.placa, v.modelo, d.ano_mes
 ORDER BY v.placa, mes_ano DESC;
 
+CREATE UNIQUE INDEX uq_vw_distribuicao_viagens ON analytics.vw_distribuicao_viagens (placa, tipo, mes_ano);
+
 -- 3. Idade da Frota
 CREATE OR REPLACE VIEW analytics.vw_idade_frota AS
 SELECT 
     v.modelo AS tipo,
     COUNT(DISTINCT v.placa) AS total_veiculos,
-    ROUND(AVG(EXTRACT(YEAR FROM CURRENT_DATE) - CAST(v.ano_fabricacao AS INTEGER)), 1) AS idade_media_anos
+    ROUND(AVG(EXTRACT(YEAR FROM CURRENT_DATE) - v.ano_fabricacao_int), 1) AS idade_media_anos
 FROM core.veiculo v
-WHERE v.ano_fabricacao IS NOT NULL
+WHERE v.ano_fabricacao_int IS NOT NULL
 GROUP BY v.modelo
 ORDER BY total_veiculos DESC;
 
--- 4. Tempo de Parada
-CREATE OR REPLACE VIEW analytics.vw_tempo_parada AS
-WITH viagens_ordenadas AS (
-    SELECT 
-        v.placa,
-        v.modelo AS tipo,
-        d.data_emissao,
-        LAG(d.data_emissao) OVER (PARTITION BY v.placa ORDER BY d.data_emissao) AS data_anterior
-    FROM core.veiculo v
-    INNER JOIN cte.documento d ON v.id_veiculo = d.id_veiculo
-    WHERE d.quilometragem > 0
-)
+-- 4. Tempo de Parada (intervalos entre viagens mantidos na carga)
+SELECT analytics.f_remover_view('analytics.vw_tempo_parada');
+CREATE MATERIALIZED VIEW analytics.vw_tempo_parada AS
 SELECT 
-    placa,
-    tipo,
-    COUNT(*) AS total_intervalos,
-    ROUND(AVG(EXTRACT(DAYS FROM (data_emissao - data_anterior))), 1) AS dias_parada_media
-FROM viagens_ordenadas
-WHERE data_anterior IS NOT NULL
-GROUP BY placa, tipo
+    v.placa,
+    v.modelo AS tipo,
+    u.intervalos AS total_intervalos,
+    ROUND(u.dias_parada::NUMERIC / u.intervalos, 1) AS dias_parada_media
+FROM analytics.veiculo_uso u
+JOIN core.veiculo v ON v.id_veiculo = u.id_veiculo
+WHERE u.intervalos > 0
 ORDER BY dias_parada_media;
 
--- 5. Veículos Uso Extremo
-CREATE OR REPLACE VIEW analytics.vw_veiculos_uso_extremo AS
-WITH uso_veiculos AS (
-    SELECT 
-        v.placa,
-        v.modelo AS tipo,
-        CAST(v.ano_fabricacao AS INTEGER) AS ano_fabricacao,
-        COUNT(d.id_cte) AS total_viagens,
-        COALESCE(SUM(d.quilometragem), 0) AS km_total,
-        ROW_NUMBER() OVER (ORDER BY SUM(d.quilometragem) DESC) AS rank_maior,
-        ROW_NUMBER() OVER (ORDER BY SUM(d.quilometragem) ASC) AS rank_menor
-    FROM core.veiculo v
-    INNER JOIN cte.documento d ON v.id_veiculo = d.id_veiculo
-    WHERE d.quilometragem > 0
-    GROUP BY v.placa, v.modelo, v.ano_fabricacao
+CREATE UNIQUE INDEX uq_vw_tempo_parada ON analytics.vw_tempo_parada (placa, tipo);
+
+-- 5. Veículos Uso Extremo (10 maiores e 10 menores pelo índice de km_total;
+--    a posição na outra ponta sai do total de veículos)
+SELECT analytics.f_remover_view('analytics.vw_veiculos_uso_extremo');
+CREATE MATERIALIZED VIEW analytics.vw_veiculos_uso_extremo AS
+WITH maiores AS (
+    SELECT id_veiculo, ROW_NUMBER() OVER (ORDER BY km_total DESC) AS rank_maior
+    FROM (SELECT id_veiculo, km_total FROM analytics.veiculo_uso ORDER BY km_total DESC LIMIT 10) m
+),
+menores AS (
+    SELECT id_veiculo, ROW_NUMBER() OVER (ORDER BY km_total ASC) AS rank_menor
+    FROM (SELECT id_veiculo, km_total FROM analytics.veiculo_uso ORDER BY km_total ASC LIMIT 10) m
+),
+total AS (
+    SELECT COUNT(*) AS veiculos FROM analytics.veiculo_uso
 )
-SELECT * FROM uso_veiculos
-WHERE rank_maior <= 10 OR rank_menor <= 10
+SELECT 
+    v.placa,
+    v.modelo AS tipo,
+    v.ano_fabricacao_int AS ano_fabricacao,
+    u.viagens AS total_viagens,
+    u.km_total,
+    COALESCE(ma.rank_maior, t.veiculos + 1 - me.rank_menor) AS rank_maior,
+    COALESCE(me.rank_menor, t.veiculos + 1 - ma.rank_maior) AS rank_menor
+FROM (SELECT id_veiculo FROM maiores UNION SELECT id_veiculo FROM menores) e
+JOIN analytics.veiculo_uso u ON u.id_veiculo = e.id_veiculo
+JOIN core.veiculo v ON v.id_veiculo = u.id_veiculo
+LEFT JOIN maiores ma ON ma.id_veiculo = u.id_veiculo
+LEFT JOIN menores me ON me.id_veiculo = u.id_veiculo
+CROSS JOIN total t
 ORDER BY km_total DESC;
 
+CREATE UNIQUE INDEX uq_vw_veiculos_uso_extremo ON analytics.vw_veiculos_uso_extremo (placa, tipo, ano_fabricacao);
+
 -- 6. Performance da Frota
-CREATE OR REPLACE VIEW analytics.vw_performance_frota AS
+SELECT analytics.f_remover_view('analytics.vw_performance_frota');
+CREATE MATERIALIZED VIEW analytics.vw_performance_frota AS
 SELECT 
     v.placa,
     v.modelo AS tipo,
-    CAST(v.ano_fabricacao AS INTEGER) AS ano_fabricacao,
-    COUNT(d.id_cte) AS total_viagens,
-    COALESCE(SUM(d.quilometragem), 0) AS km_total,
-    COALESCE(SUM(d.valor_frete), 0) AS faturamento_total,
-    ROUND(COALESCE(SUM(d.valor_frete) / NULLIF(SUM(d.quilometragem), 0), 0), 2) AS receita_por_km
-FROM core.veiculo v
-LEFT JOIN cte.documento d ON v.id_veiculo = d.id_veiculo
-WHERE d.quilometragem > 0
-GROUP BY v.placa, v.modelo, v.ano_fabricacao
+    v.ano_fabricacao_int AS ano_fabricacao,
+    u.viagens AS total_viagens,
+    u.km_total,
+    u.frete_total AS faturamento_total,
+    ROUND(COALESCE(u.frete_total / NULLIF(u.km_total, 0), 0), 2) AS receita_por_km
+FROM analytics.veiculo_uso u
+JOIN core.veiculo v ON v.id_veiculo = u.id_veiculo
 ORDER BY faturamento_total DESC;
 
+CREATE UNIQUE INDEX uq_vw_performance_frota ON analytics.vw_performance_frota (placa, tipo, ano_fabricacao);
+
 -- 7. Dashboard Frota
-CREATE OR REPLACE VIEW analytics.vw_dashboard_frota AS
+SELECT analytics.f_remover_view('analytics.vw_dashboard_frota');
+CREATE MATERIALIZED VIEW analytics.vw_dashboard_frota AS
 SELECT 
     COUNT(DISTINCT v.placa) AS total_veiculos,
-    COUNT(DISTINCT d.id_cte) AS total_viagens,
-    COALESCE(SUM(d.quilometragem), 0) AS km_total_frota,
-    COALESCE(SUM(d.valor_frete), 0) AS faturamento_total
-FROM core.veiculo v
-LEFT JOIN cte.documento d ON v.id_veiculo = d.id_veiculo
-WHERE d.quilometragem > 0;
+    COALESCE(SUM(a.docs_km), 0)::BIGINT AS total_viagens,
+    COALESCE(SUM(a.km), 0)::BIGINT AS km_total_frota,
+    COALESCE(SUM(a.frete_km), 0)::NUMERIC AS faturamento_total
+FROM analytics.agg_mensal a
+JOIN core.veiculo v ON v.id_veiculo = a.id_veiculo
+WHERE a.docs_km > 0;
+
+CREATE UNIQUE INDEX uq_vw_dashboard_frota ON analytics.vw_dashboard_frota (total_veiculos);
@@ -3,39 +3,43 @@
 -- ============================================================================
 -- Objetivo: Fornecer métricas essenciais sobre o volume e perfil das viagens
 -- Criado em: 11/11/2025
+-- Views materializadas: aplicar antes migrations/create_mv_refresh.sql e
+-- migrations/create_agg_mensal.sql (agregados mensais) e
+-- migrations/create_colunas_geradas.sql (taxa_km);
+-- atualização pelo orquestrador (Database/views/orquestrador_views.py)
 -- ============================================================================
 
 -- ============================================================================
 -- 1. Total de CT-es emitidos por mês
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_ctes_por_mes AS
+SELECT analytics.f_remover_view('analytics.vw_ctes_por_mes');
+CREATE MATERIALIZED VIEW analytics.vw_ctes_por_mes AS
 SELECT 
-    EXTRACT(YEAR FROM data_emissao)::INTEGER as ano,
-    EXTRACT(MONTH FROM data_emissao)::INTEGER as mes,
-    TO_CHAR(data_emissao, 'YYYY-MM') as ano_mes,
-    TO_CHAR(data_emissao, 'TMMonth/YYYY') as mes_nome,
-    COUNT(*) as total_ctes,
-    SUM(valor_frete)::NUMERIC(15,2) as receita_total,
-    AVG(valor_frete)::NUMERIC(10,2) as frete_medio,
-    MIN(data_emissao) as primeira_emissao,
-    MAX(data_emissao) as ultima_emissao
-FROM cte.documento
-WHERE data_emissao IS NOT NULL
-GROUP BY 
-    EXTRACT(YEAR FROM data_emissao)::INTEGER,
-    EXTRACT(MONTH FROM data_emissao)::INTEGER,
-    TO_CHAR(data_emissao, 'YYYY-MM'),
-    TO_CHAR(data_emissao, 'TMMonth/YYYY')
+    a.ano,
+    a.mes,
+    TO_CHAR(make_date(a.ano, a.mes, 1), 'YYYY-MM') as ano_mes,
+    TO_CHAR(make_date(a.ano, a.mes, 1), 'TMMonth/YYYY') as mes_nome,
+    SUM(a.docs)::BIGINT as total_ctes,
+    SUM(a.frete) FILTER (WHERE a.docs_frete > 0)::NUMERIC(15,2) as receita_total,
+    (SUM(a.frete) / NULLIF(SUM(a.docs_frete), 0))::NUMERIC(10,2) as frete_medio,
+    MIN(a.data_min) as primeira_emissao,
+    MAX(a.data_max) as ultima_emissao
+FROM analytics.agg_mensal a
+WHERE a.ano > 0  -- ano 0: documentos sem data de emissão
+GROUP BY a.ano, a.mes
 ORDER BY ano DESC, mes DESC;
 
-COMMENT ON VIEW analytics.vw_ctes_por_mes IS 
+CREATE UNIQUE INDEX uq_vw_ctes_por_mes ON analytics.vw_ctes_por_mes (ano, mes);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_ctes_por_mes IS 
 'Total de CT-es emitidos mensalmente com receita e frete médio';
 
 
 -- ============================================================================
 -- 2. Top 10 Municípios de Origem mais frequentes
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_top_origens AS
+SELECT analytics.f_remover_view('analytics.vw_top_origens');
+CREATE MATERIALIZED VIEW analytics.vw_top_origens AS
 SELECT 
     m.nome as municipio,
     uf.sigla as uf,
@@ -53,14 +57,17 @@ GROUP BY m.nome, uf.sigla
 ORDER BY total_viagens DESC
 LIMIT 10;
 
-COMMENT ON VIEW analytics.vw_top_origens IS 
+CREATE UNIQUE INDEX uq_vw_top_origens ON analytics.vw_top_origens (municipio, uf);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_top_origens IS 
 'Top 10 municípios de origem com maior volume de viagens';
 
 
 -- ============================================================================
 -- 3. Top 10 Municípios de Destino mais frequentes
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_top_destinos AS
+SELECT analytics.f_remover_view('analytics.vw_top_destinos');
+CREATE MATERIALIZED VIEW analytics.vw_top_destinos AS
 SELECT 
     m.nome as municipio,
     uf.sigla as uf,
@@ -78,38 +85,46 @@ GROUP BY m.nome, uf.sigla
 ORDER BY total_viagens DESC
 LIMIT 10;
 
-COMMENT ON VIEW analytics.vw_top_destinos IS 
+CREATE UNIQUE INDEX uq_vw_top_destinos ON analytics.vw_top_destinos (municipio, uf);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_top_destinos IS 
 'Top 10 municípios de destino com maior volume de viagens';
 
 
 -- ============================================================================
 -- 4. Distância média percorrida por viagem
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_distancia_media AS
+SELECT analytics.f_remover_view('analytics.vw_distancia_media');
+CREATE MATERIALIZED VIEW analytics.vw_distancia_media AS
 SELECT 
     COUNT(*) as total_viagens_com_km,
     ROUND(AVG(quilometragem)::NUMERIC, 2) as distancia_media_km,
     ROUND(MIN(quilometragem)::NUMERIC, 2) as distancia_minima_km,
     ROUND(MAX(quilometragem)::NUMERIC, 2) as distancia_maxima_km,
-    ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY quilometragem)::NUMERIC, 2) as mediana_km,
+    -- Mediana/p90 lidas de analytics.sketch_quantil (migrations/create_sketch_quantil.sql)
+    ROUND(analytics.f_sketch_quantil('km', 0.5), 2) as mediana_km,
     ROUND(STDDEV(quilometragem)::NUMERIC, 2) as desvio_padrao_km,
     -- Classificação por faixas de distância
     SUM(CASE WHEN quilometragem <= 100 THEN 1 ELSE 0 END) as ate_100km,
     SUM(CASE WHEN quilometragem > 100 AND quilometragem <= 300 THEN 1 ELSE 0 END) as de_101_a_300km,
     SUM(CASE WHEN quilometragem > 300 AND quilometragem <= 500 THEN 1 ELSE 0 END) as de_301_a_500km,
     SUM(CASE WHEN quilometragem > 500 AND quilometragem <= 1000 THEN 1 ELSE 0 END) as de_501_a_1000km,
-    SUM(CASE WHEN quilometragem > 1000 THEN 1 ELSE 0 END) as acima_1000km
+    SUM(CASE WHEN quilometragem > 1000 THEN 1 ELSE 0 END) as acima_1000km,
+    ROUND(analytics.f_sketch_quantil('km', 0.9), 2) as p90_km
 FROM cte.documento
 WHERE quilometragem > 0;
 
-COMMENT ON VIEW analytics.vw_distancia_media IS 
+CREATE UNIQUE INDEX uq_vw_distancia_media ON analytics.vw_distancia_media (total_viagens_com_km);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_distancia_media IS 
 'Análise estatística da distância percorrida por viagem';
 
 
 -- ============================================================================
 -- 5. Número de viagens por veículo
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_viagens_por_veiculo AS
+SELECT analytics.f_remover_view('analytics.vw_viagens_por_veiculo');
+CREATE MATERIALIZED VIEW analytics.vw_viagens_por_veiculo AS
 SELECT 
     v.placa,
     COUNT(d.id_cte) as total_viagens,
@@ -132,14 +147,17 @@ WHERE v.placa IS NOT NULL
 GROUP BY v.placa
 ORDER BY total_viagens DESC;
 
-COMMENT ON VIEW analytics.vw_viagens_por_veiculo IS 
+CREATE UNIQUE INDEX uq_vw_viagens_por_veiculo ON analytics.vw_viagens_por_veiculo (placa);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_viagens_por_veiculo IS 
 'Número de viagens e performance de cada veículo';
 
 
 -- ============================================================================
 -- 6. Produto predominante mais transportado
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_produtos_predominantes AS
+SELECT analytics.f_remover_view('analytics.vw_produtos_predominantes');
+CREATE MATERIALIZED VIEW analytics.vw_produtos_predominantes AS
 SELECT 
     COALESCE(c.produto_predominante, 'NÃO INFORMADO') as produto,
     COUNT(DISTINCT d.id_cte) as total_ctes,
@@ -168,68 +186,96 @@ GROUP BY c.produto_predominante, c.unidade_medida
 HAVING COUNT(DISTINCT d.id_cte) >= 1
 ORDER BY total_ctes DESC;
 
-COMMENT ON VIEW analytics.vw_produtos_predominantes IS 
+CREATE UNIQUE INDEX uq_vw_produtos_predominantes ON analytics.vw_produtos_predominantes (produto, unidade_medida);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_produtos_predominantes IS 
 'Produtos predominantes transportados com volume e receita';
 
 
 -- ============================================================================
 -- 7. Taxa média de frete por quilômetro
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_taxa_frete_km AS
+SELECT analytics.f_remover_view('analytics.vw_taxa_frete_km');
+CREATE MATERIALIZED VIEW analytics.vw_taxa_frete_km AS
 SELECT 
     COUNT(*) as total_viagens,
     -- Taxa média geral
-    ROUND(AVG(valor_frete / NULLIF(quilometragem, 0))::NUMERIC, 2) as taxa_media_por_km,
-    ROUND(MIN(valor_frete / NULLIF(quilometragem, 0))::NUMERIC, 2) as taxa_minima_por_km,
-    ROUND(MAX(valor_frete / NULLIF(quilometragem, 0))::NUMERIC, 2) as taxa_maxima_por_km,
-    ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY valor_frete / NULLIF(quilometragem, 0))::NUMERIC, 2) as taxa_mediana_por_km,
+    ROUND(AVG(taxa_km)::NUMERIC, 2) as taxa_media_por_km,
+    ROUND(MIN(taxa_km)::NUMERIC, 2) as taxa_minima_por_km,
+    ROUND(MAX(taxa_km)::NUMERIC, 2) as taxa_maxima_por_km,
+    ROUND(analytics.f_sketch_quantil('frete_km', 0.5), 2) as taxa_mediana_por_km,
     -- Por faixa de distância
-    ROUND(AVG(CASE WHEN quilometragem <= 100 THEN valor_frete / quilometragem END)::NUMERIC, 2) as taxa_ate_100km,
-    ROUND(AVG(CASE WHEN quilometragem > 100 AND quilometragem <= 300 THEN valor_frete / quilometragem END)::NUMERIC, 2) as taxa_101_300km,
-    ROUND(AVG(CASE WHEN quilometragem > 300 AND quilometragem <= 500 THEN valor_frete / quilometragem END)::NUMERIC, 2) as taxa_301_500km,
-    ROUND(AVG(CASE WHEN quilometragem > 500 AND quilometragem <= 1000 THEN valor_frete / quilometragem END)::NUMERIC, 2) as taxa_501_1000km,
-    ROUND(AVG(CASE WHEN quilometragem > 1000 THEN valor_frete / quilometragem END)::NUMERIC, 2) as taxa_acima_1000km
+    ROUND(AVG(CASE WHEN quilometragem <= 100 THEN taxa_km END)::NUMERIC, 2) as taxa_ate_100km,
+    ROUND(AVG(CASE WHEN quilometragem > 100 AND quilometragem <= 300 THEN taxa_km END)::NUMERIC, 2) as taxa_101_300km,
+    ROUND(AVG(CASE WHEN quilometragem > 300 AND quilometragem <= 500 THEN taxa_km END)::NUMERIC, 2) as taxa_301_500km,
+    ROUND(AVG(CASE WHEN quilometragem > 500 AND quilometragem <= 1000 THEN taxa_km END)::NUMERIC, 2) as taxa_501_1000km,
+    ROUND(AVG(CASE WHEN quilometragem > 1000 THEN taxa_km END)::NUMERIC, 2) as taxa_acima_1000km,
+    ROUND(analytics.f_sketch_quantil('frete_km', 0.9), 2) as taxa_p90_por_km
+-- taxa_km: coluna gerada (migrations/create_colunas_geradas.sql); com
+-- quilometragem > 0, taxa_km > 0 equivale a valor_frete > 0 (índice parcial)
 FROM cte.documento
-WHERE quilometragem > 0 AND valor_frete > 0;
+WHERE quilometragem > 0 AND taxa_km > 0;
 
-COMMENT ON VIEW analytics.vw_taxa_frete_km IS 
+CREATE UNIQUE INDEX uq_vw_taxa_frete_km ON analytics.vw_taxa_frete_km (total_viagens);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_taxa_frete_km IS 
 'Taxa média de frete por quilômetro segmentada por distância';
 
 
 -- ============================================================================
 -- 8. Dashboard Resumo - Todas as métricas principais
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_dashboard_operacao AS
+SELECT analytics.f_remover_view('analytics.vw_dashboard_operacao');
+CREATE MATERIALIZED VIEW analytics.vw_dashboard_operacao AS
+WITH totais AS (
+    SELECT 
+        SUM(docs)::BIGINT as total_ctes,
+        COUNT(DISTINCT id_veiculo) FILTER (WHERE id_veiculo <> 0) as total_veiculos,
+        SUM(frete) as frete,
+        SUM(docs_frete) as docs_frete,
+        SUM(km) as km,
+        SUM(docs_km) as docs_km,
+        SUM(soma_taxa) as soma_taxa,
+        SUM(docs_taxa) as docs_taxa,
+        MIN(data_min) as primeira_data,
+        MAX(data_max) as ultima_data
+    FROM analytics.agg_mensal
+)
 SELECT 
     -- Métricas gerais
-    (SELECT COUNT(*) FROM cte.documento) as total_ctes,
-    (SELECT COUNT(DISTINCT id_veiculo) FROM cte.documento WHERE id_veiculo IS NOT NULL) as total_veiculos,
-    (SELECT COUNT(DISTINCT id_municipio_origem) FROM cte.documento WHERE id_municipio_origem IS NOT NULL) as total_origens,
-    (SELECT COUNT(DISTINCT id_municipio_destino) FROM cte.documento WHERE id_municipio_destino IS NOT NULL) as total_destinos,
+    COALESCE(t.total_ctes, 0) as total_ctes,
+    t.total_veiculos,
+    -- Municípios com ao menos um CT-e (uma busca no índice por município)
+    (SELECT COUNT(*) FROM ibge.municipio m
+     WHERE EXISTS (SELECT 1 FROM cte.documento d WHERE d.id_municipio_origem = m.id_municipio)) as total_origens,
+    (SELECT COUNT(*) FROM ibge.municipio m
+     WHERE EXISTS (SELECT 1 FROM cte.documento d WHERE d.id_municipio_destino = m.id_municipio)) as total_destinos,
     
     -- Métricas financeiras
-    (SELECT SUM(valor_frete)::NUMERIC(15,2) FROM cte.documento) as receita_total,
-    (SELECT AVG(valor_frete)::NUMERIC(10,2) FROM cte.documento) as frete_medio,
+    CASE WHEN t.docs_frete > 0 THEN t.frete::NUMERIC(15,2) END as receita_total,
+    (t.frete / NULLIF(t.docs_frete, 0))::NUMERIC(10,2) as frete_medio,
     
-    -- Métricas de distância
-    (SELECT ROUND(AVG(quilometragem)::NUMERIC, 2) FROM cte.documento WHERE quilometragem > 0) as km_medio,
-    (SELECT SUM(quilometragem)::NUMERIC(15,2) FROM cte.documento WHERE quilometragem > 0) as km_total,
+    -- Métricas de distância (quilometragem nunca é negativa)
+    ROUND(t.km::NUMERIC / NULLIF(t.docs_km, 0), 2) as km_medio,
+    CASE WHEN t.docs_km > 0 THEN t.km::NUMERIC(15,2) END as km_total,
     
     -- Taxa de frete
-    (SELECT ROUND(AVG(valor_frete / NULLIF(quilometragem, 0))::NUMERIC, 2) 
-     FROM cte.documento WHERE quilometragem > 0 AND valor_frete > 0) as taxa_media_km,
+    ROUND(t.soma_taxa / NULLIF(t.docs_taxa, 0), 2) as taxa_media_km,
     
     -- Período
-    (SELECT MIN(data_emissao) FROM cte.documento) as primeira_data,
-    (SELECT MAX(data_emissao) FROM cte.documento) as ultima_data,
+    t.primeira_data,
+    t.ultima_data,
     
-    -- Produto mais transportado
+    -- Produto mais transportado (empate: ordem alfabética, como em f_dashboard_operacao)
     (SELECT produto_predominante 
      FROM cte.carga 
      WHERE produto_predominante IS NOT NULL
      GROUP BY produto_predominante 
-     ORDER BY COUNT(*) DESC 
-     LIMIT 1) as produto_mais_transportado;
+     ORDER BY COUNT(*) DESC, produto_predominante
+     LIMIT 1) as produto_mais_transportado
+FROM totais t;
+
+CREATE UNIQUE INDEX uq_vw_dashboard_operacao ON analytics.vw_dashboard_operacao (total_ctes);
 
-COMMENT ON VIEW analytics.vw_dashboard_operacao IS 
+COMMENT ON MATERIALIZED VIEW analytics.vw_dashboard_operacao IS 
 'Dashboard resumo com todas as principais métricas de operação de transporte';
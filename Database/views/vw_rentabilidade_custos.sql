@@ -3,44 +3,48 @@
 -- ============================================================================
 -- Objetivo: Medir desempenho financeiro da operação de transporte
 -- Criado em: 11/11/2025
+-- Views materializadas: aplicar antes migrations/create_mv_refresh.sql e
+-- migrations/create_agg_mensal.sql (agregados mensais);
+-- atualização pelo orquestrador (Database/views/orquestrador_views.py)
 -- ============================================================================
 
+-- vw_dashboard_financeiro (seção 7) depende de vw_receita_mensal: sai antes
+-- e é recriada no fim do script
+SELECT analytics.f_remover_view('analytics.vw_dashboard_financeiro');
+
 -- ============================================================================
 -- 1. Receita total de frete por mês
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_receita_mensal AS
+SELECT analytics.f_remover_view('analytics.vw_receita_mensal');
+CREATE MATERIALIZED VIEW analytics.vw_receita_mensal AS
 WITH receita_base AS (
     SELECT 
-        EXTRACT(YEAR FROM data_emissao)::INTEGER as ano,
-        EXTRACT(MONTH FROM data_emissao)::INTEGER as mes,
-        TO_CHAR(data_emissao, 'YYYY-MM') as ano_mes,
-        TO_CHAR(data_emissao, 'TMMonth/YYYY') as mes_nome,
+        a.ano,
+        a.mes,
+        TO_CHAR(make_date(a.ano, a.mes, 1), 'YYYY-MM') as ano_mes,
+        TO_CHAR(make_date(a.ano, a.mes, 1), 'TMMonth/YYYY') as mes_nome,
         
         -- Receitas
-        COUNT(*) as total_ctes,
-        SUM(valor_frete)::NUMERIC(15,2) as receita_total,
-        AVG(valor_frete)::NUMERIC(10,2) as receita_media,
-        MIN(valor_frete)::NUMERIC(10,2) as receita_minima,
-        MAX(valor_frete)::NUMERIC(10,2) as receita_maxima,
+        SUM(a.docs)::BIGINT as total_ctes,
+        SUM(a.frete) FILTER (WHERE a.docs_frete > 0)::NUMERIC(15,2) as receita_total,
+        (SUM(a.frete) / NULLIF(SUM(a.docs_frete), 0))::NUMERIC(10,2) as receita_media,
+        MIN(a.frete_min)::NUMERIC(10,2) as receita_minima,
+        MAX(a.frete_max)::NUMERIC(10,2) as receita_maxima,
         
         -- Quilometragem
-        SUM(quilometragem)::NUMERIC(15,2) as km_total,
-        AVG(quilometragem)::NUMERIC(10,2) as km_medio,
+        SUM(a.km)::NUMERIC(15,2) as km_total,
+        (SUM(a.km)::NUMERIC / SUM(a.docs))::NUMERIC(10,2) as km_medio,
         
         -- Receita por KM
         CASE 
-            WHEN SUM(quilometragem) > 0 
-            THEN ROUND((SUM(valor_frete) / SUM(quilometragem))::NUMERIC, 2)
+            WHEN SUM(a.km) > 0 
+            THEN ROUND((SUM(a.frete) FILTER (WHERE a.docs_frete > 0) / SUM(a.km))::NUMERIC, 2)
             ELSE 0
         END as receita_por_km
         
-    FROM cte.documento
-    WHERE data_emissao IS NOT NULL
-    GROUP BY 
-        EXTRACT(YEAR FROM data_emissao)::INTEGER,
-        EXTRACT(MONTH FROM data_emissao)::INTEGER,
-        TO_CHAR(data_emissao, 'YYYY-MM'),
-        TO_CHAR(data_emissao, 'TMMonth/YYYY')
+    FROM analytics.agg_mensal a
+    WHERE a.ano > 0  -- ano 0: documentos sem data de emissão
+    GROUP BY a.ano, a.mes
 )
 SELECT 
     *,
@@ -48,14 +52,17 @@ SELECT
 FROM receita_base
 ORDER BY ano DESC, mes DESC;
 
-COMMENT ON VIEW analytics.vw_receita_mensal IS 
+CREATE UNIQUE INDEX uq_vw_receita_mensal ON analytics.vw_receita_mensal (ano, mes);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_receita_mensal IS 
 'Receita total de frete por mês com métricas de performance';
 
 
 -- ============================================================================
 -- 2. Ticket médio por viagem
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_ticket_medio AS
+SELECT analytics.f_remover_view('analytics.vw_ticket_medio');
+CREATE MATERIALIZED VIEW analytics.vw_ticket_medio AS
 SELECT 
     -- Ticket médio geral
     COUNT(*) as total_viagens,
@@ -63,7 +70,8 @@ SELECT
     AVG(valor_frete)::NUMERIC(10,2) as ticket_medio,
     
     -- Estatísticas
-    PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY valor_frete)::NUMERIC(10,2) as ticket_mediano,
+    -- Mediana/p90 lidas de analytics.sketch_quantil (migrations/create_sketch_quantil.sql)
+    analytics.f_sketch_quantil('frete', 0.5)::NUMERIC(10,2) as ticket_mediano,
     MIN(valor_frete)::NUMERIC(10,2) as ticket_minimo,
     MAX(valor_frete)::NUMERIC(10,2) as ticket_maximo,
     STDDEV(valor_frete)::NUMERIC(10,2) as desvio_padrao,
@@ -80,19 +88,23 @@ SELECT
     AVG(CASE WHEN quilometragem > 100 AND quilometragem <= 300 THEN valor_frete END)::NUMERIC(10,2) as ticket_medio_101_300km,
     AVG(CASE WHEN quilometragem > 300 AND quilometragem <= 500 THEN valor_frete END)::NUMERIC(10,2) as ticket_medio_301_500km,
     AVG(CASE WHEN quilometragem > 500 AND quilometragem <= 1000 THEN valor_frete END)::NUMERIC(10,2) as ticket_medio_501_1000km,
-    AVG(CASE WHEN quilometragem > 1000 THEN valor_frete END)::NUMERIC(10,2) as ticket_medio_acima_1000km
+    AVG(CASE WHEN quilometragem > 1000 THEN valor_frete END)::NUMERIC(10,2) as ticket_medio_acima_1000km,
+    analytics.f_sketch_quantil('frete', 0.9)::NUMERIC(10,2) as ticket_p90
 
 FROM cte.documento
 WHERE valor_frete > 0;
 
-COMMENT ON VIEW analytics.vw_ticket_medio IS 
+CREATE UNIQUE INDEX uq_vw_ticket_medio ON analytics.vw_ticket_medio (total_viagens);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_ticket_medio IS 
 'Análise do ticket médio por viagem com distribuição por faixas';
 
 
 -- ============================================================================
 -- 3. Margem estimada por veículo (receita - custo operacional/km)
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_margem_veiculo AS
+SELECT analytics.f_remover_view('analytics.vw_margem_veiculo');
+CREATE MATERIALIZED VIEW analytics.vw_margem_veiculo AS
 SELECT 
     v.placa,
     
@@ -144,196 +156,214 @@ WHERE v.placa IS NOT NULL
 GROUP BY v.placa
 ORDER BY margem_bruta DESC;
 
-COMMENT ON VIEW analytics.vw_margem_veiculo IS 
+CREATE UNIQUE INDEX uq_vw_margem_veiculo ON analytics.vw_margem_veiculo (placa);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_margem_veiculo IS 
 'Margem estimada por veículo considerando custo operacional de R$ 2.50/km';
 
 
 -- ============================================================================
 -- 4. Faturamento por cliente (remetente)
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_faturamento_remetente AS
+SELECT analytics.f_remover_view('analytics.vw_faturamento_remetente');
+CREATE MATERIALIZED VIEW analytics.vw_faturamento_remetente AS
 SELECT 
     p.id_pessoa,
     p.nome as cliente,
     p.cpf_cnpj as documento,
     
     -- Métricas de faturamento
-    COUNT(DISTINCT d.id_cte) as total_ctes,
-    SUM(d.valor_frete)::NUMERIC(15,2) as faturamento_total,
-    AVG(d.valor_frete)::NUMERIC(10,2) as ticket_medio,
-    MIN(d.valor_frete)::NUMERIC(10,2) as menor_frete,
-    MAX(d.valor_frete)::NUMERIC(10,2) as maior_frete,
+    SUM(a.docs)::BIGINT as total_ctes,
+    SUM(a.frete) FILTER (WHERE a.docs_frete > 0)::NUMERIC(15,2) as faturamento_total,
+    (SUM(a.frete) / NULLIF(SUM(a.docs_frete), 0))::NUMERIC(10,2) as ticket_medio,
+    MIN(a.frete_min)::NUMERIC(10,2) as menor_frete,
+    MAX(a.frete_max)::NUMERIC(10,2) as maior_frete,
     
     -- Quilometragem
-    SUM(d.quilometragem)::NUMERIC(15,2) as km_total,
-    AVG(d.quilometragem)::NUMERIC(10,2) as km_medio,
+    SUM(a.km)::NUMERIC(15,2) as km_total,
+    (SUM(a.km)::NUMERIC / SUM(a.docs))::NUMERIC(10,2) as km_medio,
     
     -- Frequência
-    MIN(d.data_emissao) as primeira_transacao,
-    MAX(d.data_emissao) as ultima_transacao,
+    MIN(a.data_min) as primeira_transacao,
+    MAX(a.data_max) as ultima_transacao,
     
     -- Classificação
     CASE 
-        WHEN COUNT(DISTINCT d.id_cte) >= 100 THEN '⭐ VIP'
-        WHEN COUNT(DISTINCT d.id_cte) >= 50 THEN '🔥 PREMIUM'
-        WHEN COUNT(DISTINCT d.id_cte) >= 20 THEN '✅ REGULAR'
-        WHEN COUNT(DISTINCT d.id_cte) >= 5 THEN '⚠️ OCASIONAL'
+        WHEN SUM(a.docs) >= 100 THEN '⭐ VIP'
+        WHEN SUM(a.docs) >= 50 THEN '🔥 PREMIUM'
+        WHEN SUM(a.docs) >= 20 THEN '✅ REGULAR'
+        WHEN SUM(a.docs) >= 5 THEN '⚠️ OCASIONAL'
         ELSE '💤 ESPORÁDICO'
     END as classificacao
 
 FROM core.pessoa p
-INNER JOIN cte.documento_parte dp ON p.id_pessoa = dp.id_pessoa
-INNER JOIN cte.documento d ON dp.id_cte = d.id_cte
-WHERE dp.tipo = 'remetente'
+INNER JOIN analytics.agg_cliente_mensal a ON a.id_pessoa = p.id_pessoa
+WHERE a.tipo = 'remetente'
 GROUP BY p.id_pessoa, p.nome, p.cpf_cnpj
-HAVING COUNT(DISTINCT d.id_cte) >= 1
+HAVING SUM(a.docs) >= 1
 ORDER BY faturamento_total DESC;
 
-COMMENT ON VIEW analytics.vw_faturamento_remetente IS 
+CREATE UNIQUE INDEX uq_vw_faturamento_remetente ON analytics.vw_faturamento_remetente (id_pessoa);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_faturamento_remetente IS 
 'Faturamento por cliente remetente com classificação';
 
 
 -- ============================================================================
 -- 5. Faturamento por cliente (destinatário)
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_faturamento_destinatario AS
+SELECT analytics.f_remover_view('analytics.vw_faturamento_destinatario');
+CREATE MATERIALIZED VIEW analytics.vw_faturamento_destinatario AS
 SELECT 
     p.id_pessoa,
     p.nome as cliente,
     p.cpf_cnpj as documento,
     
     -- Métricas de faturamento
-    COUNT(DISTINCT d.id_cte) as total_ctes,
-    SUM(d.valor_frete)::NUMERIC(15,2) as faturamento_total,
-    AVG(d.valor_frete)::NUMERIC(10,2) as ticket_medio,
-    MIN(d.valor_frete)::NUMERIC(10,2) as menor_frete,
-    MAX(d.valor_frete)::NUMERIC(10,2) as maior_frete,
+    SUM(a.docs)::BIGINT as total_ctes,
+    SUM(a.frete) FILTER (WHERE a.docs_frete > 0)::NUMERIC(15,2) as faturamento_total,
+    (SUM(a.frete) / NULLIF(SUM(a.docs_frete), 0))::NUMERIC(10,2) as ticket_medio,
+    MIN(a.frete_min)::NUMERIC(10,2) as menor_frete,
+    MAX(a.frete_max)::NUMERIC(10,2) as maior_frete,
     
     -- Quilometragem
-    SUM(d.quilometragem)::NUMERIC(15,2) as km_total,
-    AVG(d.quilometragem)::NUMERIC(10,2) as km_medio,
+    SUM(a.km)::NUMERIC(15,2) as km_total,
+    (SUM(a.km)::NUMERIC / SUM(a.docs))::NUMERIC(10,2) as km_medio,
     
     -- Frequência
-    MIN(d.data_emissao) as primeira_transacao,
-    MAX(d.data_emissao) as ultima_transacao,
+    MIN(a.data_min) as primeira_transacao,
+    MAX(a.data_max) as ultima_transacao,
     
     -- Classificação
     CASE 
-        WHEN COUNT(DISTINCT d.id_cte) >= 100 THEN '⭐ VIP'
-        WHEN COUNT(DISTINCT d.id_cte) >= 50 THEN '🔥 PREMIUM'
-        WHEN COUNT(DISTINCT d.id_cte) >= 20 THEN '✅ REGULAR'
-        WHEN COUNT(DISTINCT d.id_cte) >= 5 THEN '⚠️ OCASIONAL'
+        WHEN SUM(a.docs) >= 100 THEN '⭐ VIP'
+        WHEN SUM(a.docs) >= 50 THEN '🔥 PREMIUM'
+        WHEN SUM(a.docs) >= 20 THEN '✅ REGULAR'
+        WHEN SUM(a.docs) >= 5 THEN '⚠️ OCASIONAL'
         ELSE '💤 ESPORÁDICO'
     END as classificacao
 
 FROM core.pessoa p
-INNER JOIN cte.documento_parte dp ON p.id_pessoa = dp.id_pessoa
-INNER JOIN cte.documento d ON dp.id_cte = d.id_cte
-WHERE dp.tipo = 'destinatario'
+INNER JOIN analytics.agg_cliente_mensal a ON a.id_pessoa = p.id_pessoa
+WHERE a.tipo = 'destinatario'
 GROUP BY p.id_pessoa, p.nome, p.cpf_cnpj
-HAVING COUNT(DISTINCT d.id_cte) >= 1
+HAVING SUM(a.docs) >= 1
 ORDER BY faturamento_total DESC;
 
-COMMENT ON VIEW analytics.vw_faturamento_destinatario IS 
+CREATE UNIQUE INDEX uq_vw_faturamento_destinatario ON analytics.vw_faturamento_destinatario (id_pessoa);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_faturamento_destinatario IS 
 'Faturamento por cliente destinatário com classificação';
 
 
 -- ============================================================================
 -- 6. Ranking dos principais clientes (top 20 remetentes)
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_ranking_clientes AS
+SELECT analytics.f_remover_view('analytics.vw_ranking_clientes');
+CREATE MATERIALIZED VIEW analytics.vw_ranking_clientes AS
 SELECT 
     p.id_pessoa,
     p.nome as cliente,
     p.cpf_cnpj as documento,
-    dp.tipo as tipo_cliente,
+    a.tipo as tipo_cliente,
     
     -- Métricas
-    COUNT(DISTINCT d.id_cte) as total_ctes,
-    SUM(d.valor_frete)::NUMERIC(15,2) as faturamento_total,
-    AVG(d.valor_frete)::NUMERIC(10,2) as ticket_medio,
+    SUM(a.docs)::BIGINT as total_ctes,
+    SUM(a.frete) FILTER (WHERE a.docs_frete > 0)::NUMERIC(15,2) as faturamento_total,
+    (SUM(a.frete) / NULLIF(SUM(a.docs_frete), 0))::NUMERIC(10,2) as ticket_medio,
     
     -- Participação no faturamento total
-    ROUND((SUM(d.valor_frete) / (SELECT SUM(valor_frete) FROM cte.documento) * 100)::NUMERIC, 2) as participacao_percentual,
+    ROUND((SUM(a.frete) FILTER (WHERE a.docs_frete > 0) / (SELECT SUM(frete) FILTER (WHERE docs_frete > 0) FROM analytics.agg_mensal) * 100)::NUMERIC, 2) as participacao_percentual,
     
     -- Quilometragem
-    SUM(d.quilometragem)::NUMERIC(15,2) as km_total,
+    SUM(a.km)::NUMERIC(15,2) as km_total,
     
     -- Período
-    MIN(d.data_emissao) as primeira_transacao,
-    MAX(d.data_emissao) as ultima_transacao,
+    MIN(a.data_min) as primeira_transacao,
+    MAX(a.data_max) as ultima_transacao,
     
     -- Classificação
     CASE 
-        WHEN COUNT(DISTINCT d.id_cte) >= 100 THEN '⭐ VIP'
-        WHEN COUNT(DISTINCT d.id_cte) >= 50 THEN '🔥 PREMIUM'
-        WHEN COUNT(DISTINCT d.id_cte) >= 20 THEN '✅ REGULAR'
-        WHEN COUNT(DISTINCT d.id_cte) >= 5 THEN '⚠️ OCASIONAL'
+        WHEN SUM(a.docs) >= 100 THEN '⭐ VIP'
+        WHEN SUM(a.docs) >= 50 THEN '🔥 PREMIUM'
+        WHEN SUM(a.docs) >= 20 THEN '✅ REGULAR'
+        WHEN SUM(a.docs) >= 5 THEN '⚠️ OCASIONAL'
         ELSE '💤 ESPORÁDICO'
     END as classificacao,
     
     -- Ranking
-    ROW_NUMBER() OVER (ORDER BY SUM(d.valor_frete) DESC) as ranking
+    ROW_NUMBER() OVER (ORDER BY SUM(a.frete) FILTER (WHERE a.docs_frete > 0) DESC) as ranking
 
 FROM core.pessoa p
-INNER JOIN cte.documento_parte dp ON p.id_pessoa = dp.id_pessoa
-INNER JOIN cte.documento d ON dp.id_cte = d.id_cte
-WHERE dp.tipo = 'remetente'  -- Foco nos remetentes
-GROUP BY p.id_pessoa, p.nome, p.cpf_cnpj, dp.tipo
-HAVING COUNT(DISTINCT d.id_cte) >= 1
+INNER JOIN analytics.agg_cliente_mensal a ON a.id_pessoa = p.id_pessoa
+WHERE a.tipo = 'remetente'  -- Foco nos remetentes
+GROUP BY p.id_pessoa, p.nome, p.cpf_cnpj, a.tipo
+HAVING SUM(a.docs) >= 1
 ORDER BY faturamento_total DESC
 LIMIT 20;
 
-COMMENT ON VIEW analytics.vw_ranking_clientes IS 
+CREATE UNIQUE INDEX uq_vw_ranking_clientes ON analytics.vw_ranking_clientes (id_pessoa);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_ranking_clientes IS 
 'Ranking dos top 20 clientes por faturamento total';
 
 
 -- ============================================================================
 -- 7. Dashboard Resumo Financeiro
 -- ============================================================================
-CREATE OR REPLACE VIEW analytics.vw_dashboard_financeiro AS
+SELECT analytics.f_remover_view('analytics.vw_dashboard_financeiro');
+CREATE MATERIALIZED VIEW analytics.vw_dashboard_financeiro AS
+WITH totais AS (
+    SELECT 
+        SUM(frete) as frete,
+        SUM(docs_frete) as docs_frete,
+        SUM(docs) as docs,
+        SUM(km) as km,
+        SUM(docs_km) as docs_km,
+        SUM(frete_km) as frete_km,
+        SUM(frete_taxa) as frete_taxa,
+        SUM(km_taxa) as km_taxa,
+        SUM(docs_taxa) as docs_taxa
+    FROM analytics.agg_mensal
+)
 SELECT 
     -- Receitas
-    (SELECT SUM(valor_frete)::NUMERIC(15,2) FROM cte.documento) as receita_total,
-    (SELECT AVG(valor_frete)::NUMERIC(10,2) FROM cte.documento) as ticket_medio,
-    (SELECT COUNT(*) FROM cte.documento) as total_ctes,
+    CASE WHEN t.docs_frete > 0 THEN t.frete::NUMERIC(15,2) END as receita_total,
+    (t.frete / NULLIF(t.docs_frete, 0))::NUMERIC(10,2) as ticket_medio,
+    COALESCE(t.docs, 0)::BIGINT as total_ctes,
     
-    -- Custos estimados (R$ 2.50/km)
-    (SELECT SUM(quilometragem)::NUMERIC(15,2) * 2.50 FROM cte.documento WHERE quilometragem > 0) as custo_estimado_total,
+    -- Custos estimados (R$ 2.50/km; quilometragem nunca é negativa)
+    CASE WHEN t.docs_km > 0 THEN t.km::NUMERIC(15,2) * 2.50 END as custo_estimado_total,
     
     -- Margem bruta
-    (SELECT (SUM(valor_frete) - (SUM(quilometragem) * 2.50))::NUMERIC(15,2) 
-     FROM cte.documento WHERE quilometragem > 0) as margem_bruta_total,
+    CASE WHEN t.docs_km > 0 THEN (t.frete_km - (t.km * 2.50))::NUMERIC(15,2) END as margem_bruta_total,
     
     -- Margem percentual
-    (SELECT ROUND(((SUM(valor_frete) - (SUM(quilometragem) * 2.50)) / NULLIF(SUM(valor_frete), 0) * 100)::NUMERIC, 2)
-     FROM cte.documento WHERE quilometragem > 0 AND valor_frete > 0) as margem_percentual,
+    CASE WHEN t.docs_taxa > 0 
+         THEN ROUND(((t.frete_taxa - (t.km_taxa * 2.50)) / NULLIF(t.frete_taxa, 0) * 100)::NUMERIC, 2)
+    END as margem_percentual,
     
     -- Clientes
     (SELECT COUNT(DISTINCT id_pessoa) 
-     FROM cte.documento_parte 
+     FROM analytics.agg_cliente_mensal 
      WHERE tipo = 'remetente') as total_clientes_remetentes,
      
     (SELECT COUNT(DISTINCT id_pessoa) 
-     FROM cte.documento_parte 
+     FROM analytics.agg_cliente_mensal 
      WHERE tipo = 'destinatario') as total_clientes_destinatarios,
     
-    -- Receita média mensal
-    (SELECT AVG(receita_mensal)::NUMERIC(15,2)
-     FROM (
-         SELECT SUM(valor_frete) as receita_mensal
-         FROM cte.documento
-         WHERE data_emissao IS NOT NULL
-         GROUP BY EXTRACT(YEAR FROM data_emissao), EXTRACT(MONTH FROM data_emissao)
-     ) sub) as receita_media_mensal,
+    -- Receita média mensal (da view materializada mensal, atualizada antes desta)
+    (SELECT AVG(receita_total)::NUMERIC(15,2)
+     FROM analytics.vw_receita_mensal) as receita_media_mensal,
     
     -- Melhor mês
-    (SELECT TO_CHAR(data_emissao, 'TMMonth/YYYY')
-     FROM cte.documento
-     WHERE data_emissao IS NOT NULL
-     GROUP BY EXTRACT(YEAR FROM data_emissao), EXTRACT(MONTH FROM data_emissao), TO_CHAR(data_emissao, 'TMMonth/YYYY')
-     ORDER BY SUM(valor_frete) DESC
-     LIMIT 1) as melhor_mes;
-
-COMMENT ON VIEW analytics.vw_dashboard_financeiro IS 
+    (SELECT mes_nome
+     FROM analytics.vw_receita_mensal
+     ORDER BY receita_total DESC
+     LIMIT 1) as melhor_mes
+FROM totais t;
+
+CREATE UNIQUE INDEX uq_vw_dashboard_financeiro ON analytics.vw_dashboard_financeiro (total_ctes);
+
+COMMENT ON MATERIALIZED VIEW analytics.vw_dashboard_financeiro IS 
 'Dashboard resumo com principais indicadores financeiros';
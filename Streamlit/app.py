@@ -17,7 +17,7 @@ sys.path.insert(0, parent_dir)
 # Importar camada de aplicação
 try:
     from Database.main import CTEMainApplication
-    from Config.database_config import validate_config, DATABASE_CONFIG
+    from Config.database_config import validate_config, DATABASE_CONFIG, PROCESSING_CONFIG
 except ImportError as e:
     st.error(f"Erro de importação: {e}")
     st.stop()
@@ -282,6 +282,63 @@ class StreamlitCTEInterface:
             st.divider()
             
             self.processar_arquivos_interface(diretorio, custo_por_km)
+        
+        st.divider()
+        
+        self.recalcular_quilometragem_interface()
+    
+    def recalcular_quilometragem_interface(self):
+        """Interface para recalcular a quilometragem dos CT-e já carregados"""
+        with st.expander("♻️ Recalcular quilometragem com novo custo por km"):
+            st.caption("Atualiza os CT-e já carregados sem reprocessar os XMLs. "
+                       "Um recálculo interrompido é retomado ao executar com os mesmos filtros.")
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                novo_custo = st.number_input(
+                    "Novo custo por km (R$):", min_value=0.01, value=2.50,
+                    step=0.01, format="%.2f", key="recalculo_custo"
+                )
+                periodo = st.date_input("Período de emissão (opcional):", value=[], key="recalculo_periodo")
+            with col2:
+                placa = st.text_input("Placa do veículo (opcional):", key="recalculo_placa")
+                workers = st.number_input(
+                    "Conexões em paralelo:", min_value=1, max_value=16,
+                    value=PROCESSING_CONFIG['max_workers'], key="recalculo_workers"
+                )
+            
+            if st.button("♻️ Recalcular", use_container_width=True):
+                data_inicio = periodo[0] if len(periodo) > 0 else None
+                data_fim = periodo[1] if len(periodo) > 1 else data_inicio
+                self.executar_recalculo(novo_custo, int(workers), data_inicio, data_fim, placa.strip() or None)
+    
+    def executar_recalculo(self, custo_por_km: float, workers: int, data_inicio, data_fim, placa):
+        """Executa o recálculo com barra de progresso por faixa de documentos"""
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        
+        def progresso(concluidas, total, atualizados):
+            progress_bar.progress(concluidas / total if total else 1.0)
+            status_text.text(f"🔁 {concluidas}/{total} faixas - {atualizados} documentos atualizados")
+        
+        output_buffer = io.StringIO()
+        try:
+            with redirect_stdout(output_buffer), redirect_stderr(output_buffer):
+                sucesso = self.app.executar_recalculo(
+                    custo_por_km, workers, data_inicio, data_fim, placa, progresso
+                )
+        except Exception as e:
+            st.error(f"❌ Erro inesperado: {e}")
+            return False
+        
+        progress_bar.progress(100)
+        st.text_area("📝 Logs do Recálculo:", value=output_buffer.getvalue(), height=200)
+        
+        if sucesso:
+            st.success("🎉 Recálculo concluído!")
+        else:
+            st.error("❌ Recálculo incompleto - verifique os logs e execute novamente para retomar")
+        return sucesso
     
     def pagina_operacao_transporte(self):
         try:
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Componente de Visualização: Filtros dos Dashboards
+Período, UF, veículo e cliente na barra lateral
+"""
+
+import streamlit as st
+from Streamlit.utils.consultas_pagina import ConsultasPagina
+from Streamlit.utils.filtros_dashboard import FiltrosDashboard
+from Streamlit.utils.pool_conexoes import pool_conexoes
+
+
+def mostrar_filtros(pool=None) -> FiltrosDashboard:
+    """
+    Exibe os filtros na barra lateral e retorna os valores escolhidos
+    
+    As chaves dos widgets são fixas: os filtros valem para todas as páginas
+    de dashboard até serem limpos.
+    
+    Args:
+        pool: Pool de conexões (padrão: pool global)
+    
+    Returns:
+        FiltrosDashboard (sem filtro ativo quando nada foi informado)
+    """
+    st.sidebar.header("🔎 Filtros")
+    
+    periodo = st.sidebar.date_input("Período de emissão:", value=[], key="filtro_periodo")
+    
+    try:
+        ufs = ConsultasPagina(pool or pool_conexoes).obter(
+            "SELECT sigla FROM ibge.uf ORDER BY sigla"
+        )['sigla'].tolist()
+    except Exception as e:
+        st.sidebar.warning(f"⚠️ Lista de UFs indisponível: {e}")
+        ufs = []
+    uf = st.sidebar.selectbox("UF (origem ou destino):", ["Todas"] + ufs, key="filtro_uf")
+    
+    placa = st.sidebar.text_input("Placa do veículo:", key="filtro_placa")
+    cliente = st.sidebar.text_input("CPF/CNPJ do cliente:", key="filtro_cliente",
+                                    help="Remetente ou destinatário do CT-e")
+    
+    data_inicio = periodo[0] if len(periodo) > 0 else None
+    data_fim = periodo[1] if len(periodo) > 1 else data_inicio
+    filtros = FiltrosDashboard(
+        data_inicio=data_inicio,
+        data_fim=data_fim,
+        uf=None if uf == "Todas" else uf,
+        placa=placa,
+        cliente=cliente
+    )
+    
+    if filtros.ativos:
+        st.sidebar.caption("Indicadores calculados só com os CT-e filtrados")
+    return filtros
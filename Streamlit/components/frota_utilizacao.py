@@ -19,43 +19,129 @@ parent_dir = os.path.dirname(current_dir)
 grandparent_dir = os.path.dirname(parent_dir)
 sys.path.insert(0, grandparent_dir)
 
-from Config.database_config import DATABASE_CONFIG
-import psycopg2
+from Streamlit.utils.consultas_pagina import ConsultasPagina
+from Streamlit.utils.filtros_dashboard import ARGUMENTOS, FiltrosDashboard
+from Streamlit.utils.pool_conexoes import pool_conexoes
+from Streamlit.components.filtros import mostrar_filtros
 
 
 class FrotaUtilizacaoViewer:
     """Visualizador de dados de Frota e Utilização"""
     
-    def __init__(self):
-        self.conn = None
+    # Consultas das visualizações, executadas em paralelo antes da renderização
+    # (trocar de visualização não espera o banco)
+    CONSULTAS = {
+        'dashboard': "SELECT * FROM analytics.vw_dashboard_frota",
+        'rodagem_total': """
+            SELECT placa, tipo, km_total, total_viagens, km_medio_viagem
+            FROM analytics.vw_rodagem_total
+            ORDER BY km_total DESC
+            LIMIT 20
+        """,
+        'placas': "SELECT DISTINCT placa FROM analytics.vw_distribuicao_viagens ORDER BY placa",
+        'distribuicao_todos': """
+            SELECT mes_ano, SUM(total_viagens) AS total_viagens, SUM(km_mes) AS km_mes
+            FROM analytics.vw_distribuicao_viagens
+            GROUP BY mes_ano
+            ORDER BY mes_ano
+        """,
+        'distribuicao_placa': """
+            SELECT mes_ano, total_viagens, km_mes
+            FROM analytics.vw_distribuicao_viagens
+            WHERE placa = %(placa_veiculo)s
+            ORDER BY mes_ano
+        """,
+        'idade_frota': "SELECT * FROM analytics.vw_idade_frota ORDER BY total_veiculos DESC",
+        'tempo_parada': """
+            SELECT * FROM analytics.vw_tempo_parada
+            ORDER BY dias_parada_media
+            LIMIT 30
+        """,
+        'uso_extremo': "SELECT * FROM analytics.vw_veiculos_uso_extremo ORDER BY km_total DESC",
+        'performance': """
+            SELECT * FROM analytics.vw_performance_frota
+            ORDER BY faturamento_total DESC
+            LIMIT 20
+        """,
+    }
+    
+    # Mesmas consultas com filtros: funções de analytics (create_funcoes_filtro.sql).
+    # Idade, tempo de parada e uso extremo descrevem a frota toda e não são filtrados.
+    CONSULTAS_FILTRADAS = {
+        'dashboard': f"SELECT * FROM analytics.f_dashboard_frota({ARGUMENTOS})",
+        'rodagem_total': f"""
+            SELECT placa, tipo, km_total, total_viagens, km_medio_viagem
+            FROM analytics.f_uso_veiculo({ARGUMENTOS})
+            ORDER BY km_total DESC
+            LIMIT 20
+        """,
+        'placas': f"SELECT DISTINCT placa FROM analytics.f_distribuicao_viagens({ARGUMENTOS}) ORDER BY placa",
+        'distribuicao_todos': f"""
+            SELECT mes_ano, SUM(total_viagens) AS total_viagens, SUM(km_mes) AS km_mes
+            FROM analytics.f_distribuicao_viagens({ARGUMENTOS})
+            GROUP BY mes_ano
+            ORDER BY mes_ano
+        """,
+        'distribuicao_placa': f"""
+            SELECT mes_ano, total_viagens, km_mes
+            FROM analytics.f_distribuicao_viagens({ARGUMENTOS})
+            WHERE placa = %(placa_veiculo)s
+            ORDER BY mes_ano
+        """,
+        'performance': f"""
+            SELECT placa, tipo, ano_fabricacao, total_viagens, km_total, faturamento_total, receita_por_km
+            FROM analytics.f_uso_veiculo({ARGUMENTOS})
+            ORDER BY faturamento_total DESC
+            LIMIT 20
+        """,
+    }
+    
+    def __init__(self, pool=None, filtros: FiltrosDashboard = None):
+        self.pool = pool or pool_conexoes
+        self.consultas = ConsultasPagina(self.pool)
+        self.filtros = filtros or FiltrosDashboard()
     
     def connect(self):
-        """Conecta ao banco de dados"""
+        """Verifica o acesso ao banco (conexões do pool compartilhado)"""
         try:
-            self.conn = psycopg2.connect(**DATABASE_CONFIG)
-            return True
+            with self.pool.conexao():
+                return True
         except Exception as e:
             st.error(f"Erro ao conectar ao banco: {e}")
             return False
     
     def disconnect(self):
-        """Desconecta do banco de dados"""
-        if self.conn:
-            self.conn.close()
+        """Nada a fechar: cada consulta devolve sua conexão ao pool"""
     
-    def query_data(self, query):
-        """Executa query e retorna DataFrame"""
+    def query_data(self, query, params=None):
+        """Executa query e retorna DataFrame (carregado com a página ou do cache)"""
         try:
-            return pd.read_sql_query(query, self.conn)
+            return self.consultas.obter(query, params)
         except Exception as e:
             st.error(f"Erro ao executar query: {e}")
             return pd.DataFrame()
     
+    def consulta(self, chave):
+        """SQL e parâmetros da visualização (view ou função filtrada)"""
+        return self.filtros.consulta(self.CONSULTAS, self.CONSULTAS_FILTRADAS, chave)
+    
+    def carregar_pagina(self):
+        """Executa as consultas de todas as visualizações ao mesmo tempo"""
+        # A distribuição por placa depende do veículo escolhido na tela
+        self.consultas.carregar(
+            self.consulta(chave) for chave in self.CONSULTAS if chave != 'distribuicao_placa'
+        )
+    
+    def aviso_sem_filtro(self):
+        """Indica que a visualização ignora os filtros da barra lateral"""
+        if self.filtros.ativos:
+            st.caption("ℹ️ Visualização da frota completa: os filtros não se aplicam")
+    
     def mostrar_dashboard_principal(self):
         """Dashboard principal com KPIs de frota"""
         st.header("📊 Dashboard de Frota")
         
-        df = self.query_data("SELECT * FROM analytics.vw_dashboard_frota")
+        df = self.query_data(*self.consulta('dashboard'))
         
         if not df.empty:
             row = df.iloc[0]
@@ -74,12 +160,7 @@ class FrotaUtilizacaoViewer:
         """Gráfico de rodagem total por veículo"""
         st.subheader("🛣️ Rodagem Total por Veículo")
         
-        df = self.query_data("""
-            SELECT placa, tipo, km_total, total_viagens, km_medio_viagem
-            FROM analytics.vw_rodagem_total
-            ORDER BY km_total DESC
-            LIMIT 20
-        """)
+        df = self.query_data(*self.consulta('rodagem_total'))
         
         if not df.empty:
             fig = px.bar(
@@ -99,27 +180,18 @@ class FrotaUtilizacaoViewer:
         st.subheader("📊 Distribuição de Viagens por Mês")
         
         # Seletor de veículo
-        placas_df = self.query_data("SELECT DISTINCT placa FROM analytics.vw_distribuicao_viagens ORDER BY placa")
+        placas_df = self.query_data(*self.consulta('placas'))
         placas = ['Todos'] + placas_df['placa'].tolist()
         
         placa_selecionada = st.selectbox("Selecione um veículo:", placas)
         
         if placa_selecionada == 'Todos':
-            query = """
-                SELECT mes_ano, SUM(total_viagens) AS total_viagens, SUM(km_mes) AS km_mes
-                FROM analytics.vw_distribuicao_viagens
-                GROUP BY mes_ano
-                ORDER BY mes_ano
-            """
+            query, params = self.consulta('distribuicao_todos')
         else:
-            query = f"""
-                SELECT mes_ano, total_viagens, km_mes
-                FROM analytics.vw_distribuicao_viagens
-                WHERE placa = '{placa_selecionada}'
-                ORDER BY mes_ano
-            """
+            query, params = self.consulta('distribuicao_placa')
+            params = dict(params or {}, placa_veiculo=placa_selecionada)
         
-        df = self.query_data(query)
+        df = self.query_data(query, params)
         
         if not df.empty:
             fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -144,8 +216,9 @@ class FrotaUtilizacaoViewer:
     def mostrar_idade_frota(self):
         """Idade média da frota por tipo"""
         st.subheader("📅 Idade da Frota")
+        self.aviso_sem_filtro()
         
-        df = self.query_data("SELECT * FROM analytics.vw_idade_frota ORDER BY total_veiculos DESC")
+        df = self.query_data(*self.consulta('idade_frota'))
         
         if not df.empty:
             col1, col2 = st.columns(2)
@@ -175,12 +248,9 @@ class FrotaUtilizacaoViewer:
     def mostrar_tempo_parada(self):
         """Tempo médio de parada entre viagens"""
         st.subheader("⏱️ Tempo de Parada Entre Viagens")
+        self.aviso_sem_filtro()
         
-        df = self.query_data("""
-            SELECT * FROM analytics.vw_tempo_parada
-            ORDER BY dias_parada_media
-            LIMIT 30
-        """)
+        df = self.query_data(*self.consulta('tempo_parada'))
         
         if not df.empty:
             fig = px.bar(
@@ -200,8 +270,9 @@ class FrotaUtilizacaoViewer:
     def mostrar_uso_extremo(self):
         """Veículos com maior e menor uso"""
         st.subheader("🔝 Veículos de Uso Extremo")
+        self.aviso_sem_filtro()
         
-        df = self.query_data("SELECT * FROM analytics.vw_veiculos_uso_extremo")
+        df = self.query_data(*self.consulta('uso_extremo'))
         
         if not df.empty:
             col1, col2 = st.columns(2)
@@ -220,11 +291,7 @@ class FrotaUtilizacaoViewer:
         """Performance geral da frota"""
         st.subheader("💼 Performance da Frota")
         
-        df = self.query_data("""
-            SELECT * FROM analytics.vw_performance_frota
-            ORDER BY faturamento_total DESC
-            LIMIT 20
-        """)
+        df = self.query_data(*self.consulta('performance'))
         
         if not df.empty:
             fig = px.scatter(
@@ -252,13 +319,16 @@ def exibir_frota_utilizacao():
     st.markdown("**Monitoramento de uso e desempenho da frota de veículos**")
     st.divider()
     
-    viewer = FrotaUtilizacaoViewer()
+    viewer = FrotaUtilizacaoViewer(filtros=mostrar_filtros())
     
     if not viewer.connect():
         st.error("❌ Não foi possível conectar ao banco de dados")
         return
     
     try:
+        # Consultas de todas as visualizações em paralelo
+        viewer.carregar_pagina()
+        
         # Menu de visualizações
         opcoes = [
             "📊 Dashboard Geral",
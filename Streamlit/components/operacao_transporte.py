@@ -10,54 +10,137 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from typing import Optional
-import psycopg2
-from Config.database_config import DATABASE_CONFIG
+from Streamlit.utils.consultas_pagina import ConsultasPagina
+from Streamlit.utils.filtros_dashboard import ARGUMENTOS, FiltrosDashboard
+from Streamlit.utils.pool_conexoes import pool_conexoes
+from Streamlit.components.filtros import mostrar_filtros
+from Database.services.indice_espacial_service import IndiceEspacialService
 
 
 class OperacaoTransporteViewer:
     """Gerenciador de visualizações de Operação de Transporte"""
     
-    def __init__(self):
-        """Inicializa o visualizador"""
-        self.conn = None
+    # Consultas da página, executadas em paralelo antes da renderização.
+    # Os rankings trazem o máximo dos sliders; o slider só recorta o resultado.
+    CONSULTAS = {
+        'dashboard': "SELECT * FROM analytics.vw_dashboard_operacao",
+        'ctes_por_mes': "SELECT * FROM analytics.vw_ctes_por_mes ORDER BY ano, mes",
+        'top_origens': "SELECT * FROM analytics.vw_top_origens ORDER BY total_viagens DESC",
+        'top_destinos': "SELECT * FROM analytics.vw_top_destinos ORDER BY total_viagens DESC",
+        'origens_municipio': """
+            SELECT d.id_municipio_origem AS id_municipio,
+                   m.nome || ' - ' || u.sigla AS municipio,
+                   m.latitude, m.longitude,
+                   COUNT(*) AS total_ctes
+            FROM cte.documento d
+            JOIN ibge.municipio m ON m.id_municipio = d.id_municipio_origem
+            JOIN ibge.uf u ON u.id_uf = m.id_uf
+            GROUP BY d.id_municipio_origem, m.nome, u.sigla, m.latitude, m.longitude
+            ORDER BY total_ctes DESC
+        """,
+        'coordenadas': """
+            SELECT id_municipio, latitude, longitude
+            FROM ibge.municipio
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        """,
+        'distancia_media': "SELECT * FROM analytics.vw_distancia_media",
+        'viagens_por_veiculo': """
+            SELECT * FROM analytics.vw_viagens_por_veiculo
+            ORDER BY total_viagens DESC
+            LIMIT 50
+        """,
+        'produtos_predominantes': """
+            SELECT * FROM analytics.vw_produtos_predominantes
+            ORDER BY total_ctes DESC
+            LIMIT 20
+        """,
+        'taxa_frete_km': "SELECT * FROM analytics.vw_taxa_frete_km",
+    }
+    
+    # Mesmas consultas com filtros: funções de analytics (create_funcoes_filtro.sql)
+    CONSULTAS_FILTRADAS = {
+        'dashboard': f"SELECT * FROM analytics.f_dashboard_operacao({ARGUMENTOS})",
+        'ctes_por_mes': f"SELECT * FROM analytics.f_ctes_por_mes({ARGUMENTOS}) ORDER BY ano, mes",
+        'top_origens': f"SELECT * FROM analytics.f_top_origens({ARGUMENTOS}) ORDER BY total_viagens DESC",
+        'top_destinos': f"SELECT * FROM analytics.f_top_destinos({ARGUMENTOS}) ORDER BY total_viagens DESC",
+        'origens_municipio': f"""
+            SELECT d.id_municipio_origem AS id_municipio,
+                   m.nome || ' - ' || u.sigla AS municipio,
+                   m.latitude, m.longitude,
+                   COUNT(*) AS total_ctes
+            FROM analytics.f_documentos_filtrados({ARGUMENTOS}) d
+            JOIN ibge.municipio m ON m.id_municipio = d.id_municipio_origem
+            JOIN ibge.uf u ON u.id_uf = m.id_uf
+            GROUP BY d.id_municipio_origem, m.nome, u.sigla, m.latitude, m.longitude
+            ORDER BY total_ctes DESC
+        """,
+        'distancia_media': f"SELECT * FROM analytics.f_distancia_media({ARGUMENTOS})",
+        'viagens_por_veiculo': f"""
+            SELECT * FROM analytics.f_viagens_por_veiculo({ARGUMENTOS})
+            ORDER BY total_viagens DESC
+            LIMIT 50
+        """,
+        'produtos_predominantes': f"""
+            SELECT * FROM analytics.f_produtos_predominantes({ARGUMENTOS})
+            ORDER BY total_ctes DESC
+            LIMIT 20
+        """,
+        'taxa_frete_km': f"SELECT * FROM analytics.f_taxa_frete_km({ARGUMENTOS})",
+    }
+    
+    def __init__(self, pool=None, filtros: FiltrosDashboard = None):
+        """Inicializa o visualizador (conexões do pool compartilhado)"""
+        self.pool = pool or pool_conexoes
+        self.consultas = ConsultasPagina(self.pool)
+        self.filtros = filtros or FiltrosDashboard()
         
     def conectar(self) -> bool:
-        """Estabelece conexão com o banco de dados"""
+        """Verifica o acesso ao banco de dados"""
         try:
-            self.conn = psycopg2.connect(**DATABASE_CONFIG)
-            return True
+            with self.pool.conexao():
+                return True
         except Exception as e:
             st.error(f"❌ Erro ao conectar ao banco: {e}")
             return False
     
     def desconectar(self):
-        """Fecha conexão com o banco"""
-        if self.conn:
-            self.conn.close()
+        """Nada a fechar: cada consulta devolve sua conexão ao pool"""
     
-    def executar_query(self, query: str) -> Optional[pd.DataFrame]:
+    def executar_query(self, query: str, params=None) -> Optional[pd.DataFrame]:
         """
         Executa uma query e retorna um DataFrame
         
+        Usa o resultado carregado com a página (carregar_pagina) quando
+        disponível; resultados ficam em cache até a próxima carga do ETL.
+        
         Args:
             query: SQL query a executar
+            params: Parâmetros da query (opcional)
             
         Returns:
             DataFrame com os resultados ou None em caso de erro
         """
         try:
-            return pd.read_sql_query(query, self.conn)
+            return self.consultas.obter(query, params)
         except Exception as e:
             st.error(f"❌ Erro ao executar query: {e}")
             return None
     
+    def consulta(self, chave: str):
+        """SQL e parâmetros da consulta da página (view ou função filtrada)"""
+        return self.filtros.consulta(self.CONSULTAS, self.CONSULTAS_FILTRADAS, chave)
+    
+    def carregar_pagina(self):
+        """Executa todas as consultas da página ao mesmo tempo"""
+        self.consultas.carregar(self.consulta(chave) for chave in self.CONSULTAS)
+    
     def mostrar_dashboard_principal(self):
         """Exibe o dashboard principal com KPIs"""
         st.header("📊 Dashboard de Operação de Transporte")
         st.markdown("---")
         
         # Carregar dados do dashboard
-        df = self.executar_query("SELECT * FROM analytics.vw_dashboard_operacao")
+        df = self.executar_query(*self.consulta('dashboard'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
@@ -170,10 +253,7 @@ class OperacaoTransporteViewer:
         """Exibe análise temporal de CT-es por mês"""
         st.subheader("📅 Total de CT-es Emitidos por Mês")
         
-        df = self.executar_query("""
-            SELECT * FROM analytics.vw_ctes_por_mes 
-            ORDER BY ano, mes
-        """)
+        df = self.executar_query(*self.consulta('ctes_por_mes'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
@@ -211,7 +291,7 @@ class OperacaoTransporteViewer:
         
         with col1:
             st.markdown("#### 🔵 Top 10 Origens")
-            df_origens = self.executar_query("SELECT * FROM analytics.vw_top_origens")
+            df_origens = self.executar_query(*self.consulta('top_origens'))
             
             if df_origens is not None and not df_origens.empty:
                 # Gráfico
@@ -236,7 +316,7 @@ class OperacaoTransporteViewer:
         
         with col2:
             st.markdown("#### 🟢 Top 10 Destinos")
-            df_destinos = self.executar_query("SELECT * FROM analytics.vw_top_destinos")
+            df_destinos = self.executar_query(*self.consulta('top_destinos'))
             
             if df_destinos is not None and not df_destinos.empty:
                 # Gráfico
@@ -259,11 +339,112 @@ class OperacaoTransporteViewer:
                 with st.expander("📊 Detalhes"):
                     st.dataframe(df_destinos, use_container_width=True, hide_index=True)
     
+    def indice_espacial(self) -> Optional[IndiceEspacialService]:
+        """
+        Índice espacial dos municípios com coordenadas
+        
+        Montado uma vez por processo e guardado no cache de consultas (grupo
+        próprio), compartilhado pelas sessões e reruns até a próxima carga
+        do ETL.
+        
+        Returns:
+            IndiceEspacialService ou None se não há coordenadas
+        """
+        query = self.CONSULTAS['coordenadas']
+        
+        def montar():
+            df_coordenadas = self.consultas.obter(query)
+            if df_coordenadas is None or df_coordenadas.empty:
+                return None
+            indice = IndiceEspacialService()
+            indice.definir_coordenadas(
+                df_coordenadas['id_municipio'], df_coordenadas['latitude'].astype(float),
+                df_coordenadas['longitude'].astype(float)
+            )
+            return indice
+        
+        return self.consultas.cache.obter(query, None, montar, grupo='indice_espacial')
+    
+    def mostrar_origens_por_regiao(self):
+        """Exibe CT-es originados em um raio de um município e origens agrupadas por região"""
+        st.subheader("🗺️ Origens por Raio e Região")
+        
+        df_origens = self.executar_query(*self.consulta('origens_municipio'))
+        
+        if df_origens is None or df_origens.empty:
+            st.warning("⚠️ Sem dados disponíveis")
+            return
+        
+        try:
+            indice = self.indice_espacial()
+        except Exception as e:
+            st.error(f"❌ Erro ao montar o índice espacial: {e}")
+            return
+        if indice is None:
+            st.info("💡 Municípios sem coordenadas: execute Database/ibge_loader.py")
+            return
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            centro = st.selectbox("📍 Município de referência", df_origens['municipio'].tolist())
+        
+        with col2:
+            raio_km = st.slider("📏 Raio (km)", min_value=10, max_value=1000, value=150, step=10)
+        
+        codigo_centro = int(df_origens.loc[df_origens['municipio'] == centro, 'id_municipio'].iloc[0])
+        codigos, distancias = indice.municipios_no_raio(codigo_centro, raio_km)
+        distancia_por_codigo = dict(zip(codigos.tolist(), distancias.tolist()))
+        
+        no_raio = df_origens[df_origens['id_municipio'].isin(list(distancia_por_codigo))].copy()
+        no_raio['distancia_km'] = no_raio['id_municipio'].map(distancia_por_codigo).round(1)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.metric("📄 CT-es no Raio", f"{int(no_raio['total_ctes'].sum()):,}")
+        
+        with col2:
+            st.metric("🏙️ Municípios de Origem no Raio", f"{len(no_raio):,}")
+        
+        with st.expander("📊 Origens no Raio"):
+            st.dataframe(
+                no_raio.sort_values('distancia_km')[['municipio', 'distancia_km', 'total_ctes']],
+                use_container_width=True, hide_index=True
+            )
+        
+        # Agrupamento das origens em regiões (células de 1° x 1°)
+        df_origens['regiao'] = indice.regioes(df_origens['id_municipio'], tamanho_regiao=1.0)
+        regioes = (
+            df_origens[df_origens['regiao'] >= 0]
+            .groupby('regiao')
+            .agg(total_ctes=('total_ctes', 'sum'), municipios=('municipio', 'count'),
+                 principal=('municipio', 'first'))
+            .reset_index()
+            .sort_values('total_ctes', ascending=False)
+        )
+        centros = [indice.centro_regiao(regiao, tamanho_regiao=1.0) for regiao in regioes['regiao']]
+        regioes['lat'] = [centro[0] for centro in centros]
+        regioes['lon'] = [centro[1] for centro in centros]
+        
+        fig = px.scatter_geo(
+            regioes,
+            lat='lat',
+            lon='lon',
+            size='total_ctes',
+            hover_name='principal',
+            hover_data={'municipios': True, 'total_ctes': ':,', 'lat': False, 'lon': False},
+            title='Origens Agrupadas por Região (1° x 1°)',
+            scope='south america'
+        )
+        fig.update_layout(height=450)
+        st.plotly_chart(fig, use_container_width=True)
+    
     def mostrar_analise_distancia(self):
         """Exibe análise de distâncias percorridas"""
         st.subheader("📏 Análise de Distâncias Percorridas")
         
-        df = self.executar_query("SELECT * FROM analytics.vw_distancia_media")
+        df = self.executar_query(*self.consulta('distancia_media'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
@@ -278,7 +459,9 @@ class OperacaoTransporteViewer:
             st.metric("📊 Média", f"{float(dados['distancia_media_km']):,.0f} km")
         
         with col2:
-            st.metric("📈 Mediana", f"{float(dados['mediana_km']):,.0f} km")
+            p90_km = float(dados['p90_km']) if pd.notna(dados['p90_km']) else 0
+            st.metric("📈 Mediana", f"{float(dados['mediana_km']):,.0f} km",
+                      help=f"P90: {p90_km:,.0f} km")
         
         with col3:
             st.metric("⬆️ Máxima", f"{float(dados['distancia_maxima_km']):,.0f} km")
@@ -327,14 +510,12 @@ class OperacaoTransporteViewer:
             step=5
         )
         
-        df = self.executar_query(f"""
-            SELECT * FROM analytics.vw_viagens_por_veiculo 
-            LIMIT {num_veiculos}
-        """)
+        df = self.executar_query(*self.consulta('viagens_por_veiculo'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
             return
+        df = df.head(num_veiculos)
         
         # Gráfico de barras
         fig = px.bar(
@@ -375,14 +556,12 @@ class OperacaoTransporteViewer:
             step=5
         )
         
-        df = self.executar_query(f"""
-            SELECT * FROM analytics.vw_produtos_predominantes 
-            LIMIT {num_produtos}
-        """)
+        df = self.executar_query(*self.consulta('produtos_predominantes'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
             return
+        df = df.head(num_produtos)
         
         # Gráfico de barras horizontais
         fig = px.bar(
@@ -417,7 +596,7 @@ class OperacaoTransporteViewer:
         """Exibe análise da taxa de frete por quilômetro"""
         st.subheader("💰 Taxa Média de Frete por Quilômetro")
         
-        df = self.executar_query("SELECT * FROM analytics.vw_taxa_frete_km")
+        df = self.executar_query(*self.consulta('taxa_frete_km'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
@@ -434,7 +613,8 @@ class OperacaoTransporteViewer:
         
         with col2:
             taxa_mediana = float(dados['taxa_mediana_por_km']) if pd.notna(dados['taxa_mediana_por_km']) else 0
-            st.metric("📈 Taxa Mediana", f"R$ {taxa_mediana:.2f}/km")
+            taxa_p90 = float(dados['taxa_p90_por_km']) if pd.notna(dados['taxa_p90_por_km']) else 0
+            st.metric("📈 Taxa Mediana", f"R$ {taxa_mediana:.2f}/km", help=f"P90: R$ {taxa_p90:.2f}/km")
         
         with col3:
             taxa_min = float(dados['taxa_minima_por_km']) if pd.notna(dados['taxa_minima_por_km']) else 0
@@ -483,13 +663,16 @@ class OperacaoTransporteViewer:
 
 def exibir_operacao_transporte():
     """Função principal para exibir todas as visualizações de operação de transporte"""
-    viewer = OperacaoTransporteViewer()
+    viewer = OperacaoTransporteViewer(filtros=mostrar_filtros())
     
     if not viewer.conectar():
         st.error("❌ Não foi possível conectar ao banco de dados")
         return
     
     try:
+        # Consultas da página em paralelo; a renderização usa os resultados
+        viewer.carregar_pagina()
+        
         # Dashboard principal
         viewer.mostrar_dashboard_principal()
         
@@ -506,6 +689,11 @@ def exibir_operacao_transporte():
         
         st.markdown("---")
         
+        # Origens por raio e região
+        viewer.mostrar_origens_por_regiao()
+        
+        st.markdown("---")
+        
         # Análise de distâncias
         viewer.mostrar_analise_distancia()
         
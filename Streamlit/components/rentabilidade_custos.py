@@ -10,54 +10,115 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from typing import Optional
-import psycopg2
-from Config.database_config import DATABASE_CONFIG
+from Streamlit.utils.consultas_pagina import ConsultasPagina
+from Streamlit.utils.filtros_dashboard import ARGUMENTOS, FiltrosDashboard
+from Streamlit.utils.pool_conexoes import pool_conexoes
+from Streamlit.components.filtros import mostrar_filtros
 
 
 class RentabilidadeCustosViewer:
     """Gerenciador de visualizações de Rentabilidade e Custos"""
     
-    def __init__(self):
-        """Inicializa o visualizador"""
-        self.conn = None
+    # Consultas da página, executadas em paralelo antes da renderização.
+    # Os rankings trazem o máximo dos sliders; o slider só recorta o resultado.
+    CONSULTAS = {
+        'dashboard': "SELECT * FROM analytics.vw_dashboard_financeiro",
+        'receita_mensal': "SELECT * FROM analytics.vw_receita_mensal ORDER BY ano, mes",
+        'ticket_medio': "SELECT * FROM analytics.vw_ticket_medio",
+        'margem_veiculo': """
+            SELECT * FROM analytics.vw_margem_veiculo
+            ORDER BY margem_bruta DESC
+            LIMIT 50
+        """,
+        'faturamento_remetente': """
+            SELECT * FROM analytics.vw_faturamento_remetente
+            ORDER BY faturamento_total DESC
+            LIMIT 50
+        """,
+        'faturamento_destinatario': """
+            SELECT * FROM analytics.vw_faturamento_destinatario
+            ORDER BY faturamento_total DESC
+            LIMIT 50
+        """,
+        'ranking_clientes': "SELECT * FROM analytics.vw_ranking_clientes ORDER BY ranking",
+    }
+    
+    # Mesmas consultas com filtros: funções de analytics (create_funcoes_filtro.sql)
+    CONSULTAS_FILTRADAS = {
+        'dashboard': f"SELECT * FROM analytics.f_dashboard_financeiro({ARGUMENTOS})",
+        'receita_mensal': f"SELECT * FROM analytics.f_receita_mensal({ARGUMENTOS}) ORDER BY ano, mes",
+        'ticket_medio': f"SELECT * FROM analytics.f_ticket_medio({ARGUMENTOS})",
+        'margem_veiculo': f"""
+            SELECT * FROM analytics.f_margem_veiculo({ARGUMENTOS})
+            ORDER BY margem_bruta DESC
+            LIMIT 50
+        """,
+        'faturamento_remetente': f"""
+            SELECT * FROM analytics.f_faturamento_cliente('remetente', {ARGUMENTOS})
+            ORDER BY faturamento_total DESC
+            LIMIT 50
+        """,
+        'faturamento_destinatario': f"""
+            SELECT * FROM analytics.f_faturamento_cliente('destinatario', {ARGUMENTOS})
+            ORDER BY faturamento_total DESC
+            LIMIT 50
+        """,
+        'ranking_clientes': f"SELECT * FROM analytics.f_ranking_clientes({ARGUMENTOS}) ORDER BY ranking",
+    }
+    
+    def __init__(self, pool=None, filtros: FiltrosDashboard = None):
+        """Inicializa o visualizador (conexões do pool compartilhado)"""
+        self.pool = pool or pool_conexoes
+        self.consultas = ConsultasPagina(self.pool)
+        self.filtros = filtros or FiltrosDashboard()
         
     def conectar(self) -> bool:
-        """Estabelece conexão com o banco de dados"""
+        """Verifica o acesso ao banco de dados"""
         try:
-            self.conn = psycopg2.connect(**DATABASE_CONFIG)
-            return True
+            with self.pool.conexao():
+                return True
         except Exception as e:
             st.error(f"❌ Erro ao conectar ao banco: {e}")
             return False
     
     def desconectar(self):
-        """Fecha conexão com o banco"""
-        if self.conn:
-            self.conn.close()
+        """Nada a fechar: cada consulta devolve sua conexão ao pool"""
     
-    def executar_query(self, query: str) -> Optional[pd.DataFrame]:
+    def executar_query(self, query: str, params=None) -> Optional[pd.DataFrame]:
         """
         Executa uma query e retorna um DataFrame
         
+        Usa o resultado carregado com a página (carregar_pagina) quando
+        disponível; resultados ficam em cache até a próxima carga do ETL.
+        
         Args:
             query: SQL query a executar
+            params: Parâmetros da query
             
         Returns:
             DataFrame com os resultados ou None em caso de erro
         """
         try:
-            return pd.read_sql_query(query, self.conn)
+            return self.consultas.obter(query, params)
         except Exception as e:
             st.error(f"❌ Erro ao executar query: {e}")
             return None
     
+    def consulta(self, chave: str):
+        """SQL e parâmetros da consulta da página (view ou função filtrada)"""
+        return self.filtros.consulta(self.CONSULTAS, self.CONSULTAS_FILTRADAS, chave)
+    
+    def carregar_pagina(self):
+        """Executa todas as consultas da página ao mesmo tempo"""
+        self.consultas.carregar(self.consulta(chave) for chave in self.CONSULTAS)
+    
     def mostrar_dashboard_principal(self):
         """Exibe o dashboard financeiro principal com KPIs"""
         st.header("💰 Dashboard de Rentabilidade e Custos")
         st.markdown("---")
         
         # Carregar dados do dashboard
-        df = self.executar_query("SELECT * FROM analytics.vw_dashboard_financeiro")
+        df = self.executar_query(*self.consulta('dashboard'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
@@ -146,10 +207,7 @@ class RentabilidadeCustosViewer:
         """Exibe análise de receita mensal"""
         st.subheader("📅 Receita Total de Frete por Mês")
         
-        df = self.executar_query("""
-            SELECT * FROM analytics.vw_receita_mensal 
-            ORDER BY ano, mes
-        """)
+        df = self.executar_query(*self.consulta('receita_mensal'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
@@ -213,7 +271,7 @@ class RentabilidadeCustosViewer:
         """Exibe análise de ticket médio"""
         st.subheader("🎫 Ticket Médio por Viagem")
         
-        df = self.executar_query("SELECT * FROM analytics.vw_ticket_medio")
+        df = self.executar_query(*self.consulta('ticket_medio'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
@@ -230,7 +288,8 @@ class RentabilidadeCustosViewer:
         
         with col2:
             ticket_mediano = float(dados['ticket_mediano']) if pd.notna(dados['ticket_mediano']) else 0
-            st.metric("📈 Ticket Mediano", f"R$ {ticket_mediano:,.2f}")
+            ticket_p90 = float(dados['ticket_p90']) if pd.notna(dados['ticket_p90']) else 0
+            st.metric("📈 Ticket Mediano", f"R$ {ticket_mediano:,.2f}", help=f"P90: R$ {ticket_p90:,.2f}")
         
         with col3:
             ticket_min = float(dados['ticket_minimo']) if pd.notna(dados['ticket_minimo']) else 0
@@ -315,14 +374,12 @@ class RentabilidadeCustosViewer:
             step=10
         )
         
-        df = self.executar_query(f"""
-            SELECT * FROM analytics.vw_margem_veiculo 
-            LIMIT {num_veiculos}
-        """)
+        df = self.executar_query(*self.consulta('margem_veiculo'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
             return
+        df = df.head(num_veiculos)
         
         # Gráfico de barras - Margem percentual
         fig = px.bar(
@@ -378,15 +435,12 @@ class RentabilidadeCustosViewer:
             key=f"slider_{tipo}"
         )
         
-        view_name = f"analytics.vw_faturamento_{tipo}"
-        df = self.executar_query(f"""
-            SELECT * FROM {view_name} 
-            LIMIT {num_clientes}
-        """)
+        df = self.executar_query(*self.consulta(f'faturamento_{tipo}'))
         
         if df is None or df.empty:
             st.warning(f"⚠️ Sem dados de {tipo}s disponíveis")
             return
+        df = df.head(num_clientes).copy()
         
         # Truncar nomes longos para visualização
         df['cliente_display'] = df['cliente'].apply(lambda x: x[:30] + '...' if len(str(x)) > 30 else x)
@@ -423,7 +477,7 @@ class RentabilidadeCustosViewer:
         """Exibe ranking dos principais clientes"""
         st.subheader("🏆 Ranking dos Principais Clientes")
         
-        df = self.executar_query("SELECT * FROM analytics.vw_ranking_clientes")
+        df = self.executar_query(*self.consulta('ranking_clientes'))
         
         if df is None or df.empty:
             st.warning("⚠️ Sem dados disponíveis")
@@ -479,13 +533,16 @@ class RentabilidadeCustosViewer:
 
 def exibir_rentabilidade_custos():
     """Função principal para exibir todas as visualizações de rentabilidade e custos"""
-    viewer = RentabilidadeCustosViewer()
+    viewer = RentabilidadeCustosViewer(filtros=mostrar_filtros())
     
     if not viewer.conectar():
         st.error("❌ Não foi possível conectar ao banco de dados")
         return
     
     try:
+        # Consultas da página em paralelo; a renderização usa os resultados
+        viewer.carregar_pagina()
+        
         # Dashboard principal
         viewer.mostrar_dashboard_principal()
         
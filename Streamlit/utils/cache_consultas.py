@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de resultados das consultas dos dashboards
+Reaproveita resultados entre reruns do Streamlit até a próxima carga do ETL
+"""
+import re
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+from psycopg2 import errors
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from Config.database_config import CACHE_CONFIG
+from Streamlit.utils.cache_disco import CacheDisco
+from Streamlit.utils.pool_conexoes import PoolConexoes, pool_conexoes
+
+logger = logging.getLogger(__name__)
+
+# Literais entre aspas são mantidos; demais espaços viram um só
+_ESPACOS_SQL = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+
+
+def normalizar_sql(query: str) -> str:
+    """Remove diferenças de espaçamento/indentação fora dos literais."""
+    return _ESPACOS_SQL.sub(lambda m: m.group(1) or ' ', query).strip()
+
+
+def chave_consulta(query: str, params: Any) -> tuple:
+    """Chave de uma consulta: SQL normalizado e representação estável dos parâmetros."""
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    elif params is not None:
+        params = tuple(params)
+    return normalizar_sql(query), repr(params)
+
+
+class LeitorGeracao:
+    """
+    Lê a geração dos dados (analytics.f_geracao_dados) numa conexão do pool.
+    
+    Sem a migration create_geracao_dados.sql ou com o banco indisponível a
+    leitura retorna None.
+    """
+    
+    def __init__(self, pool: PoolConexoes = None):
+        self.pool = pool or pool_conexoes
+    
+    def __call__(self) -> Optional[int]:
+        try:
+            with self.pool.conexao() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT analytics.f_geracao_dados()")
+                    return int(cur.fetchone()[0])
+        except errors.UndefinedFunction:
+            return None
+        except Exception as e:
+            logger.warning(f"Erro ao ler geração dos dados: {e}")
+            return None
+
+
+class CacheConsultas:
+    """
+    Cache LRU de resultados de consultas, compartilhado pelas sessões.
+    
+    A chave é (SQL normalizado, parâmetros). Cada resultado guarda a
+    geração dos dados em que foi lido; quando o ETL confirma um lote e
+    incrementa a geração, os resultados anteriores deixam de valer. A
+    geração é relida no máximo a cada `intervalo_geracao` segundos. O TTL
+    limita a idade dos resultados quando a geração não está disponível.
+    Erros não são guardados.
+    
+    Com `disco` (CACHE_SHARED_DIR), DataFrames ausentes da memória são
+    procurados no cache em disco compartilhado pelos processos do host
+    antes de ir ao banco, e os lidos do banco são gravados nele.
+    """
+    
+    def __init__(self, ttl_segundos: float = None, max_entradas: int = None,
+                 max_memoria_mb: float = None, intervalo_geracao: float = None,
+                 ler_geracao: Callable[[], Optional[int]] = None,
+                 relogio: Callable[[], float] = time.monotonic,
+                 disco: Optional[CacheDisco] = None):
+        """
+        Inicializa o cache (padrões de CACHE_CONFIG).
+        
+        Args:
+            ttl_segundos: Idade máxima de um resultado
+            max_entradas: Número máximo de resultados guardados
+            max_memoria_mb: Memória máxima dos resultados guardados
+            intervalo_geracao: Intervalo mínimo entre leituras da geração
+            ler_geracao: Função que retorna a geração atual ou None
+                (padrão: LeitorGeracao no pool de conexões)
+            relogio: Função de tempo (segundos)
+            disco: Cache em disco compartilhado (padrão: CACHE_SHARED_DIR,
+                se configurado)
+        """
+        self.ttl_segundos = CACHE_CONFIG['ttl_seconds'] if ttl_segundos is None else ttl_segundos
+        self.max_entradas = CACHE_CONFIG['max_size'] if max_entradas is None else max_entradas
+        memoria = CACHE_CONFIG['max_memory_mb'] if max_memoria_mb is None else max_memoria_mb
+        self.max_bytes = int(memoria * 1024 * 1024)
+        self.intervalo_geracao = (CACHE_CONFIG['generation_poll_seconds']
+                                  if intervalo_geracao is None else intervalo_geracao)
+        self.ler_geracao = ler_geracao or LeitorGeracao()
+        self.relogio = relogio
+        self.disco = disco if disco is not None else self._criar_disco()
+        
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self._trava_geracao = threading.Lock()
+        self._geracao = None
+        self._geracao_lida_em = None
+        self.acertos = 0
+        self.falhas = 0
+    
+    def obter(self, query: str, params: Any, carregar: Callable[[], Any],
+              grupo: str = 'dataframe') -> Any:
+        """
+        Retorna o resultado guardado ou executa `carregar` e guarda o resultado.
+        
+        Args:
+            query: SQL da consulta
+            params: Parâmetros da consulta (tupla, lista, dict ou None)
+            carregar: Função que executa a consulta
+            grupo: Tipo do resultado (consultas iguais com retornos diferentes)
+        
+        Returns:
+            Resultado (cópia, no caso de DataFrame)
+        """
+        chave = (grupo,) + chave_consulta(query, params)
+        geracao = self.geracao()
+        agora = self.relogio()
+        
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                valor, geracao_entrada, criado_em, _ = entrada
+                if geracao_entrada == geracao and agora - criado_em < self.ttl_segundos:
+                    self._entradas.move_to_end(chave)
+                    self.acertos += 1
+                    return self._copiar(valor)
+                self._remover(chave)
+            self.falhas += 1
+        
+        compartilhado = self.disco is not None and grupo == 'dataframe'
+        valor = self.disco.obter(chave, geracao, self.ttl_segundos) if compartilhado else None
+        if valor is None:
+            valor = carregar()
+            if compartilhado and geracao == self._geracao:
+                self.disco.guardar(chave, valor, geracao, self.ttl_segundos)
+        self._guardar(chave, valor, geracao, agora)
+        return self._copiar(valor)
+    
+    def geracao(self) -> Optional[int]:
+        """
+        Geração atual dos dados (relida no máximo a cada intervalo_geracao).
+        
+        Returns:
+            Geração ou None (sem a migration ou banco indisponível)
+        """
+        with self._trava_geracao:
+            agora = self.relogio()
+            if (self._geracao_lida_em is not None
+                    and agora - self._geracao_lida_em < self.intervalo_geracao):
+                return self._geracao
+            
+            geracao = self.ler_geracao()
+            self._geracao_lida_em = self.relogio()
+            if geracao != self._geracao:
+                self._geracao = geracao
+                # Resultados de outra geração nunca mais serão válidos
+                with self._trava:
+                    self._entradas.clear()
+                    self._bytes = 0
+            return geracao
+    
+    def limpar(self) -> None:
+        """Descarta todos os resultados (inclusive em disco) e força a releitura da geração."""
+        with self._trava_geracao, self._trava:
+            self._entradas.clear()
+            self._bytes = 0
+            self._geracao_lida_em = None
+        if self.disco is not None:
+            self.disco.limpar()
+    
+    def estatisticas(self) -> Dict[str, Any]:
+        """Acertos, falhas, entradas, memória (bytes) e geração atual."""
+        with self._trava:
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'geracao': self._geracao
+            }
+    
+    @staticmethod
+    def _criar_disco() -> Optional[CacheDisco]:
+        """Cache em disco de CACHE_CONFIG; sem diretório ou pyarrow, só memória."""
+        if not CACHE_CONFIG['shared_dir']:
+            return None
+        try:
+            return CacheDisco(CACHE_CONFIG['shared_dir'], CACHE_CONFIG['shared_max_mb'],
+                              intervalo_acesso=CACHE_CONFIG['shared_access_interval_seconds'])
+        except Exception as e:
+            logger.warning(f"Cache em disco desativado: {e}")
+            return None
+    
+    def _guardar(self, chave: tuple, valor: Any, geracao: Optional[int], agora: float) -> None:
+        """Guarda o resultado e remove os menos usados acima dos limites."""
+        tamanho = self._tamanho(valor)
+        if tamanho > self.max_bytes or self.max_entradas <= 0:
+            return
+        
+        with self._trava:
+            # Geração mudou durante a consulta: o resultado pode estar defasado
+            if geracao != self._geracao:
+                return
+            self._remover(chave)
+            self._entradas[chave] = (valor, geracao, agora, tamanho)
+            self._bytes += tamanho
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                self._remover(next(iter(self._entradas)))
+    
+    def _remover(self, chave: tuple) -> None:
+        """Remove uma entrada (chamar com a trava adquirida)."""
+        entrada = self._entradas.pop(chave, None)
+        if entrada is not None:
+            self._bytes -= entrada[3]
+    
+    @staticmethod
+    def _tamanho(valor: Any) -> int:
+        """Memória ocupada pelo resultado em bytes."""
+        if isinstance(valor, pd.DataFrame):
+            return int(valor.memory_usage(index=True, deep=True).sum())
+        return sys.getsizeof(valor)
+    
+    @staticmethod
+    def _copiar(valor: Any) -> Any:
+        """Cópia do DataFrame: alterações do chamador não afetam o cache."""
+        if isinstance(valor, pd.DataFrame):
+            return valor.copy()
+        return valor
+
+
+# Instância global (compartilhada pelas sessões do Streamlit)
+cache_consultas = CacheConsultas()
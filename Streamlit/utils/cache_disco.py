@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Cache em disco compartilhado entre processos do Streamlit
+DataFrames das consultas gravados em Arrow IPC num arquivo SQLite por host
+"""
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # Dependência do Streamlit; sem ela o cache fica só em memória
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+
+def serializar_dataframe(df: pd.DataFrame) -> bytes:
+    """DataFrame em Arrow IPC (colunar, tipos preservados, compressão zstd)."""
+    tabela = pa.Table.from_pandas(df, preserve_index=True)
+    saida = pa.BufferOutputStream()
+    opcoes = pa.ipc.IpcWriteOptions(compression='zstd')
+    with pa.ipc.new_stream(saida, tabela.schema, options=opcoes) as escritor:
+        escritor.write_table(tabela)
+    return saida.getvalue().to_pybytes()
+
+
+def desserializar_dataframe(dados: bytes) -> pd.DataFrame:
+    """Reconstrói o DataFrame gravado por serializar_dataframe."""
+    return pa.ipc.open_stream(pa.py_buffer(dados)).read_all().to_pandas()
+
+
+class CacheDisco:
+    """
+    Camada do cache de consultas compartilhada pelos processos do host.
+    
+    Os DataFrames ficam num arquivo SQLite em modo WAL (leitores não
+    bloqueiam o gravador; gravadores concorrentes aguardam busy_timeout),
+    serializados em Arrow IPC. Cada entrada guarda a geração dos dados em
+    que foi lida: entradas de outra geração ou mais velhas que o TTL são
+    ignoradas e removidas na gravação seguinte. Acima de `max_mb` saem as
+    entradas acessadas há mais tempo.
+    """
+    
+    ARQUIVO = 'consultas.sqlite3'
+    # Intervalo mínimo padrão entre atualizações do último acesso de uma entrada
+    INTERVALO_ACESSO = 60
+    
+    def __init__(self, diretorio: str, max_mb: float = 1024, timeout: float = 5.0,
+                 intervalo_acesso: Optional[float] = None):
+        """
+        Inicializa o cache em disco.
+        
+        Args:
+            diretorio: Diretório do arquivo SQLite (criado se necessário)
+            max_mb: Tamanho máximo dos DataFrames gravados
+            timeout: Espera máxima por um gravador concorrente (segundos)
+            intervalo_acesso: Segundos mínimos entre gravações do último
+                acesso de uma entrada (leituras acertadas não escrevem no
+                SQLite dentro do intervalo); padrão INTERVALO_ACESSO
+        """
+        if pa is None:
+            raise ImportError("pyarrow é necessário para o cache em disco")
+        
+        self.caminho = Path(diretorio) / self.ARQUIVO
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.timeout = timeout
+        self.intervalo_acesso = self.INTERVALO_ACESSO if intervalo_acesso is None else intervalo_acesso
+        self._local = threading.local()
+        
+        with self._conexao() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entrada (
+                    chave       TEXT PRIMARY KEY,
+                    geracao     INTEGER,
+                    criado_em   REAL NOT NULL,
+                    acessado_em REAL NOT NULL,
+                    tamanho     INTEGER NOT NULL,
+                    dados       BLOB NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entrada_acesso ON entrada (acessado_em)")
+    
+    def _conexao(self) -> sqlite3.Connection:
+        """Conexão SQLite da thread atual (sqlite3 não compartilha entre threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.caminho), timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def chave_texto(chave: Any) -> str:
+        """Chave do SQLite: hash da chave do cache em memória."""
+        return hashlib.sha256(repr(chave).encode('utf-8')).hexdigest()
+    
+    def obter(self, chave: Any, geracao: Optional[int], ttl_segundos: float) -> Optional[pd.DataFrame]:
+        """
+        Lê o DataFrame gravado para a chave na mesma geração e dentro do TTL.
+        
+        Returns:
+            DataFrame ou None (ausente, de outra geração, expirado ou erro)
+        """
+        texto = self.chave_texto(chave)
+        agora = time.time()
+        try:
+            conn = self._conexao()
+            linha = conn.execute(
+                "SELECT geracao, criado_em, acessado_em, dados FROM entrada WHERE chave = ?",
+                (texto,)
+            ).fetchone()
+            if linha is None or linha[0] != geracao or agora - linha[1] >= ttl_segundos:
+                return None
+            
+            if agora - linha[2] >= self.intervalo_acesso:
+                with conn:
+                    conn.execute("UPDATE entrada SET acessado_em = ? WHERE chave = ?", (agora, texto))
+            return desserializar_dataframe(linha[3])
+        except Exception as e:
+            logger.warning(f"Erro ao ler cache em disco: {e}")
+            return None
+    
+    def guardar(self, chave: Any, valor: pd.DataFrame, geracao: Optional[int],
+                ttl_segundos: float) -> bool:
+        """
+        Grava o DataFrame e remove entradas inválidas ou acima do limite.
+        
+        Returns:
+            True se gravado
+        """
+        try:
+            dados = serializar_dataframe(valor)
+        except Exception as e:
+            # Colunas que o Arrow não representa (ex.: tipos mistos) ficam só em memória
+            logger.debug(f"DataFrame não serializável para o cache em disco: {e}")
+            return False
+        if len(dados) > self.max_bytes:
+            return False
+        
+        agora = time.time()
+        try:
+            with self._conexao() as conn:
+                # Só gerações anteriores: um processo com a geração defasada não apaga as novas
+                conn.execute(
+                    "DELETE FROM entrada WHERE geracao < ? OR criado_em <= ?",
+                    (geracao, agora - ttl_segundos)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO entrada VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.chave_texto(chave), geracao, agora, agora, len(dados), dados)
+                )
+                conn.execute("""
+                    DELETE FROM entrada WHERE chave IN (
+                        SELECT chave FROM (
+                            SELECT chave, sum(tamanho) OVER (ORDER BY acessado_em DESC, chave) AS acumulado
+                            FROM entrada
+                        ) WHERE acumulado > ?
+                    )
+                """, (self.max_bytes,))
+            return True
+        except Exception as e:
+            logger.warning(f"Erro ao gravar cache em disco: {e}")
+            return False
+    
+    def limpar(self) -> None:
+        """Remove todas as entradas (de todos os processos)."""
+        with self._conexao() as conn:
+            conn.execute("DELETE FROM entrada")
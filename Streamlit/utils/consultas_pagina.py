@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Consultas de uma página do dashboard executadas em paralelo
+Carrega todas as consultas da página antes de renderizar
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Tuple, Union
+
+import pandas as pd
+
+from Config.database_config import POOL_CONFIG
+from Streamlit.utils.cache_consultas import CacheConsultas, cache_consultas, chave_consulta
+from Streamlit.utils.pool_conexoes import PoolConexoes, pool_conexoes
+
+logger = logging.getLogger(__name__)
+
+Consulta = Union[str, Tuple[str, Any]]
+
+
+class ConsultasPagina:
+    """
+    Conjunto de consultas de uma página, executadas ao mesmo tempo.
+    
+    A página chama `carregar` com todas as consultas que não dependem de
+    widgets; cada uma roda numa conexão do pool (passando pelo cache de
+    consultas), então o tempo de carga fica perto da consulta mais lenta em
+    vez da soma. Durante a renderização, `obter` devolve o resultado já
+    carregado ou, para consultas fora do conjunto, consulta na hora.
+    """
+    
+    def __init__(self, pool: PoolConexoes = None, cache: CacheConsultas = None,
+                 workers: int = None):
+        """
+        Inicializa o conjunto.
+        
+        Args:
+            pool: Pool de conexões (padrão: pool global)
+            cache: Cache de consultas (padrão: cache global)
+            workers: Consultas simultâneas (padrão: POOL_CONFIG['page_workers'],
+                limitado ao máximo de conexões do pool para que uma página
+                não ocupe o pool inteiro das outras sessões)
+        """
+        self.pool = pool or pool_conexoes
+        self.cache = cache or cache_consultas
+        self.workers = max(1, min(workers or POOL_CONFIG['page_workers'], self.pool.maximo))
+        self._resultados: Dict[tuple, Any] = {}
+    
+    def carregar(self, consultas: Iterable[Consulta]) -> Dict[str, Exception]:
+        """
+        Executa as consultas em paralelo e guarda os resultados.
+        
+        Args:
+            consultas: SQL ou tuplas (SQL, parâmetros)
+        
+        Returns:
+            Dicionário SQL -> erro das consultas que falharam (o erro é
+            repetido por `obter`)
+        """
+        pendentes = {}
+        for consulta in consultas:
+            query, params = (consulta, None) if isinstance(consulta, str) else consulta
+            pendentes.setdefault(chave_consulta(query, params), (query, params))
+        if not pendentes:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(pendentes))) as executor:
+            futuros = {
+                chave: executor.submit(self._executar, query, params)
+                for chave, (query, params) in pendentes.items()
+            }
+        
+        erros = {}
+        for chave, futuro in futuros.items():
+            erro = futuro.exception()
+            self._resultados[chave] = erro if erro is not None else futuro.result()
+            if erro is not None:
+                logger.error(f"Erro na consulta da página: {erro}")
+                erros[pendentes[chave][0]] = erro
+        return erros
+    
+    def obter(self, query: str, params: Any = None) -> pd.DataFrame:
+        """
+        Resultado carregado pela página ou, se ausente, consultado agora.
+        
+        Raises:
+            Exception: Erro da consulta (inclusive o registrado em `carregar`)
+        """
+        resultado = self._resultados.get(chave_consulta(query, params))
+        if resultado is None:
+            return self._executar(query, params)
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado.copy()
+    
+    def _executar(self, query: str, params: Any) -> pd.DataFrame:
+        return self.cache.obter(query, params, lambda: self.pool.ler_dataframe(query, params))
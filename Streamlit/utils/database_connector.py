@@ -16,6 +16,8 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from Config.database_config import DATABASE_CONFIG, SCHEMAS
+from Streamlit.utils.cache_consultas import cache_consultas
+from Streamlit.utils.pool_conexoes import pool_conexoes
 
 logger = logging.getLogger(__name__)
 
@@ -28,43 +30,44 @@ class DatabaseConnector:
     
     @contextmanager
     def get_connection(self):
-        """Context manager para conexão com o banco"""
-        conn = None
+        """Context manager para conexão do pool compartilhado (devolvida no final)"""
         try:
-            conn = psycopg2.connect(**self.config)
-            yield conn
+            with pool_conexoes.conexao() as conn:
+                yield conn
         except Exception as e:
             logger.error(f"Erro na conexão: {e}")
-            if conn:
-                conn.rollback()
             raise
-        finally:
-            if conn:
-                conn.close()
     
     def execute_query(self, query: str, params: Optional[tuple] = None) -> pd.DataFrame:
-        """Executa uma query e retorna DataFrame"""
+        """Executa uma query e retorna DataFrame (cache até a próxima carga)"""
         try:
-            with self.get_connection() as conn:
-                df = pd.read_sql_query(query, conn, params=params)
-                return df
+            return cache_consultas.obter(query, params, lambda: self._ler_dataframe(query, params))
         except Exception as e:
             logger.error(f"Erro ao executar query: {e}")
             st.error(f"Erro na consulta: {e}")
             return pd.DataFrame()
     
     def execute_scalar(self, query: str, params: Optional[tuple] = None) -> Any:
-        """Executa query que retorna um valor único"""
+        """Executa query que retorna um valor único (cache até a próxima carga)"""
         try:
-            with self.get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(query, params)
-                    result = cur.fetchone()
-                    return result[0] if result else None
+            return cache_consultas.obter(query, params, lambda: self._ler_escalar(query, params),
+                                         grupo='escalar')
         except Exception as e:
             logger.error(f"Erro ao executar query escalar: {e}")
             return None
     
+    def _ler_dataframe(self, query: str, params: Optional[tuple] = None) -> pd.DataFrame:
+        """Executa a query no banco, sem cache (resultados grandes via COPY)"""
+        return pool_conexoes.ler_dataframe(query, params)
+    
+    def _ler_escalar(self, query: str, params: Optional[tuple] = None) -> Any:
+        """Executa a query escalar no banco, sem cache"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                result = cur.fetchone()
+                return result[0] if result else None
+    
     def get_table_info(self) -> Dict[str, Any]:
         """Obtém informações sobre as tabelas principais"""
         info = {}
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Filtros dos dashboards (período, UF, veículo e cliente)
+Escolhe entre a view materializada e a função filtrada de analytics
+"""
+import re
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+# Argumentos das funções analytics.f_* (migrations/create_funcoes_filtro.sql)
+ARGUMENTOS = "%(data_inicio)s, %(data_fim)s, %(uf)s, %(placa)s, %(cliente)s"
+
+
+def _texto(valor: Optional[str], padrao: str) -> Optional[str]:
+    """Mantém só os caracteres do padrão; vazio vira None."""
+    if valor is None:
+        return None
+    return re.sub(padrao, '', str(valor).upper()) or None
+
+
+@dataclass(frozen=True)
+class FiltrosDashboard:
+    """
+    Filtros escolhidos na barra lateral.
+    
+    Os valores são normalizados como no banco (UF e placa em maiúsculas sem
+    hífen, CPF/CNPJ só com dígitos). Sem filtro ativo as páginas continuam
+    lendo as views materializadas; com filtro, as funções analytics.f_*
+    recebem os filtros como parâmetros e o PostgreSQL aplica o período
+    direto nas partições de cte.documento.
+    """
+    data_inicio: Optional[date] = None
+    data_fim: Optional[date] = None
+    uf: Optional[str] = None
+    placa: Optional[str] = None
+    cliente: Optional[str] = None
+    
+    def __post_init__(self):
+        # Período informado ao contrário é invertido
+        if self.data_inicio and self.data_fim and self.data_inicio > self.data_fim:
+            inicio, fim = self.data_fim, self.data_inicio
+            object.__setattr__(self, 'data_inicio', inicio)
+            object.__setattr__(self, 'data_fim', fim)
+        object.__setattr__(self, 'uf', _texto(self.uf, r'[^A-Z]'))
+        object.__setattr__(self, 'placa', _texto(self.placa, r'[^A-Z0-9]'))
+        object.__setattr__(self, 'cliente', _texto(self.cliente, r'\D'))
+    
+    @property
+    def ativos(self) -> bool:
+        """Algum filtro informado."""
+        return any(valor is not None for valor in self.params().values())
+    
+    def params(self) -> Dict[str, Any]:
+        """Parâmetros nomeados para ARGUMENTOS."""
+        return {
+            'data_inicio': self.data_inicio,
+            'data_fim': self.data_fim,
+            'uf': self.uf,
+            'placa': self.placa,
+            'cliente': self.cliente
+        }
+    
+    def consulta(self, consultas: Dict[str, str], filtradas: Dict[str, str],
+                 chave: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Consulta a executar para a chave da página.
+        
+        Args:
+            consultas: SQL sobre as views materializadas
+            filtradas: SQL sobre as funções filtradas (com ARGUMENTOS)
+            chave: Consulta da página
+        
+        Returns:
+            Tupla (SQL, parâmetros); parâmetros None sem filtro ativo
+        """
+        if self.ativos and chave in filtradas:
+            return filtradas[chave], self.params()
+        return consultas[chave], None
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura colunar de resultados grandes
+COPY (consulta) TO STDOUT lido em blocos direto para colunas Arrow tipadas
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, List, Optional, Tuple
+
+import pandas as pd
+import psycopg2
+from psycopg2 import extensions
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # Dependência do Streamlit; sem ela tudo passa por ler_sql
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# OID do tipo PostgreSQL -> nome do tipo Arrow (colunas de outros tipos: ler_sql)
+TIPOS_POSTGRES = {
+    16: 'bool',          # boolean
+    18: 'string',        # "char"
+    19: 'string',        # name
+    20: 'int64',         # bigint
+    21: 'int64',         # smallint
+    23: 'int64',         # integer
+    25: 'string',        # text
+    700: 'float64',      # real
+    701: 'float64',      # double precision
+    1042: 'string',      # char(n)
+    1043: 'string',      # varchar
+    1082: 'date',        # date
+    1114: 'timestamp',   # timestamp
+    1184: 'timestamptz', # timestamp with time zone
+    1700: 'float64'      # numeric (float64 em vez de Decimal, também em ler_sql)
+}
+
+# Tipos numéricos: em ler_sql, colunas só com NULL saem float64 como no COPY
+OIDS_NUMERICOS = {oid for oid, nome in TIPOS_POSTGRES.items() if nome in ('int64', 'float64')}
+
+# timestamptz: nos dois caminhos, datetime64 no TimeZone da sessão
+OID_TIMESTAMPTZ = 1184
+
+# Texto que o COPY grava para NULL (texto vazio continua sendo "")
+_NULO = r'\N'
+
+
+def _tipo_arrow(nome: str):
+    if nome == 'date':
+        return pa.date32()
+    if nome == 'timestamp':
+        return pa.timestamp('us')
+    if nome == 'timestamptz':
+        return pa.timestamp('us', tz='UTC')
+    return pa.type_for_alias(nome)
+
+
+class LeitorCopy:
+    """
+    Carrega resultados grandes via COPY em vez de pd.read_sql_query.
+    
+    read_sql_query monta uma tupla Python por linha e depois infere os
+    tipos das colunas. Quando o planejador estima ao menos `min_linhas`
+    linhas, a consulta é exportada com COPY ... TO STDOUT (CSV) por um
+    pipe e lida pelo leitor de CSV do Arrow em blocos de `bloco_mb`, com o
+    tipo de cada coluna vindo do catálogo (sem inferência): só o bloco
+    atual fica em memória como texto.
+    
+    O DataFrame é o mesmo nos dois caminhos (inteiros com NULL em float,
+    datas como datetime.date, numeric sempre float64, timestamptz no
+    TimeZone da sessão). Abaixo do limite, sem pyarrow ou com colunas de
+    outros tipos (json, arrays, intervalos...) a leitura usa `ler_sql`.
+    
+    A decisão (EXPLAIN + colunas) custa duas idas ao banco e é guardada por
+    SQL normalizado e parâmetros (a estimativa depende deles) durante
+    VALIDADE_DECISAO segundos.
+    """
+    
+    VALIDADE_DECISAO = 600.0
+    MAX_DECISOES = 1024
+    
+    def __init__(self, min_linhas: int, bloco_mb: float = 8):
+        """
+        Inicializa o leitor.
+        
+        Args:
+            min_linhas: Linhas estimadas a partir das quais usar COPY (0: nunca)
+            bloco_mb: Tamanho de cada bloco de CSV lido
+        """
+        self.min_linhas = min_linhas if pa is not None else 0
+        self.bloco_bytes = max(1 << 16, int(bloco_mb * 1024 * 1024))
+        self._decisoes: OrderedDict = OrderedDict()  # (SQL, parâmetros) -> (instante, colunas)
+        self._trava = threading.Lock()
+    
+    def ler_dataframe(self, conn, query: str, params: Any = None) -> pd.DataFrame:
+        """
+        Executa a consulta e retorna DataFrame (COPY para resultados grandes).
+        
+        Args:
+            conn: Conexão psycopg2
+            query: SQL da consulta (SELECT)
+            params: Parâmetros da consulta
+        
+        Returns:
+            DataFrame com o resultado
+        """
+        if self.min_linhas > 0:
+            sql = self.sql_literal(conn, query, params)
+            colunas = self._decidir(conn, query, params, sql)
+            if colunas is not None:
+                return self.ler_copy(conn, sql, colunas)
+        return self.ler_sql(conn, query, params)
+    
+    @staticmethod
+    def ler_sql(conn, query: str, params: Any = None) -> pd.DataFrame:
+        """
+        Caminho comum, como pd.read_sql_query, com numeric em float64.
+        
+        read_sql_query já converte Decimal em float, mas uma coluna numérica
+        só com NULL (ou de um resultado vazio) ficaria com dtype object; pelo
+        tipo da coluna no cursor ela sai float64, como no COPY. Colunas
+        timestamptz com offsets diferentes (horário de verão) também ficariam
+        object: saem convertidas para o TimeZone da sessão.
+        """
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            descricao = cur.description or []
+            df = pd.DataFrame.from_records(cur.fetchall(), columns=[coluna.name for coluna in descricao],
+                                           coerce_float=True)
+        fuso = None
+        for posicao, coluna in enumerate(descricao):
+            if coluna.type_code in OIDS_NUMERICOS and df.iloc[:, posicao].dtype == object:
+                df.isetitem(posicao, df.iloc[:, posicao].astype('float64'))
+            elif coluna.type_code == OID_TIMESTAMPTZ:
+                fuso = fuso or fuso_horario(conn)
+                df.isetitem(posicao, _converter_fuso(pd.to_datetime(df.iloc[:, posicao], utc=True), fuso))
+        return df
+    
+    def _decidir(self, conn, query: str, params: Any, sql: str) -> Optional[List[Tuple[str, int]]]:
+        """Resultado de _colunas_copy guardado por SQL normalizado e parâmetros."""
+        # Importado aqui: cache_consultas importa o pool, que importa este módulo
+        from Streamlit.utils.cache_consultas import chave_consulta
+        
+        chave = chave_consulta(query, params)
+        agora = time.monotonic()
+        with self._trava:
+            decisao = self._decisoes.get(chave)
+            if decisao is not None and agora - decisao[0] < self.VALIDADE_DECISAO:
+                self._decisoes.move_to_end(chave)
+                return decisao[1]
+        
+        colunas = self._colunas_copy(conn, sql)
+        with self._trava:
+            self._decisoes[chave] = (agora, colunas)
+            self._decisoes.move_to_end(chave)
+            while len(self._decisoes) > self.MAX_DECISOES:
+                self._decisoes.popitem(last=False)
+        return colunas
+    
+    @staticmethod
+    def sql_literal(conn, query: str, params: Any) -> str:
+        """SQL com os parâmetros interpolados pelo psycopg2 (COPY não aceita parâmetros)."""
+        if params is not None:
+            with conn.cursor() as cur:
+                query = cur.mogrify(query, params).decode(extensions.encodings[conn.encoding])
+        return query.strip().rstrip(';')
+    
+    def _colunas_copy(self, conn, sql: str) -> Optional[List[Tuple[str, int]]]:
+        """Colunas (nome, OID) se a consulta deve usar COPY; senão None."""
+        try:
+            with conn.cursor() as cur:
+                # Estimativa do planejador, sem executar a consulta
+                cur.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+                if cur.fetchone()[0][0]['Plan']['Plan Rows'] < self.min_linhas:
+                    return None
+                cur.execute(f"SELECT * FROM ({sql}) AS consulta LIMIT 0")
+                colunas = [(coluna.name, coluna.type_code) for coluna in cur.description]
+        except psycopg2.DatabaseError as e:
+            # Comandos que não aceitam EXPLAIN/subconsulta seguem pelo caminho comum
+            logger.debug(f"Leitura via COPY indisponível para a consulta: {e}")
+            return None
+        if all(oid in TIPOS_POSTGRES for _, oid in colunas):
+            return colunas
+        return None
+    
+    def ler_copy(self, conn, sql: str, colunas: List[Tuple[str, int]]) -> pd.DataFrame:
+        """
+        Exporta a consulta com COPY e lê o CSV em blocos.
+        
+        O COPY roda numa thread que escreve no pipe; esta thread lê do
+        outro lado. Um erro no servidor (ex.: statement_timeout) no meio da
+        exportação é repassado em vez de retornar um resultado truncado.
+        """
+        comando = f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, NULL '{_NULO}')"
+        leitura, escrita = os.pipe()
+        erros = []
+        
+        def exportar():
+            try:
+                with os.fdopen(escrita, 'wb', buffering=1 << 20) as saida, conn.cursor() as cur:
+                    cur.copy_expert(comando, saida)
+            except Exception as e:
+                erros.append(e)
+        
+        exportador = threading.Thread(target=exportar, name='leitura-copy', daemon=True)
+        exportador.start()
+        try:
+            with os.fdopen(leitura, 'rb') as entrada:
+                try:
+                    df = self.dataframe_csv(entrada, colunas, extensions.encodings[conn.encoding],
+                                            fuso_horario(conn))
+                except Exception:
+                    # CSV truncado por erro no COPY: o erro do servidor é o relevante
+                    if not erros:
+                        raise
+        finally:
+            # Com o pipe fechado, um COPY interrompido falha na escrita e termina
+            exportador.join()
+        if erros:
+            raise erros[0]
+        return df
+    
+    def dataframe_csv(self, entrada: BinaryIO, colunas: List[Tuple[str, int]],
+                      encoding: str = 'utf8', fuso: str = 'UTC') -> pd.DataFrame:
+        """
+        Lê o CSV do COPY (sem cabeçalho) em blocos com os tipos das colunas.
+        
+        Args:
+            entrada: Arquivo binário com o CSV
+            colunas: Nome e OID do tipo de cada coluna
+            encoding: Codificação do texto (client_encoding da conexão)
+            fuso: TimeZone das colunas timestamptz
+        
+        Returns:
+            DataFrame com as colunas na ordem da consulta
+        """
+        # Nomes posicionais: a consulta pode repetir nomes de colunas
+        nomes = [f'c{i}' for i in range(len(colunas))]
+        tipos = {nome: _tipo_arrow(TIPOS_POSTGRES[oid]) for nome, (_, oid) in zip(nomes, colunas)}
+        if hasattr(entrada, 'peek') and not entrada.peek(1):
+            # COPY sem linhas (estimativa alta, resultado vazio): o Arrow recusa CSV vazio
+            tabela = pa.schema(list(tipos.items())).empty_table()
+        else:
+            tabela = self._ler_blocos(entrada, nomes, tipos, encoding)
+        
+        df = tabela.to_pandas()
+        for posicao, (_, oid) in enumerate(colunas):
+            if oid == OID_TIMESTAMPTZ:
+                df.isetitem(posicao, _converter_fuso(df.iloc[:, posicao], fuso))
+        df.columns = [nome for nome, _ in colunas]
+        return df
+    
+    def _ler_blocos(self, entrada: BinaryIO, nomes: List[str], tipos: dict, encoding: str):
+        """Tabela Arrow lida do CSV em blocos de bloco_bytes."""
+        leitor = pa_csv.open_csv(
+            entrada,
+            read_options=pa_csv.ReadOptions(column_names=nomes, block_size=self.bloco_bytes,
+                                            encoding=encoding),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=tipos, null_values=[_NULO], strings_can_be_null=True,
+                quoted_strings_can_be_null=False, true_values=['t'], false_values=['f']
+            )
+        )
+        return pa.Table.from_batches(list(leitor), schema=leitor.schema)
+
+
+def fuso_horario(conn) -> str:
+    """
+    TimeZone da sessão, informado pelo servidor na conexão (sem consulta).
+    
+    Returns:
+        Nome do fuso ou 'UTC' se ele não for reconhecido pelo pandas
+        (ex.: especificação POSIX como '<-03>+03')
+    """
+    fuso = conn.info.parameter_status('TimeZone') or 'UTC'
+    try:
+        pd.Timestamp(0, tz=fuso)
+    except (KeyError, ValueError):
+        return 'UTC'
+    return fuso
+
+
+def _converter_fuso(serie: pd.Series, fuso: str) -> pd.Series:
+    """Coluna datetime64 com fuso convertida para `fuso`, em microssegundos como no Arrow."""
+    serie = serie.dt.tz_convert(fuso)
+    if hasattr(serie.dt, 'as_unit'):
+        serie = serie.dt.as_unit('us')
+    return serie
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de conexões dos dashboards
+Conexões somente leitura compartilhadas por todas as sessões do processo
+"""
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+import psycopg2
+from psycopg2 import extensions
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from Config.database_config import DATABASE_CONFIG, POOL_CONFIG
+from Streamlit.utils.leitura_copy import LeitorCopy
+
+logger = logging.getLogger(__name__)
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão foi liberada dentro do tempo de espera."""
+
+
+class PoolConexoes:
+    """
+    Pool limitado de conexões para as consultas dos dashboards.
+    
+    - No máximo `maximo` conexões abertas; quem chega com todas em uso
+      espera até `timeout` segundos por uma devolução;
+    - Conexões em autocommit e somente leitura, com statement_timeout:
+      uma consulta lenta não prende a conexão nem abre transação ociosa;
+    - Conexões ociosas há mais de `ocioso_segundos` são fechadas (mantendo
+      `minimo` abertas) por uma thread de coleta e a cada devolução; as
+      devolvidas por último são reutilizadas primeiro;
+    - Conexões quebradas (ex.: reinício do servidor) são descartadas na
+      devolução; ler_dataframe repete a consulta uma vez numa conexão nova;
+    - Resultados grandes são lidos via COPY (LeitorCopy).
+    """
+    
+    def __init__(self, config: Dict[str, Any] = None, minimo: int = None, maximo: int = None,
+                 ocioso_segundos: float = None, timeout: float = None,
+                 statement_timeout_ms: int = None, leitor: LeitorCopy = None):
+        """
+        Inicializa o pool (padrões de POOL_CONFIG); nenhuma conexão é aberta aqui.
+        
+        Args:
+            config: Parâmetros de conexão (padrão: DATABASE_CONFIG)
+            minimo: Conexões ociosas mantidas abertas
+            maximo: Conexões abertas ao mesmo tempo
+            ocioso_segundos: Tempo ocioso até a conexão ser fechada
+            timeout: Espera máxima por uma conexão livre (segundos)
+            statement_timeout_ms: Tempo máximo de cada consulta (0: sem limite)
+            leitor: Leitura dos DataFrames (padrão: COPY a partir de copy_min_rows)
+        """
+        self.config = (config or DATABASE_CONFIG).copy()
+        self.minimo = POOL_CONFIG['min_connections'] if minimo is None else minimo
+        self.maximo = max(1, POOL_CONFIG['max_connections'] if maximo is None else maximo)
+        self.ocioso_segundos = POOL_CONFIG['idle_seconds'] if ocioso_segundos is None else ocioso_segundos
+        self.timeout = POOL_CONFIG['timeout'] if timeout is None else timeout
+        statement_timeout_ms = (POOL_CONFIG['statement_timeout_ms']
+                                if statement_timeout_ms is None else statement_timeout_ms)
+        self.config['options'] = (
+            f"{self.config.get('options', '')} -c statement_timeout={int(statement_timeout_ms)}"
+        ).strip()
+        self.leitor = leitor or LeitorCopy(POOL_CONFIG['copy_min_rows'], POOL_CONFIG['copy_block_mb'])
+        
+        self._ociosas: List[Tuple[Any, float]] = []
+        self._abertas = 0
+        self._condicao = threading.Condition()
+        self._coletor = None
+    
+    @contextmanager
+    def conexao(self):
+        """
+        Context manager: retira uma conexão e a devolve ao pool no final.
+        
+        Raises:
+            PoolEsgotado: Todas as conexões em uso durante `timeout` segundos
+        """
+        conn = self._retirar()
+        try:
+            yield conn
+        finally:
+            self._devolver(conn)
+    
+    def ler_dataframe(self, query: str, params: Any = None) -> pd.DataFrame:
+        """Executa a consulta numa conexão do pool e retorna DataFrame."""
+        for tentativa in range(2):
+            with self.conexao() as conn:
+                try:
+                    return self.leitor.ler_dataframe(conn, query, params)
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    # Conexão ociosa derrubada pelo servidor: repete numa nova
+                    if not conn.closed or tentativa:
+                        raise
+    
+    def testar(self) -> bool:
+        """Verifica se o pool consegue uma conexão válida."""
+        try:
+            with self.conexao() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+            return True
+        except Exception as e:
+            logger.error(f"Teste de conexão falhou: {e}")
+            return False
+    
+    def estatisticas(self) -> Dict[str, int]:
+        """Conexões abertas, ociosas e em uso."""
+        with self._condicao:
+            return {
+                'abertas': self._abertas,
+                'ociosas': len(self._ociosas),
+                'em_uso': self._abertas - len(self._ociosas)
+            }
+    
+    def recolher_ociosas(self) -> int:
+        """
+        Fecha as conexões ociosas há mais de `ocioso_segundos` acima do mínimo.
+        
+        Returns:
+            Número de conexões fechadas
+        """
+        agora = time.monotonic()
+        expiradas = []
+        with self._condicao:
+            # Ociosas em ordem de devolução: as mais antigas ficam no início
+            while (len(self._ociosas) > self.minimo
+                   and agora - self._ociosas[0][1] > self.ocioso_segundos):
+                expiradas.append(self._ociosas.pop(0)[0])
+            self._abertas -= len(expiradas)
+            if expiradas:
+                self._condicao.notify(len(expiradas))
+        for conn in expiradas:
+            self._fechar(conn)
+        return len(expiradas)
+    
+    def fechar(self) -> None:
+        """Fecha as conexões ociosas (as em uso fecham ao serem devolvidas)."""
+        with self._condicao:
+            ociosas, self._ociosas = self._ociosas, []
+            self._abertas -= len(ociosas)
+        for conn, _ in ociosas:
+            self._fechar(conn)
+    
+    def _retirar(self):
+        """Conexão ociosa mais recente, uma nova (abaixo do máximo) ou espera."""
+        limite = time.monotonic() + self.timeout
+        with self._condicao:
+            while True:
+                while self._ociosas:
+                    conn, _ = self._ociosas.pop()
+                    if not conn.closed:
+                        return conn
+                    self._abertas -= 1
+                if self._abertas < self.maximo:
+                    self._abertas += 1
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise PoolEsgotado(f"{self.maximo} conexões em uso por mais de {self.timeout}s")
+                self._condicao.wait(restante)
+        
+        self._iniciar_coletor()
+        # Conexão aberta fora da trava: não bloqueia quem devolve conexões
+        try:
+            conn = psycopg2.connect(**self.config)
+            conn.set_session(readonly=True, autocommit=True)
+            return conn
+        except Exception:
+            with self._condicao:
+                self._abertas -= 1
+                self._condicao.notify()
+            raise
+    
+    def _devolver(self, conn) -> None:
+        """Devolve a conexão (ou a descarta, se quebrada) e fecha as ociosas antigas."""
+        valida = (not conn.closed
+                  and conn.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE)
+        with self._condicao:
+            if valida:
+                self._ociosas.append((conn, time.monotonic()))
+            else:
+                self._abertas -= 1
+            self._condicao.notify()
+        
+        if not valida:
+            self._fechar(conn)
+        self.recolher_ociosas()
+    
+    def _iniciar_coletor(self) -> None:
+        """Thread que fecha as conexões ociosas mesmo sem novas consultas."""
+        with self._condicao:
+            if self._coletor is not None:
+                return
+            self._coletor = threading.Thread(target=self._coletar, name='pool-conexoes-coletor',
+                                             daemon=True)
+        self._coletor.start()
+    
+    def _coletar(self) -> None:
+        intervalo = max(1.0, self.ocioso_segundos / 2)
+        while True:
+            time.sleep(intervalo)
+            try:
+                self.recolher_ociosas()
+            except Exception as e:
+                logger.warning(f"Erro ao fechar conexões ociosas: {e}")
+    
+    @staticmethod
+    def _fechar(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# Instância global (compartilhada pelas sessões do Streamlit no processo)
+pool_conexoes = PoolConexoes()
@@ -73,6 +73,34 @@ def temp_dir():
         yield Path(tmpdir)
 
 
+@pytest.fixture
+def dados_cte():
+    """Dados de um CT-e no formato do extrator (sem XML nem banco)."""
+    return {
+        'CT-e_chave': '21250135263415000132570010000004821317310777',
+        'CT-e_numero': '482',
+        'CT-e_serie': '1',
+        'Data_emissao': '2025-01-15T10:30:00',
+        'CFOP': '6353',
+        'Valor_frete': '250.00',
+        'Origem': {'cidade': 'Timon', 'uf': 'MA'},
+        'Destino': {'cidade': 'Teresina', 'uf': 'PI'},
+        'Veiculo': {'placa': 'abc-1d23'},
+        'Carga': {'propred': 'BOVINOS', 'qcarga': '20', 'vcarga': '50000', 'unidade': 'CAB'},
+        'Remetente': {
+            'nome': 'FAZENDA EXEMPLO LTDA',
+            'documentos': {'cnpj': '12.345.678/0001-90', 'ie': '123456'},
+            'endereco': {'xlgr': 'Rod. BR 316', 'nro': 'SN', 'xbairro': 'Zona Rural',
+                         'xmun': 'Timon', 'uf': 'ma', 'cep': '65630000'}
+        },
+        'Destinatario': {
+            'nome': 'FRIGORIFICO EXEMPLO SA',
+            'documentos': {'cnpj': '98765432000110'},
+            'endereco': {}
+        }
+    }
+
+
 @pytest.fixture(scope="session")
 def db_config():
     """Configuração do banco de dados de testes."""
@@ -124,11 +152,12 @@ def db_connection(db_config, populate_ibge):
 
 @pytest.fixture(scope="session")
 def populate_ibge(db_config):
-    """Popula dados IBGE básicos para testes."""
-    import psycopg
+    """Popula UFs e municípios a partir do snapshot IBGE versionado (COPY + upsert por diferença)."""
+    import psycopg2
+    from Database.ibge_loader import load_snapshot
     
     try:
-        conn = psycopg.connect(
+        conn = psycopg2.connect(
             host=db_config['host'],
             port=db_config['port'],
             dbname=db_config['database'],
@@ -137,34 +166,13 @@ def populate_ibge(db_config):
             options=db_config.get('options', '')
         )
         
-        with conn.cursor() as cursor:
-            # Popular UFs (principais para testes)
-            cursor.execute("""
-                INSERT INTO ibge.uf (id_uf, sigla, nome, regiao)
-                VALUES 
-                    (22, 'PI', 'Piauí', 'Nordeste'),
-                    (35, 'SP', 'São Paulo', 'Sudeste'),
-                    (33, 'RJ', 'Rio de Janeiro', 'Sudeste'),
-                    (31, 'MG', 'Minas Gerais', 'Sudeste'),
-                    (41, 'PR', 'Paraná', 'Sul')
-                ON CONFLICT (id_uf) DO NOTHING
-            """)
-            
-            # Popular alguns municípios principais
-            cursor.execute("""
-                INSERT INTO ibge.municipio (id_municipio, nome, id_uf, nome_normalizado)
-                VALUES 
-                    (2211001, 'Teresina', 22, 'TERESINA'),
-                    (3550308, 'São Paulo', 35, 'SAO PAULO'),
-                    (3304557, 'Rio de Janeiro', 33, 'RIO DE JANEIRO'),
-                    (3106200, 'Belo Horizonte', 31, 'BELO HORIZONTE'),
-                    (4106902, 'Curitiba', 41, 'CURITIBA')
-                ON CONFLICT (id_municipio) DO NOTHING
-            """)
-            
+        try:
+            # Sem rede: COPY do snapshot em Database/dados/ibge (semente basta aos testes);
+            # só grava linhas novas/alteradas
+            load_snapshot(conn, allow_seed=True)
             conn.commit()
-        
-        conn.close()
+        finally:
+            conn.close()
         
     except Exception as e:
         # Se falhar, apenas pula (pode ser que já esteja populado)
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTES DE INTEGRAÇÃO - Analytics no Banco
+Tabelas mantidas por triggers comparadas com a reconstrução completa
+"""
+
+import pytest
+
+# Chaves de teste: UF 98, emissão 2025-02 (posições 3-6 da chave)
+PREFIXO_CHAVE = '982502'
+PLACA_TESTE = 'TST0A01'
+
+
+@pytest.fixture
+def db_manager(db_config):
+    """Banco de teste com as partições do período dos documentos de teste."""
+    from Database.managers.database_manager import CTEDatabaseManager
+    
+    try:
+        db_manager = CTEDatabaseManager(db_config)
+        db_manager.execute_query("SELECT 1")
+    except Exception as e:
+        pytest.skip(f"Banco não disponível: {e}")
+    
+    for mes in ('2025-02-01', '2025-03-01'):
+        db_manager.execute_query("SELECT cte.f_garantir_particao(%s::date)", (mes,))
+    yield db_manager
+    db_manager.execute_query(
+        "DELETE FROM cte.documento WHERE chave LIKE %s RETURNING 1", (PREFIXO_CHAVE + '%',)
+    )
+
+
+@pytest.fixture
+def referencias(db_manager):
+    """Veículo e municípios usados pelos documentos de teste."""
+    db_manager.execute_query(
+        "INSERT INTO core.veiculo (placa) VALUES (%s) ON CONFLICT DO NOTHING RETURNING 1",
+        (PLACA_TESTE,)
+    )
+    id_veiculo = db_manager.execute_query(
+        "SELECT id_veiculo FROM core.veiculo WHERE placa = %s", (PLACA_TESTE,), fetch_one=True
+    )[0]
+    municipios = [linha[0] for linha in db_manager.execute_query(
+        "SELECT id_municipio FROM ibge.municipio ORDER BY id_municipio LIMIT 2"
+    )]
+    if len(municipios) < 2:
+        pytest.skip("ibge.municipio sem dados")
+    return {'id_veiculo': id_veiculo, 'origem': municipios[0], 'destino': municipios[1]}
+
+
+def _inserir_documentos(db_manager, referencias, quantidade: int):
+    """Insere documentos de teste em fevereiro de 2025; retorna os id_cte."""
+    linhas = db_manager.execute_query(
+        """
+        INSERT INTO cte.documento (chave, data_emissao, cfop, valor_frete, quilometragem,
+                                   id_veiculo, id_municipio_origem, id_municipio_destino)
+        SELECT %s || lpad(i::text, 38, '0'),
+               TIMESTAMPTZ '2025-02-03 10:00+00' + i * INTERVAL '1 day',
+               '6353', 1000 + 37 * i, 120 + 13 * i,
+               %s, %s, %s
+          FROM generate_series(1, %s) AS i
+        RETURNING id_cte
+        """,
+        (PREFIXO_CHAVE, referencias['id_veiculo'], referencias['origem'],
+         referencias['destino'], quantidade)
+    )
+    return sorted(linha[0] for linha in linhas)
+
+
+def _tabela(db_manager, consulta: str):
+    """Linhas de uma consulta como conjunto (ordem irrelevante)."""
+    return set(db_manager.execute_query(consulta))
+
+
+@pytest.mark.integracao
+@pytest.mark.database
+class TestSketchQuantilBanco:
+    """Testa os triggers de analytics.sketch_quantil."""
+    
+    CONSULTA = ("SELECT metrica, dimensao, chave, mes, bucket, contagem "
+                "FROM analytics.sketch_quantil WHERE contagem <> 0")
+    
+    @pytest.fixture(autouse=True)
+    def migration(self, db_manager):
+        if not db_manager.execute_query(
+                "SELECT to_regclass('analytics.sketch_quantil') IS NOT NULL", fetch_one=True)[0]:
+            pytest.skip("Migration create_sketch_quantil.sql não aplicada")
+    
+    def test_update_sem_coluna_do_sketch_nao_toca_buckets(self, db_manager, referencias):
+        """Atualizar só o CFOP não altera os buckets do veículo."""
+        ids = _inserir_documentos(db_manager, referencias, 5)
+        consulta = ("SELECT metrica, bucket, xmin::text FROM analytics.sketch_quantil "
+                    "WHERE dimensao = 'veiculo' AND chave = %s")
+        antes = set(db_manager.execute_query(consulta, (referencias['id_veiculo'],)))
+        
+        db_manager.execute_query(
+            "UPDATE cte.documento SET cfop = '5353' WHERE id_cte = ANY(%s) RETURNING 1", (ids,)
+        )
+        
+        assert antes
+        assert set(db_manager.execute_query(consulta, (referencias['id_veiculo'],))) == antes
+    
+    def test_deltas_equivalem_a_reconstrucao(self, db_manager, referencias):
+        """INSERT, UPDATE e DELETE deixam os sketches iguais à reconstrução completa."""
+        ids = _inserir_documentos(db_manager, referencias, 12)
+        db_manager.execute_query(
+            "UPDATE cte.documento SET quilometragem = quilometragem * 3, valor_frete = valor_frete + 1 "
+            "WHERE id_cte = ANY(%s) RETURNING 1", (ids[:4],)
+        )
+        db_manager.execute_query(
+            "UPDATE cte.documento SET data_emissao = data_emissao + INTERVAL '1 month' "
+            "WHERE id_cte = ANY(%s) RETURNING 1", (ids[4:6],)
+        )
+        db_manager.execute_query(
+            "DELETE FROM cte.documento WHERE id_cte = ANY(%s) RETURNING 1", (ids[6:8],)
+        )
+        
+        incremental = _tabela(db_manager, self.CONSULTA)
+        db_manager.execute_query("SELECT analytics.f_sketch_reconstruir()")
+        
+        assert incremental == _tabela(db_manager, self.CONSULTA)
+
+
+@pytest.mark.integracao
+@pytest.mark.database
+class TestViewsMaterializadasBanco:
+    """Testa f_remover_view e a atualização das views pelo OrquestradorViews."""
+    
+    BASE = 'analytics.vw_teste_remover_base'
+    DEPENDENTE = 'analytics.vw_teste_remover_dependente'
+    
+    @pytest.fixture(autouse=True)
+    def migration(self, db_manager):
+        if not db_manager.execute_query(
+                "SELECT to_regproc('analytics.f_remover_view') IS NOT NULL", fetch_one=True)[0]:
+            pytest.skip("Migration create_mv_refresh.sql não aplicada")
+    
+    @pytest.fixture
+    def views_teste(self, db_manager):
+        """View base com uma view dependente; removidas ao final."""
+        with db_manager.get_cursor() as (cursor, conn):
+            cursor.execute(f"CREATE VIEW {self.BASE} AS SELECT 1 AS valor")
+            cursor.execute(f"CREATE VIEW {self.DEPENDENTE} AS SELECT valor FROM {self.BASE}")
+        yield
+        with db_manager.get_cursor() as (cursor, conn):
+            cursor.execute(f"DROP VIEW IF EXISTS {self.DEPENDENTE}")
+            cursor.execute(f"DROP VIEW IF EXISTS {self.BASE}")
+    
+    def _existe(self, db_manager, nome: str) -> bool:
+        return db_manager.execute_query("SELECT to_regclass(%s) IS NOT NULL",
+                                        (nome,), fetch_one=True)[0]
+    
+    def test_remover_view_com_dependentes_falha(self, db_manager, views_teste):
+        """Sem CASCADE: a view com dependentes não é removida e nada some junto."""
+        import psycopg2
+        
+        with pytest.raises(psycopg2.errors.DependentObjectsStillExist):
+            db_manager.execute_query("SELECT analytics.f_remover_view(%s)", (self.BASE,))
+        
+        assert self._existe(db_manager, self.BASE)
+        assert self._existe(db_manager, self.DEPENDENTE)
+    
+    def test_remover_dependente_antes_da_base(self, db_manager, views_teste):
+        """Removendo os dependentes primeiro, a base é removida normalmente."""
+        db_manager.execute_query("SELECT analytics.f_remover_view(%s)", (self.DEPENDENTE,))
+        db_manager.execute_query("SELECT analytics.f_remover_view(%s)", (self.BASE,))
+        
+        assert not self._existe(db_manager, self.DEPENDENTE)
+        assert not self._existe(db_manager, self.BASE)
+    
+    def test_atualizacao_deixa_views_iguais_a_definicao(self, db_manager, referencias):
+        """Após inserir documentos, o orquestrador limpa as pendências e as views
+        materializadas ficam iguais à sua própria definição."""
+        from Database.views.orquestrador_views import OrquestradorViews
+        
+        _inserir_documentos(db_manager, referencias, 6)
+        resultado = OrquestradorViews(db_manager).atualizar(esperar=True)
+        
+        assert resultado['executado']
+        assert not resultado['falhas']
+        assert 'analytics.vw_receita_mensal' in resultado['atualizadas']
+        assert not db_manager.execute_query(
+            "SELECT nome_view FROM analytics.mv_controle WHERE pendente"
+        )
+        
+        for nome_view, definicao in db_manager.execute_query(
+                "SELECT c.nome_view, pg_get_viewdef(c.nome_view::regclass) "
+                "FROM analytics.mv_controle c"):
+            definicao = definicao.rstrip().rstrip(';')
+            diferencas = db_manager.execute_query(
+                f"SELECT count(*) FROM ((TABLE {nome_view} EXCEPT ALL ({definicao})) "
+                f"UNION ALL (({definicao}) EXCEPT ALL TABLE {nome_view})) d", fetch_one=True
+            )[0]
+            assert diferencas == 0, nome_view
+
+
+@pytest.mark.integracao
+@pytest.mark.database
+class TestAgregadoMensalBanco:
+    """Testa os triggers de analytics.agg_mensal e agg_cliente_mensal."""
+    
+    @pytest.fixture(autouse=True)
+    def agregados(self, db_manager):
+        from Database.managers.agregado_mensal_manager import AgregadoMensalManager
+        
+        agregados = AgregadoMensalManager(db_manager)
+        if not agregados.disponivel():
+            pytest.skip("Migration create_agg_mensal.sql não aplicada")
+        return agregados
+    
+    @pytest.fixture
+    def pessoas(self, db_manager):
+        """Três pessoas de teste; partes e pessoas removidas ao final."""
+        ids = [linha[0] for linha in db_manager.execute_query(
+            """
+            INSERT INTO core.pessoa (nome, cpf_cnpj)
+            SELECT 'PESSOA TESTE ' || i, %s || lpad(i::text, 8, '0')
+              FROM generate_series(1, 3) AS i
+            ON CONFLICT (cpf_cnpj) DO UPDATE SET nome = EXCLUDED.nome
+            RETURNING id_pessoa
+            """,
+            (PREFIXO_CHAVE,)
+        )]
+        yield sorted(ids)
+        db_manager.execute_query(
+            "DELETE FROM cte.documento_parte WHERE id_pessoa = ANY(%s) RETURNING 1", (ids,)
+        )
+        db_manager.execute_query(
+            "DELETE FROM core.pessoa WHERE id_pessoa = ANY(%s) RETURNING 1", (ids,)
+        )
+    
+    def test_deltas_equivalem_a_reconstrucao(self, db_manager, referencias, pessoas, agregados):
+        """INSERT, UPDATE, troca de participante e DELETE deixam os agregados
+        iguais a analytics.f_agg_reconstruir()."""
+        ids = _inserir_documentos(db_manager, referencias, 10)
+        remetente, destinatario, outro = pessoas
+        db_manager.execute_query(
+            """
+            INSERT INTO cte.documento_parte (id_cte, tipo, id_pessoa)
+            SELECT id_cte, tipo, CASE tipo WHEN 'remetente' THEN %s ELSE %s END
+              FROM unnest(%s::bigint[]) AS id_cte
+             CROSS JOIN (VALUES ('remetente'), ('destinatario')) AS t(tipo)
+            RETURNING 1
+            """,
+            (remetente, destinatario, ids)
+        )
+        assert agregados.conferir() == dict.fromkeys(agregados.TABELAS, 0)
+        
+        # Valores, mês e veículo/UF alterados
+        db_manager.execute_query(
+            "UPDATE cte.documento SET valor_frete = NULL, quilometragem = quilometragem + 40 "
+            "WHERE id_cte = ANY(%s) RETURNING 1", (ids[:3],)
+        )
+        db_manager.execute_query(
+            "UPDATE cte.documento SET data_emissao = data_emissao + INTERVAL '1 month', "
+            "id_municipio_destino = %s WHERE id_cte = ANY(%s) RETURNING 1",
+            (referencias['origem'], ids[3:5])
+        )
+        # Troca de participante
+        db_manager.execute_query(
+            "UPDATE cte.documento_parte SET id_pessoa = %s "
+            "WHERE id_cte = ANY(%s) AND tipo = 'remetente' RETURNING 1", (outro, ids[5:7])
+        )
+        db_manager.execute_query(
+            "DELETE FROM cte.documento_parte WHERE id_cte = %s AND tipo = 'destinatario' "
+            "RETURNING 1", (ids[7],)
+        )
+        db_manager.execute_query(
+            "DELETE FROM cte.documento WHERE id_cte = ANY(%s) RETURNING 1", (ids[8:],)
+        )
+        
+        assert agregados.conferir() == dict.fromkeys(agregados.TABELAS, 0)
+    
+    def test_mudanca_so_de_quilometragem_nao_recalcula_extremos(self, db_manager, referencias,
+                                                               pessoas, agregados):
+        """UPDATE só de quilometragem aplica o delta sem reler os grupos; frete
+        alterado recalcula mínimos/máximos."""
+        ids = _inserir_documentos(db_manager, referencias, 4)
+        remetente = pessoas[0]
+        db_manager.execute_query(
+            "INSERT INTO cte.documento_parte (id_cte, tipo, id_pessoa) "
+            "SELECT id_cte, 'remetente', %s FROM unnest(%s::bigint[]) AS id_cte RETURNING 1",
+            (remetente, ids)
+        )
+        # Marcador nos extremos: só um recálculo a partir de cte.documento o desfaz
+        marcar = (
+            "WITH m AS (UPDATE analytics.agg_mensal SET frete_max = 999999 "
+            "            WHERE id_veiculo = %s RETURNING 1), "
+            "     c AS (UPDATE analytics.agg_cliente_mensal SET frete_max = 999999 "
+            "            WHERE id_pessoa = %s RETURNING 1) "
+            "SELECT (SELECT COUNT(*) FROM m), (SELECT COUNT(*) FROM c)"
+        )
+        marcados = db_manager.execute_query(marcar, (referencias['id_veiculo'], remetente),
+                                            fetch_one=True)
+        assert all(marcados)
+        extremos = (
+            "SELECT (SELECT bool_and(frete_max = 999999) FROM analytics.agg_mensal WHERE id_veiculo = %s), "
+            "       (SELECT bool_and(frete_max = 999999) FROM analytics.agg_cliente_mensal "
+            "         WHERE id_pessoa = %s)"
+        )
+        
+        db_manager.execute_query(
+            "UPDATE cte.documento SET quilometragem = quilometragem + 15 "
+            "WHERE id_cte = ANY(%s) RETURNING 1", (ids,)
+        )
+        assert db_manager.execute_query(extremos, (referencias['id_veiculo'], remetente),
+                                        fetch_one=True) == (True, True)
+        
+        db_manager.execute_query(
+            "UPDATE cte.documento SET valor_frete = valor_frete + 1 "
+            "WHERE id_cte = ANY(%s) RETURNING 1", (ids,)
+        )
+        assert agregados.conferir() == dict.fromkeys(agregados.TABELAS, 0)
+
+
+@pytest.mark.integracao
+@pytest.mark.database
+class TestViagemIntervaloBanco:
+    """Testa os triggers de analytics.viagem e analytics.veiculo_uso."""
+    
+    VIAGENS = ("SELECT id_cte, id_veiculo, data_emissao, quilometragem, valor_frete, "
+               "dias_desde_viagem_anterior FROM analytics.viagem")
+    USO = "SELECT * FROM analytics.veiculo_uso"
+    PLACA_SEGUNDO_VEICULO = 'TST0A02'
+    
+    @pytest.fixture(autouse=True)
+    def migration(self, db_manager):
+        if not db_manager.execute_query(
+                "SELECT to_regclass('analytics.viagem') IS NOT NULL", fetch_one=True)[0]:
+            pytest.skip("Migration create_viagem_intervalo.sql não aplicada")
+    
+    @pytest.fixture
+    def segundo_veiculo(self, db_manager):
+        """Veículo para onde documentos de teste são transferidos."""
+        db_manager.execute_query(
+            "INSERT INTO core.veiculo (placa) VALUES (%s) ON CONFLICT DO NOTHING RETURNING 1",
+            (self.PLACA_SEGUNDO_VEICULO,)
+        )
+        return db_manager.execute_query(
+            "SELECT id_veiculo FROM core.veiculo WHERE placa = %s",
+            (self.PLACA_SEGUNDO_VEICULO,), fetch_one=True
+        )[0]
+    
+    @staticmethod
+    def _inserir(db_manager, referencias, numeros, dias):
+        """Insere documentos do veículo de teste com os dias de fevereiro informados."""
+        return [linha[0] for linha in db_manager.execute_query(
+            """
+            INSERT INTO cte.documento (chave, data_emissao, cfop, valor_frete, quilometragem,
+                                       id_veiculo, id_municipio_origem, id_municipio_destino)
+            SELECT %s || lpad(n::text, 38, '0'),
+                   TIMESTAMPTZ '2025-02-01 08:00+00' + d * INTERVAL '1 day',
+                   '6353', 900 + 11 * n, 100 + 7 * n, %s, %s, %s
+              FROM unnest(%s::int[], %s::int[]) AS t(n, d)
+            RETURNING id_cte
+            """,
+            (PREFIXO_CHAVE, referencias['id_veiculo'], referencias['origem'],
+             referencias['destino'], numeros, dias)
+        )]
+    
+    def test_deltas_equivalem_a_reconstrucao(self, db_manager, referencias, segundo_veiculo):
+        """Inserções fora de ordem, UPDATE de km/veículo/data e DELETE deixam
+        viagem e veiculo_uso iguais a analytics.f_viagem_reconstruir()."""
+        # Em ordem, depois intercalados antes, entre e depois dos existentes
+        ids = self._inserir(db_manager, referencias, [1, 2, 3], [10, 12, 20])
+        ids += self._inserir(db_manager, referencias, [4, 5, 6], [2, 15, 25])
+        ids += self._inserir(db_manager, referencias, [7, 8], [11, 11])
+        
+        db_manager.execute_query(
+            "UPDATE cte.documento SET quilometragem = quilometragem + 500 "
+            "WHERE id_cte = ANY(%s) RETURNING 1", (ids[:2],)
+        )
+        db_manager.execute_query(
+            "UPDATE cte.documento SET id_veiculo = %s WHERE id_cte = ANY(%s) RETURNING 1",
+            (segundo_veiculo, ids[2:4])
+        )
+        db_manager.execute_query(
+            "UPDATE cte.documento SET data_emissao = data_emissao + INTERVAL '9 days' "
+            "WHERE id_cte = ANY(%s) RETURNING 1", (ids[4:6],)
+        )
+        db_manager.execute_query(
+            "DELETE FROM cte.documento WHERE id_cte = ANY(%s) RETURNING 1", (ids[6:7],)
+        )
+        
+        viagens, uso = _tabela(db_manager, self.VIAGENS), _tabela(db_manager, self.USO)
+        db_manager.execute_query("SELECT analytics.f_viagem_reconstruir()")
+        
+        assert {linha[0] for linha in viagens} >= set(ids) - set(ids[6:7])
+        assert viagens == _tabela(db_manager, self.VIAGENS)
+        assert uso == _tabela(db_manager, self.USO)
+
+
+@pytest.mark.integracao
+@pytest.mark.database
+class TestFuncoesFiltroBanco:
+    """Testa as funções analytics.f_* (migrations/create_funcoes_filtro.sql)."""
+    
+    # (chamada sem filtros, view correspondente, colunas dos sketches de quantis)
+    PARES = [
+        ("analytics.f_receita_mensal()", 'analytics.vw_receita_mensal', ()),
+        ("analytics.f_ticket_medio()", 'analytics.vw_ticket_medio', ('ticket_mediano', 'ticket_p90')),
+        ("analytics.f_margem_veiculo()", 'analytics.vw_margem_veiculo', ()),
+        ("analytics.f_faturamento_cliente('remetente')", 'analytics.vw_faturamento_remetente', ()),
+        ("analytics.f_faturamento_cliente('destinatario')", 'analytics.vw_faturamento_destinatario', ()),
+        ("analytics.f_ranking_clientes()", 'analytics.vw_ranking_clientes', ()),
+        ("analytics.f_dashboard_financeiro()", 'analytics.vw_dashboard_financeiro', ()),
+        ("analytics.f_ctes_por_mes()", 'analytics.vw_ctes_por_mes', ()),
+        ("analytics.f_top_origens()", 'analytics.vw_top_origens', ()),
+        ("analytics.f_top_destinos()", 'analytics.vw_top_destinos', ()),
+        ("analytics.f_distancia_media()", 'analytics.vw_distancia_media', ('mediana_km', 'p90_km')),
+        ("analytics.f_viagens_por_veiculo()", 'analytics.vw_viagens_por_veiculo', ()),
+        ("analytics.f_produtos_predominantes()", 'analytics.vw_produtos_predominantes', ()),
+        ("analytics.f_taxa_frete_km()", 'analytics.vw_taxa_frete_km',
+         ('taxa_mediana_por_km', 'taxa_p90_por_km')),
+        ("analytics.f_dashboard_operacao()", 'analytics.vw_dashboard_operacao', ()),
+        ("analytics.f_uso_veiculo()", 'analytics.vw_rodagem_total', ()),
+        ("analytics.f_uso_veiculo()", 'analytics.vw_performance_frota', ()),
+        ("analytics.f_distribuicao_viagens()", 'analytics.vw_distribuicao_viagens', ()),
+        ("analytics.f_dashboard_frota()", 'analytics.vw_dashboard_frota', ()),
+    ]
+    
+    @pytest.fixture(autouse=True)
+    def migration(self, db_manager):
+        if not db_manager.execute_query(
+                "SELECT to_regproc('analytics.f_documentos_filtrados') IS NOT NULL", fetch_one=True)[0]:
+            pytest.skip("Migration create_funcoes_filtro.sql não aplicada")
+    
+    @pytest.fixture
+    def documentos(self, db_manager, referencias):
+        """Documentos de teste com as views materializadas já atualizadas."""
+        from Database.views.orquestrador_views import OrquestradorViews
+        
+        ids = _inserir_documentos(db_manager, referencias, 6)
+        assert not OrquestradorViews(db_manager).atualizar(esperar=True)['falhas']
+        return ids
+    
+    @pytest.mark.parametrize('chamada, view, quantis', PARES, ids=[par[1] for par in PARES])
+    def test_sem_filtros_igual_a_view(self, db_manager, documentos, chamada, view, quantis):
+        """Sem filtros a função devolve as linhas da view (exceto os quantis dos sketches)."""
+        esquema, nome = view.split('.')
+        colunas = [linha[0] for linha in db_manager.execute_query(
+            """
+            SELECT a.attname FROM pg_attribute a
+             WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0 AND NOT a.attisdropped
+               AND a.attname <> ALL(%s)
+             ORDER BY a.attnum
+            """,
+            (view, list(quantis))
+        )]
+        assert colunas, view
+        lista = ', '.join(f'"{coluna}"' for coluna in colunas)
+        
+        diferencas = db_manager.execute_query(
+            f"SELECT count(*) FROM ((SELECT {lista} FROM {chamada} EXCEPT ALL SELECT {lista} FROM {view}) "
+            f"UNION ALL (SELECT {lista} FROM {view} EXCEPT ALL SELECT {lista} FROM {chamada})) d",
+            fetch_one=True
+        )[0]
+        assert diferencas == 0
+    
+    def test_filtros_restringem_documentos(self, db_manager, documentos, referencias):
+        """Período, UF, placa e cliente restringem os documentos considerados."""
+        consulta = ("SELECT total_ctes FROM analytics.f_dashboard_operacao(%s, %s, %s, %s, %s)")
+        uf_origem = db_manager.execute_query(
+            "SELECT u.sigla FROM ibge.municipio m JOIN ibge.uf u ON u.id_uf = m.id_uf "
+            "WHERE m.id_municipio = %s", (referencias['origem'],), fetch_one=True
+        )[0]
+        outra_uf = db_manager.execute_query(
+            "SELECT sigla FROM ibge.uf WHERE sigla <> ALL(ARRAY(SELECT u.sigla FROM ibge.municipio m "
+            "JOIN ibge.uf u ON u.id_uf = m.id_uf WHERE m.id_municipio IN (%s, %s))) LIMIT 1",
+            (referencias['origem'], referencias['destino']), fetch_one=True
+        )[0]
+        
+        def total(inicio=None, fim=None, uf=None, placa=PLACA_TESTE, cliente=None):
+            return db_manager.execute_query(consulta, (inicio, fim, uf, placa, cliente), fetch_one=True)[0]
+        
+        # Documentos de teste: 2025-02-04 a 2025-02-09, um por dia
+        assert total() == 6
+        assert total('2025-02-01', '2025-02-05') == 2
+        assert total('2025-03-01', None) == 0
+        assert total(uf=uf_origem.lower()) == 6
+        assert total(uf=outra_uf) == 0
+        assert total(placa=PLACA_TESTE[:3] + '-' + PLACA_TESTE[3:]) == 6
+        
+        id_pessoa = db_manager.execute_query(
+            "INSERT INTO core.pessoa (nome, cpf_cnpj) VALUES ('CLIENTE TESTE', %s) "
+            "ON CONFLICT (cpf_cnpj) DO UPDATE SET nome = EXCLUDED.nome RETURNING id_pessoa",
+            (PREFIXO_CHAVE + '00000009',), fetch_one=True
+        )[0]
+        try:
+            db_manager.execute_query(
+                "INSERT INTO cte.documento_parte (id_cte, tipo, id_pessoa) "
+                "SELECT unnest(%s::bigint[]), 'remetente', %s RETURNING 1",
+                (documentos[:2], id_pessoa)
+            )
+            assert total(cliente='98.250.200/0000-09') == 2
+            assert total(placa=None, cliente=PREFIXO_CHAVE + '00000009') == 2
+        finally:
+            db_manager.execute_query(
+                "DELETE FROM cte.documento_parte WHERE id_pessoa = %s RETURNING 1", (id_pessoa,)
+            )
+            db_manager.execute_query(
+                "DELETE FROM core.pessoa WHERE id_pessoa = %s RETURNING 1", (id_pessoa,)
+            )
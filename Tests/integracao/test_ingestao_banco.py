@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTES DE INTEGRAÇÃO - Ingestão no Banco
+Funções de ingestão em lote executadas contra o banco de teste
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Chaves de teste: UF 99, emissão 2025-01 (posições 3-6 da chave)
+PREFIXO_CHAVE = '992501'
+
+
+def _chave(numero: int) -> str:
+    """Chave de acesso de teste com 44 dígitos."""
+    return f"{PREFIXO_CHAVE}{numero:038d}"
+
+
+@pytest.mark.integracao
+@pytest.mark.database
+class TestIngestaoLoteBanco:
+    """Testa cte.f_ingest_cte_batch com payloads montados pelo ETLService."""
+    
+    @pytest.fixture
+    def db_manager(self, db_config):
+        from Database.managers.database_manager import CTEDatabaseManager
+        
+        try:
+            db_manager = CTEDatabaseManager(db_config)
+            pronta = db_manager.execute_query(
+                "SELECT to_regproc('cte.f_ingest_cte_batch') IS NOT NULL", fetch_one=True
+            )[0]
+        except Exception as e:
+            pytest.skip(f"Banco não disponível: {e}")
+        
+        if not pronta:
+            pytest.skip("Migration create_f_ingest_cte_batch.sql não aplicada")
+        
+        db_manager.execute_query("SELECT cte.f_garantir_particao(DATE '2025-01-01')")
+        yield db_manager
+        db_manager.execute_update("DELETE FROM cte.documento WHERE chave LIKE %s",
+                                  (PREFIXO_CHAVE + '%',))
+    
+    @pytest.fixture
+    def payload(self, dados_cte):
+        """Monta o payload de ingestão de uma chave de teste."""
+        from Database.managers.stats_manager import StatsManager
+        from Database.services.etl_service import ETLService
+        
+        etl = ETLService(db_manager=None, stats_manager=StatsManager())
+        
+        def montar(numero: int, **campos):
+            dados = dict(dados_cte, **{'CT-e_chave': _chave(numero)})
+            payload = etl._montar_payload_ingestao(dados, etl._transformar_dados(dados, 2.50))
+            payload.update(campos)
+            return payload
+        return montar
+    
+    @staticmethod
+    def _ingerir(db_manager, payloads):
+        return db_manager.execute_query(
+            "SELECT ordem, chave, id_cte, inserido FROM cte.f_ingest_cte_batch(%s::jsonb)",
+            (json.dumps(payloads, default=str),)
+        )
+    
+    def test_lote_grava_documentos_cargas_e_partes(self, db_manager, payload):
+        """Um lote insere documento, carga e partes de cada CT-e."""
+        resultado = self._ingerir(db_manager, [payload(1), payload(2), payload(3)])
+        
+        assert [linha[0] for linha in resultado] == [1, 2, 3]
+        assert [linha[1] for linha in resultado] == [_chave(1), _chave(2), _chave(3)]
+        assert all(linha[2] is not None and linha[3] for linha in resultado)
+        
+        documentos, cargas, partes, veiculos = db_manager.execute_query(
+            """
+            SELECT COUNT(DISTINCT d.id_cte), COUNT(DISTINCT c.id_cte),
+                   COUNT(DISTINCT (p.id_cte, p.tipo)), COUNT(DISTINCT d.id_veiculo)
+              FROM cte.documento d
+              LEFT JOIN cte.carga c ON c.id_cte = d.id_cte AND c.data_emissao = d.data_emissao
+              LEFT JOIN cte.documento_parte p ON p.id_cte = d.id_cte
+             WHERE d.chave LIKE %s
+            """,
+            (PREFIXO_CHAVE + '%',), fetch_one=True
+        )
+        assert (documentos, cargas, partes, veiculos) == (3, 3, 6, 1)
+    
+    def test_reenvio_atualiza_sem_duplicar(self, db_manager, payload):
+        """Reenviar a mesma chave atualiza o documento e devolve inserido = false."""
+        (_, _, id_cte, inserido), = self._ingerir(db_manager, [payload(1)])
+        assert inserido
+        
+        (_, _, id_reenvio, inserido), = self._ingerir(db_manager, [payload(1, valor_frete=300.0)])
+        assert not inserido
+        assert id_reenvio == id_cte
+        
+        linhas, valor_frete = db_manager.execute_query(
+            "SELECT COUNT(*), MAX(valor_frete) FROM cte.documento WHERE chave = %s",
+            (_chave(1),), fetch_one=True
+        )
+        assert linhas == 1
+        assert float(valor_frete) == 300.0
+    
+    def test_ultima_ocorrencia_no_lote_prevalece(self, db_manager, payload):
+        """Chave repetida no mesmo lote grava uma linha com os dados da última."""
+        resultado = self._ingerir(db_manager, [payload(1, valor_frete=100.0),
+                                               payload(1, valor_frete=200.0)])
+        
+        assert len({linha[2] for linha in resultado}) == 1
+        linhas, valor_frete = db_manager.execute_query(
+            "SELECT COUNT(*), MAX(valor_frete) FROM cte.documento WHERE chave = %s",
+            (_chave(1),), fetch_one=True
+        )
+        assert linhas == 1
+        assert float(valor_frete) == 200.0
+    
+    def test_documento_sem_data_usa_mes_da_chave(self, db_manager, payload):
+        """Sem dhEmi o documento vai para a partição do mês da chave de acesso."""
+        self._ingerir(db_manager, [payload(1, data_emissao=None)])
+        
+        data_emissao = db_manager.execute_query(
+            "SELECT data_emissao::date::text FROM cte.documento WHERE chave = %s",
+            (_chave(1),), fetch_one=True
+        )[0]
+        assert data_emissao == '2025-01-01'
+    
+    def test_mesma_chave_com_outra_data_atualiza_no_lugar(self, db_manager, payload):
+        """Chave reenviada com outra data de emissão move o documento sem duplicar."""
+        db_manager.execute_query("SELECT cte.f_garantir_particao(DATE '2025-02-01')")
+        (_, _, id_cte, _), = self._ingerir(db_manager, [payload(1)])
+        
+        (_, _, id_reenvio, inserido), = self._ingerir(
+            db_manager, [payload(1, data_emissao='2025-02-10T08:00:00', valor_frete=300.0)]
+        )
+        assert not inserido
+        assert id_reenvio == id_cte
+        
+        linhas, data_emissao, data_carga = db_manager.execute_query(
+            """
+            SELECT COUNT(*), MAX(d.data_emissao)::date::text, MAX(c.data_emissao)::date::text
+              FROM cte.documento d
+              LEFT JOIN cte.carga c ON c.id_cte = d.id_cte
+             WHERE d.chave = %s
+            """,
+            (_chave(1),), fetch_one=True
+        )
+        assert linhas == 1
+        assert data_emissao == data_carga == '2025-02-10'
+    
+    def test_chave_fora_do_padrao_sem_data_usa_mes_corrente(self, db_manager, payload):
+        """Sem dhEmi e sem chave de 44 dígitos o documento vai para o mês corrente."""
+        chave = PREFIXO_CHAVE + 'SEMDATA'
+        db_manager.execute_query("SELECT cte.f_garantir_particao(current_date)")
+        
+        resultado = self._ingerir(db_manager, [payload(1), payload(2, chave=chave, data_emissao=None)])
+        
+        assert [linha[1] for linha in resultado] == [_chave(1), chave]
+        assert all(linha[2] is not None for linha in resultado)
+        assert db_manager.execute_query(
+            "SELECT data_emissao = date_trunc('month', now()) FROM cte.documento WHERE chave = %s",
+            (chave,), fetch_one=True
+        )[0]
+    
+    def test_elementos_sem_chave_sao_ignorados(self, db_manager, payload):
+        """Elementos sem chave não geram linha no retorno."""
+        resultado = self._ingerir(db_manager, [payload(1), payload(2, chave='')])
+        
+        assert [linha[1] for linha in resultado] == [_chave(1)]
+    
+    def test_lotes_concorrentes_nao_duplicam_pessoa_e_endereco(self, db_manager, payload):
+        """Dois lotes simultâneos com a mesma parte sem documento gravam uma pessoa e um endereço."""
+        nome = f'PARTE SEM DOCUMENTO {PREFIXO_CHAVE}'
+        logradouro = f'RUA LOTE {PREFIXO_CHAVE}'
+        parte = {'nome': nome, 'endereco': {'xlgr': logradouro, 'nro': '1', 'cep': '99999999'}}
+        
+        def lote(numero):
+            # Só a parte sem documento: nenhum outro ON CONFLICT serializa os lotes antes dela
+            return json.dumps([payload(numero, placa=None, remetente=parte, destinatario=None,
+                                       expedidor=None, recebedor=None)], default=str)
+        
+        def ingerir(conn, documentos):
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM cte.f_ingest_cte_batch(%s::jsonb)", (documentos,))
+            conn.commit()
+        
+        try:
+            with db_manager.get_connection() as primeira, db_manager.get_connection() as segunda:
+                with primeira.cursor() as cursor:
+                    cursor.execute("SELECT COUNT(*) FROM cte.f_ingest_cte_batch(%s::jsonb)", (lote(1),))
+                
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    pendente = executor.submit(ingerir, segunda, lote(2))
+                    time.sleep(0.5)
+                    primeira.commit()
+                    pendente.result(timeout=30)
+            
+            pessoas, enderecos, vinculos = db_manager.execute_query(
+                """
+                SELECT (SELECT COUNT(*) FROM core.pessoa WHERE nome = %s AND cpf_cnpj IS NULL),
+                       (SELECT COUNT(*) FROM core.endereco WHERE logradouro = %s),
+                       (SELECT COUNT(DISTINCT id_pessoa) FROM cte.documento_parte dp
+                          JOIN cte.documento d ON d.id_cte = dp.id_cte
+                         WHERE d.chave IN (%s, %s))
+                """,
+                (nome, logradouro, _chave(1), _chave(2)), fetch_one=True
+            )
+            assert (pessoas, enderecos, vinculos) == (1, 1, 1)
+        finally:
+            db_manager.execute_update("DELETE FROM cte.documento WHERE chave LIKE %s",
+                                      (PREFIXO_CHAVE + '%',))
+            db_manager.execute_update("DELETE FROM core.pessoa WHERE nome = %s AND cpf_cnpj IS NULL",
+                                      (nome,))
+            db_manager.execute_update("DELETE FROM core.endereco WHERE logradouro = %s", (logradouro,))
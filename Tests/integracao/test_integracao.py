@@ -337,3 +337,131 @@ class TestIntegracaoQuatroCamadas:
                 for chave in chaves_teste:
                     cursor.execute("DELETE FROM cte.documento WHERE chave = %s", (chave,))
                 db_connection.commit()
+
+
+def _worker_ingestao_distribuida(db_config, diretorio, fila_resultados):
+    """Worker local: converge os shards e reivindica arquivos no manifesto."""
+    import time
+    from Database.managers.database_manager import CTEDatabaseManager
+    from Database.managers.manifest_manager import ManifestManager
+    from Database.managers.shard_manager import ShardManager
+    
+    db_manager = CTEDatabaseManager(db_config)
+    shard_manager = ShardManager(db_manager, lease_segundos=5)
+    manifest_manager = ManifestManager(db_manager)
+    
+    # Rebalancear algumas vezes até a divisão convergir entre os workers
+    for _ in range(15):
+        shard_manager.rebalancear()
+        time.sleep(0.2)
+    shards = shard_manager.rebalancear()
+    
+    arquivos = shard_manager.ordenar_por_afinidade(sorted(Path(diretorio).glob('*.xml')))
+    reivindicados = []
+    for inicio in range(0, len(arquivos), 10):
+        reivindicados += [str(a) for a in manifest_manager.reivindicar(arquivos[inicio:inicio + 10])]
+    
+    fila_resultados.put((sorted(shards), reivindicados))
+    time.sleep(1)
+    shard_manager.encerrar()
+
+
+@pytest.mark.integracao
+@pytest.mark.database
+@pytest.mark.lento
+class TestIngestaoDistribuida:
+    """Testa a divisão de arquivos entre workers locais via PostgreSQL."""
+    
+    @pytest.fixture
+    def db_manager(self, db_config):
+        from Database.managers.database_manager import CTEDatabaseManager
+        
+        try:
+            db_manager = CTEDatabaseManager(db_config)
+            prontas = db_manager.execute_query(
+                "SELECT to_regclass('staging.ingestao_shard') IS NOT NULL "
+                "AND to_regclass('staging.ingestao_manifesto') IS NOT NULL",
+                fetch_one=True
+            )[0]
+        except Exception as e:
+            pytest.skip(f"Banco não disponível: {e}")
+        
+        if not prontas:
+            pytest.skip("Migrations de manifesto/shards não aplicadas")
+        
+        db_manager.execute_update("UPDATE staging.ingestao_shard SET id_worker = NULL, heartbeat = NULL")
+        db_manager.execute_update("DELETE FROM staging.ingestao_worker")
+        return db_manager
+    
+    def test_workers_dividem_arquivos_sem_duplicar(self, db_manager, db_config, temp_dir):
+        """Três processos dividem shards e arquivos sem sobreposição."""
+        import multiprocessing
+        
+        for i in range(300):
+            (temp_dir / f"CTe{i:044d}.xml").write_text('<cteProc/>', encoding='utf-8')
+        
+        contexto = multiprocessing.get_context('spawn')
+        fila_resultados = contexto.Queue()
+        processos = [
+            contexto.Process(target=_worker_ingestao_distribuida,
+                             args=(dict(db_config), str(temp_dir), fila_resultados))
+            for _ in range(3)
+        ]
+        try:
+            for processo in processos:
+                processo.start()
+            resultados = [fila_resultados.get(timeout=60) for _ in processos]
+        finally:
+            for processo in processos:
+                processo.join(timeout=30)
+            db_manager.execute_update(
+                "DELETE FROM staging.ingestao_manifesto WHERE caminho = ANY(%s)",
+                ([a.name for a in temp_dir.glob('*.xml')],)
+            )
+        
+        shards = [s for shards_worker, _ in resultados for s in shards_worker]
+        arquivos = [a for _, arquivos_worker in resultados for a in arquivos_worker]
+        
+        assert len(shards) == len(set(shards)) == 64
+        assert all(len(shards_worker) > 0 for shards_worker, _ in resultados)
+        assert len(arquivos) == len(set(arquivos)) == 300
+    
+    def test_raizes_diferentes_reivindicam_o_mesmo_registro(self, db_manager, temp_dir):
+        """Hosts com pontos de montagem diferentes não reivindicam o mesmo XML duas vezes."""
+        from Database.managers.manifest_manager import ManifestManager
+        
+        raizes = [temp_dir / 'host_a', temp_dir / 'host_b']
+        for raiz in raizes:
+            (raiz / 'mes_11').mkdir(parents=True)
+            for i in range(10):
+                (raiz / 'mes_11' / f"CTe{i:044d}.xml").write_text('<cteProc/>', encoding='utf-8')
+        
+        manifestos = [ManifestManager(db_manager, raiz=raiz) for raiz in raizes]
+        try:
+            primeiro = manifestos[0].reivindicar(sorted((raizes[0] / 'mes_11').glob('*.xml')))
+            segundo = manifestos[1].reivindicar(sorted((raizes[1] / 'mes_11').glob('*.xml')))
+        finally:
+            db_manager.execute_update(
+                "DELETE FROM staging.ingestao_manifesto WHERE caminho LIKE 'mes\\_11/CTe%%'"
+            )
+        
+        assert len(primeiro) == 10
+        assert segundo == []
+    
+    def test_shards_de_worker_parado_sao_redistribuidos(self, db_manager):
+        """Shards sem heartbeat dentro do lease passam para outro worker."""
+        import time
+        from Database.managers.shard_manager import ShardManager
+        
+        parado = ShardManager(db_manager, lease_segundos=1)
+        ativo = ShardManager(db_manager, lease_segundos=1)
+        try:
+            assert len(parado.rebalancear()) == 64
+            assert ativo.rebalancear() == set()
+            
+            time.sleep(1.5)
+            assert len(ativo.rebalancear()) == 64
+            assert parado.heartbeat() == set()
+        finally:
+            ativo.encerrar()
+            parado.encerrar()
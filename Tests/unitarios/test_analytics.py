@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTES UNITÁRIOS - Analytics
+Ordem de atualização das views materializadas e particionamento
+"""
+
+import pytest
+from datetime import date
+
+from Database.managers.particao_manager import ParticaoManager
+from Database.views.orquestrador_views import OrquestradorViews
+
+
+class TestOrquestradorViews:
+    """Testes da ordem de atualização das views materializadas."""
+    
+    DEPENDENCIAS = {
+        'analytics.vw_receita_mensal': set(),
+        'analytics.vw_ticket_medio': set(),
+        'analytics.vw_dashboard_financeiro': {'analytics.vw_receita_mensal'},
+        'analytics.vw_resumo': {'analytics.vw_dashboard_financeiro', 'analytics.vw_receita_mensal'},
+    }
+    
+    def test_niveis_respeitam_dependencias(self):
+        """Independentes no mesmo nível; dependentes depois das suas origens."""
+        niveis = OrquestradorViews.niveis(self.DEPENDENCIAS, self.DEPENDENCIAS)
+        
+        assert niveis == [
+            ['analytics.vw_receita_mensal', 'analytics.vw_ticket_medio'],
+            ['analytics.vw_dashboard_financeiro'],
+            ['analytics.vw_resumo'],
+        ]
+    
+    def test_dependencias_fora_da_selecao_sao_ignoradas(self):
+        """Só as views pendentes entram nos níveis."""
+        niveis = OrquestradorViews.niveis(
+            ['analytics.vw_resumo', 'analytics.vw_ticket_medio'], self.DEPENDENCIAS
+        )
+        assert niveis == [['analytics.vw_resumo', 'analytics.vw_ticket_medio']]
+    
+    def test_dependencia_circular(self):
+        """Ciclo entre views é rejeitado."""
+        with pytest.raises(ValueError):
+            OrquestradorViews.niveis(['a', 'b'], {'a': {'b'}, 'b': {'a'}})
+
+
+class BancoFusoFalso:
+    """Banco que só responde o fuso horário da sessão."""
+    
+    def __init__(self, fuso):
+        self.fuso = fuso
+        self.consultas = 0
+    
+    def execute_query(self, query, params=None, fetch_one=False):
+        self.consultas += 1
+        return (self.fuso,)
+
+
+class TestParticaoManager:
+    """Testes do mês de partição dos documentos."""
+    
+    def test_mes_da_chave(self):
+        """AAMM da chave de acesso; chaves inválidas não têm mês."""
+        assert ParticaoManager.mes_da_chave('31250312345678000199570010000000011000000019') == date(2025, 3, 1)
+        assert ParticaoManager.mes_da_chave('31251312345678000199570010000000011000000019') is None
+        assert ParticaoManager.mes_da_chave('31250312') is None
+        assert ParticaoManager.mes_da_chave(None) is None
+    
+    def test_mes_particao_no_fuso_do_banco(self):
+        """Datas com fuso caem no mês do fuso do banco; sem data, vale a chave."""
+        banco = BancoFusoFalso('America/Sao_Paulo')
+        particoes = ParticaoManager(banco)
+        
+        assert particoes.mes_particao('2025-04-01T01:00:00+00:00') == date(2025, 3, 1)
+        assert particoes.mes_particao('2025-04-01T01:00:00') == date(2025, 4, 1)
+        assert particoes.mes_particao(None, '31250512345678000199570010000000031000000039') == date(2025, 5, 1)
+        assert particoes.mes_particao('inválida') is None
+        assert banco.consultas == 1
+    
+    def test_somar_meses(self):
+        """Deslocamento atravessa a virada do ano."""
+        assert ParticaoManager._somar_meses(date(2025, 11, 1), 3) == date(2026, 2, 1)
+        assert ParticaoManager._somar_meses(date(2025, 1, 1), -1) == date(2024, 12, 1)
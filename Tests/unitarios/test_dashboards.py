@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTES UNITÁRIOS - Dashboards
+Cache de consultas, pool de conexões, consultas de página, leitura via COPY e filtros
+"""
+
+import time
+import threading
+import numpy as np
+import pytest
+from datetime import date
+
+from Streamlit.utils.cache_consultas import CacheConsultas, normalizar_sql
+from Streamlit.utils import pool_conexoes
+from Streamlit.utils.consultas_pagina import ConsultasPagina
+
+
+class RelogioFalso:
+    """Relógio controlado pelo teste."""
+    
+    def __init__(self):
+        self.agora = 0.0
+    
+    def __call__(self):
+        return self.agora
+
+
+class TestCacheConsultas:
+    """Testes do cache de consultas dos dashboards."""
+    
+    @pytest.fixture
+    def relogio(self):
+        return RelogioFalso()
+    
+    def criar_cache(self, relogio, geracao, **kwargs):
+        opcoes = dict(ttl_segundos=60, max_entradas=10, max_memoria_mb=1,
+                      intervalo_geracao=0, ler_geracao=lambda: geracao[0], relogio=relogio)
+        opcoes.update(kwargs)
+        return CacheConsultas(**opcoes)
+    
+    def test_normalizar_sql_preserva_literais(self):
+        """Espaçamento fora dos literais não muda a chave."""
+        assert normalizar_sql("SELECT  *\n   FROM t\tWHERE a = 'x  y' ") == "SELECT * FROM t WHERE a = 'x  y'"
+    
+    def test_reaproveita_ate_nova_geracao(self, relogio):
+        """Mesmo SQL e parâmetros só vão ao banco de novo após um incremento da geração."""
+        pd = pytest.importorskip('pandas')
+        geracao, chamadas = [1], []
+        cache = self.criar_cache(relogio, geracao)
+        
+        def carregar():
+            chamadas.append(1)
+            return pd.DataFrame({'total': [len(chamadas)]})
+        
+        primeiro = cache.obter("SELECT count(*) FROM cte.documento WHERE id > %s", (1,), carregar)
+        primeiro.loc[0, 'total'] = 99
+        segundo = cache.obter("SELECT count(*)\n  FROM cte.documento WHERE id > %s", (1,), carregar)
+        assert segundo['total'].tolist() == [1] and len(chamadas) == 1
+        
+        cache.obter("SELECT count(*) FROM cte.documento WHERE id > %s", (2,), carregar)
+        assert len(chamadas) == 2
+        
+        geracao[0] = 2
+        terceiro = cache.obter("SELECT count(*) FROM cte.documento WHERE id > %s", (1,), carregar)
+        assert terceiro['total'].tolist() == [3]
+    
+    def test_ttl_e_erros(self, relogio):
+        """Resultados expiram pelo TTL (sem geração disponível) e erros não são guardados."""
+        geracao, chamadas = [None], []
+        cache = self.criar_cache(relogio, geracao)
+        
+        def falhar():
+            raise RuntimeError('banco fora')
+        
+        with pytest.raises(RuntimeError):
+            cache.obter("SELECT 1", None, falhar)
+        assert cache.obter("SELECT 1", None, lambda: chamadas.append(1) or 1, grupo='escalar') == 1
+        cache.obter("SELECT 1", None, lambda: chamadas.append(1) or 1, grupo='escalar')
+        assert len(chamadas) == 1
+        
+        relogio.agora = 61
+        cache.obter("SELECT 1", None, lambda: chamadas.append(1) or 1, grupo='escalar')
+        assert len(chamadas) == 2
+    
+    def test_limites_de_entradas_e_memoria(self, relogio):
+        """Os menos usados saem primeiro; resultados maiores que o limite não entram."""
+        pd = pytest.importorskip('pandas')
+        cache = self.criar_cache(relogio, [1], max_entradas=2)
+        for consulta in ('SELECT 1', 'SELECT 2'):
+            cache.obter(consulta, None, lambda: pd.DataFrame({'a': [1]}))
+        cache.obter('SELECT 1', None, lambda: pd.DataFrame())
+        cache.obter('SELECT 3', None, lambda: pd.DataFrame({'a': [3]}))
+        cache.obter('SELECT 4', None, lambda: pd.DataFrame({'a': range(200_000)}))
+        
+        estatisticas = cache.estatisticas()
+        assert estatisticas['entradas'] == 2 and estatisticas['acertos'] == 1
+        assert cache.obter('SELECT 2', None, lambda: 'novo', grupo='escalar') == 'novo'
+        assert estatisticas['bytes'] < 1024 * 1024
+    
+    def test_cache_em_disco_compartilhado(self, relogio, temp_dir):
+        """Outro processo (outro cache no mesmo diretório) lê o DataFrame do disco."""
+        pytest.importorskip('pyarrow')
+        pd = pytest.importorskip('pandas')
+        from decimal import Decimal
+        from Streamlit.utils.cache_disco import CacheDisco
+        
+        geracao, chamadas = [1], []
+        df = pd.DataFrame({'uf': ['MG', 'SP'], 'frete': [Decimal('10.50'), None],
+                           'mes': pd.to_datetime(['2025-01-01', '2025-02-01'], utc=True)})
+        
+        def carregar():
+            chamadas.append(1)
+            return df
+        
+        processos = [self.criar_cache(relogio, geracao, disco=CacheDisco(str(temp_dir)))
+                     for _ in range(2)]
+        processos[0].obter("SELECT * FROM analytics.vw_top_origens", None, carregar)
+        lido = processos[1].obter("SELECT * FROM analytics.vw_top_origens", None, carregar)
+        
+        assert len(chamadas) == 1
+        pd.testing.assert_frame_equal(lido, df)
+        
+        geracao[0] = 2
+        processos[1].obter("SELECT * FROM analytics.vw_top_origens", None, carregar)
+        assert len(chamadas) == 2
+    
+    def test_acertos_no_disco_regravam_acesso_so_apos_intervalo(self, temp_dir, monkeypatch):
+        """Leituras dentro do intervalo não escrevem no SQLite."""
+        pytest.importorskip('pyarrow')
+        pd = pytest.importorskip('pandas')
+        from Streamlit.utils import cache_disco
+        
+        instante = [1000.0]
+        monkeypatch.setattr(cache_disco.time, 'time', lambda: instante[0])
+        disco = cache_disco.CacheDisco(str(temp_dir), intervalo_acesso=30)
+        disco.guardar('consulta', pd.DataFrame({'a': [1]}), 1, 3600)
+        
+        def acessado_em():
+            return disco._conexao().execute("SELECT acessado_em FROM entrada").fetchone()[0]
+        
+        instante[0] = 1020.0
+        assert disco.obter('consulta', 1, 3600) is not None
+        assert acessado_em() == 1000.0
+        
+        instante[0] = 1031.0
+        assert disco.obter('consulta', 1, 3600) is not None
+        assert acessado_em() == 1031.0
+        assert cache_disco.CacheDisco(str(temp_dir)).intervalo_acesso == cache_disco.CacheDisco.INTERVALO_ACESSO
+
+
+class ConexaoFalsa:
+    """Conexão psycopg2 mínima para o pool."""
+    
+    class Info:
+        transaction_status = 0  # TRANSACTION_STATUS_IDLE
+    
+    def __init__(self, **config):
+        self.config = config
+        self.closed = 0
+        self.info = self.Info()
+    
+    def set_session(self, **opcoes):
+        self.sessao = opcoes
+    
+    def close(self):
+        self.closed = 1
+
+
+class TestPoolConexoes:
+    """Testes do pool de conexões dos dashboards."""
+    
+    @pytest.fixture
+    def pool(self, monkeypatch):
+        monkeypatch.setattr(pool_conexoes.psycopg2, 'connect', ConexaoFalsa)
+        monkeypatch.setattr(pool_conexoes.PoolConexoes, '_iniciar_coletor', lambda self: None)
+        return pool_conexoes.PoolConexoes({'options': '-c search_path=cte'}, minimo=1, maximo=2,
+                                          ocioso_segundos=0, timeout=0.05,
+                                          statement_timeout_ms=5000)
+    
+    def test_reutiliza_e_limita(self, pool):
+        """Conexões devolvidas são reutilizadas; acima do máximo a retirada falha após o timeout."""
+        with pool.conexao() as primeira:
+            pass
+        with pool.conexao() as conn, pool.conexao():
+            assert conn is primeira
+            assert conn.sessao == {'readonly': True, 'autocommit': True}
+            assert conn.config['options'] == '-c search_path=cte -c statement_timeout=5000'
+            with pytest.raises(pool_conexoes.PoolEsgotado):
+                with pool.conexao():
+                    pass
+        assert pool.estatisticas()['em_uso'] == 0
+    
+    def test_descarta_quebradas_e_recolhe_ociosas(self, pool):
+        """Conexões fechadas não voltam ao pool; ociosas acima do mínimo são fechadas."""
+        with pool.conexao() as quebrada:
+            quebrada.closed = 2
+        with pool.conexao() as conn:
+            assert conn is not quebrada
+            with pool.conexao() as extra:
+                pass
+        
+        assert pool.estatisticas() == {'abertas': 1, 'ociosas': 1, 'em_uso': 0}
+        assert extra.closed and not conn.closed
+
+
+class PoolLentoFalso:
+    """Pool cujas consultas demoram um tempo fixo."""
+    
+    maximo = 4
+    
+    def __init__(self, segundos):
+        self.segundos = segundos
+        self.executadas = []
+        self.simultaneas = self.pico = 0
+        self._trava = threading.Lock()
+    
+    def ler_dataframe(self, query, params=None):
+        import pandas as pd
+        with self._trava:
+            self.executadas.append((query, params))
+            self.simultaneas += 1
+            self.pico = max(self.pico, self.simultaneas)
+        time.sleep(self.segundos)
+        with self._trava:
+            self.simultaneas -= 1
+        if 'falha' in query:
+            raise RuntimeError('relação inexistente')
+        return pd.DataFrame({'query': [query], 'params': [repr(params)]})
+
+
+class TestConsultasPagina:
+    """Testes das consultas de página executadas em paralelo."""
+    
+    def test_carrega_em_paralelo_e_reutiliza(self):
+        """A carga leva o tempo da consulta mais lenta; a renderização não volta ao banco."""
+        pytest.importorskip('pandas')
+        pool = PoolLentoFalso(0.2)
+        cache = CacheConsultas(max_entradas=0, ler_geracao=lambda: None)
+        pagina = ConsultasPagina(pool, cache)
+        consultas = ["SELECT * FROM analytics.vw_top_origens", "SELECT * FROM analytics.vw_top_destinos",
+                     ("SELECT * FROM analytics.vw_receita_mensal WHERE ano = %s", (2025,)),
+                     "SELECT * FROM analytics.falha"]
+        
+        inicio = time.monotonic()
+        erros = pagina.carregar(consultas)
+        assert time.monotonic() - inicio < 0.6
+        assert list(erros) == ["SELECT * FROM analytics.falha"]
+        
+        df = pagina.obter("SELECT *\n FROM analytics.vw_receita_mensal WHERE ano = %s", (2025,))
+        assert df['params'].tolist() == ['(2025,)']
+        with pytest.raises(RuntimeError):
+            pagina.obter("SELECT * FROM analytics.falha")
+        assert len(pool.executadas) == 4
+    
+    def test_pagina_nao_ocupa_o_pool_inteiro(self, monkeypatch):
+        """Sem workers explícito vale POOL_CONFIG['page_workers'], limitado ao pool."""
+        pytest.importorskip('pandas')
+        from Streamlit.utils import consultas_pagina
+        
+        monkeypatch.setitem(consultas_pagina.POOL_CONFIG, 'page_workers', 2)
+        pool = PoolLentoFalso(0.05)
+        cache = CacheConsultas(max_entradas=0, ler_geracao=lambda: None)
+        pagina = ConsultasPagina(pool, cache)
+        
+        pagina.carregar([f"SELECT {i}" for i in range(6)])
+        
+        assert pagina.workers == 2
+        assert pool.pico == 2
+        assert len(pool.executadas) == 6
+        assert ConsultasPagina(pool, cache, workers=50).workers == pool.maximo
+
+
+class TestLeitorCopy:
+    """Testes da leitura colunar do CSV gerado pelo COPY."""
+    
+    def test_tipos_iguais_ao_read_sql(self):
+        """NULL vs texto vazio, inteiros com NULL, datas e nomes repetidos como no read_sql_query."""
+        pytest.importorskip('pyarrow')
+        import io
+        from Streamlit.utils.leitura_copy import LeitorCopy
+        
+        csv = ('1,10,"a,""b""\n",t,2025-01-31,2025-01-31 08:00:00-03,12.50\n'
+               '2,\\N,"",\\N,\\N,\\N,\\N\n'
+               '3,30,\\N,f,2025-02-01,2025-02-01 00:00:00+00,0\n').encode('utf-8')
+        colunas = [('id', 23), ('total', 20), ('texto', 25), ('ativo', 16),
+                   ('data', 1082), ('id', 1184), ('valor', 1700)]
+        df = LeitorCopy(1, bloco_mb=0).dataframe_csv(io.BytesIO(csv), colunas)
+        
+        assert list(df.columns) == ['id', 'total', 'texto', 'ativo', 'data', 'id', 'valor']
+        assert df.iloc[:, 0].tolist() == [1, 2, 3] and df.iloc[:, 0].dtype == 'int64'
+        assert df['total'].dtype == 'float64' and np.isnan(df['total'][1])
+        assert df['texto'][0] == 'a,"b"\n' and df['texto'][1] == '' and df['texto'].isna()[2]
+        assert df['ativo'].tolist() == [True, None, False]
+        assert df['data'][0] == date(2025, 1, 31) and df['data'][1] is None
+        assert str(df.iloc[0, 5]) == '2025-01-31 11:00:00+00:00'
+        assert df['valor'].tolist()[::2] == [12.5, 0.0]
+    
+    def test_decisao_por_sql_normalizado_e_numeric_em_float(self):
+        """EXPLAIN uma vez por consulta; no caminho comum numeric também vira float64."""
+        pytest.importorskip('pyarrow')
+        import io
+        from collections import namedtuple
+        from decimal import Decimal
+        from Streamlit.utils.leitura_copy import LeitorCopy
+        
+        Coluna = namedtuple('Coluna', 'name type_code')
+        
+        class CursorFalso:
+            def __init__(self, conn):
+                self.conn = conn
+            
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *_):
+                return False
+            
+            def execute(self, query, params=None):
+                self.conn.executadas.append(query)
+                self.description = [Coluna('valor', 1700), Coluna('vazio', 1700), Coluna('total', 20)]
+            
+            def fetchone(self):
+                return ([{'Plan': {'Plan Rows': 10}}],)
+            
+            def fetchall(self):
+                return [(Decimal('12.50'), None, 3), (None, None, 4)]
+            
+            def mogrify(self, query, params):
+                return (query % tuple(repr(p) for p in params)).encode('utf-8')
+        
+        class ConexaoFalsa:
+            encoding = 'UTF8'
+            
+            def __init__(self):
+                self.executadas = []
+            
+            def cursor(self):
+                return CursorFalso(self)
+        
+        conn, leitor = ConexaoFalsa(), LeitorCopy(1000)
+        primeiro = leitor.ler_dataframe(conn, "SELECT *\n  FROM analytics.vw_ticket_medio")
+        leitor.ler_dataframe(conn, "SELECT * FROM analytics.vw_ticket_medio")
+        
+        assert sum(query.startswith('EXPLAIN') for query in conn.executadas) == 1
+        assert len(conn.executadas) == 3
+        
+        # A estimativa depende dos parâmetros: outro conjunto refaz o EXPLAIN
+        filtrada = "SELECT * FROM analytics.f_ticket_medio(%s)"
+        leitor.ler_dataframe(conn, filtrada, ('PI',))
+        leitor.ler_dataframe(conn, filtrada, ('PI',))
+        leitor.ler_dataframe(conn, filtrada, ('SP',))
+        assert sum(query.startswith('EXPLAIN') for query in conn.executadas) == 3
+        assert primeiro.dtypes.tolist() == ['float64', 'float64', 'int64']
+        assert primeiro['valor'].tolist()[0] == 12.5
+        
+        # COPY sem linhas (estimativa alta, resultado vazio)
+        vazio = leitor.dataframe_csv(io.BufferedReader(io.BytesIO(b'')), [('id', 23), ('valor', 1700)])
+        assert list(vazio.columns) == ['id', 'valor'] and vazio.empty
+
+
+    def test_timestamptz_no_fuso_da_sessao_nos_dois_caminhos(self):
+        """Offsets diferentes (horário de verão) saem no TimeZone da sessão, com o mesmo dtype do COPY."""
+        pytest.importorskip('pyarrow')
+        import io
+        from collections import namedtuple
+        from datetime import datetime, timedelta, timezone
+        from Streamlit.utils.leitura_copy import LeitorCopy
+        
+        Coluna = namedtuple('Coluna', 'name type_code')
+        
+        class CursorFalso:
+            description = [Coluna('data', 1184)]
+            
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *_):
+                return False
+            
+            def execute(self, query, params=None):
+                pass
+            
+            def fetchall(self):
+                return [(datetime(2018, 1, 15, 8, tzinfo=timezone(timedelta(hours=-2))),),
+                        (datetime(2025, 1, 15, 7, tzinfo=timezone(timedelta(hours=-3))),),
+                        (None,)]
+        
+        class InfoFalsa:
+            def parameter_status(self, nome):
+                return {'TimeZone': 'America/Sao_Paulo'}.get(nome)
+        
+        class ConexaoFalsa:
+            info = InfoFalsa()
+            
+            def cursor(self):
+                return CursorFalso()
+        
+        comum = LeitorCopy.ler_sql(ConexaoFalsa(), "SELECT data FROM cte.documento")
+        csv = b'2018-01-15 10:00:00+00\n2025-01-15 10:00:00+00\n\\N\n'
+        copy = LeitorCopy(1).dataframe_csv(io.BytesIO(csv), [('data', 1184)], fuso='America/Sao_Paulo')
+        
+        assert str(comum['data'].dtype) == str(copy['data'].dtype)
+        assert str(comum['data'].dt.tz) == 'America/Sao_Paulo'
+        assert comum['data'].tolist()[:2] == copy['data'].tolist()[:2]
+        assert comum['data'].isna()[2] and copy['data'].isna()[2]
+
+
+class TestFiltrosDashboard:
+    """Testes da escolha entre view materializada e função filtrada."""
+    
+    def test_normalizacao_e_consulta(self):
+        """Valores normalizados; sem filtro a view é usada sem parâmetros."""
+        from Streamlit.utils.filtros_dashboard import ARGUMENTOS, FiltrosDashboard
+        
+        consultas = {'receita': "SELECT * FROM analytics.vw_receita_mensal",
+                     'idade': "SELECT * FROM analytics.vw_idade_frota"}
+        filtradas = {'receita': f"SELECT * FROM analytics.f_receita_mensal({ARGUMENTOS})"}
+        
+        vazio = FiltrosDashboard(uf='', placa=' ', cliente='./-')
+        assert not vazio.ativos
+        assert vazio.consulta(consultas, filtradas, 'receita') == (consultas['receita'], None)
+        
+        filtros = FiltrosDashboard(data_inicio=date(2025, 3, 31), data_fim=date(2025, 1, 1),
+                                   uf='sp', placa='abc-1d23', cliente='12.345.678/0001-90')
+        assert filtros.ativos
+        assert filtros.params() == {'data_inicio': date(2025, 1, 1), 'data_fim': date(2025, 3, 31),
+                                    'uf': 'SP', 'placa': 'ABC1D23', 'cliente': '12345678000190'}
+        query, params = filtros.consulta(consultas, filtradas, 'receita')
+        assert query == filtradas['receita'] and params == filtros.params()
+        # Consultas sem versão filtrada continuam na view
+        assert filtros.consulta(consultas, filtradas, 'idade') == (consultas['idade'], None)
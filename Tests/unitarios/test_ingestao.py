@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTES UNITÁRIOS - Ingestão
+Lotes, manifesto, monitoramento de diretórios, shards e descoberta de arquivos
+"""
+
+import os
+import time
+import hashlib
+import pytest
+from pathlib import Path
+
+from Database.managers.file_manager import FileManager
+from Database.managers.manifest_manager import ManifestManager
+from Database.managers.shard_manager import ShardManager
+from Database.managers.stats_manager import StatsManager
+from Database.services.etl_service import ETLService
+from Database.services.watch_service import WatchService
+
+
+@pytest.mark.unitario
+class TestPayloadIngestaoLote:
+    """Testes da montagem do payload enviado a cte.f_ingest_cte_batch."""
+    
+    @pytest.fixture
+    def etl(self):
+        return ETLService(db_manager=None, stats_manager=StatsManager())
+    
+    def test_payload_documento(self, etl, dados_cte):
+        """Campos do documento seguem o formato de cte.f_ingest_cte_json."""
+        transformados = etl._transformar_dados(dados_cte, 2.50)
+        payload = etl._montar_payload_ingestao(dados_cte, transformados)
+        
+        assert payload['chave'] == dados_cte['CT-e_chave']
+        assert payload['valor_frete'] == 250.0
+        assert payload['quilometragem'] == 100.0
+        assert payload['origem_cidade'] == 'Timon'
+        assert payload['destino_uf'] == 'PI'
+        assert payload['placa'] == 'ABC1D23'
+        assert payload['carga']['produto_predominante'] == 'BOVINOS'
+        assert payload['carga']['valor'] == 50000.0
+    
+    def test_payload_partes(self, etl, dados_cte):
+        """Partes são normalizadas e partes ausentes não entram no payload."""
+        transformados = etl._transformar_dados(dados_cte, 2.50)
+        payload = etl._montar_payload_ingestao(dados_cte, transformados)
+        
+        remetente = payload['remetente']
+        assert remetente['documento'] == '12345678000190'
+        assert remetente['inscricao_estadual'] == '123456'
+        assert remetente['endereco']['uf'] == 'MA'
+        assert remetente['endereco']['cep'] == '65630-000'
+        
+        assert payload['destinatario']['endereco'] is None
+        assert 'expedidor' not in payload
+        assert 'recebedor' not in payload
+    
+    def test_lote_vazio(self, etl):
+        """Lote sem arquivos não é processado."""
+        assert etl.processar_arquivos_em_lotes([], 2.50) is False
+
+
+class ManifestoFalso:
+    """Manifesto em memória: reivindica apenas arquivos ainda não vistos."""
+    
+    def __init__(self, concluidos):
+        self.concluidos = set(concluidos)
+        self.registrados = []
+        self.descargas = 0
+    
+    def reivindicar(self, arquivos):
+        return [a for a in arquivos if a.name not in self.concluidos]
+    
+    def registrar(self, arquivo, sucesso, chave=None, classe_erro=None, mensagem=None):
+        self.registrados.append((arquivo.name, sucesso, classe_erro))
+    
+    def descarregar(self):
+        self.descargas += 1
+        return 0
+    
+    def liberar_reivindicacoes(self):
+        return 0
+
+
+@pytest.mark.unitario
+class TestManifestoIngestao:
+    """Testes do manifesto de ingestão retomável."""
+    
+    def test_sha256_e_assinatura(self, tmp_path):
+        """Checksum e assinatura refletem o conteúdo e o tamanho do arquivo."""
+        arquivo = tmp_path / 'cte.xml'
+        arquivo.write_bytes(b'<cteProc/>')
+        
+        assert ManifestManager.calcular_sha256(arquivo) == hashlib.sha256(b'<cteProc/>').hexdigest()
+        assert ManifestManager.calcular_sha256(tmp_path / 'inexistente.xml') is None
+        
+        manifesto = ManifestManager(db_manager=None)
+        manifesto.definir_raiz([tmp_path])
+        caminho, tamanho, mtime = manifesto.assinatura_arquivo(arquivo)
+        assert caminho == 'cte.xml'
+        assert tamanho == len(b'<cteProc/>')
+        assert mtime.tzinfo is not None
+    
+    def test_identidade_independe_do_ponto_de_montagem(self, tmp_path):
+        """O mesmo arquivo visto por duas raízes tem a mesma identidade no manifesto."""
+        raizes = [tmp_path / 'host_a' / 'cte', tmp_path / 'mnt' / 'nfs' / 'cte']
+        arquivos = []
+        for raiz in raizes:
+            (raiz / 'mes_11').mkdir(parents=True)
+            arquivo = raiz / 'mes_11' / 'CTe123.xml'
+            arquivo.write_bytes(b'<cteProc/>')
+            arquivos.append(arquivo)
+        
+        com_raiz = [ManifestManager(db_manager=None, raiz=raiz).identificar(arquivo)
+                    for raiz, arquivo in zip(raizes, arquivos)]
+        sem_raiz = [ManifestManager(db_manager=None).identificar(arquivo) for arquivo in arquivos]
+        
+        assert com_raiz == ['mes_11/CTe123.xml', 'mes_11/CTe123.xml']
+        # Sem raiz e fora da raiz configurada, o caminho absoluto (nunca o nome isolado)
+        assert sem_raiz == [arquivo.resolve().as_posix() for arquivo in arquivos]
+        assert (ManifestManager(db_manager=None, raiz=raizes[0]).identificar(arquivos[1])
+                == arquivos[1].resolve().as_posix())
+    
+    def test_raiz_padrao_e_o_diretorio_varrido(self, tmp_path):
+        """Sem INGEST_ROOT, homônimos em subdiretórios têm identidades distintas."""
+        arquivos = [tmp_path / 'mes_10' / 'CTe123.xml', tmp_path / 'mes_11' / 'CTe123.xml']
+        for arquivo in arquivos:
+            arquivo.parent.mkdir()
+            arquivo.write_bytes(b'<cteProc/>')
+        
+        manifesto = ManifestManager(db_manager=None)
+        assert manifesto.definir_raiz([tmp_path]) == tmp_path.resolve()
+        assert [manifesto.identificar(a) for a in arquivos] == ['mes_10/CTe123.xml',
+                                                               'mes_11/CTe123.xml']
+        
+        # Vários diretórios monitorados: o ancestral comum
+        varios = ManifestManager(db_manager=None)
+        assert varios.definir_raiz([a.parent for a in arquivos]) == tmp_path.resolve()
+        # Raiz configurada prevalece
+        configurada = ManifestManager(db_manager=None, raiz=arquivos[0].parent)
+        assert configurada.definir_raiz([tmp_path]) == arquivos[0].parent.resolve()
+    
+    def test_falhas_em_subdiretorios_sem_raiz_configurada(self, tmp_path):
+        """--retry-failed encontra falhas em subdiretórios do diretório varrido."""
+        (tmp_path / 'mes_11' / 'dia_05').mkdir(parents=True)
+        (tmp_path / 'mes_11' / 'dia_05' / 'a.xml').write_bytes(b'<cteProc/>')
+        
+        class BancoFalso:
+            def execute_query(self, query, params=None, fetch_one=False):
+                self.params = params
+                return [('mes_11/dia_05/a.xml',)]
+        
+        banco = BancoFalso()
+        manifesto = ManifestManager(banco)
+        manifesto.definir_raiz([tmp_path])
+        
+        assert manifesto.listar_falhas(tmp_path) == [tmp_path.resolve() / 'mes_11' / 'dia_05' / 'a.xml']
+        assert banco.params == ('%',)
+    
+    def test_falhas_localizadas_a_partir_da_raiz(self, tmp_path):
+        """Registros relativos à raiz voltam como arquivos do host atual."""
+        (tmp_path / 'mes_11').mkdir()
+        (tmp_path / 'mes_11' / 'a.xml').write_bytes(b'<cteProc/>')
+        
+        class BancoFalso:
+            def execute_query(self, query, params=None, fetch_one=False):
+                self.params = params
+                return [('mes_11/a.xml',), ('mes_11/removido.xml',)]
+        
+        banco = BancoFalso()
+        falhas = ManifestManager(banco, raiz=tmp_path).listar_falhas(tmp_path / 'mes_11')
+        
+        assert banco.params == ('mes\\_11/%',)
+        assert falhas == [tmp_path.resolve() / 'mes_11' / 'a.xml']
+    
+    def test_registrar_acumula_ate_descarregar(self, tmp_path):
+        """Resultados ficam em memória até o descarregar do lote."""
+        arquivo = tmp_path / 'cte.xml'
+        arquivo.write_bytes(b'<cteProc/>')
+        manifesto = ManifestManager(db_manager=None)
+        
+        manifesto.registrar(arquivo, False, classe_erro='extracao', mensagem='falha')
+        
+        caminho, status, sha256, chave, classe_erro, _, id_execucao = manifesto._resultados_pendentes[0]
+        assert status == 'erro'
+        assert classe_erro == 'extracao'
+        assert chave is None
+        assert id_execucao == manifesto.id_execucao
+    
+    def test_blocos_ignoram_concluidos(self, tmp_path):
+        """Arquivos já concluídos no manifesto não são reprocessados."""
+        arquivos = [tmp_path / f'cte_{i}.xml' for i in range(5)]
+        manifesto = ManifestoFalso(concluidos={'cte_1.xml', 'cte_3.xml'})
+        stats = StatsManager()
+        etl = ETLService(db_manager=None, stats_manager=stats, manifest_manager=manifesto)
+        
+        blocos = list(etl._reivindicar_blocos(arquivos, 2))
+        
+        assert [[a.name for a in bloco] for bloco in blocos] == [['cte_0.xml'], ['cte_2.xml'], ['cte_4.xml']]
+        assert stats.estatisticas['arquivos_ignorados'] == 2
+    
+    def test_falha_de_extracao_registrada(self, tmp_path):
+        """Falhas entram no manifesto com a etapa como classe do erro."""
+        arquivo = tmp_path / 'invalido.xml'
+        arquivo.write_text('<nao-e-cte/>', encoding='utf-8')
+        manifesto = ManifestoFalso(concluidos=set())
+        etl = ETLService(db_manager=None, stats_manager=StatsManager(), manifest_manager=manifesto)
+        
+        etl.processar_arquivos_em_lotes([arquivo], 2.50)
+        
+        assert manifesto.registrados == [('invalido.xml', False, 'extracao')]
+        assert manifesto.descargas >= 1
+
+
+class ETLFalso:
+    """ETL em memória que apenas guarda os micro-lotes recebidos."""
+    
+    def __init__(self):
+        self.lotes = []
+        self.atualizacoes_views = 0
+    
+    def processar_lote_arquivos(self, arquivos, custo_por_km, tamanho_lote=500,
+                                atualizar_views=True):
+        self.lotes.append([a.name for a in arquivos])
+        if atualizar_views:
+            self.atualizar_views()
+        return True
+    
+    processar_arquivos_em_lotes = processar_lote_arquivos
+    
+    def atualizar_views(self):
+        self.atualizacoes_views += 1
+
+
+@pytest.mark.unitario
+class TestWatchService:
+    """Testes do monitoramento contínuo de diretórios."""
+    
+    def _criar_xml(self, diretorio, nome, idade=10.0):
+        arquivo = diretorio / nome
+        arquivo.write_text('<cteProc/>', encoding='utf-8')
+        instante = time.time() - idade
+        os.utime(arquivo, (instante, instante))
+        return arquivo
+    
+    def test_varredura_enfileira_apenas_novos(self, tmp_path):
+        """Arquivos já entregues não voltam para a fila."""
+        self._criar_xml(tmp_path, 'a.xml')
+        self._criar_xml(tmp_path, 'b.XML')
+        (tmp_path / 'ignorar.txt').write_text('x', encoding='utf-8')
+        watch = WatchService(ETLFalso(), [tmp_path], 2.50)
+        
+        assert watch.varrer() == 2
+        assert watch.varrer() == 0
+        
+        self._criar_xml(tmp_path, 'c.xml')
+        assert watch.varrer() == 1
+    
+    def test_arquivo_recente_aguarda_estabilizar(self, tmp_path):
+        """Arquivo recém-escrito só entra na fila quando não muda entre varreduras."""
+        arquivo = self._criar_xml(tmp_path, 'novo.xml', idade=0.0)
+        watch = WatchService(ETLFalso(), [tmp_path], 2.50, estabilidade=60.0)
+        
+        assert watch.varrer() == 0
+        arquivo.write_text('<cteProc>completo</cteProc>', encoding='utf-8')
+        assert watch.varrer() == 0
+        assert watch.varrer() == 1
+    
+    def test_micro_lote_por_quantidade_e_idade(self, tmp_path):
+        """A fila é descarregada ao atingir o tamanho ou a idade máxima."""
+        for i in range(5):
+            self._criar_xml(tmp_path, f'cte_{i}.xml')
+        etl = ETLFalso()
+        watch = WatchService(etl, [tmp_path], 2.50, lote_maximo=3, idade_maxima=3600)
+        
+        watch.varrer()
+        assert watch.deve_descarregar()
+        watch.descarregar_fila()
+        assert len(etl.lotes[0]) == 3
+        assert not watch.deve_descarregar()
+        
+        watch.idade_maxima = 0
+        assert watch.deve_descarregar()
+        watch.descarregar_fila()
+        assert len(etl.lotes[1]) == 2
+    
+    def test_metricas_de_lag_e_throughput(self, tmp_path):
+        """Métricas refletem arquivos processados, lag e throughput."""
+        for i in range(4):
+            self._criar_xml(tmp_path, f'cte_{i}.xml', idade=5.0)
+        arquivo_metricas = tmp_path / 'metricas.json'
+        watch = WatchService(ETLFalso(), [tmp_path], 2.50, idade_maxima=0,
+                             intervalo_varredura=0, arquivo_metricas=str(arquivo_metricas))
+        
+        watch.executar(duracao_maxima=0)
+        metricas = watch.metricas()
+        
+        assert metricas['arquivos_processados'] == 4
+        assert metricas['fila'] == 0
+        assert metricas['lag_max_segundos'] >= 5.0
+        assert metricas['throughput_arquivos_min'] == 4.0
+        assert arquivo_metricas.exists()
+
+    def test_views_atualizadas_por_intervalo_e_nao_por_micro_lote(self, tmp_path):
+        """Micro-lotes não atualizam as views; o daemon atualiza no intervalo e ao sair."""
+        etl = ETLFalso()
+        watch = WatchService(etl, [tmp_path], 2.50, lote_maximo=1, idade_maxima=0,
+                             intervalo_views=3600)
+        watch._ultima_atualizacao_views = time.monotonic()
+        
+        for i in range(3):
+            self._criar_xml(tmp_path, f'cte_{i}.xml')
+        watch.varrer()
+        while watch.deve_descarregar():
+            watch.descarregar_fila()
+        
+        assert len(etl.lotes) == 3
+        assert not watch.atualizar_views()
+        assert etl.atualizacoes_views == 0
+        
+        watch.intervalo_views = 0
+        assert watch.atualizar_views()
+        assert not watch.atualizar_views()
+        assert etl.atualizacoes_views == 1
+    
+    def test_encerramento_atualiza_views_pendentes(self, tmp_path):
+        """Ao encerrar, as views são atualizadas uma vez mesmo antes do intervalo."""
+        for i in range(4):
+            self._criar_xml(tmp_path, f'cte_{i}.xml')
+        etl = ETLFalso()
+        watch = WatchService(etl, [tmp_path], 2.50, lote_maximo=1, idade_maxima=0,
+                             intervalo_varredura=0, intervalo_views=3600)
+        
+        watch.executar(duracao_maxima=0)
+        
+        assert len(etl.lotes) == 4
+        assert etl.atualizacoes_views == 1
+
+
+@pytest.mark.unitario
+class TestShardsIngestao:
+    """Testes da divisão de arquivos entre workers."""
+    
+    def test_shard_depende_apenas_do_nome(self):
+        """Máquinas com pontos de montagem diferentes calculam o mesmo shard."""
+        nome = 'CTe21250135263415000132570010000004821317310777.xml'
+        shard = ShardManager.calcular_shard(Path('/mnt/a') / nome, 64)
+        
+        assert shard == ShardManager.calcular_shard(Path('/srv/share/cte') / nome, 64)
+        assert 0 <= shard < 64
+    
+    def test_cota_por_worker(self):
+        """A cota cobre todos os shards entre os workers ativos."""
+        assert ShardManager.calcular_cota(64, 1) == 64
+        assert ShardManager.calcular_cota(64, 3) == 22
+        assert ShardManager.calcular_cota(64, 0) == 64
+    
+    def test_ordenar_por_afinidade(self):
+        """Arquivos dos shards próprios vêm antes dos demais."""
+        shard_manager = ShardManager(db_manager=None)
+        shard_manager.total_shards = 4
+        arquivos = [Path(f'cte_{i}.xml') for i in range(20)]
+        shard_manager.shards = {ShardManager.calcular_shard(arquivos[5], 4)}
+        
+        ordenados = shard_manager.ordenar_por_afinidade(arquivos)
+        proprios = [a for a in arquivos if shard_manager.pertence(a)]
+        
+        assert ordenados[:len(proprios)] == proprios
+        assert sorted(ordenados) == sorted(arquivos)
+    
+    def test_watch_ignora_arquivos_de_outros_shards(self, tmp_path):
+        """No modo worker o daemon só enfileira arquivos dos próprios shards."""
+        for i in range(10):
+            arquivo = tmp_path / f'cte_{i}.xml'
+            arquivo.write_text('<cteProc/>', encoding='utf-8')
+            os.utime(arquivo, (time.time() - 10, time.time() - 10))
+        
+        shard_manager = ShardManager(db_manager=None, lease_segundos=3600)
+        shard_manager.total_shards = 2
+        shard_manager.shards = {0}
+        shard_manager.rebalancear = lambda: shard_manager.shards
+        watch = WatchService(ETLFalso(), [tmp_path], 2.50, shard_manager=shard_manager)
+        
+        esperados = sum(1 for i in range(10)
+                        if ShardManager.calcular_shard(Path(f'cte_{i}.xml'), 2) == 0)
+        assert watch.varrer() == esperados
+
+
+@pytest.mark.unitario
+class TestDescobertaEStatisticasLimitadas:
+    """Testes da descoberta em streaming e das estatísticas com memória limitada."""
+    
+    @pytest.fixture
+    def arvore_xml(self, tmp_path):
+        for caminho in ('a.xml', 'B.XML', 'notas.txt', 'sub/c.xml',
+                        'sub/cancelados/d.xml', 'sub/profundo/e.xml'):
+            arquivo = tmp_path / caminho
+            arquivo.parent.mkdir(parents=True, exist_ok=True)
+            arquivo.write_text('<cteProc/>', encoding='utf-8')
+        return tmp_path
+    
+    def test_descoberta_e_um_gerador(self, arvore_xml):
+        """A descoberta entrega arquivos sob demanda."""
+        arquivos = FileManager().iterar_arquivos_xml(arvore_xml)
+        
+        assert not isinstance(arquivos, list)
+        assert sorted(a.name for a in arquivos) == ['B.XML', 'a.xml']
+    
+    def test_descoberta_recursiva_com_filtros(self, arvore_xml):
+        """Subdiretórios e padrões de inclusão/exclusão são respeitados."""
+        file_manager = FileManager()
+        
+        todos = file_manager.iterar_arquivos_xml(arvore_xml, recursivo=True)
+        assert sorted(a.name for a in todos) == ['B.XML', 'a.xml', 'c.xml', 'd.xml', 'e.xml']
+        
+        filtrados = file_manager.iterar_arquivos_xml(
+            arvore_xml, recursivo=True, incluir=['*.xml'], excluir=['cancelados', 'sub/profundo/*']
+        )
+        assert sorted(a.name for a in filtrados) == ['B.XML', 'a.xml', 'c.xml']
+    
+    def test_validacao_para_no_primeiro_arquivo(self, tmp_path):
+        """A seleção do diretório só sonda se há XML, sem percorrer tudo."""
+        from Database.main import CTEMainApplication
+        
+        entregues = []
+        
+        def descobrir(diretorio, **filtros):
+            for i in range(1000):
+                entregues.append(i)
+                yield diretorio / f'cte_{i}.xml'
+        
+        app = CTEMainApplication(diretorio=tmp_path)
+        app.file_manager.iterar_arquivos_xml = descobrir
+        
+        assert app.selecionar_e_validar_arquivos() == (tmp_path, True)
+        assert entregues == [0]
+        
+        app.diretorio = tmp_path / 'vazio'
+        app.file_manager.iterar_arquivos_xml = lambda diretorio, **filtros: iter(())
+        assert app.selecionar_e_validar_arquivos() == (None, False)
+    
+    def test_descobrir_arquivos_xml_mantem_lista_ordenada(self, arvore_xml):
+        """A API em lista continua ordenada e sem recursão."""
+        arquivos = FileManager().descobrir_arquivos_xml(arvore_xml)
+        assert [a.name for a in arquivos] == ['B.XML', 'a.xml']
+    
+    def test_estatisticas_com_memoria_limitada(self):
+        """Totais continuam exatos enquanto apenas os registros recentes são mantidos."""
+        stats = StatsManager(max_registros=5)
+        for i in range(100):
+            stats.registrar_sucesso(f'ok_{i}.xml', {'valor_frete': 10.0, 'quilometragem': 4.0})
+            stats.registrar_erro(f'erro_{i}.xml', "Falha na extração de dados")
+        
+        assert stats.estatisticas['sucessos'] == 100
+        assert stats.estatisticas['erros'] == 100
+        assert len(stats.arquivos_sucesso) == 5
+        assert len(stats.detalhes_erros) == 5
+        assert stats.detalhes_erros[-1]['arquivo'] == 'erro_99.xml'
+        assert stats.erros_por_tipo["Falha na extração de dados"] == 100
+        assert len(stats.exemplos_erro["Falha na extração de dados"]) == StatsManager.MAX_EXEMPLOS_POR_TIPO
+        assert stats.totais_sucesso['valor_frete'] == 1000.0
+    
+    def test_tipos_de_erro_limitados(self):
+        """Mensagens distintas além do limite são agrupadas em 'Outros erros'."""
+        stats = StatsManager()
+        for i in range(StatsManager.MAX_TIPOS_ERRO + 10):
+            stats.registrar_erro(f'erro_{i}.xml', f"Erro inesperado: {i}")
+        
+        assert len(stats.erros_por_tipo) == StatsManager.MAX_TIPOS_ERRO + 1
+        assert stats.erros_por_tipo['Outros erros'] == 10
+    
+    def test_historico_do_facade_limitado(self):
+        """O histórico do facade guarda apenas as extrações recentes."""
+        from cte_extractor.facade import CTEFacade
+        
+        facade = CTEFacade()
+        assert facade._extraction_history.maxlen == CTEFacade.MAX_HISTORICO
+        
+        for i in range(CTEFacade.MAX_HISTORICO + 10):
+            facade._extraction_history.append({'arquivo': f'{i}.xml', 'sucesso': True, 'campos': 1})
+        
+        assert len(facade.get_historico()) == CTEFacade.MAX_HISTORICO
+        assert facade.get_historico()[-1]['arquivo'] == f'{CTEFacade.MAX_HISTORICO + 9}.xml'
+    
+    def test_etl_processa_iterador(self, tmp_path):
+        """O ETL aceita um gerador de arquivos sem conhecer o total."""
+        for i in range(3):
+            (tmp_path / f'cte_{i}.xml').write_text('<nao-e-cte/>', encoding='utf-8')
+        stats = StatsManager()
+        etl = ETLService(db_manager=None, stats_manager=stats)
+        
+        etl.processar_arquivos_em_lotes(FileManager().iterar_arquivos_xml(tmp_path), 2.50, 2)
+        
+        assert stats.estatisticas['arquivos_processados'] == 3
+        assert etl.processar_lote_arquivos(iter([]), 2.50) is False
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTES UNITÁRIOS - Quilometragem e Distâncias
+Haversine, rotas, recálculo, estatísticas vetorizadas e sketches de quantis
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from Database.managers.rota_distancia_manager import RotaDistanciaManager
+from Database.managers.sketch_quantil_manager import ALFA_SKETCH, SketchQuantilManager
+from Database.managers.stats_manager import StatsManager
+from Database.services.backfill_service import BackfillService
+from Database.services.distancia_service import DistanciaService
+from Database.services.etl_service import ETLService
+from Database.services.quilometragem_service import (
+    CATEGORIAS_DISTANCIA, CATEGORIAS_VALIDACAO, EstatisticasQuilometragemParciais,
+    QuilometragemService
+)
+
+
+class TestDistanciaService:
+    """Testes do cálculo vetorizado de distâncias entre municípios."""
+    
+    @pytest.fixture
+    def distancias(self, tmp_path):
+        servico = DistanciaService(diretorio_cache=str(tmp_path))
+        servico.definir_coordenadas(
+            [3550308, 2211001, 2112209, 1100015],
+            [35, 22, 21, 11],
+            [-23.5329, -5.0892, -5.0948, float('nan')],
+            [-46.6395, -42.8016, -42.8387, float('nan')],
+            {'SP': 35, 'PI': 22, 'MA': 21}
+        )
+        return servico
+    
+    def test_distancias_conhecidas(self, distancias):
+        """Teresina-Timon fica a poucos km; Teresina-São Paulo a ~2.000 km."""
+        assert distancias.total_municipios == 3
+        assert 3 < distancias.distancia_km(2211001, 2112209) < 6
+        assert 2000 < distancias.distancia_km('2211001', '3550308') < 2200
+        assert distancias.distancia_km(2211001, 2211001) == 0
+    
+    def test_codigos_desconhecidos(self, distancias):
+        """Códigos sem coordenadas retornam None/NaN."""
+        assert distancias.distancia_km(2211001, 1100015) is None
+        assert distancias.distancia_km(None, 2211001) is None
+        
+        lote = distancias.calcular_lote([2211001, 9999999], [3550308, 2211001])
+        assert lote[0] > 0
+        assert np.isnan(lote[1])
+    
+    def test_lote_igual_ao_individual(self, distancias):
+        """O lote vetorizado devolve os mesmos valores da consulta unitária."""
+        origens = [2211001, 2112209, 3550308, 2211001]
+        destinos = [3550308, 2211001, 2112209, 2112209]
+        lote = distancias.calcular_lote(origens, destinos)
+        
+        for km, origem, destino in zip(lote, origens, destinos):
+            assert km == pytest.approx(distancias.distancia_km(origem, destino))
+    
+    def test_cache_em_disco_reutilizado(self, distancias, tmp_path):
+        """Linhas calculadas ficam no memmap e são reaproveitadas por outra instância."""
+        km = distancias.distancia_km(2211001, 3550308)
+        distancias._matriz.flush()
+        distancias._calculadas.flush()
+        
+        outra = DistanciaService(diretorio_cache=str(tmp_path))
+        outra.definir_coordenadas(
+            [3550308, 2211001, 2112209], [35, 22, 21],
+            [-23.5329, -5.0892, -5.0948], [-46.6395, -42.8016, -42.8387]
+        )
+        indice = outra.indices_municipios([2211001])[0]
+        assert outra._calculadas[indice] == 1
+        assert outra.distancia_km(2211001, 3550308) == pytest.approx(km)
+    
+    def test_cache_criado_por_outro_processo_nao_e_truncado(self, distancias, tmp_path, monkeypatch):
+        """Criação concorrente do cache não sobrescreve o arquivo já mapeado por outro worker."""
+        km = distancias.distancia_km(2211001, 3550308)
+        distancias._matriz.flush()
+        distancias._calculadas.flush()
+        
+        # Outro processo também não viu os arquivos: o os.link dele falha e nada é truncado
+        monkeypatch.setattr('os.path.exists', lambda caminho: False)
+        assert not DistanciaService._criar_arquivo_esparso(distancias._matriz.filename, 16)
+        monkeypatch.undo()
+        
+        outra = DistanciaService(diretorio_cache=str(tmp_path))
+        outra.definir_coordenadas(
+            [3550308, 2211001, 2112209], [35, 22, 21],
+            [-23.5329, -5.0892, -5.0948], [-46.6395, -42.8016, -42.8387]
+        )
+        assert outra._calculadas[outra.indices_municipios([2211001])[0]] == 1
+        assert outra.distancia_km(2211001, 3550308) == pytest.approx(km)
+        assert not list(tmp_path.glob('*.tmp'))
+    
+    def test_flags_sem_matriz_sao_zeradas(self, distancias, tmp_path):
+        """Se a matriz some e as flags ficam, as linhas são recalculadas."""
+        km = distancias.distancia_km(2211001, 3550308)
+        distancias._calculadas.flush()
+        arquivo_matriz = distancias._matriz.filename
+        del distancias._matriz
+        os.remove(arquivo_matriz)
+        
+        outra = DistanciaService(diretorio_cache=str(tmp_path))
+        outra.definir_coordenadas(
+            [3550308, 2211001, 2112209], [35, 22, 21],
+            [-23.5329, -5.0892, -5.0948], [-46.6395, -42.8016, -42.8387]
+        )
+        assert not outra._calculadas.any()
+        assert outra.distancia_km(2211001, 3550308) == pytest.approx(km)
+    
+    def test_fator_circuidade(self, distancias, tmp_path):
+        """O fator do par de UFs multiplica a distância em linha reta."""
+        reta = distancias.distancia_km(2211001, 3550308)
+        
+        arquivo = tmp_path / 'circuidade.csv'
+        arquivo.write_text('uf_origem,uf_destino,fator\nPI,SP,1.25\n', encoding='utf-8')
+        assert distancias.carregar_fatores_circuidade(str(arquivo)) == 1
+        
+        assert distancias.distancia_km(2211001, 3550308) == pytest.approx(reta * 1.25, rel=1e-6)
+        assert distancias.distancia_km(3550308, 2211001) == pytest.approx(reta * 1.25, rel=1e-6)
+        assert distancias.distancia_km(2211001, 3550308, aplicar_circuidade=False) == pytest.approx(reta)
+    
+    def test_etl_substitui_estimativa_por_frete(self, distancias, dados_cte):
+        """Com o serviço de distâncias o ETL usa a rota; sem coordenadas mantém o frete."""
+        etl = ETLService(db_manager=None, stats_manager=StatsManager(),
+                         distancia_service=distancias)
+        dados = dict(dados_cte,
+                     Origem={'cidade': 'Timon', 'uf': 'MA', 'cod_municipio': '2112209'},
+                     Destino={'cidade': 'Teresina', 'uf': 'PI', 'cod_municipio': '2211001'})
+        
+        transformados = etl._transformar_dados(dados, 2.50)
+        payloads = [etl._montar_payload_ingestao(dados, transformados),
+                    etl._montar_payload_ingestao(dados_cte, etl._transformar_dados(dados_cte, 2.50))]
+        
+        assert etl._aplicar_distancias(payloads) == 1
+        assert 3 < payloads[0]['quilometragem'] < 6
+        assert payloads[0]['fonte_quilometragem'] == 'haversine'
+        assert payloads[1]['quilometragem'] == 100.0
+        assert payloads[1]['fonte_quilometragem'] == 'frete'
+
+
+class BancoRotasFalso:
+    """Banco em memória para a tabela de rotas e o intervalo de id_cte."""
+    
+    def __init__(self, rotas=None, intervalo=(None, None)):
+        self.rotas = dict(rotas or {})
+        self.intervalo = intervalo
+        self.consultas = 0
+    
+    def execute_query(self, query, params=None, fetch_one=False):
+        self.consultas += 1
+        if fetch_one:
+            return self.intervalo
+        origens, destinos = params
+        return [(o, d, self.rotas[(o, d)]) for o, d in zip(origens, destinos) if (o, d) in self.rotas]
+
+
+class TestRotasDistancia:
+    """Testes do LRU de rotas e da divisão em faixas do backfill."""
+    
+    @pytest.fixture
+    def rotas(self, tmp_path):
+        servico = DistanciaService(diretorio_cache=str(tmp_path))
+        servico.definir_coordenadas(
+            [3550308, 2211001, 2112209], [35, 22, 21],
+            [-23.5329, -5.0892, -5.0948], [-46.6395, -42.8016, -42.8387]
+        )
+        manager = RotaDistanciaManager(BancoRotasFalso({(2211001, 3550308): 2500.0}),
+                                       servico, tamanho_cache=2)
+        manager.gravadas = []
+        manager.gravar_rotas = lambda novas, fonte='haversine': manager.gravadas.extend(novas) or len(novas)
+        return manager
+    
+    def test_tabela_tem_precedencia(self, rotas):
+        """Rota já gravada (ex.: manual) não é recalculada nem regravada."""
+        assert rotas.distancia_km(2211001, 3550308) == 2500.0
+        assert rotas.gravadas == []
+    
+    def test_rota_nova_gravada_uma_vez(self, rotas):
+        """Rota nova é calculada, gravada e depois servida pelo LRU."""
+        lote = rotas.calcular_lote(['2112209', 2112209, None], [2211001, 2211001, 2211001])
+        
+        assert 3 < lote[0] < 6 and lote[1] == lote[0]
+        assert np.isnan(lote[2])
+        assert rotas.gravadas == [(2112209, 2211001, round(lote[0], 1))]
+        
+        consultas = rotas.db_manager.consultas
+        assert rotas.distancia_km(2112209, 2211001) == lote[0]
+        assert rotas.db_manager.consultas == consultas
+        assert rotas.estatisticas['calculadas'] == 1
+    
+    def test_lru_descarta_rota_menos_usada(self, rotas):
+        """Acima do tamanho do cache a rota menos usada sai do LRU."""
+        rotas.distancia_km(2211001, 3550308)
+        rotas.distancia_km(2112209, 2211001)
+        rotas.distancia_km(2211001, 3550308)
+        rotas.distancia_km(3550308, 2211001)
+        
+        assert list(rotas._cache) == [(2211001, 3550308), (3550308, 2211001)]
+    
+    def test_faixas_do_backfill(self):
+        """O intervalo de id_cte é dividido em faixas inclusivas."""
+        backfill = BackfillService(BancoRotasFalso(intervalo=(1, 25)), tamanho_bloco=10)
+        assert backfill.faixas_id_cte() == [(1, 10), (11, 20), (21, 25)]
+        
+        vazio = BackfillService(BancoRotasFalso(intervalo=(None, None)))
+        assert vazio.faixas_id_cte() == []
+
+
+class TestRecalculoQuilometragem:
+    """Testes da montagem do recálculo por custo/km."""
+    
+    def test_filtro_completo(self):
+        """Período inclusivo e placa normalizada viram parâmetros nomeados."""
+        filtro, params = BackfillService.montar_filtro('2025-03-01', '2025-03-31', 'abc-1d23')
+        
+        assert "d.data_emissao >= %(data_inicio)s::date" in filtro
+        assert "d.data_emissao < %(data_fim)s::date + 1" in filtro
+        assert "v.placa = %(placa)s" in filtro
+        assert params == {'data_inicio': '2025-03-01', 'data_fim': '2025-03-31', 'placa': 'ABC1D23'}
+    
+    def test_filtro_vazio(self):
+        """Sem filtros o recálculo abrange a tabela inteira."""
+        assert BackfillService.montar_filtro() == ('', {})
+    
+    def test_custo_invalido(self):
+        """Custo por km precisa ser positivo."""
+        with pytest.raises(ValueError):
+            BackfillService(BancoRotasFalso()).recalcular_custo_por_km(0)
+
+
+class TestEstatisticasVetorizadas:
+    """Testes da API vetorizada de estatísticas de quilometragem."""
+    
+    @pytest.fixture
+    def servico(self):
+        return QuilometragemService()
+    
+    @pytest.fixture
+    def amostra(self):
+        rng = np.random.default_rng(42)
+        km = rng.lognormal(5, 1, 50000)
+        km[::100] = 0
+        frete = km * rng.normal(3, 0.3, len(km))
+        frete[:10] *= 50   # custo por km fora do padrão
+        return km, frete
+    
+    def test_classificacao_igual_a_escalar(self, servico):
+        """Categorias vetorizadas coincidem com classificar/validar por documento."""
+        km = np.array([-1, 0, 5, 9.99, 10, 49.9, 50, 199, 200, 799, 800, 1999, 2000, 2001, 5001])
+        
+        categorias = servico.classificar_distancias(km)
+        validacao = servico.validar_quilometragens(km)
+        for valor, codigo, codigo_validacao in zip(km, categorias, validacao['categoria']):
+            assert CATEGORIAS_DISTANCIA[codigo] == servico.classificar_distancia(valor)
+            assert CATEGORIAS_VALIDACAO[codigo_validacao] == servico.validar_quilometragem(valor)['categoria']
+        
+        assert validacao['muito_curta'].sum() == 2
+        assert validacao['muito_longa'].sum() == 1
+    
+    def test_totais_iguais_a_versao_por_lista(self, servico):
+        """Chaves existentes mantêm os valores de calcular_estatisticas_quilometragem."""
+        dados = [{'quilometragem': 100, 'valor_frete': 250}, {'quilometragem': 0, 'valor_frete': 10},
+                 {'quilometragem': 300, 'valor_frete': 0}]
+        esperado = servico.calcular_estatisticas_quilometragem(dados)
+        
+        obtido = servico.calcular_estatisticas_vetorizadas(
+            [d['quilometragem'] for d in dados], [d['valor_frete'] for d in dados]
+        )
+        for chave, valor in esperado.items():
+            assert obtido[chave] == pytest.approx(valor)
+    
+    def test_dataframe(self, servico):
+        """Aceita DataFrame com nulos vindos do banco."""
+        pd = pytest.importorskip('pandas')
+        df = pd.DataFrame({'quilometragem': [100, 0, None], 'valor_frete': [250.0, 10.0, None]})
+        
+        estatisticas = servico.calcular_estatisticas_vetorizadas(df)
+        assert estatisticas['total_ctes'] == 3
+        assert estatisticas['ctes_com_quilometragem'] == 1
+        assert estatisticas['histograma_categorias']['❌ INVÁLIDA'] == 2
+        assert estatisticas['percentis_custo_km'][50] == pytest.approx(2.5)
+    
+    def test_outliers(self, servico, amostra):
+        """Documentos com custo por km fora das cercas de Tukey são marcados."""
+        km, frete = amostra
+        outliers = servico.marcar_outliers(km, frete)
+        
+        assert outliers[1:10].all()
+        assert not outliers[0]   # sem quilometragem
+        assert servico.calcular_estatisticas_vetorizadas(km, frete)['total_outliers'] == outliers.sum()
+    
+    def test_blocos_combinam_com_exato(self, servico, amostra):
+        """Modo em blocos: totais exatos e percentis próximos dos exatos."""
+        km, frete = amostra
+        exato = servico.calcular_estatisticas_vetorizadas(km, frete)
+        blocos = servico.calcular_estatisticas_em_blocos(
+            (km[i:i + 7000], frete[i:i + 7000]) for i in range(0, len(km), 7000)
+        )
+        
+        assert blocos['aproximado'] and not exato['aproximado']
+        for chave in ('total_ctes', 'ctes_com_quilometragem', 'quilometragem_total',
+                      'quilometragem_min', 'quilometragem_max', 'custo_medio_por_km',
+                      'histograma_categorias'):
+            assert blocos[chave] == pytest.approx(exato[chave])
+        for percentil, valor in exato['percentis_km'].items():
+            assert blocos['percentis_km'][percentil] == pytest.approx(valor, rel=0.01)
+    
+    def test_parciais_combinados(self, servico, amostra):
+        """Parciais de workers diferentes somados equivalem a um único acumulador."""
+        km, frete = amostra
+        metade = len(km) // 2
+        
+        unico = EstatisticasQuilometragemParciais(servico).atualizar(km, frete)
+        combinado = EstatisticasQuilometragemParciais(servico).atualizar(km[:metade], frete[:metade])
+        combinado.combinar(EstatisticasQuilometragemParciais(servico).atualizar(km[metade:], frete[metade:]))
+        
+        assert combinado.resultado() == unico.resultado()
+
+
+class TestSketchQuantis:
+    """Testes da aritmética dos sketches de quantis (espelho do SQL)."""
+    
+    @staticmethod
+    def sketch(valores):
+        buckets, contagens = np.unique(SketchQuantilManager.bucket(valores), return_counts=True)
+        return dict(zip(buckets.tolist(), contagens.tolist()))
+    
+    def test_erro_relativo_do_bucket(self):
+        """Todo valor fica a no máximo ALFA do representante do seu bucket."""
+        valores = np.geomspace(0.01, 1e7, 100000)
+        representantes = SketchQuantilManager.valor_bucket(SketchQuantilManager.bucket(valores))
+        
+        assert np.max(np.abs(representantes - valores) / valores) <= ALFA_SKETCH + 1e-12
+    
+    def test_quantis_com_erro_limitado(self):
+        """Mediana e p90 do sketch ficam dentro de ALFA do quantil exato."""
+        valores = np.random.default_rng(7).lognormal(5, 1, 100000)
+        sketch = self.sketch(valores)
+        
+        for quantil in (0.5, 0.9):
+            exato = np.quantile(valores, quantil, method='inverted_cdf')
+            assert SketchQuantilManager.quantil_buckets(sketch, quantil) == pytest.approx(exato, rel=ALFA_SKETCH)
+        assert SketchQuantilManager.quantil_buckets({}, 0.5) is None
+    
+    def test_combinacao_e_remocao(self):
+        """Somar sketches equivale a um sketch único; remover desfaz a soma."""
+        valores = np.random.default_rng(3).uniform(1, 3000, 20000)
+        janeiro, fevereiro = self.sketch(valores[:8000]), self.sketch(valores[8000:])
+        
+        combinado = dict(janeiro)
+        for bucket, contagem in fevereiro.items():
+            combinado[bucket] = combinado.get(bucket, 0) + contagem
+        assert combinado == self.sketch(valores)
+        
+        for bucket, contagem in fevereiro.items():
+            combinado[bucket] -= contagem
+        assert SketchQuantilManager.quantil_buckets(combinado, 0.9) == \
+            SketchQuantilManager.quantil_buckets(janeiro, 0.9)
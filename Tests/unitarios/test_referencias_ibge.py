@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TESTES UNITÁRIOS - Referências IBGE
+Snapshot versionado, índice espacial e tabelas em memória compartilhada
+"""
+
+import os
+import numpy as np
+import pytest
+
+from Database import ibge_loader
+from Database.managers.referencia_compartilhada_manager import ReferenciaCompartilhadaManager
+from Database.services.distancia_service import DistanciaService
+from Database.services.indice_espacial_service import IndiceEspacialService
+
+
+class TestSnapshotIBGE:
+    """Testes do snapshot IBGE versionado (carga offline)."""
+    
+    def test_snapshot_distribuido_integro(self):
+        """O snapshot do repositório confere com o manifesto e cobre todas as UFs."""
+        manifesto = ibge_loader.read_manifest()
+        
+        assert manifesto['files'][ibge_loader.UF_FILE]['rows'] == 27
+        assert manifesto['files'][ibge_loader.MUNICIPIO_FILE]['rows'] > 0
+    
+    def test_semente_recusada_sem_permissao(self, temp_dir):
+        """Snapshot semente só é carregado com --allow-seed; o distribuído é semente."""
+        manifesto = ibge_loader.read_manifest()
+        if manifesto['files'][ibge_loader.MUNICIPIO_FILE]['rows'] < 5000:
+            assert manifesto.get('seed') is True
+        
+        semente = ibge_loader.write_snapshot([(22, 'PI', 'Piauí', 'Nordeste')], [],
+                                             temp_dir / 'semente', seed=True)
+        with pytest.raises(ValueError, match='--refresh'):
+            ibge_loader.check_seed(semente)
+        ibge_loader.check_seed(semente, allow_seed=True)
+        ibge_loader.check_seed(ibge_loader.write_snapshot([], [], temp_dir / 'completo'))
+        
+        with pytest.raises(SystemExit):
+            ibge_loader.main(['--snapshot-dir', str(temp_dir / 'semente')])
+    
+    def test_escrita_deterministica_e_verificada(self, temp_dir):
+        """Mesmos dados geram os mesmos bytes; arquivo alterado é rejeitado."""
+        ufs = [(22, 'PI', 'Piauí', 'Nordeste')]
+        municipios = [(2211001, 'Teresina', 22, -5.09194, -42.8034)]
+        primeiro = ibge_loader.write_snapshot(ufs, municipios, temp_dir / 'a')
+        segundo = ibge_loader.write_snapshot(ufs, municipios, temp_dir / 'b')
+        assert primeiro['files'] == segundo['files']
+        
+        arquivo = temp_dir / 'a' / ibge_loader.MUNICIPIO_FILE
+        arquivo.write_bytes(arquivo.read_bytes() + b'\0')
+        with pytest.raises(ValueError):
+            ibge_loader.read_manifest(temp_dir / 'a')
+
+
+class TestIndiceEspacial:
+    """Testes do índice espacial em grade (comparado com busca exaustiva)."""
+    
+    @pytest.fixture
+    def pontos(self):
+        rng = np.random.default_rng(11)
+        latitudes = rng.uniform(-33.7, 5.2, 3000)
+        longitudes = rng.uniform(-73.9, -34.8, 3000)
+        codigos = np.arange(1100000, 1103000)
+        return codigos, latitudes, longitudes
+    
+    @pytest.fixture
+    def indice(self, pontos):
+        indice = IndiceEspacialService(tamanho_celula=0.5)
+        indice.definir_coordenadas(*pontos)
+        return indice
+    
+    @staticmethod
+    def distancias(pontos, latitude, longitude):
+        _, latitudes, longitudes = pontos
+        return DistanciaService.haversine_km(
+            np.radians(latitude), np.radians(longitude), np.radians(latitudes), np.radians(longitudes)
+        )
+    
+    def test_raio_igual_a_busca_exaustiva(self, indice, pontos):
+        """Consultas por raio retornam exatamente os pontos da busca exaustiva."""
+        for latitude, longitude, raio in ((-5.09, -42.80, 150), (-20.0, -50.0, 600), (4.5, -35.0, 1500)):
+            codigos, distancias = indice.no_raio(latitude, longitude, raio)
+            esperado = pontos[0][self.distancias(pontos, latitude, longitude) <= raio]
+            
+            assert set(codigos) == set(esperado)
+            assert np.all(np.diff(distancias) >= 0)
+    
+    def test_mais_proximo(self, indice, pontos):
+        """Vizinho mais próximo coincide com o mínimo exaustivo, inclusive fora da grade."""
+        consultas = [(-5.09, -42.80), (-40.0, -80.0), (10.0, -30.0), (-15.78, -47.93)]
+        codigos, distancias = indice.mais_proximo(*zip(*consultas))
+        
+        for (latitude, longitude), codigo, km in zip(consultas, codigos, distancias):
+            exaustivo = self.distancias(pontos, latitude, longitude)
+            assert codigo == pontos[0][np.argmin(exaustivo)]
+            assert km == pytest.approx(exaustivo.min())
+    
+    def test_caixa_e_regioes(self, indice, pontos):
+        """Caixa inclusiva e regiões: vizinhos na mesma célula, códigos ausentes -1."""
+        codigos, latitudes, longitudes = pontos
+        dentro = (latitudes >= -10) & (latitudes <= -5) & (longitudes >= -45) & (longitudes <= -40)
+        assert list(indice.na_caixa(-10, -5, -45, -40)) == sorted(codigos[dentro])
+        
+        regioes = indice.regioes([codigos[0], 999], tamanho_regiao=2.0)
+        assert regioes[1] == -1
+        centro = indice.centro_regiao(regioes[0], tamanho_regiao=2.0)
+        assert abs(centro[0] - latitudes[0]) <= 1 and abs(centro[1] - longitudes[0]) <= 1
+    
+    def test_indice_do_dashboard_montado_uma_vez(self, pontos):
+        """Reruns da página reutilizam o índice guardado no cache de consultas."""
+        pytest.importorskip('streamlit')
+        pytest.importorskip('plotly')
+        pd = pytest.importorskip('pandas')
+        from Streamlit.components.operacao_transporte import OperacaoTransporteViewer
+        from Streamlit.utils.cache_consultas import CacheConsultas
+        
+        codigos, latitudes, longitudes = pontos
+        coordenadas = pd.DataFrame({'id_municipio': codigos, 'latitude': latitudes,
+                                    'longitude': longitudes})
+        
+        class ConsultasFalsas:
+            cache = CacheConsultas(ler_geracao=lambda: 1)
+            leituras = 0
+            
+            def obter(self, query, params=None):
+                ConsultasFalsas.leituras += 1
+                return coordenadas
+        
+        viewer = OperacaoTransporteViewer()
+        viewer.consultas = ConsultasFalsas()
+        
+        indice = viewer.indice_espacial()
+        assert viewer.indice_espacial() is indice
+        assert ConsultasFalsas.leituras == 1
+        assert indice.mais_proximo([latitudes[0]], [longitudes[0]])[0][0] == codigos[0]
+
+
+class TestReferenciaCompartilhada:
+    """Testes das tabelas IBGE publicadas em memória compartilhada."""
+    
+    MUNICIPIOS = [
+        (2211001, 22, 'Teresina', -5.09, -42.80),
+        (2112209, 21, 'Timon', -5.09, -42.83),
+        (2927408, 29, 'Salvador', -12.97, -38.50),
+        (2211100, 22, 'Salvador', None, None),
+    ]
+    UFS = [(29, 'BA'), (21, 'MA'), (22, 'PI')]
+    
+    @pytest.fixture
+    def manager(self):
+        manager = ReferenciaCompartilhadaManager(prefixo=f"sact_t{os.getpid()}", intervalo_verificacao=0)
+        yield manager
+        manager.remover()
+    
+    def test_publicar_e_consultar(self, manager):
+        """Leitor em outro manager anexa sem cópia e resolve nome/UF e códigos."""
+        versao = manager.publicar(manager.montar_tabelas(self.MUNICIPIOS, self.UFS))
+        tabelas = ReferenciaCompartilhadaManager(prefixo=manager.prefixo).atual()
+        
+        assert tabelas.versao == versao and tabelas.total_municipios == 4
+        assert not tabelas.codigos.flags.owndata and not tabelas.codigos.flags.writeable
+        assert tabelas.codigo_municipio('salvador', 'BA') == 2927408
+        assert tabelas.codigo_municipio('Salvador', 'PI') == 2211100
+        assert tabelas.codigo_municipio('Salvador', 'MA') is None
+        assert tabelas.nome_municipio(2112209) == 'TIMON'
+        assert list(tabelas.indices([2211001, 1])) == [1, -1]
+        assert np.isnan(tabelas.latitudes[tabelas.indices([2211100])[0]])
+    
+    def test_nova_versao_troca_atomicamente(self, manager):
+        """Nova publicação troca a versão; a visão anterior continua legível."""
+        manager.publicar(manager.montar_tabelas(self.MUNICIPIOS, self.UFS))
+        leitor = ReferenciaCompartilhadaManager(prefixo=manager.prefixo, intervalo_verificacao=0)
+        anterior = leitor.atual()
+        
+        novos = self.MUNICIPIOS + [(2100055, 21, 'Açailândia', -4.95, -47.50)]
+        versao = manager.publicar(manager.montar_tabelas(novos, self.UFS))
+        atual = leitor.atual()
+        
+        assert atual.versao == versao != anterior.versao
+        assert atual.codigo_municipio('AÇAILÂNDIA', 'MA') == 2100055
+        assert anterior.total_municipios == 4 and anterior.nome_municipio(2211001) == 'TERESINA'
+        assert manager.publicar(manager.montar_tabelas(reversed(novos), self.UFS)) == versao
+    
+    def test_distancias_usam_referencias(self, manager, temp_dir):
+        """DistanciaService carrega as coordenadas publicadas (sem banco)."""
+        manager.publicar(manager.montar_tabelas(self.MUNICIPIOS, self.UFS))
+        servico = DistanciaService(diretorio_cache=str(temp_dir), referencias=manager)
+        
+        assert servico.total_municipios == 3
@@ -2,6 +2,7 @@
 """
 Módulo Facade - Interface simplificada para uso do CT-e Extractor
 """
+from collections import deque
 from contextlib import contextmanager
 from pathlib import Path
 from typing import Dict, Any, Optional, List, Union
@@ -19,6 +20,9 @@ class CTEFacade:
     do sistema, ocultando a complexidade interna e aplicando o padrão Facade.
     """
     
+    # Quantidade de extrações recentes mantidas em get_historico()
+    MAX_HISTORICO = 1000
+    
     def __init__(self, config: Dict[str, Any] = None):
         """
         Inicializa o facade com configuração opcional.
@@ -31,7 +35,8 @@ class CTEFacade:
         
         # Estado interno
         self._last_extractor = None
-        self._extraction_history = []
+        self._extraction_history = deque(maxlen=self.MAX_HISTORICO)
+        self._extraction_totals = {'total': 0, 'sucessos': 0, 'campos': 0}
     
     def _apply_global_config(self):
         """Aplica configuração global ao sistema."""
@@ -72,12 +77,17 @@ class CTEFacade:
                 monitor.add_metric("file", arquivo_str)
                 monitor.add_metric("success", dados is not None)
             
-            # Registrar no histórico
+            # Registrar no histórico (recentes) e nos totais
+            campos = len(dados) if dados else 0
             self._extraction_history.append({
                 'arquivo': arquivo_str,
                 'sucesso': dados is not None,
-                'campos': len(dados) if dados else 0
+                'campos': campos
             })
+            self._extraction_totals['total'] += 1
+            if dados is not None:
+                self._extraction_totals['sucessos'] += 1
+                self._extraction_totals['campos'] += campos
             
             return dados
             
@@ -329,28 +339,29 @@ class CTEFacade:
     # ========== MÉTODOS DE INFORMAÇÃO E STATUS ==========
     
     def get_historico(self) -> List[Dict[str, Any]]:
-        """Retorna histórico de extrações."""
-        return self._extraction_history.copy()
+        """Retorna histórico das extrações mais recentes (até MAX_HISTORICO)."""
+        return list(self._extraction_history)
     
     def get_estatisticas(self) -> Dict[str, Any]:
         """Retorna estatísticas de uso."""
-        if not self._extraction_history:
+        total = self._extraction_totals['total']
+        if not total:
             return {'total_extracoes': 0}
         
-        total = len(self._extraction_history)
-        sucessos = sum(1 for h in self._extraction_history if h['sucesso'])
+        sucessos = self._extraction_totals['sucessos']
         
         return {
             'total_extracoes': total,
             'sucessos': sucessos,
             'falhas': total - sucessos,
             'taxa_sucesso': sucessos / total if total > 0 else 0,
-            'media_campos_extraidos': sum(h['campos'] for h in self._extraction_history if h['sucesso']) / sucessos if sucessos > 0 else 0
+            'media_campos_extraidos': self._extraction_totals['campos'] / sucessos if sucessos > 0 else 0
         }
     
     def limpar_historico(self):
         """Limpa o histórico de extrações."""
         self._extraction_history.clear()
+        self._extraction_totals = {'total': 0, 'sucessos': 0, 'campos': 0}
     
     def get_configuracao_atual(self) -> Dict[str, Any]:
         """Retorna configuração atual do sistema."""